@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Measures the startup time of exec_evaluations.py in fresh interpreters and shows which heavy dependencies are
+loaded. The heavy dependencies are imported when the first metric which needs them runs, a single file evaluation
+without an image directory doesn't load PIL or tqdm. nltk is still loaded by every evaluation of a file, because the
+levenshtein distance is always computed.
+Each benchmark is compared with an eager run which imports all heavy dependencies before the script, like the
+script did before the imports were deferred.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+HEAVY_MODULES: List[str] = ["numpy", "shapely", "nltk", "PIL", "tqdm"]
+
+# runs exec_evaluations.py with the given arguments and prints the loaded heavy modules as last line
+# without arguments, the script is only imported. The eager modules are imported before the script.
+_RUN_SCRIPT: str = """
+import importlib, json, runpy, sys
+heavy_modules, eager_modules, arguments = json.loads(sys.argv[1])
+for module in eager_modules:
+    importlib.import_module(module)
+sys.argv = ["exec_evaluations.py"] + arguments
+try:
+    runpy.run_path("exec_evaluations.py", run_name="__main__" if len(arguments) > 0 else "exec_evaluations")
+finally:
+    print(json.dumps([x for x in heavy_modules if x in sys.modules]))
+"""
+
+
+def _run(arguments: List[str], eager: bool) -> Tuple[float, List[str]]:
+    """
+    :param eager: import all heavy modules before the script
+    :return: wall time in seconds and the heavy modules which were loaded
+    """
+    start: float = time.perf_counter()
+    completed: subprocess.CompletedProcess = subprocess.run(
+        [sys.executable, "-c", _RUN_SCRIPT, json.dumps([HEAVY_MODULES, HEAVY_MODULES if eager else [], arguments])],
+        cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        check=True)
+    duration: float = time.perf_counter() - start
+    return duration, json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _benchmark(name: str, arguments: List[str], repeat: int):
+    """
+    runs the deferred and the eager imports alternately, so both see the same state of the file system caches
+    """
+    durations: Dict[bool, List[float]] = {False: [], True: []}
+    loaded_modules: Dict[bool, List[str]] = {}
+    for _ in range(repeat):
+        for eager in [False, True]:
+            duration, loaded_modules[eager] = _run(arguments, eager)
+            durations[eager].append(duration)
+    medians: Dict[bool, float] = {}
+    for eager in [False, True]:
+        durations[eager].sort()
+        medians[eager] = durations[eager][len(durations[eager]) // 2]
+        logger.info((name + (", eager" if eager else "")).ljust(24) + ("min %.3f s" % durations[eager][0]).rjust(14) +
+                    ("median %.3f s" % medians[eager]).rjust(18) + "   loaded: " +
+                    (", ".join(loaded_modules[eager]) if len(loaded_modules[eager]) > 0 else "-"))
+    logger.info((name + ", saved").ljust(24) + ("median %.3f s" % (medians[True] - medians[False])).rjust(32))
+
+
+def main(prediction_file: Optional[str], ground_truth_directory: Optional[str], image_directory: Optional[str],
+         repeat: int):
+    logger.info("Startup of exec_evaluations.py over " + str(repeat) + " runs each:")
+    _benchmark("import", [], repeat)
+    if prediction_file is not None and ground_truth_directory is not None:
+        arguments: List[str] = ["-f", os.path.abspath(prediction_file), "-g", os.path.abspath(ground_truth_directory)]
+        _benchmark("-f", arguments, repeat)
+        logger.info("nltk is loaded by every -f run, because the levenshtein distance is always computed.")
+        if image_directory is not None:
+            _benchmark("-f with images", arguments + ["-i", os.path.abspath(image_directory)], repeat)
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--prediction_file", type=str, required=False,
+                        help="Prediction file for the benchmark of a whole single file evaluation.",
+                        default=None)
+    parser.add_argument("-g", "--ground_truth_directory", type=str, required=False,
+                        help="Ground truth directory for the prediction file.",
+                        default=None)
+    parser.add_argument("-i", "--image_directory", type=str, required=False,
+                        help="Image directory to additionally benchmark the evaluation with images.",
+                        default=None)
+    parser.add_argument("--repeat", type=int, required=False,
+                        help="Number of runs of each benchmark.",
+                        default=10)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args: argparse.Namespace = parse_arguments()
+    main(args.prediction_file, args.ground_truth_directory, args.image_directory, args.repeat)
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+This script converts the images of an image directory into foreground masks with one bit per pixel.
+The masks are written into a hidden directory inside the image directory, exec_evaluations.py reads them instead of
+decoding the images. Running it again only converts the images which were added or changed since the last run.
+"""
+import argparse
+import sys
+
+from loguru import logger
+
+import script_utilities
+
+logger.remove()
+logger.add(sys.stderr, level="INFO")
+
+
+def main(image_directory: str):
+    script_utilities.compile_foreground_masks(image_directory)
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--image_directory", type=str, required=True,
+                        help="The directory which contains the images used for prediction and evaluation.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args: argparse.Namespace = parse_arguments()
+    main(args.image_directory)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+This script runs a local evaluation server for interactive tools.
+The ground truth corpus is parsed once at startup and the foreground masks of the images are kept in memory, so
+evaluating a single prediction only costs the metric computation itself.
+
+POST /evaluate?filename=<name>  with a prediction document as body returns all metrics as json.
+                                The filename is optional, the filename of the prediction document is used otherwise.
+GET  /health                    returns the number of loaded ground truth documents.
+
+The errors of an evaluation are returned as json with an error message:
+
+400  the body isn't a prediction document or there is no filename
+404  there is no ground truth for the filename
+413  the prediction is over the memory budget
+422  the prediction can't be evaluated, e.g. its revisions are malformed
+500  the evaluation failed for another reason, e.g. the image is missing
+"""
+import argparse
+import json
+import os.path
+import sys
+import time
+
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from docrecjson import decoder
+from docrecjson.elements import Document
+import numpy as np
+from loguru import logger
+
+import exec_evaluations
+import script_utilities
+import python.evaluations.thresholds as threshold_sweep
+from python.evaluations.columnar import ColumnarDocument
+from python.evaluations.columnar_store import ColumnarStore
+from python.evaluations.memory_accounting import MemoryBudgetExceeded
+
+logger.remove()
+logger.add(sys.stderr, level="INFO")
+
+
+class EvaluationServer(HTTPServer):
+    """
+    requests are handled one after another, the metrics share caches which are not synchronized
+    """
+
+    def __init__(self, address, evaluation: exec_evaluations.Evaluation, ground_truth: Dict[str, ColumnarDocument],
+                 image_directory: Optional[str], image_cache_size: int):
+        super().__init__(address, EvaluationRequestHandler)
+        self.evaluation: exec_evaluations.Evaluation = evaluation
+        self.ground_truth: Dict[str, ColumnarDocument] = ground_truth
+        self.image_directory: Optional[str] = image_directory
+        self.image_cache_size: int = image_cache_size
+        self.images: OrderedDict = OrderedDict()
+
+    def get_foreground_mask(self, filename: str) -> Optional[np.ndarray]:
+        if self.image_directory is None:
+            return None
+        foreground_mask: Optional[np.ndarray] = self.images.get(filename)
+        if foreground_mask is None:
+            foreground_mask = script_utilities.load_foreground_mask(filename, self.image_directory)
+            self.images[filename] = foreground_mask
+            if len(self.images) > self.image_cache_size:
+                self.images.popitem(last=False)
+        else:
+            self.images.move_to_end(filename)
+        return foreground_mask
+
+    def evaluate(self, prediction: Document, filename: str) -> dict:
+        """
+        :param filename: filename of the prediction, it identifies the ground truth and the image
+        :raises KeyError: if there is no ground truth for the filename
+        """
+        key: str = script_utilities.ground_truth_key(filename)
+        if key not in self.ground_truth:
+            raise KeyError("No ground truth for [" + filename + "]")
+        return exec_evaluations.evaluate_document(self.evaluation, self.ground_truth[key], prediction,
+                                                  self.image_directory, self.get_foreground_mask(filename))
+
+
+class EvaluationRequestHandler(BaseHTTPRequestHandler):
+    server: EvaluationServer
+
+    def _send_json(self, status: int, content: dict):
+        body: bytes = json.dumps(content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str):
+        logger.warning(str(status) + ": " + message)
+        self._send_json(status, {"error": message})
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self._send_json(200, {"documents": len(self.server.ground_truth)})
+        else:
+            self._send_json(404, {"error": "Unknown path " + self.path})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/evaluate":
+            self._send_json(404, {"error": "Unknown path " + self.path})
+            return
+
+        start: float = time.perf_counter()
+        try:
+            body: str = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+            prediction: Document = decoder.loads(body)
+            filename: Optional[str] = parse_qs(url.query).get("filename", [prediction.filename])[0]
+        except Exception as error:
+            # the decoder raises e.g. a KeyError for a missing field, every error of the body is the client's
+            self._send_error(400, "Invalid prediction document: " + type(error).__name__ + ": " + str(error))
+            return
+        if not filename or os.path.basename(filename) != filename:
+            self._send_error(400, "Invalid filename [" + str(filename) + "], pass the filename of the image as "
+                                  "?filename=<name> if the prediction doesn't state it")
+            return
+        # the evaluation identifies the prediction by its filename, e.g. in the results store
+        if prediction.filename is None:
+            prediction.filename = filename
+
+        if script_utilities.ground_truth_key(filename) not in self.server.ground_truth:
+            self._send_error(404, "No ground truth for [" + filename + "]")
+            return
+
+        try:
+            metrics: dict = self.server.evaluate(prediction, filename)
+        except MemoryBudgetExceeded as error:
+            self._send_error(413, str(error))
+            return
+        except (AttributeError, LookupError, RuntimeError, TypeError, ValueError) as error:
+            self._send_error(422, "Evaluation of [" + filename + "] failed: " + type(error).__name__ + ": " +
+                             str(error))
+            return
+        except Exception as error:
+            logger.exception("Evaluation of [" + filename + "] failed")
+            self._send_error(500, "Evaluation of [" + filename + "] failed: " + type(error).__name__ + ": " +
+                             str(error))
+            return
+        latency_ms: float = (time.perf_counter() - start) * 1000
+        logger.info("Evaluated [" + filename + "] in " + "%.1f" % latency_ms + " ms")
+        self._send_json(200, {"filename": filename, "metrics": metrics, "latency_ms": latency_ms})
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def main(ground_truth_directory: str, ground_truth_store_directory: Optional[str], image_directory: Optional[str],
+         host: str, port: int, image_cache_size: int, thresholds: Optional[str] = None):
+    evaluation: exec_evaluations.Evaluation = exec_evaluations.Evaluation()
+    if thresholds is not None:
+        evaluation.sweep_thresholds = threshold_sweep.parse_thresholds(thresholds)
+    ground_truth_store: Optional[ColumnarStore] = None
+    if ground_truth_store_directory is not None:
+        ground_truth_store = script_utilities.load_ground_truth_store(ground_truth_directory,
+                                                                      ground_truth_store_directory)
+    ground_truth: Dict[str, ColumnarDocument] = script_utilities.load_ground_truth_corpus(ground_truth_directory,
+                                                                                          ground_truth_store)
+    logger.info("Loaded [" + str(len(ground_truth)) + "] ground truth documents.")
+
+    server: EvaluationServer = EvaluationServer((host, port), evaluation, ground_truth, image_directory,
+                                                image_cache_size)
+    logger.success("Serving evaluations on http://" + host + ":" + str(port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-g", "--ground_truth_directory", type=str, required=True,
+                        help="This is the directory with the ground_truth files.")
+    parser.add_argument("-s", "--ground_truth_store", type=str, required=False,
+                        help="Specify a directory for the compiled ground truth, see exec_evaluations.py.",
+                        default=None)
+    parser.add_argument("-i", "--image_directory", type=str, required=False,
+                        help="Specify a directory which contains the images used for prediction and evaluation."
+                             "This enables for additional metrics to be computed.",
+                        default=None)
+    parser.add_argument("--host", type=str, required=False, default="127.0.0.1",
+                        help="Address the server listens on.")
+    parser.add_argument("--port", type=int, required=False, default=8765,
+                        help="Port the server listens on.")
+    parser.add_argument("--image_cache_size", type=int, required=False, default=256,
+                        help="Number of foreground masks of images which are kept in memory.")
+    parser.add_argument("--thresholds", type=str, required=False, default=None,
+                        help="Additionally compute the threshold sweep start:stop:step, see exec_evaluations.py.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args: argparse.Namespace = parse_arguments()
+    main(args.ground_truth_directory, args.ground_truth_store, args.image_directory, args.host, args.port,
+         args.image_cache_size, args.thresholds)
@@ -4,29 +4,58 @@ This script is intended to be an easy entrypoint for executing all metrics writt
 It's intended to be executed over a whole directory of annotations together with their ground truth
 """
 import argparse
+import contextlib
+import functools
 import glob
+import itertools
+import math
+import multiprocessing
 import os.path
+import random
 import sys
+import time
 
-from typing import List, Optional
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
 
 import python.evaluations.iou as iou
+import python.evaluations.archives as archives
+import python.evaluations.columnar as columnar
+import python.evaluations.confidence as confidence
 import python.evaluations.foreground_pixel_accuracy as foreground_pixel_accuracy
-import python.evaluations.levenshtein_distance as ld
-import python.evaluations.correct_tsr_share as tsr_share
-import python.evaluations.completeness as completeness
-import python.evaluations.purity as purity
+import python.evaluations.memory_accounting as memory
+import python.evaluations.parallel as parallel
+import python.evaluations.results_store as results
+import python.evaluations.scheduling as scheduling
+import python.evaluations.table_metrics as table_metrics
+import python.evaluations.table_structure as table_structure
+import python.evaluations.thresholds as threshold_sweep
+import python.evaluations.time_limits as limits
+from python.evaluations.columnar import ColumnarDocument
+from python.evaluations.columnar_store import ColumnarStore
+from python.evaluations.confidence import DocumentScores, RunningStatistics
+from python.evaluations.foreground_pixel_accuracy import PixelSampling
+from python.evaluations.live_metrics import LiveMetrics
+from python.evaluations.memory_accounting import MemoryAccounting, MemoryBudgetExceeded
+from python.evaluations.parallel import CellPool
+from python.evaluations.results_store import ResultsStore
+from python.evaluations.table_metrics import DocumentMetrics, TableCache
+from python.evaluations.time_limits import DocumentStopped, TimeLimits
 
-from docrecjson.elements import Document, Revision, Table
+from docrecjson.elements import Document, Revision
 
+import numpy as np
 from loguru import logger
-from tqdm import tqdm
 
 import script_utilities
 
 logger.remove()
 logger.add(sys.stderr, level="INFO")
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 IOU: str = "iou"
 IOU_F1_60 = "iou_f1_60"
 IOU_F1_70 = "iou_f1_70"
@@ -41,6 +70,14 @@ FPA_F1_80 = "fpa_f1_80"
 FPA_F1_90 = "fpa_f1_90"
 FPA_F1_THRESHOLDS = [FPA_F1_60, FPA_F1_70, FPA_F1_80, FPA_F1_90]
 
+# squared error bound of the approximate foreground pixel accuracy of a document, the error bound of the average is
+# the root of their sum divided by the number of documents
+FPA_SQUARED_ERROR_BOUND: str = "fpa_squared_error_bound"
+# lower and upper bounds of the approximate fpa f1 scores, e.g. fpa_f1_60_lower
+FPA_F1_BOUNDS: List[str] = [threshold_key + "_" + bound for bound in ["lower", "upper"]
+                            for threshold_key in FPA_F1_THRESHOLDS]
+APPROXIMATION_METRICS: List[str] = [FPA_SQUARED_ERROR_BOUND] + FPA_F1_BOUNDS
+
 LEVENSHTEIN_DISTANCE: str = "levenshtein_distance"
 LD_F1_60 = "ld_f1_60"
 LD_F1_70 = "ld_f1_70"
@@ -54,6 +91,102 @@ COMPLETENESS: str = "completeness"
 
 PURITY: str = "purity"
 
+METRICS: List[str] = [IOU] + IOU_F1_THRESHOLDS + [FOREGROUND_PIXEL_ACCURACY] + FPA_F1_THRESHOLDS + \
+                     [LEVENSHTEIN_DISTANCE] + LD_F1_THRESHOLDS + [CORRECT_TSR_SHARE, COMPLETENESS, PURITY]
+
+# thresholds of the *_F1_60 to *_F1_90 metrics
+F1_THRESHOLD_VALUES: np.ndarray = np.array([0.6, 0.7, 0.8, 0.9])
+
+# prefixes of the threshold sweep metrics, e.g. iou_precision_0.5, iou_f1_0.5 and iou_f1_average
+SWEEP_PREFIXES: List[str] = ["iou", "fpa", "ld"]
+
+# minimum number of documents before a sampled evaluation can stop, the normal approximation of the confidence
+# intervals is too optimistic for fewer documents
+MIN_SAMPLES: int = 30
+
+# number of documents with the highest peak memory in the memory report
+MEMORY_REPORT_DOCUMENTS: int = 10
+
+# number of documents with the largest difference between their estimated and measured time in the schedule report
+SCHEDULE_REPORT_DOCUMENTS: int = 10
+
+# documents which are queued per document worker process, the rest waits in the order of the schedule
+QUEUED_PER_WORKER: int = 2
+
+# hidden, therefore it's not listed as prediction file
+WATCH_STATE_FILENAME: str = ".evaluation_state.json"
+
+
+class Evaluation:
+    """
+    configuration of the metrics and the records which are shared by all documents of an evaluation, see
+    create_evaluation. The default evaluation computes the exact metrics without records.
+    """
+    __slots__ = ("sweep_thresholds", "memory_accounting", "results_store", "cell_pool", "parallel_min_cells",
+                 "fpa_sampling", "fpa_sampling_z", "time_limits", "live_metrics")
+
+    def __init__(self):
+        # thresholds of the optional sweep, set by --thresholds
+        self.sweep_thresholds: Optional[np.ndarray] = None
+        # peak memory of the documents and metrics, set by --memory_profile or --memory_budget
+        self.memory_accounting: Optional[MemoryAccounting] = None
+        # metrics of each table, set by --results_store
+        self.results_store: Optional[ResultsStore] = None
+        # worker processes for the cells of large documents and the number of cells from which a document is large,
+        # set by --cell_workers and --cell_parallel_threshold
+        self.cell_pool: Optional[CellPool] = None
+        self.parallel_min_cells: int = parallel.MIN_CELLS
+        # pixel sampling of the approximate foreground pixel accuracy and the quantile of the standard normal
+        # distribution for its error bounds, set by --fpa_sampling and --confidence_level. None computes the exact
+        # foreground pixel accuracy.
+        self.fpa_sampling: Optional[PixelSampling] = None
+        self.fpa_sampling_z: float = confidence.z_value(0.95)
+        # worker process and watchdog which stops documents and metrics over their time limit, set by
+        # --document_time_limit or --metric_time_limit
+        self.time_limits: Optional[TimeLimits] = None
+        # throughput, latencies, errors and cache hits of the running evaluation, set by --live_metrics
+        self.live_metrics: Optional[LiveMetrics] = None
+
+
+# evaluation, ground truth directory, image directory and ground truth store of a document worker process
+_worker_sources: Optional[Tuple[Evaluation, str, Optional[str], Optional[ColumnarStore]]] = None
+
+
+def _sweep_metric(prefix: str, kind: str, threshold: Optional[float] = None) -> str:
+    """
+    :param kind: precision, recall or f1
+    :param threshold: threshold of the value, none for the f1 score averaged over all thresholds of the sweep
+    """
+    return prefix + "_" + kind + "_" + ("average" if threshold is None else "%g" % threshold)
+
+
+def _sweep_metrics(evaluation: Evaluation) -> List[str]:
+    """
+    :return: the metrics of the threshold sweep, empty without a sweep
+    """
+    if evaluation.sweep_thresholds is None:
+        return []
+    return [_sweep_metric(prefix, kind, threshold) for prefix in SWEEP_PREFIXES
+            for kind in ["precision", "recall", "f1"] for threshold in evaluation.sweep_thresholds] + \
+        [_sweep_metric(prefix, "f1") for prefix in SWEEP_PREFIXES]
+
+
+def _ordered_metrics(metrics: Iterable[str]) -> List[str]:
+    """
+    :return: METRICS followed by the other metrics, e.g. of a threshold sweep, in their given order. The squared error
+    bound of the approximate foreground pixel accuracy isn't averaged like the metrics and is left out.
+    """
+    ordered: List[str] = list(METRICS)
+    ordered.extend(metric for metric in dict.fromkeys(metrics)
+                   if metric not in METRICS and metric != FPA_SQUARED_ERROR_BOUND)
+    return ordered
+
+
+def _create_metrics(evaluation: Evaluation) -> dict:
+    # each metric maps the revision name to the summed metric value of this revision
+    return {metric: {} for metric in METRICS + _sweep_metrics(evaluation) +
+            (APPROXIMATION_METRICS if evaluation.fpa_sampling else [])}
+
 
 def _output_metrics(files_considered: int, metrics: dict):
     logger.info("-----------------------------------------------------------------------------------------------------")
@@ -74,6 +207,7 @@ def _output_metrics(files_considered: int, metrics: dict):
     for threshold_key in FPA_F1_THRESHOLDS:
         for key, value in metrics[threshold_key].items():
             logger.info(str(threshold_key) + ": " + key + ": " + str(float(value) / files_considered))
+    _output_approximation(files_considered, metrics)
     logger.info("-----------------------------------------------------------------------------------------------------")
     logger.info("Found the following Levenshtein Distance Scores:")
     for key, value in metrics[LEVENSHTEIN_DISTANCE].items():
@@ -95,26 +229,121 @@ def _output_metrics(files_considered: int, metrics: dict):
     logger.info("Found the following purity values:")
     for key, value in metrics[PURITY].items():
         logger.info(key + ": " + str(float(value) / files_considered))
+    sweep_metrics: List[str] = [metric for metric in metrics
+                                if metric not in METRICS and metric not in APPROXIMATION_METRICS]
+    if len(sweep_metrics) == 0:
+        return
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("Found the following values of the threshold sweep:")
+    for sweep_metric in sweep_metrics:
+        for key, value in metrics[sweep_metric].items():
+            logger.info(sweep_metric + ": " + key + ": " + str(float(value) / files_considered))
 
 
-def _process_revision(ground_truth: Document, metrics: dict, prediction: Document, revision_index: int,
-                      image_directory: Optional[str]) -> dict:
+def _output_approximation(files_considered: int, metrics: dict):
+    """
+    outputs the error bounds of the approximate foreground pixel accuracy, if it was approximated
+    """
+    if len(metrics.get(FPA_SQUARED_ERROR_BOUND, {})) == 0:
+        return
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("The Foreground Pixel Accuracy was approximated from sampled pixels, its averages are about within:")
+    for key, value in metrics[FPA_SQUARED_ERROR_BOUND].items():
+        logger.info(key + ": " + str(float(metrics[FOREGROUND_PIXEL_ACCURACY][key]) / files_considered) + " +- " +
+                    str(math.sqrt(float(value)) / files_considered))
+    logger.info("The FPA F1 Scores are within:")
+    for threshold_key in FPA_F1_THRESHOLDS:
+        for key, value in metrics[threshold_key + "_lower"].items():
+            logger.info(str(threshold_key) + ": " + key + ": [" + str(float(value) / files_considered) + ", " +
+                        str(float(metrics[threshold_key + "_upper"][key]) / files_considered) + "]")
+
+
+def _add_approximation(metrics: dict, revision_name: str, squared_error_bound: float, f1_lower: np.ndarray,
+                       f1_upper: np.ndarray):
+    """
+    adds the error bounds of the approximate foreground pixel accuracy of one revision
+    :param f1_lower: lower bounds of the f1 scores of FPA_F1_THRESHOLDS, the same for f1_upper
+    """
+    values: Dict[str, float] = {FPA_SQUARED_ERROR_BOUND: squared_error_bound}
+    for threshold_key, lower, upper in zip(FPA_F1_THRESHOLDS, f1_lower, f1_upper):
+        values[threshold_key + "_lower"] = float(lower)
+        values[threshold_key + "_upper"] = float(upper)
+    for metric, value in values.items():
+        revisions: dict = metrics.setdefault(metric, {})
+        revisions[revision_name] = float(revisions[revision_name]) + value if revisions.get(
+            revision_name) is not None else value
+
+
+def _add_sweep(evaluation: Evaluation, metrics: dict, prefix: str, revision_name: str, precision: np.ndarray,
+               recall: np.ndarray, f1_score: np.ndarray):
+    """
+    adds the values of the threshold sweep of one revision
+    :param precision: precision for the fixed f1 thresholds followed by the sweep thresholds, the same for recall and
+    f1_score
+    """
+    if evaluation.sweep_thresholds is None:
+        return
+    offset: int = len(F1_THRESHOLD_VALUES)
+    values: Dict[str, float] = {}
+    for index, threshold in enumerate(evaluation.sweep_thresholds):
+        values[_sweep_metric(prefix, "precision", threshold)] = float(precision[offset + index])
+        values[_sweep_metric(prefix, "recall", threshold)] = float(recall[offset + index])
+        values[_sweep_metric(prefix, "f1", threshold)] = float(f1_score[offset + index])
+    values[_sweep_metric(prefix, "f1")] = float(np.mean(f1_score[offset:]))
+    for metric, value in values.items():
+        revisions: dict = metrics.setdefault(metric, {})
+        revisions[revision_name] = float(revisions[revision_name]) + value if revisions.get(
+            revision_name) is not None else value
+
+
+@contextlib.contextmanager
+def _measure(evaluation: Evaluation, memory_record: Optional[dict], metric: str) -> Iterator[None]:
+    """
+    measures the peak memory and the time of the metric and reports it to the watchdog of the time limits
+    :param memory_record: record of the document in the memory accounting, none without memory accounting
+    """
+    with limits.metric(metric), evaluation.live_metrics.metric(metric) if evaluation.live_metrics is not None \
+            else contextlib.nullcontext():
+        if memory_record is None:
+            yield
+            return
+        with evaluation.memory_accounting.metric(memory_record, metric):
+            yield
+
+
+def _process_revision(evaluation: Evaluation, ground_truth: ColumnarDocument, metrics: dict, prediction: Document,
+                      revision_index: int, foreground_mask: Optional[np.ndarray], memory_record: Optional[dict] = None,
+                      table_cache: Optional[TableCache] = None) -> dict:
+    """
+    :param table_cache: results of the tables of the earlier revisions of the document, the tables which didn't
+    change since an earlier revision aren't evaluated again
+    """
     prediction.select_revision(revision_index)
     revision: Revision = prediction.revisions[revision_index]
     revision_name: str = 'revision:' + str(revision_index) + ':' + revision.name if revision.name is not None else ""
-    tables_prediction: List[Table] = [x for x in prediction.objects() if isinstance(x, Table)]
-    tables_gt: List[Table] = [x for x in ground_truth.objects() if isinstance(x, Table)]
+    # the tables of the revision are converted once and shared by all metrics
+    revision_prediction: ColumnarDocument = columnar.from_revision(revision, prediction.filename)
 
-    # add fpa metrics
-    if image_directory is not None:
-        image_filepath: str = script_utilities.get_image_file(prediction.filename, image_directory)
-        fpa = foreground_pixel_accuracy.foreground_pixel_accuracy(ground_truth, revision, image_filepath)
+    # the f1 scores of all thresholds are computed from one set of cell scores per metric
+    thresholds: np.ndarray = F1_THRESHOLD_VALUES if evaluation.sweep_thresholds is None else \
+        np.concatenate([F1_THRESHOLD_VALUES, evaluation.sweep_thresholds])
 
-        fpa_f1_60: float = foreground_pixel_accuracy.fpa_f1_score(0.6, ground_truth, revision, image_filepath)
-        fpa_f1_70: float = foreground_pixel_accuracy.fpa_f1_score(0.7, ground_truth, revision, image_filepath)
-        fpa_f1_80: float = foreground_pixel_accuracy.fpa_f1_score(0.8, ground_truth, revision, image_filepath)
-        fpa_f1_90: float = foreground_pixel_accuracy.fpa_f1_score(0.9, ground_truth, revision, image_filepath)
-        fpa_f1_values: List[float] = [fpa_f1_60, fpa_f1_70, fpa_f1_80, fpa_f1_90]
+    # the tables are matched once and each metric is evaluated per table, the document metrics are aggregated from
+    # the results of the tables
+    document: DocumentMetrics = table_metrics.evaluate_document(
+        ground_truth, revision_prediction, foreground_mask,
+        evaluation.memory_accounting.max_grid_points() if evaluation.memory_accounting is not None else None,
+        (lambda metric: _measure(evaluation, memory_record, metric))
+        if memory_record is not None or evaluation.time_limits is not None or evaluation.live_metrics is not None
+        else None, table_cache, evaluation.cell_pool, evaluation.parallel_min_cells, evaluation.fpa_sampling)
+    if evaluation.results_store is not None:
+        evaluation.results_store.add_tables(prediction.filename, revision_name,
+                                            table_metrics.table_columns(ground_truth, document))
+
+    # add fpa metrics
+    if foreground_mask is not None:
+        fpa, fpa_precision, fpa_recall, fpa_f1 = table_metrics.fpa_threshold_scores(thresholds, document)
+        fpa_f1_values: List[float] = [float(x) for x in fpa_f1[:len(F1_THRESHOLD_VALUES)]]
 
         metrics[FOREGROUND_PIXEL_ACCURACY][revision_name] = float(
             metrics[FOREGROUND_PIXEL_ACCURACY][revision_name]) + fpa if metrics[FOREGROUND_PIXEL_ACCURACY].get(
@@ -124,54 +353,57 @@ def _process_revision(ground_truth: Document, metrics: dict, prediction: Documen
             metrics[threshold_key][revision_name] = \
                 float(metrics[threshold_key][revision_name]) + value if metrics[threshold_key].get(
                     revision_name) is not None else value
+        _add_sweep(evaluation, metrics, "fpa", revision_name, fpa_precision, fpa_recall, fpa_f1)
+        if evaluation.fpa_sampling is not None:
+            fpa_variance, fpa_f1_lower, fpa_f1_upper = table_metrics.fpa_approximation(
+                F1_THRESHOLD_VALUES, document, evaluation.fpa_sampling_z)
+            _add_approximation(metrics, revision_name, evaluation.fpa_sampling_z ** 2 * fpa_variance, fpa_f1_lower,
+                               fpa_f1_upper)
 
     # add iou metrics
-    iou_value: float = iou.intersection_over_union(tables_gt=tables_gt, tables_prediction=tables_prediction)
+    iou_value: float = table_metrics.intersection_over_union(document)
+    iou_precision, iou_recall, iou_f1 = table_metrics.iou_precision_recall_f1(thresholds, document, ground_truth,
+                                                                              revision_prediction)
     metrics[IOU][revision_name] = float(metrics[IOU][revision_name]) + iou_value if metrics[IOU].get(
         revision_name) is not None else iou_value
 
-    iou_f1_60: float = iou.iou_f1_score_with_threshold(0.6, tables_gt, tables_prediction)
-    iou_f1_70: float = iou.iou_f1_score_with_threshold(0.7, tables_gt, tables_prediction)
-    iou_f1_80: float = iou.iou_f1_score_with_threshold(0.8, tables_gt, tables_prediction)
-    iou_f1_90: float = iou.iou_f1_score_with_threshold(0.9, tables_gt, tables_prediction)
-    iou_f1_values: List[float] = [iou_f1_60, iou_f1_70, iou_f1_80, iou_f1_90]
+    iou_f1_values: List[float] = [float(x) for x in iou_f1[:len(F1_THRESHOLD_VALUES)]]
 
     for threshold_key, value in zip(IOU_F1_THRESHOLDS, iou_f1_values):
         metrics[threshold_key][revision_name] = \
             float(metrics[threshold_key][revision_name]) + value if metrics[threshold_key].get(
                 revision_name) is not None else value
+    _add_sweep(evaluation, metrics, "iou", revision_name, iou_precision, iou_recall, iou_f1)
 
     # add levenshtein metrics
-    levenshtein_distance: float = ld.levenshtein_distance(ground_truth, revision)
+    levenshtein_distance: float = table_metrics.levenshtein_distance(document)
+    ld_precision, ld_recall, ld_f1 = table_metrics.ld_precision_recall_f1(thresholds, document)
     metrics[LEVENSHTEIN_DISTANCE][revision_name] = float(
         metrics[LEVENSHTEIN_DISTANCE][revision_name]) + levenshtein_distance if metrics[LEVENSHTEIN_DISTANCE].get(
         revision_name) is not None else levenshtein_distance
 
-    ld_f1_60: float = ld.ld_f1(0.6, ground_truth, revision)
-    ld_f1_70: float = ld.ld_f1(0.7, ground_truth, revision)
-    ld_f1_80: float = ld.ld_f1(0.8, ground_truth, revision)
-    ld_f1_90: float = ld.ld_f1(0.9, ground_truth, revision)
-    ld_f1_values: List[float] = [ld_f1_60, ld_f1_70, ld_f1_80, ld_f1_90]
+    ld_f1_values: List[float] = [float(x) for x in ld_f1[:len(F1_THRESHOLD_VALUES)]]
 
     for threshold_key, value in zip(LD_F1_THRESHOLDS, ld_f1_values):
         metrics[threshold_key][revision_name] = \
             float(metrics[threshold_key][revision_name]) + value if metrics[threshold_key].get(
                 revision_name) is not None else value
+    _add_sweep(evaluation, metrics, "ld", revision_name, ld_precision, ld_recall, ld_f1)
 
     # add correct tsr share metrics
-    correct_tsr_share: float = tsr_share.correct_tsr_share(ground_truth, revision)
+    correct_tsr_share: float = table_metrics.correct_tsr_share(document)
     metrics[CORRECT_TSR_SHARE][revision_name] = \
         float(metrics[CORRECT_TSR_SHARE][revision_name] + correct_tsr_share) if metrics[CORRECT_TSR_SHARE].get(
             revision_name) is not None else correct_tsr_share
 
     # add completeness metric
-    completeness_value: float = completeness.completeness(ground_truth, revision)
+    completeness_value: float = table_metrics.completeness_value(document)
     metrics[COMPLETENESS][revision_name] = \
         float(metrics[COMPLETENESS][revision_name] + completeness_value) if metrics[COMPLETENESS].get(
             revision_name) is not None else completeness_value
 
     # add purity metric
-    purity_value: float = purity.purity(ground_truth, revision)
+    purity_value: float = table_metrics.purity_value(document)
     metrics[PURITY][revision_name] = \
         float(metrics[PURITY][revision_name]) + purity_value if metrics[PURITY].get(
             revision_name) is not None else purity_value
@@ -179,19 +411,89 @@ def _process_revision(ground_truth: Document, metrics: dict, prediction: Documen
     return metrics
 
 
-def _process_prediction_file(ground_truth: Document, metrics: dict, prediction: Document,
-                             image_directory: Optional[str]):
-    if prediction.revisions is not None:
+def _process_revisions_with_memory_accounting(evaluation: Evaluation, ground_truth: ColumnarDocument, metrics: dict,
+                                              prediction: Document, foreground_mask: Optional[np.ndarray],
+                                              table_cache: TableCache):
+    """
+    evaluates all revisions of the prediction and records their peak memory. If documents over the memory budget are
+    skipped, MemoryBudgetExceeded is raised for those documents and their metrics aren't added.
+    """
+    filename: str = prediction.filename
+    if foreground_mask is not None:
+        # the point grids of the foreground pixel accuracy are the largest allocations
+        grid_points: int = max([memory.estimate_grid_points(ground_truth, columnar.from_revision(revision))
+                                for revision in prediction.revisions] + [0])
+        evaluation.memory_accounting.check_estimate(filename, grid_points * memory.BYTES_PER_GRID_POINT)
+
+    document_metrics: dict = _create_metrics(evaluation)
+    stored_rows: int = len(evaluation.results_store) if evaluation.results_store is not None else 0
+    with evaluation.memory_accounting.document(filename) as memory_record:
         for revision_index in range(len(prediction.revisions)):
-            _process_revision(ground_truth, metrics, prediction, revision_index, image_directory)
+            _process_revision(evaluation, ground_truth, document_metrics, prediction, revision_index, foreground_mask,
+                              memory_record, table_cache)
+    try:
+        evaluation.memory_accounting.check_peak(memory_record)
+    except MemoryBudgetExceeded:
+        # the tables of skipped documents aren't stored either
+        if evaluation.results_store is not None:
+            evaluation.results_store.truncate(stored_rows)
+        raise
+    _add_metrics(metrics, document_metrics)
+
+
+def _process_prediction_file(evaluation: Evaluation, ground_truth: Union[Document, ColumnarDocument], metrics: dict,
+                             prediction: Document, image_directory: Optional[str],
+                             foreground_mask: Optional[np.ndarray] = None):
+    if evaluation.live_metrics is None:
+        return _evaluate_prediction_file(evaluation, ground_truth, metrics, prediction, image_directory,
+                                         foreground_mask)
+    with evaluation.live_metrics.document():
+        return _evaluate_prediction_file(evaluation, ground_truth, metrics, prediction, image_directory,
+                                         foreground_mask)
+
+
+def _evaluate_prediction_file(evaluation: Evaluation, ground_truth: Union[Document, ColumnarDocument], metrics: dict,
+                              prediction: Document, image_directory: Optional[str],
+                              foreground_mask: Optional[np.ndarray] = None):
+    # the structures of the tables are built once per document, e.g. the revisions are converted twice with memory
+    # accounting
+    with table_structure.document_cache():
+        return _evaluate_document_tables(evaluation, ground_truth, metrics, prediction, image_directory,
+                                         foreground_mask)
+
+
+def _evaluate_document_tables(evaluation: Evaluation, ground_truth: Union[Document, ColumnarDocument], metrics: dict,
+                              prediction: Document, image_directory: Optional[str],
+                              foreground_mask: Optional[np.ndarray]):
+    # the tables of the ground truth are converted once and shared by all revisions and metrics
+    if not isinstance(ground_truth, ColumnarDocument):
+        ground_truth = columnar.from_document(ground_truth)
+
+    if prediction.revisions is not None:
+        # the foreground mask of the image is loaded once and shared by all revisions
+        if foreground_mask is None and image_directory is not None:
+            foreground_mask = script_utilities.load_foreground_mask(prediction.filename, image_directory)
+        # the revisions share the results of their unchanged tables
+        table_cache: TableCache = TableCache()
+        if evaluation.memory_accounting is None:
+            for revision_index in range(len(prediction.revisions)):
+                _process_revision(evaluation, ground_truth, metrics, prediction, revision_index, foreground_mask,
+                                  table_cache=table_cache)
+        else:
+            _process_revisions_with_memory_accounting(evaluation, ground_truth, metrics, prediction, foreground_mask,
+                                                      table_cache)
+        logger.debug("Reused the results of [" + str(table_cache.reused) + "] of [" +
+                     str(table_cache.reused + table_cache.evaluated) + "] tables of [" + str(prediction.filename) +
+                     "]")
+        if evaluation.live_metrics is not None:
+            evaluation.live_metrics.add_cache("tables", table_cache.reused,
+                                              table_cache.reused + table_cache.evaluated)
 
         if len(prediction.revisions) != len(metrics[IOU]):
             raise RuntimeError("Mismatching revision sum and total revision dictionary.")
     else:
-        tables_prediction: List[Table] = [x for x in prediction.objects() if isinstance(x, Table)]
-        tables_gt: List[Table] = [x for x in ground_truth.objects() if isinstance(x, Table)]
-        iou_value: float = iou.intersection_over_union(tables_gt=tables_gt,
-                                                       tables_prediction=tables_prediction)
+        iou_value: float = iou.intersection_over_union(columnar_gt=ground_truth,
+                                                       columnar_prediction=columnar.from_document(prediction))
         logger.debug("IoU  value: " + str(iou_value))
         metrics[IOU] = float(
             metrics["no revision"]) + iou_value if metrics.get(
@@ -200,34 +502,521 @@ def _process_prediction_file(ground_truth: Document, metrics: dict, prediction:
     return metrics
 
 
-def _handle_prediction_directory(prediction_directory: str, ground_truth_directory: str,
-                                 image_directory: Optional[str]):
+def evaluate_document(evaluation: Evaluation, ground_truth: Union[Document, ColumnarDocument], prediction: Document,
+                      image_directory: Optional[str] = None, foreground_mask: Optional[np.ndarray] = None) -> dict:
+    """
+    evaluates a single prediction, e.g. for the evaluation server
+    :param foreground_mask: foreground mask of the image of the prediction, it's loaded from the image directory if
+    it's not given
+    :return: the metrics of the prediction, each metric maps the revision name to its value
+    :raises MemoryBudgetExceeded: if the evaluation skips documents over its memory budget and the prediction is over
+    the budget
+    :raises RuntimeError: if the prediction can't be evaluated against the ground truth
+    """
+    return _process_prediction_file(evaluation, ground_truth, _create_metrics(evaluation), prediction,
+                                    image_directory, foreground_mask)
+
+
+def _evaluate_in_worker(evaluation: Evaluation, ground_truth: ColumnarDocument, prediction: Document,
+                        image_directory: Optional[str], foreground_mask: Optional[np.ndarray]) \
+        -> Tuple[Optional[dict], Optional[ResultsStore], List[dict], Optional[LiveMetrics], Optional[str]]:
+    """
+    evaluates a document in the worker process of the time limits, the results which the evaluation adds to the
+    results store, memory accounting and live metrics of the forked evaluation are passed back to the evaluating process
+    :return: the metrics of the document, none if it's over the memory budget, the rows of its tables, the records of
+    the memory accounting, the live metrics of the document and the reason why it's over the memory budget
+    """
+    _reset_worker_records(evaluation)
+    return _evaluate_recorded(evaluation, ground_truth, prediction, image_directory, foreground_mask)
+
+
+def _reset_worker_records(evaluation: Evaluation):
+    """
+    the results which the next document adds to the results store and live metrics of the forked evaluation are
+    recorded from scratch
+    """
+    if evaluation.results_store is not None:
+        run: str = evaluation.results_store.run
+        evaluation.results_store = ResultsStore()
+        evaluation.results_store.run = run
+    if evaluation.live_metrics is not None:
+        evaluation.live_metrics = LiveMetrics()
+
+
+def _evaluate_recorded(evaluation: Evaluation, ground_truth: ColumnarDocument, prediction: Document,
+                       image_directory: Optional[str], foreground_mask: Optional[np.ndarray]) \
+        -> Tuple[Optional[dict], Optional[ResultsStore], List[dict], Optional[LiveMetrics], Optional[str]]:
+    """
+    see _evaluate_in_worker, the records are expected to be reset
+    """
+    memory_accounting: Optional[MemoryAccounting] = evaluation.memory_accounting
+    recorded: int = len(memory_accounting.documents) if memory_accounting is not None else 0
+    try:
+        document_metrics: Optional[dict] = _process_prediction_file(evaluation, ground_truth,
+                                                                    _create_metrics(evaluation), prediction,
+                                                                    image_directory, foreground_mask)
+        reason: Optional[str] = None
+    except MemoryBudgetExceeded as error:
+        document_metrics, reason = None, str(error)
+    records: List[dict] = memory_accounting.documents[recorded:] if memory_accounting is not None else []
+    return document_metrics, evaluation.results_store, records, evaluation.live_metrics, reason
+
+
+def _process_with_time_limits(evaluation: Evaluation, ground_truth: ColumnarDocument, prediction: Document,
+                              image_directory: Optional[str], foreground_mask: Optional[np.ndarray]) -> dict:
+    """
+    evaluates a document in the worker process of the time limits
+    :return: the metrics of the document
+    :raises DocumentStopped: if the document is over its time limit
+    :raises MemoryBudgetExceeded: if the document is over the memory budget
+    """
+    try:
+        document_metrics, store, records, document_live_metrics, reason = evaluation.time_limits.evaluate(
+            prediction.filename, ground_truth, prediction, image_directory, foreground_mask)
+    except Exception as error:
+        # the live metrics of the worker are lost with a document which failed or was stopped
+        if evaluation.live_metrics is not None:
+            evaluation.live_metrics.add_error(type(error).__name__)
+        raise
+    _merge_worker_records(evaluation, store, records, document_live_metrics)
+    if reason is not None:
+        raise MemoryBudgetExceeded(reason)
+    return document_metrics
+
+
+def _merge_worker_records(evaluation: Evaluation, store: Optional[ResultsStore], records: List[dict],
+                          document_live_metrics: Optional[LiveMetrics]):
+    """
+    adds the records of a document which was evaluated by a worker process, see _evaluate_in_worker
+    """
+    if document_live_metrics is not None:
+        evaluation.live_metrics.merge(document_live_metrics)
+    if store is not None:
+        evaluation.results_store.extend(store)
+    if evaluation.memory_accounting is not None:
+        evaluation.memory_accounting.documents.extend(records)
+
+
+def _initialize_document_worker(evaluation: Evaluation, ground_truth_directory: str, image_directory: Optional[str],
+                                ground_truth_store: Optional[ColumnarStore]):
+    global _worker_sources
+    _worker_sources = (evaluation, ground_truth_directory, image_directory, ground_truth_store)
+
+
+def _evaluate_file_in_worker(filepath: str) \
+        -> Tuple[float, Optional[dict], Optional[ResultsStore], List[dict], Optional[LiveMetrics], Optional[str]]:
+    """
+    loads and evaluates a prediction file in a document worker process. A document which can't be loaded or
+    evaluated is skipped like a document over the memory budget, the other documents of the worker continue.
+    :return: the seconds of the document and the results of _evaluate_in_worker, the reason is the error of a skipped
+    document
+    """
+    start: float = time.perf_counter()
+    evaluation, ground_truth_directory, image_directory, ground_truth_store = _worker_sources
+    _reset_worker_records(evaluation)
+    try:
+        prediction, ground_truth, foreground_mask = _load_prediction_file(evaluation, filepath, ground_truth_directory,
+                                                                          image_directory, ground_truth_store)
+    except Exception as error:
+        # the live metrics of the document only record the errors of its evaluation
+        if evaluation.live_metrics is not None:
+            evaluation.live_metrics.add_error(type(error).__name__)
+        return time.perf_counter() - start, None, None, [], evaluation.live_metrics, _skip_reason(filepath, error)
+    try:
+        result: tuple = _evaluate_recorded(evaluation, ground_truth, prediction, image_directory, foreground_mask)
+    except Exception as error:
+        # the rows and the memory record of the document are incomplete and left out
+        result = None, None, [], evaluation.live_metrics, _skip_reason(filepath, error)
+    return (time.perf_counter() - start,) + result
+
+
+def _skip_reason(filepath: str, error: Exception) -> str:
+    return "Skipped [" + os.path.basename(filepath) + "]: " + type(error).__name__ + ": " + str(error)
+
+
+def _estimate_seconds(prediction_directory: str, filepaths: List[str], image_directory: Optional[str],
+                      timings: Dict[str, dict]) -> Tuple[List[str], List[dict], np.ndarray]:
+    """
+    estimates the seconds of each prediction file, see scheduling. A file with a measured time from an earlier run
+    and the same size isn't scanned.
+    :param timings: measured seconds and features of the documents of an earlier run
+    :return: name, features and estimated seconds of each file
+    """
+    model: scheduling.CostModel = scheduling.CostModel.fit(timings)
+    logger.info("Estimating the time of [" + str(len(filepaths)) + "] documents, " +
+                ("the cost model is fitted to [" + str(model.documents) + "] measured documents"
+                 if model.documents > 0 else "the cost model has its default coefficients"))
+    names: List[str] = [os.path.relpath(filepath, prediction_directory) for filepath in filepaths]
+    features: List[dict] = []
+    estimates: np.ndarray = np.zeros(len(filepaths))
+    for index, (name, filepath) in enumerate(zip(names, filepaths)):
+        timing: Optional[dict] = timings.get(name)
+        if timing is not None and timing["size"] == os.stat(filepath).st_size:
+            features.append({feature: timing[feature] for feature in scheduling.FEATURES})
+            estimates[index] = timing["seconds"]
+        else:
+            features.append(script_utilities.prescan_prediction_file(filepath, image_directory))
+            estimates[index] = model.estimate(features[-1])
+    return names, features, estimates
+
+
+def _dispatch_longest_first(evaluation: Evaluation, filepaths: List[str], estimates: np.ndarray, workers: int,
+                            ground_truth_directory: str, image_directory: Optional[str],
+                            ground_truth_store: Optional[ColumnarStore]) \
+        -> Iterator[Tuple[int, tuple]]:
+    """
+    evaluates the prediction files with document worker processes in the order of decreasing estimated seconds. Each
+    worker takes the next file when it finishes one, so the workers are balanced even if the estimates are off.
+    :return: index and result of _evaluate_file_in_worker of each file in the order in which they finish
+    """
+    order: Iterator[int] = iter(scheduling.longest_first(estimates))
+    # the workers are forked, so they have the same configuration as this process
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"),
+                             initializer=_initialize_document_worker,
+                             initargs=(evaluation, ground_truth_directory, image_directory,
+                                       ground_truth_store)) as executor:
+        running: Dict[Future, int] = {}
+        while True:
+            for index in itertools.islice(order, QUEUED_PER_WORKER * workers - len(running)):
+                running[executor.submit(_evaluate_file_in_worker, filepaths[index])] = index
+            _set_queue_depth(evaluation.live_metrics, len(running))
+            if len(running) == 0:
+                return
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield running.pop(future), future.result()
+
+
+def _handle_scheduled_documents(evaluation: Evaluation, prediction_directory: str, ground_truth_directory: str,
+                                image_directory: Optional[str], ground_truth_store: Optional[ColumnarStore],
+                                shard: Optional[Tuple[int, int]], recursive: bool, workers: int,
+                                timings_filepath: Optional[str], metrics: dict,
+                                document_scores: Optional[DocumentScores]) -> int:
+    """
+    evaluates the prediction files with document worker processes, the largest documents first. The results are added
+    in the order of the files. A document which fails is skipped, see _evaluate_file_in_worker, like in the evaluation
+    in a single process, see _evaluate_or_skip. So both evaluate the same documents and sum their metrics in the same
+    order.
+    :param timings_filepath: json file with the measured times of an earlier run, it's updated with the measured times
+    of this run. None to estimate the times without measured times.
+    :return: number of evaluated files
+    """
+    filepaths: List[str] = _list_prediction_files(prediction_directory, shard, recursive)
+    if any(archives.is_archive(x) for x in filepaths):
+        raise RuntimeError("Document workers can't evaluate the prediction files in archives.")
+    timings: Dict[str, dict] = scheduling.load_timings(timings_filepath) if timings_filepath is not None else {}
+    names, features, estimates = _estimate_seconds(prediction_directory, filepaths, image_directory, timings)
+
+    start: float = time.monotonic()
+    files_considered: int = 0
+    measured: np.ndarray = np.zeros(len(filepaths))
+    # results which finished before an earlier file
+    finished: Dict[int, tuple] = {}
+    next_index: int = 0
+    for index, result in _progress(_dispatch_longest_first(evaluation, filepaths, estimates, workers,
+                                                           ground_truth_directory, image_directory,
+                                                           ground_truth_store), len(filepaths)):
+        finished[index] = result
+        while next_index in finished:
+            seconds, document_metrics, store, records, document_live_metrics, reason = finished.pop(next_index)
+            measured[next_index] = seconds
+            next_index += 1
+            _merge_worker_records(evaluation, store, records, document_live_metrics)
+            if reason is not None:
+                logger.warning(reason)
+                continue
+            _add_metrics(metrics, document_metrics)
+            if document_scores is not None:
+                document_scores.add(document_metrics)
+            files_considered += 1
+            if files_considered % 100 == 0:
+                logger.info("Outputting temporary average metrics after processing of " + str(files_considered) +
+                            " files: ")
+                _output_metrics(files_considered, metrics)
+
+    _output_schedule(names, estimates, measured, time.monotonic() - start, workers)
+    if timings_filepath is not None:
+        for name, document_features, seconds in zip(names, features, measured):
+            timings[name] = {**document_features, "seconds": float(seconds)}
+        scheduling.save_timings(timings_filepath, timings)
+        logger.info("Wrote the measured times of [" + str(len(names)) + "] documents to [" + timings_filepath + "]")
+    return files_considered
+
+
+def _output_schedule(names: List[str], estimated: np.ndarray, measured: np.ndarray, wall_seconds: float,
+                     workers: int):
+    """
+    outputs how the estimated times of the documents compare with their measured times
+    """
+    comparison: dict = scheduling.compare(estimated, measured)
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("Evaluated [" + str(len(names)) + "] documents with [" + str(workers) + "] worker processes in " +
+                limits.seconds(wall_seconds) + ", the workers were busy " +
+                ("%.0f%%" % (100 * comparison["measured"] / (workers * wall_seconds)) if wall_seconds > 0 else "-") +
+                " of the time")
+    logger.info("Estimated time " + limits.seconds(comparison["estimated"]) + ", measured time " +
+                limits.seconds(comparison["measured"]) + ", mean absolute error " +
+                limits.seconds(comparison["mean_absolute_error"]) + ", rank correlation " +
+                ("%.3f" % comparison["rank_correlation"] if comparison["rank_correlation"] is not None else "-"))
+    logger.info("Documents with the largest difference between the estimated and the measured time:")
+    logger.info("document".ljust(40) + "estimated".rjust(12) + "measured".rjust(12))
+    for index in np.argsort(-np.abs(estimated - measured), kind="stable")[:SCHEDULE_REPORT_DOCUMENTS]:
+        logger.info(names[index].ljust(40) + limits.seconds(estimated[index]).rjust(12) +
+                    limits.seconds(measured[index]).rjust(12))
+
+
+def _load_prediction_file(evaluation: Evaluation, filepath: str, ground_truth_directory: str,
+                          image_directory: Optional[str], ground_truth_store: Optional[ColumnarStore],
+                          data: Optional[bytes] = None) \
+        -> Tuple[Document, ColumnarDocument, Optional[np.ndarray]]:
+    """
+    reads and decodes everything which is required to evaluate the prediction file
+    :param data: content of the prediction file if it was read from an archive, filepath is its name in the archive
+    :return: prediction, ground truth and the foreground mask of the image if an image directory is given
+    """
+    filename: str = os.path.basename(filepath)
+    prediction: Document = script_utilities.load_document(filepath) if data is None else \
+        script_utilities.parse_document(data)
+    if evaluation.live_metrics is not None and ground_truth_store is not None:
+        evaluation.live_metrics.add_cache("ground_truth_store", int(script_utilities.ground_truth_key(filename) in
+                                                         ground_truth_store), 1)
+    ground_truth: ColumnarDocument = script_utilities.get_columnar_ground_truth(filename, ground_truth_directory,
+                                                                                ground_truth_store)
+    foreground_mask: Optional[np.ndarray] = script_utilities.load_foreground_mask(prediction.filename,
+                                                                                  image_directory) \
+        if image_directory is not None else None
+    return prediction, ground_truth, foreground_mask
+
+
+def _output_bootstrap(document_scores: DocumentScores, resamples: int, confidence_level: float,
+                      seed: Optional[int] = None):
+    """
+    outputs bootstrap confidence intervals of the average metrics and the significance of the differences between
+    the revisions of each metric. The differences are paired by document.
+    """
+    values: np.ndarray = document_scores.values()
+    revisions_by_metric: Dict[str, List[str]] = {}
+    for metric, revision_name in document_scores.columns:
+        revisions_by_metric.setdefault(metric, []).append(revision_name)
+
+    # metric, revision name a, revision name b and the per-document differences b - a
+    pairs: List[Tuple[str, str, str]] = []
+    differences: List[np.ndarray] = []
+    for metric in _ordered_metrics(revisions_by_metric):
+        revision_names: List[str] = revisions_by_metric.get(metric, [])
+        for index, revision_a in enumerate(revision_names):
+            for revision_b in revision_names[index + 1:]:
+                difference: np.ndarray = values[:, document_scores.columns[(metric, revision_b)]] - \
+                                         values[:, document_scores.columns[(metric, revision_a)]]
+                if np.all(np.isnan(difference)):
+                    continue
+                pairs.append((metric, revision_a, revision_b))
+                differences.append(difference)
+
+    # the averages and the differences are resampled with the same documents
+    all_values: np.ndarray = np.column_stack([values] + differences)
+    resampled_means: np.ndarray = confidence.bootstrap_means(all_values, resamples, seed)
+    lower, upper = confidence.percentile_intervals(resampled_means, confidence_level)
+    counts: np.ndarray = np.count_nonzero(~np.isnan(all_values), axis=0)
+    means: np.ndarray = np.nansum(all_values, axis=0) / counts
+    p_values: np.ndarray = confidence.paired_p_values(resampled_means[:, values.shape[1]:])
+
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("Bootstrap confidence intervals (" + str(confidence_level) + ", " + str(resamples) +
+                " resamples) of the average metrics:")
+    logger.info("metric".ljust(24) + "revision".ljust(32) + "average".rjust(10) + "interval".rjust(22) +
+                "documents".rjust(11))
+    for metric in _ordered_metrics(revisions_by_metric):
+        for revision_name in revisions_by_metric.get(metric, []):
+            column: int = document_scores.columns[(metric, revision_name)]
+            logger.info(metric.ljust(24) + revision_name.ljust(32) + ("%.4f" % means[column]).rjust(10) +
+                        ("[%.4f, %.4f]" % (lower[column], upper[column])).rjust(22) + str(counts[column]).rjust(11))
+    if len(pairs) == 0:
+        return
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("Paired differences between the revisions (b - a):")
+    logger.info("metric".ljust(24) + "revision a".ljust(32) + "revision b".ljust(32) + "difference".rjust(11) +
+                "interval".rjust(22) + "p-value".rjust(9) + "documents".rjust(11))
+    for pair_index, (metric, revision_a, revision_b) in enumerate(pairs):
+        column: int = values.shape[1] + pair_index
+        logger.info(metric.ljust(24) + revision_a.ljust(32) + revision_b.ljust(32) +
+                    ("%.4f" % means[column]).rjust(11) + ("[%.4f, %.4f]" % (lower[column], upper[column])).rjust(22) +
+                    ("%.4f" % p_values[pair_index]).rjust(9) + str(counts[column]).rjust(11))
+
+
+def _progress(items: Iterable[T], total: Optional[int]) -> Iterable[T]:
+    # tqdm is only imported for the directory modes, a single file is evaluated without a progress bar
+    from tqdm import tqdm
+    return tqdm(items, total=total)
+
+
+def _count_prediction_files(prediction_directory: str, shard: Optional[Tuple[int, int]]) -> Optional[int]:
+    """
+    counts the prediction files for the total of the progress bar if the prediction directory is an archive, see
+    archives.member_count. The count of a zip archive is read from its index, the member headers of an uncompressed tar
+    archive are read once more. A directory isn't counted, it would have to be enumerated twice.
+    :return: the number of prediction files, none for a directory, a sharded or a compressed tar archive
+    """
+    if shard is not None or not archives.is_archive(prediction_directory):
+        return None
+    return archives.member_count(prediction_directory)
+
+
+def _prefetched(items: Iterable[T], load: Callable[[T], R], prefetch: int,
+                live_metrics: Optional[LiveMetrics] = None) -> Iterator[Tuple[T, R]]:
+    """
+    loads the items in order. With prefetch > 0, the next prefetch items are loaded by a thread pool while the
+    current item is evaluated. At most prefetch loaded items are kept in memory at any time.
+    :param live_metrics: live metrics for the number of loaded items, none to not record it
+    """
+    if prefetch <= 0:
+        for item in items:
+            yield item, load(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        pending: Deque[Tuple[T, Future]] = deque()
+        for item in items:
+            pending.append((item, executor.submit(load, item)))
+            if len(pending) >= prefetch:
+                loaded_item, future = pending.popleft()
+                _set_queue_depth(live_metrics, len(pending))
+                yield loaded_item, future.result()
+        while len(pending) > 0:
+            loaded_item, future = pending.popleft()
+            _set_queue_depth(live_metrics, len(pending))
+            yield loaded_item, future.result()
+
+
+def _set_queue_depth(live_metrics: Optional[LiveMetrics], depth: int):
+    if live_metrics is not None:
+        live_metrics.queue_depth = depth
+
+
+def _iter_prediction_files(prediction_directory: str, shard: Optional[Tuple[int, int]] = None,
+                           recursive: bool = False, quiet: bool = False) -> Iterator[str]:
+    """
+    enumerates the prediction files while the directory is read, without listing the whole directory first.
+    Only the subdirectories which are not enumerated yet are kept in memory.
+    :param shard: optional shard index and shard count, only the files of this shard are listed
+    :param recursive: whether the files in subdirectories are prediction files too
+    :param quiet: don't log the ignored files
+    """
+    directories: List[str] = [prediction_directory]
+    while len(directories) > 0:
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    if not quiet:
+                        logger.info("Ignoring [" + str(entry.name) + "] because it's hidden.")
+                    continue
+                if entry.is_dir():
+                    if recursive:
+                        directories.append(entry.path)
+                    elif not quiet:
+                        logger.info("Ignoring [" + str(entry.name) + "] because it's a directory.")
+                    continue
+                if shard is not None and not script_utilities.in_shard(entry.name, *shard):
+                    continue
+                yield entry.path
+
+
+def _iter_prediction_sources(prediction_directory: str, shard: Optional[Tuple[int, int]] = None,
+                             recursive: bool = False) -> Iterator[Tuple[str, Optional[bytes]]]:
+    """
+    enumerates the prediction files like _iter_prediction_files and reads the archives among them as a stream. The
+    archives in the directory are assigned to shards as a whole by their filename, if the prediction directory is an
+    archive itself its members are assigned to the shards.
+    :return: path and none for each prediction file, name and content for each prediction file in an archive
+    """
+    if archives.is_archive(prediction_directory):
+        yield from archives.iter_members(
+            prediction_directory, lambda name: shard is None or script_utilities.in_shard(name, *shard))
+        return
+    for filepath in _iter_prediction_files(prediction_directory, shard, recursive):
+        if archives.is_archive(filepath):
+            yield from archives.iter_members(filepath)
+        else:
+            yield filepath, None
+
+
+def _list_prediction_files(prediction_directory: str, shard: Optional[Tuple[int, int]] = None,
+                           recursive: bool = False) -> List[str]:
+    """
+    lists all prediction files for the modes which need all of them before the first one is evaluated, the document
+    workers order them by their estimated time and the sampling shuffles them
+    """
+    return list(_iter_prediction_files(prediction_directory, shard, recursive))
+
+
+def _handle_prediction_directory(evaluation: Evaluation, prediction_directory: str, ground_truth_directory: str,
+                                 image_directory: Optional[str], ground_truth_store: Optional[ColumnarStore] = None,
+                                 prefetch: int = 0, shard: Optional[Tuple[int, int]] = None,
+                                 partial_output: Optional[str] = None, bootstrap: int = 0,
+                                 confidence_level: float = 0.95, seed: Optional[int] = None,
+                                 recursive: bool = False, document_workers: int = 0,
+                                 schedule_timings: Optional[str] = None, run_label: Optional[str] = None):
+    """
+    :param recursive: whether the files in subdirectories are prediction files too
+    :param bootstrap: number of bootstrap resamples for the confidence intervals of the average metrics,
+    0 disables the confidence intervals
+    :param document_workers: number of worker processes which evaluate the documents, the largest documents first.
+    0 or 1 evaluates the documents in this process while the directory is enumerated.
+    :param schedule_timings: json file with the measured times of the documents, see _handle_scheduled_documents
+    :param run_label: label of the run in the partial output, see script_utilities.run_label
+    """
     files_considered: int = 0
     # this list is intended for average iou computation. Each index represents the summed revision.
-    metrics: dict = {IOU: {}, IOU_F1_60: {}, IOU_F1_70: {}, IOU_F1_80: {}, IOU_F1_90: {},
-                     FOREGROUND_PIXEL_ACCURACY: {}, FPA_F1_60: {}, FPA_F1_70: {}, FPA_F1_80: {}, FPA_F1_90: {},
-                     LEVENSHTEIN_DISTANCE: {}, LD_F1_60: {}, LD_F1_70: {}, LD_F1_80: {}, LD_F1_90: {},
-                     CORRECT_TSR_SHARE: {},
-                     COMPLETENESS: {},
-                     PURITY: {}}
-
-    for filepath in tqdm(glob.glob(os.path.join(prediction_directory, "*"))):
-
-        filename: str = os.path.basename(filepath)
-        if filename.startswith('.'):
-            logger.info("Ignoring [" + str(filename) + "] because it's hidden.")
-            continue
+    metrics: dict = _create_metrics(evaluation)
+    # the per-document values are only kept for the confidence intervals
+    document_scores: Optional[DocumentScores] = DocumentScores() if bootstrap > 0 else None
 
-        prediction: Document = script_utilities.load_document(filepath)
-        ground_truth: Document = script_utilities.get_ground_truth(filename, ground_truth_directory)
+    def load(source: Tuple[str, Optional[bytes]]) \
+            -> Tuple[Optional[Tuple[Document, ColumnarDocument, Optional[np.ndarray]]], Optional[str]]:
+        # a file which can't be loaded is skipped like in a document worker, see _evaluate_file_in_worker
+        try:
+            return _load_prediction_file(evaluation, source[0], ground_truth_directory, image_directory,
+                                         ground_truth_store, source[1]), None
+        except Exception as error:
+            if evaluation.live_metrics is not None:
+                evaluation.live_metrics.add_error(type(error).__name__)
+            return None, _skip_reason(source[0], error)
 
-        metrics = _process_prediction_file(ground_truth, metrics, prediction, image_directory)
+    if document_workers > 1:
+        files_considered = _handle_scheduled_documents(evaluation, prediction_directory, ground_truth_directory,
+                                                       image_directory, ground_truth_store, shard, recursive,
+                                                       document_workers, schedule_timings, metrics, document_scores)
+    else:
+        def sources() -> Iterator[Tuple[str, Optional[bytes]]]:
+            count: int = 0
+            for source in _iter_prediction_sources(prediction_directory, shard, recursive):
+                count += 1
+                yield source
+            # the enumeration is complete, the total is known from now on
+            progress.total = count
 
-        files_considered += 1
-        if files_considered % 100 == 0:
-            logger.info(
-                "Outputting temporary average metrics after processing of " + str(files_considered) + " files: ")
-            _output_metrics(files_considered, metrics)
+        # the files are evaluated while the directory is enumerated, the progress bar of a directory has no total
+        # until the enumeration is complete
+        progress = _progress(_prefetched(sources(), load, prefetch, evaluation.live_metrics),
+                             total=_count_prediction_files(prediction_directory, shard))
+        for (filepath, _), (loaded, reason) in progress:
+            if loaded is None:
+                logger.warning(reason)
+                continue
+            prediction, ground_truth, foreground_mask = loaded
+            document_metrics: Optional[dict] = _evaluate_or_skip(evaluation, filepath, ground_truth, prediction,
+                                                                 image_directory, foreground_mask)
+            if document_metrics is None:
+                continue
+            _add_metrics(metrics, document_metrics)
+            if document_scores is not None:
+                document_scores.add(document_metrics)
+
+            files_considered += 1
+            if files_considered % 100 == 0:
+                logger.info(
+                    "Outputting temporary average metrics after processing of " + str(files_considered) + " files: ")
+                _output_metrics(files_considered, metrics)
 
     logger.info("Computed evaluations for [" + str(
         files_considered) + "] files in [" + prediction_directory + "] with gt: [" + ground_truth_directory + "]")
@@ -235,52 +1024,790 @@ def _handle_prediction_directory(prediction_directory: str, ground_truth_directo
 
     logger.success("Computed average metrics for [" + str(files_considered) + "] files.")
     _output_metrics(files_considered, metrics)
+    if document_scores is not None and len(document_scores) > 0:
+        _output_bootstrap(document_scores, bootstrap, confidence_level, seed)
+
+    if partial_output is not None:
+        script_utilities.write_partial_metrics(partial_output, [
+            script_utilities.partial_run(prediction_directory, files_considered, metrics, run_label)])
+
+
+def _evaluate_or_skip(evaluation: Evaluation, filepath: str, ground_truth: ColumnarDocument, prediction: Document,
+                      image_directory: Optional[str], foreground_mask: Optional[np.ndarray]) -> Optional[dict]:
+    """
+    evaluates a document of a prediction directory in this process. A document which fails is skipped like in a
+    document worker, see _evaluate_file_in_worker, so both evaluate the same documents.
+    :return: the metrics of the document, none if it's skipped
+    """
+    stored_rows: int = len(evaluation.results_store) if evaluation.results_store is not None else 0
+    recorded: int = len(evaluation.memory_accounting.documents) if evaluation.memory_accounting is not None else 0
+    try:
+        if evaluation.time_limits is not None:
+            return _process_with_time_limits(evaluation, ground_truth, prediction, image_directory, foreground_mask)
+        return _process_prediction_file(evaluation, ground_truth, _create_metrics(evaluation), prediction,
+                                        image_directory, foreground_mask)
+    except (MemoryBudgetExceeded, DocumentStopped) as error:
+        logger.warning(str(error))
+    except Exception as error:
+        # the rows and the memory record of the document are incomplete and left out
+        if evaluation.results_store is not None:
+            evaluation.results_store.truncate(stored_rows)
+        if evaluation.memory_accounting is not None:
+            del evaluation.memory_accounting.documents[recorded:]
+        logger.warning(_skip_reason(filepath, error))
+    return None
+
+
+def _add_metrics(metrics: dict, file_metrics: dict, sign: int = 1):
+    """
+    adds (sign=1) or removes (sign=-1) the summed metrics of a file to/from the summed metrics
+    """
+    for metric, revisions in file_metrics.items():
+        summed_revisions: dict = metrics.setdefault(metric, {})
+        for revision_name, value in revisions.items():
+            summed_revisions[revision_name] = summed_revisions.get(revision_name, 0) + sign * value
+
+
+def _scan_prediction_files(prediction_directory: str, shard: Optional[Tuple[int, int]] = None) \
+        -> Dict[str, Tuple[int, int]]:
+    """
+    :return: size and modification time of each prediction file by its filename
+    """
+    files: Dict[str, Tuple[int, int]] = {}
+    with os.scandir(prediction_directory) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            if shard is not None and not script_utilities.in_shard(entry.name, *shard):
+                continue
+            stat: os.stat_result = entry.stat()
+            files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def _watch_prediction_directory(evaluation: Evaluation, prediction_directory: str, ground_truth_directory: str,
+                                image_directory: Optional[str], ground_truth_store: Optional[ColumnarStore] = None,
+                                shard: Optional[Tuple[int, int]] = None, partial_output: Optional[str] = None,
+                                interval: float = 2.0, idle_timeout: Optional[float] = None,
+                                state_filepath: Optional[str] = None, run_label: Optional[str] = None):
+    """
+    follows the prediction directory and evaluates each new or changed prediction file once.
+    The metrics of each evaluated file are persisted in the state file, a restarted watch continues with the files
+    which were not evaluated yet. A changed file replaces its previous metrics in the running aggregates.
+    :param interval: seconds between two scans of the directory
+    :param idle_timeout: stop watching after this many seconds without new files, none to watch until interrupted
+    :param state_filepath: file for the progress, defaults to WATCH_STATE_FILENAME in the prediction directory
+    :param run_label: label of the run in the partial output, see script_utilities.run_label
+    """
+    if state_filepath is None:
+        state_filepath = os.path.join(prediction_directory, WATCH_STATE_FILENAME)
+    state: dict = script_utilities.read_watch_state(state_filepath)
+    # filename -> size, modification time and metrics of the evaluated version, metrics are none for skipped files
+    evaluated_files: Dict[str, dict] = state["files"]
+
+    files_considered: int = 0
+    metrics: dict = _create_metrics(evaluation)
+    for evaluated_file in evaluated_files.values():
+        if evaluated_file["metrics"] is not None:
+            _add_metrics(metrics, evaluated_file["metrics"])
+            files_considered += 1
+    if len(evaluated_files) > 0:
+        logger.info("Resuming the evaluation of [" + prediction_directory + "] with [" + str(files_considered) +
+                    "] evaluated files from [" + state_filepath + "]")
+
+    logger.info("Watching [" + prediction_directory + "] for prediction files.")
+    last_change: float = time.monotonic()
+    # filename -> size and modification time of the files which couldn't be decoded in the last scan
+    unparsed: Dict[str, Tuple[int, int]] = {}
+    try:
+        while True:
+            files: Dict[str, Tuple[int, int]] = _scan_prediction_files(prediction_directory, shard)
+            changed: bool = False
+            # files which are still being written are read again with the next scan
+            pending: bool = False
+
+            for filename in [x for x in evaluated_files if x not in files]:
+                logger.info("[" + filename + "] was removed, removing its metrics.")
+                if evaluated_files[filename]["metrics"] is not None:
+                    _add_metrics(metrics, evaluated_files[filename]["metrics"], -1)
+                    files_considered -= 1
+                del evaluated_files[filename]
+                changed = True
+
+            for filename, (size, mtime_ns) in sorted(files.items()):
+                evaluated_file: Optional[dict] = evaluated_files.get(filename)
+                if evaluated_file is not None and evaluated_file["size"] == size and \
+                        evaluated_file["mtime_ns"] == mtime_ns:
+                    continue
+
+                file_metrics: Optional[dict] = None
+                try:
+                    prediction, ground_truth, foreground_mask = _load_prediction_file(
+                        evaluation, os.path.join(prediction_directory, filename), ground_truth_directory,
+                        image_directory, ground_truth_store)
+                except ValueError as error:
+                    # a file which can't be decoded is still being written if it changes until the next scan,
+                    # otherwise it's malformed and skipped until it changes again
+                    if unparsed.get(filename) != (size, mtime_ns):
+                        logger.debug("[" + filename + "] can't be parsed yet, trying again with the next scan.")
+                        unparsed[filename] = (size, mtime_ns)
+                        pending = True
+                        continue
+                    logger.warning("Skipping [" + filename + "], it can't be parsed: " + str(error))
+                except RuntimeError as error:
+                    logger.warning("Skipping [" + filename + "]: " + str(error))
+                else:
+                    try:
+                        file_metrics = _process_prediction_file(evaluation, ground_truth, _create_metrics(evaluation),
+                                                                prediction, image_directory, foreground_mask)
+                    except MemoryBudgetExceeded as error:
+                        logger.warning(str(error))
+                    except (RuntimeError, ValueError) as error:
+                        # skipped until the file changes again
+                        logger.warning("Skipping [" + filename + "]: " + str(error))
+                unparsed.pop(filename, None)
+
+                if evaluated_file is not None and evaluated_file["metrics"] is not None:
+                    _add_metrics(metrics, evaluated_file["metrics"], -1)
+                    files_considered -= 1
+                if file_metrics is not None:
+                    _add_metrics(metrics, file_metrics)
+                    files_considered += 1
+                evaluated_files[filename] = {"size": size, "mtime_ns": mtime_ns, "metrics": file_metrics}
+                changed = True
+
+            if changed:
+                script_utilities.write_watch_state(state_filepath, state)
+                logger.info("Outputting average metrics after processing of " + str(files_considered) + " files: ")
+                if files_considered > 0:
+                    _output_metrics(files_considered, metrics)
+            if changed or pending:
+                last_change = time.monotonic()
+            elif idle_timeout is not None and time.monotonic() - last_change >= idle_timeout:
+                logger.info("No new prediction files for " + str(idle_timeout) + " seconds, stopping the watch.")
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching [" + prediction_directory + "]")
+
+    logger.success("Computed average metrics for [" + str(files_considered) + "] files.")
+    if files_considered > 0:
+        _output_metrics(files_considered, metrics)
+
+    if partial_output is not None:
+        script_utilities.write_partial_metrics(partial_output, [
+            script_utilities.partial_run(prediction_directory, files_considered, metrics, run_label)])
 
 
-def _handle_prediction_file(prediction_file: str, ground_truth_directory: str, image_directory: Optional[str]):
+def _output_estimates(documents_used: int, population_size: int, statistics: Dict[str, Dict[str, RunningStatistics]],
+                      z: float):
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("Estimated the average metrics from [" + str(documents_used) + "] of [" + str(population_size) +
+                "] documents:")
+    logger.info("metric".ljust(24) + "revision".ljust(32) + "estimate".rjust(10) + "interval".rjust(22) +
+                "documents".rjust(11))
+    for metric in _ordered_metrics(statistics):
+        for revision_name, revision_statistics in statistics.get(metric, {}).items():
+            half_width: float = revision_statistics.interval_width(z, population_size) / 2
+            logger.info(metric.ljust(24) + revision_name.ljust(32) + ("%.4f" % revision_statistics.mean).rjust(10) +
+                        ("[%.4f, %.4f]" % (revision_statistics.mean - half_width,
+                                           revision_statistics.mean + half_width)).rjust(22) +
+                        str(revision_statistics.count).rjust(11))
+
+
+def _sample_prediction_directory(evaluation: Evaluation, prediction_directory: str, ground_truth_directory: str,
+                                 image_directory: Optional[str], ground_truth_store: Optional[ColumnarStore] = None,
+                                 prefetch: int = 0, shard: Optional[Tuple[int, int]] = None,
+                                 partial_output: Optional[str] = None, interval_width: float = 0.01,
+                                 confidence_level: float = 0.95, time_budget: Optional[float] = None,
+                                 sample_metrics: Optional[List[str]] = None, seed: Optional[int] = None,
+                                 recursive: bool = False, run_label: Optional[str] = None):
+    """
+    evaluates the prediction files in random order until the confidence intervals of the averages of all sampled
+    metrics are narrower than interval_width, or until the time budget is used up
+    :param interval_width: target width of the confidence intervals
+    :param confidence_level: confidence level of the intervals
+    :param time_budget: maximum seconds for the evaluation, none to evaluate until the intervals are narrow enough
+    :param sample_metrics: metrics whose intervals have to be narrow enough, defaults to all metrics
+    :param seed: seed for the order of the documents
+    :param run_label: label of the run in the partial output, see script_utilities.run_label
+    """
+    known_metrics: List[str] = METRICS + _sweep_metrics(evaluation)
+    if sample_metrics is None:
+        sample_metrics = known_metrics
+    unknown_metrics: List[str] = [x for x in sample_metrics if x not in known_metrics]
+    if len(unknown_metrics) > 0:
+        raise RuntimeError("Unknown metrics: " + ", ".join(unknown_metrics) + ". Expected one of: " +
+                           ", ".join(known_metrics))
+    z: float = confidence.z_value(confidence_level)
+
+    filepaths: List[str] = _list_prediction_files(prediction_directory, shard, recursive)
+    random.Random(seed).shuffle(filepaths)
+
+    files_considered: int = 0
+    metrics: dict = _create_metrics(evaluation)
+    # metric -> revision name -> statistics of the per-document values
+    statistics: Dict[str, Dict[str, RunningStatistics]] = {}
+
+    def load(filepath: str) -> Tuple[Document, ColumnarDocument, Optional[np.ndarray]]:
+        return _load_prediction_file(evaluation, filepath, ground_truth_directory, image_directory, ground_truth_store)
+
+    def intervals_narrow_enough() -> bool:
+        sampled_statistics: List[RunningStatistics] = [revision_statistics for metric in sample_metrics
+                                                       for revision_statistics in statistics.get(metric, {}).values()]
+        return len(sampled_statistics) > 0 and all(
+            revision_statistics.interval_width(z, len(filepaths)) <= interval_width
+            for revision_statistics in sampled_statistics)
+
+    start: float = time.monotonic()
+    for filepath, (prediction, ground_truth, foreground_mask) in _progress(
+            _prefetched(filepaths, load, prefetch, evaluation.live_metrics), total=len(filepaths)):
+        try:
+            document_metrics: dict = _process_prediction_file(evaluation, ground_truth, _create_metrics(evaluation),
+                                                              prediction, image_directory, foreground_mask)
+        except MemoryBudgetExceeded as error:
+            logger.warning(str(error))
+            continue
+        _add_metrics(metrics, document_metrics)
+        confidence.add_document(statistics, document_metrics)
+        files_considered += 1
+
+        if files_considered >= MIN_SAMPLES and intervals_narrow_enough():
+            logger.info("All confidence intervals are narrower than " + str(interval_width) + ".")
+            break
+        if time_budget is not None and time.monotonic() - start >= time_budget:
+            logger.info("The time budget of " + str(time_budget) + " seconds is used up.")
+            break
+
+    logger.success("Sampled [" + str(files_considered) + "] of [" + str(len(filepaths)) + "] files in [" +
+                   prediction_directory + "] with gt: [" + ground_truth_directory + "]")
+    _output_estimates(files_considered, len(filepaths), statistics, z)
+
+    if partial_output is not None:
+        script_utilities.write_partial_metrics(partial_output, [
+            script_utilities.partial_run(prediction_directory, files_considered, metrics, run_label)])
+
+
+def _handle_prediction_file(evaluation: Evaluation, prediction_file: str, ground_truth_directory: str,
+                            image_directory: Optional[str], ground_truth_store: Optional[ColumnarStore] = None):
     filename: str = os.path.basename(prediction_file)
     logger.info("[" + filename + "]")
 
     prediction: Document = script_utilities.load_document(prediction_file)
-    ground_truth: Document = script_utilities.get_ground_truth(filename, ground_truth_directory)
+    ground_truth: ColumnarDocument = script_utilities.get_columnar_ground_truth(filename, ground_truth_directory,
+                                                                                ground_truth_store)
 
-    metrics: dict = {IOU: {}, IOU_F1_60: {}, IOU_F1_70: {}, IOU_F1_80: {}, IOU_F1_90: {}, FOREGROUND_PIXEL_ACCURACY: {}}
-    metrics = _process_prediction_file(ground_truth, metrics, prediction, image_directory)
+    metrics: dict = _create_metrics(evaluation)
+    try:
+        metrics = _process_prediction_file(evaluation, ground_truth, metrics, prediction, image_directory)
+    except MemoryBudgetExceeded as error:
+        logger.warning(str(error))
+        return
     _output_metrics(1, metrics)
 
 
-def main(prediction_file: str, prediction_directory: str, ground_truth_directory: str, image_directory: Optional[str]):
+def _output_comparison(prediction_directories: List[str], files_considered: List[int], run_metrics: List[dict]):
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("Compared the average metrics of the following runs:")
+    for run_index, prediction_directory in enumerate(prediction_directories):
+        logger.info("[" + str(run_index) + "] " + prediction_directory + ": " + str(files_considered[run_index]) +
+                    " files")
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("metric".ljust(24) + "revision".ljust(32) +
+                "".join(("[" + str(run_index) + "]").rjust(10) for run_index in range(len(prediction_directories))))
+    for metric in _ordered_metrics(metric for metrics in run_metrics for metric in metrics):
+        revision_names: List[str] = []
+        for metrics in run_metrics:
+            revision_names.extend(name for name in metrics.get(metric, {}) if name not in revision_names)
+        for revision_name in revision_names:
+            values: List[str] = []
+            for metrics, run_files_considered in zip(run_metrics, files_considered):
+                value = metrics.get(metric, {}).get(revision_name)
+                values.append(("%.4f" % (float(value) / run_files_considered) if value is not None else "-").rjust(10))
+            logger.info(metric.ljust(24) + revision_name.ljust(32) + "".join(values))
+
+
+def _load_runs(run_filepaths: List[Optional[str]], ground_truth_directory: str, image_directory: Optional[str],
+               ground_truth_store: Optional[ColumnarStore]) \
+        -> Tuple[ColumnarDocument, List[Optional[Document]], Dict[str, np.ndarray]]:
+    """
+    reads the prediction file of each run for one ground truth document. The ground truth and the images are only
+    read once for all runs.
+    :param run_filepaths: the prediction file of each run, none if the run has no prediction for the document
+    :return: ground truth, the prediction of each run and the foreground masks of the images by their filename
+    """
+    filename: str = os.path.basename(next(filepath for filepath in run_filepaths if filepath is not None))
+    ground_truth: ColumnarDocument = script_utilities.get_columnar_ground_truth(filename, ground_truth_directory,
+                                                                                ground_truth_store)
+    predictions: List[Optional[Document]] = [script_utilities.load_document(filepath) if filepath is not None else None
+                                             for filepath in run_filepaths]
+    foreground_masks: Dict[str, np.ndarray] = {}
     if image_directory is not None:
-        logger.info("Image directory: " + image_directory)
-    if not prediction_directory == "":
-        logger.info("Prediction directory: " + prediction_directory)
+        for prediction in predictions:
+            if prediction is not None and prediction.filename not in foreground_masks:
+                foreground_masks[prediction.filename] = script_utilities.load_foreground_mask(prediction.filename,
+                                                                                              image_directory)
+    return ground_truth, predictions, foreground_masks
+
+
+def _handle_prediction_directories(evaluation: Evaluation, prediction_directories: List[str],
+                                   ground_truth_directory: str, image_directory: Optional[str],
+                                   ground_truth_store: Optional[ColumnarStore] = None,
+                                   prefetch: int = 0, shard: Optional[Tuple[int, int]] = None,
+                                   partial_output: Optional[str] = None, recursive: bool = False,
+                                   run_labels: Optional[List[str]] = None):
+    """
+    evaluates multiple runs against the same ground truth in a single pass. The ground truth of each document is
+    loaded once and all runs are evaluated against it before the next document is loaded.
+    :param run_labels: label of each run in the results store and the partial output, see script_utilities.run_label
+    """
+    if run_labels is None:
+        run_labels = [script_utilities.run_label(x) for x in prediction_directories]
+    # ground truth key -> prediction file of each run
+    documents: Dict[str, List[Optional[str]]] = {}
+    for run_index, prediction_directory in enumerate(prediction_directories):
+        for filepath in _iter_prediction_files(prediction_directory, shard, recursive):
+            key: str = script_utilities.ground_truth_key(os.path.basename(filepath))
+            documents.setdefault(key, [None] * len(prediction_directories))[run_index] = filepath
+
+    files_considered: List[int] = [0] * len(prediction_directories)
+    run_metrics: List[dict] = [_create_metrics(evaluation) for _ in prediction_directories]
+
+    def load(key: str) -> Tuple[ColumnarDocument, List[Optional[Document]], Dict[str, np.ndarray]]:
+        return _load_runs(documents[key], ground_truth_directory, image_directory, ground_truth_store)
+
+    for key, (ground_truth, predictions, foreground_masks) in _progress(
+            _prefetched(sorted(documents), load, prefetch, evaluation.live_metrics), total=len(documents)):
+        for run_index, prediction in enumerate(predictions):
+            if prediction is None:
+                continue
+            if evaluation.results_store is not None:
+                evaluation.results_store.run = run_labels[run_index]
+            try:
+                run_metrics[run_index] = _process_prediction_file(evaluation, ground_truth, run_metrics[run_index],
+                                                                  prediction, image_directory,
+                                                                  foreground_masks.get(prediction.filename))
+            except MemoryBudgetExceeded as error:
+                logger.warning(str(error))
+                continue
+            files_considered[run_index] += 1
+
+    logger.success("Computed evaluations for [" + str(len(documents)) + "] documents in [" +
+                   str(len(prediction_directories)) + "] runs with gt: [" + ground_truth_directory + "]")
+    _output_comparison(prediction_directories, files_considered, run_metrics)
+
+    if partial_output is not None:
+        script_utilities.write_partial_metrics(partial_output, [
+            script_utilities.partial_run(prediction_directory, run_files_considered, metrics, label)
+            for prediction_directory, run_files_considered, metrics, label in zip(
+                prediction_directories, files_considered, run_metrics, run_labels)])
+
+
+def _output_memory(memory_accounting: MemoryAccounting, report_filepath: Optional[str] = None):
+    """
+    outputs the documents with the highest peak memory, the highest peak of each metric and the documents over the
+    memory budget
+    :param report_filepath: file for the records of all documents, none to only output the summary
+    """
+    measured: List[dict] = [record for record in memory_accounting.documents if record["traced"] is not None]
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("Peak memory of the documents with the highest peak of [" + str(len(measured)) + "] documents:")
+    logger.info("document".ljust(40) + "peak".rjust(12) + "traced".rjust(12) + "rss".rjust(12) + "   largest metric")
+    for record in sorted(measured, key=memory.peak, reverse=True)[:MEMORY_REPORT_DOCUMENTS]:
+        metric_peaks: Dict[str, int] = record["metrics"]
+        largest_metric: str = max(metric_peaks, key=metric_peaks.get) if len(metric_peaks) > 0 else "-"
+        logger.info(record["filename"].ljust(40) + memory.megabytes(memory.peak(record)).rjust(12) +
+                    memory.megabytes(record["traced"]).rjust(12) +
+                    (memory.megabytes(record["rss"]) if record["rss"] is not None else "-").rjust(12) +
+                    "   " + largest_metric)
+
+    metric_peaks: Dict[str, int] = {}
+    for record in measured:
+        for metric, metric_peak in record["metrics"].items():
+            metric_peaks[metric] = max(metric_peaks.get(metric, 0), metric_peak)
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("Highest peak memory of each metric:")
+    for metric in [x for x in METRICS if x in metric_peaks]:
+        logger.info(metric.ljust(40) + memory.megabytes(metric_peaks[metric]).rjust(12))
+
+    if report_filepath is not None:
+        script_utilities.write_memory_report(report_filepath, memory_accounting.budget, memory_accounting.action,
+                                             memory_accounting.documents)
+    if memory_accounting.budget is None:
+        return
+
+    over_budget: List[dict] = [record for record in memory_accounting.documents if record["reason"] is not None]
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("[" + str(len(over_budget)) + "] documents are over the memory budget of " +
+                memory.megabytes(memory_accounting.budget) + ", action: " + memory_accounting.action)
+    for record in over_budget:
+        logger.warning(record["filename"] + ": " + record["reason"])
+
+
+def _output_time_limits(time_limits: TimeLimits, report_filepath: Optional[str] = None):
+    """
+    outputs the documents which were stopped by the time limits and the time of their metrics until they were stopped
+    :param report_filepath: file for the records of the stopped documents, none to only output them
+    """
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("[" + str(len(time_limits.documents)) + "] documents were stopped, time limit of a document: " +
+                (limits.seconds(time_limits.document_limit) if time_limits.document_limit is not None else "-") +
+                ", of a metric: " +
+                (limits.seconds(time_limits.metric_limit) if time_limits.metric_limit is not None else "-"))
+    for record in time_limits.documents:
+        logger.warning(record["filename"] + " after " + limits.seconds(record["seconds"]) + ": " + record["reason"])
+        for metric in [x for x in METRICS if x in record["metrics"]]:
+            logger.info("    " + metric.ljust(36) + limits.seconds(record["metrics"][metric]).rjust(12))
+    if report_filepath is not None:
+        script_utilities.write_time_limit_report(report_filepath, time_limits.document_limit,
+                                                 time_limits.metric_limit, time_limits.documents)
+
+
+def _expand_prediction_directories(prediction_directories: List[str]) -> List[str]:
+    """
+    :return: the prediction directories with glob patterns replaced by the matching directories and archives
+    """
+    expanded: List[str] = []
+    for prediction_directory in prediction_directories:
+        if glob.has_magic(prediction_directory):
+            expanded.extend(sorted(x for x in glob.glob(prediction_directory)
+                                   if os.path.isdir(x) or archives.is_archive(x)))
+        else:
+            expanded.append(prediction_directory)
+    return expanded
+
+
+def create_evaluation(options: argparse.Namespace) -> Evaluation:
+    """
+    :param options: the options of the metrics and records, see parse_arguments
+    :return: the evaluation which the options configure
+    """
+    evaluation: Evaluation = Evaluation()
+    if options.thresholds is not None:
+        evaluation.sweep_thresholds = threshold_sweep.parse_thresholds(options.thresholds)
+        logger.info("Threshold sweep: " + ", ".join("%g" % x for x in evaluation.sweep_thresholds))
+    if options.memory_profile or options.memory_budget is not None or options.memory_report is not None:
+        evaluation.memory_accounting = MemoryAccounting(
+            int(options.memory_budget * (1 << 20)) if options.memory_budget is not None else None,
+            options.memory_budget_action)
+        if options.prefetch > 0:
+            logger.warning("Memory of the prefetched files is attributed to the document evaluated at the same time.")
+    if options.results_store is not None:
+        evaluation.results_store = ResultsStore()
+    if options.cell_workers > 1:
+        evaluation.cell_pool = CellPool(options.cell_workers)
+        evaluation.parallel_min_cells = options.cell_parallel_threshold
+        logger.info("Documents with at least [" + str(evaluation.parallel_min_cells) + "] cells are evaluated with [" +
+                    str(options.cell_workers) + "] worker processes")
+        if evaluation.memory_accounting is not None:
+            logger.warning("The memory of the worker processes isn't part of the memory accounting.")
+    if options.fpa_sampling is not None:
+        evaluation.fpa_sampling = PixelSampling(options.fpa_sampling, options.fpa_sampling_stride,
+                                                options.fpa_sampling_samples, options.seed or 0)
+        evaluation.fpa_sampling_z = confidence.z_value(options.confidence_level)
+        logger.info("The Foreground Pixel Accuracy is approximated from a sample of the pixels: " +
+                    str(evaluation.fpa_sampling))
+    if options.document_time_limit is not None or options.metric_time_limit is not None:
+        # the worker is forked with the evaluation, so it evaluates the documents with the same configuration
+        evaluation.time_limits = TimeLimits(functools.partial(_evaluate_in_worker, evaluation),
+                                            options.document_time_limit, options.metric_time_limit)
+        logger.info("Documents are evaluated in a worker process with time limits")
+    if options.live_metrics is not None:
+        evaluation.live_metrics = LiveMetrics()
+        evaluation.live_metrics.start_export(options.live_metrics, options.live_metrics_interval)
+        logger.info("Live metrics are written to [" + options.live_metrics + "] every " +
+                    limits.seconds(options.live_metrics_interval))
+    return evaluation
+
+
+def _evaluate_predictions(evaluation: Evaluation, options: argparse.Namespace, prediction_directories: List[str],
+                          run_labels: List[str], ground_truth_store: Optional[ColumnarStore],
+                          shard: Optional[Tuple[int, int]]):
+    """
+    evaluates the prediction directories or the prediction file in the mode of the options, see main
+    """
+    ground_truth_directory: str = options.ground_truth_directory
+    image_directory: Optional[str] = options.image_directory
+    if options.watch:
+        if len(prediction_directories) != 1:
+            raise RuntimeError("Watching requires exactly one prediction directory.")
+        logger.info("Ground Truth directory: " + ground_truth_directory)
+        _watch_prediction_directory(evaluation, prediction_directories[0], ground_truth_directory, image_directory,
+                                    ground_truth_store, shard, options.partial_output, options.watch_interval,
+                                    options.watch_idle_timeout, options.watch_state, run_labels[0])
+    elif options.sample:
+        if len(prediction_directories) != 1:
+            raise RuntimeError("Sampling requires exactly one prediction directory.")
+        logger.info("Prediction directory: " + prediction_directories[0])
+        logger.info("Ground Truth directory: " + ground_truth_directory)
+        _sample_prediction_directory(evaluation, prediction_directories[0], ground_truth_directory, image_directory,
+                                     ground_truth_store, options.prefetch, shard, options.partial_output,
+                                     options.interval_width, options.confidence_level, options.time_budget,
+                                     options.sample_metrics, options.seed, options.recursive, run_labels[0])
+    elif len(prediction_directories) > 1:
+        logger.info("Prediction directories: " + ", ".join(prediction_directories))
         logger.info("Ground Truth directory: " + ground_truth_directory)
-        _handle_prediction_directory(prediction_directory, ground_truth_directory, image_directory)
-    elif not prediction_file == "":
-        _handle_prediction_file(prediction_file, ground_truth_directory, image_directory)
+        _handle_prediction_directories(evaluation, prediction_directories, ground_truth_directory, image_directory,
+                                       ground_truth_store, options.prefetch, shard, options.partial_output,
+                                       options.recursive, run_labels)
+    elif len(prediction_directories) == 1:
+        logger.info("Prediction directory: " + prediction_directories[0])
+        logger.info("Ground Truth directory: " + ground_truth_directory)
+        _handle_prediction_directory(evaluation, prediction_directories[0], ground_truth_directory, image_directory,
+                                     ground_truth_store, options.prefetch, shard, options.partial_output,
+                                     options.bootstrap, options.confidence_level, options.seed, options.recursive,
+                                     options.document_workers, options.schedule_timings, run_labels[0])
+    elif not options.prediction_file == "":
+        _handle_prediction_file(evaluation, options.prediction_file, ground_truth_directory, image_directory,
+                                ground_truth_store)
     else:
         raise RuntimeError("No prediction_file or prediction_directory was specified!")
 
 
+def main(options: argparse.Namespace):
+    """
+    :param options: see parse_arguments
+    """
+    if options.compile_ground_truth:
+        if options.ground_truth_store is None:
+            raise RuntimeError("Compiling the ground truth requires a ground truth store directory.")
+        script_utilities.compile_ground_truth_store(options.ground_truth_directory, options.ground_truth_store)
+        return
+
+    ground_truth_directory: str = options.ground_truth_directory
+    image_directory: Optional[str] = options.image_directory
+    ground_truth_store: Optional[ColumnarStore] = None
+    if options.ground_truth_store is not None:
+        logger.info("Ground Truth store: " + options.ground_truth_store)
+        ground_truth_store = script_utilities.load_ground_truth_store(ground_truth_directory,
+                                                                      options.ground_truth_store)
+    if image_directory is not None:
+        logger.info("Image directory: " + image_directory)
+    shard: Optional[Tuple[int, int]] = script_utilities.parse_shard(options.shard) \
+        if options.shard is not None else None
+    if shard is not None:
+        logger.info("Evaluating shard " + options.shard)
+    prediction_directories: List[str] = _expand_prediction_directories(options.prediction_directory)
+    # the shards of a run are merged by its label, their prediction directories can differ between the machines
+    run_labels: List[str] = options.run_labels if options.run_labels is not None else \
+        [script_utilities.run_label(x) for x in prediction_directories]
+    if len(run_labels) != len(prediction_directories) or len(set(run_labels)) != len(run_labels):
+        raise RuntimeError("Each prediction directory needs its own label, pass them with --run_labels. Labels: " +
+                           ", ".join(run_labels))
+    if (options.watch or options.sample or len(prediction_directories) > 1) and \
+            any(archives.is_archive(x) for x in prediction_directories):
+        raise RuntimeError("An archive can only be evaluated as single prediction directory, "
+                           "not with --watch, --sample or together with other runs.")
+    time_limited: bool = options.document_time_limit is not None or options.metric_time_limit is not None
+    if time_limited and (options.watch or options.sample or len(prediction_directories) != 1):
+        raise RuntimeError("Time limits require a single prediction directory without --watch or --sample.")
+    if options.document_workers > 1:
+        if options.watch or options.sample or len(prediction_directories) != 1 or time_limited:
+            raise RuntimeError("Document workers require a single prediction directory without --watch, --sample or "
+                               "time limits.")
+        logger.info("Documents are evaluated with [" + str(options.document_workers) + "] worker processes, the "
+                    "largest documents first")
+
+    evaluation: Evaluation = create_evaluation(options)
+    try:
+        _evaluate_predictions(evaluation, options, prediction_directories, run_labels, ground_truth_store, shard)
+    finally:
+        # the worker processes and the export thread are stopped even if the evaluation fails
+        if evaluation.cell_pool is not None:
+            evaluation.cell_pool.close()
+        if evaluation.time_limits is not None:
+            evaluation.time_limits.close()
+        if evaluation.live_metrics is not None:
+            evaluation.live_metrics.stop_export(options.live_metrics)
+
+    if evaluation.time_limits is not None:
+        _output_time_limits(evaluation.time_limits, options.time_limit_report)
+    if evaluation.memory_accounting is not None:
+        _output_memory(evaluation.memory_accounting, options.memory_report)
+    if evaluation.results_store is not None:
+        results.save(options.results_store, evaluation.results_store)
+        logger.info("Wrote the results of [" + str(len(evaluation.results_store)) + "] tables to [" +
+                    options.results_store + "]")
+
+
 def parse_arguments() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument("-f", "--prediction_file", type=str, required=False,
                         help="Specify a prediction file. "
                              "You have to specify a prediction file or an prediction directory.",
                         default="")
-    parser.add_argument("-p", "--prediction_directory", type=str,
+    parser.add_argument("-p", "--prediction_directory", type=str, nargs="+",
                         required=False,
                         help="Specify the directory where the prediction json files are in. "
-                             "You have to specify a prediction file or a prediction directory.",
-                        default="")
+                             "You have to specify a prediction file or a prediction directory. "
+                             "The prediction files can be compressed (.json.gz, .json.zst), a directory can contain "
+                             "tar or zip archives of prediction files, e.g. one per shard, and a single tar or zip "
+                             "archive can be given instead of a directory. Archives are read as a stream. "
+                             "Multiple directories or glob patterns (e.g. 'runs/*') evaluate all runs against the "
+                             "ground truth in a single pass and output a comparison of the runs.",
+                        default=[])
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Also evaluate the prediction files in the subdirectories of the prediction directories.")
     parser.add_argument("-g", "--ground_truth_directory", type=str, required=True,
                         help="This is the directory with the ground_truth files. "
                              "It's necessary to have ground truth information to compute the evaluation metrics. "
                              "If you leave this empty, "
-                             "this application will take the earliest version from the predictions as ground truth.")
+                             "this application will take the earliest version from the predictions as ground truth. "
+                             "It can be a tar or zip archive of the ground truth files too.")
     parser.add_argument("-i", "--image_directory", type=str, required=False,
                         help="Specify a directory which contains the images used for prediction and evaluation."
-                             "This enables for additional metrics to be computed.",
+                             "This enables for additional metrics to be computed. "
+                             "It can be a tar or zip archive of the images too.",
+                        default=None)
+    parser.add_argument("-s", "--ground_truth_store", type=str, required=False,
+                        help="Specify a directory for the compiled ground truth. "
+                             "The ground truth is read from this store without parsing the json files. "
+                             "It's compiled automatically if it's missing or if the ground truth directory changed.",
+                        default=None)
+    parser.add_argument("--compile_ground_truth", action="store_true",
+                        help="Only compile the ground truth directory into the ground truth store and exit.")
+    parser.add_argument("--prefetch", type=int, required=False,
+                        help="Number of prediction files which are read and decoded in the background "
+                             "while the current file is evaluated. 0 disables prefetching.",
+                        default=0)
+    parser.add_argument("--shard", type=str, required=False,
+                        help="Only evaluate the prediction files of shard i/N, e.g. 0/4. "
+                             "Files are assigned to shards by a stable hash of their filename.",
+                        default=None)
+    parser.add_argument("--partial_output", type=str, required=False,
+                        help="Write the summed metrics to this file. "
+                             "The partial files of all shards can be combined with merge_evaluations.py.",
+                        default=None)
+    parser.add_argument("--run_labels", type=str, nargs="+", required=False,
+                        help="Label of each prediction directory in the partial output and the results store. "
+                             "The partial files of the shards are merged by these labels. Defaults to the name of "
+                             "each prediction directory.",
+                        default=None)
+    parser.add_argument("--watch", action="store_true",
+                        help="Follow the prediction directory and evaluate each new or changed prediction file "
+                             "as soon as it's written. The progress is persisted, a restarted watch continues "
+                             "where the previous one stopped.")
+    parser.add_argument("--watch_interval", type=float, required=False,
+                        help="Seconds between two scans of the watched prediction directory.",
+                        default=2.0)
+    parser.add_argument("--watch_idle_timeout", type=float, required=False,
+                        help="Stop watching after this many seconds without new prediction files. "
+                             "Without a timeout, the directory is watched until the process is interrupted.",
+                        default=None)
+    parser.add_argument("--watch_state", type=str, required=False,
+                        help="File for the progress of the watch. "
+                             "Defaults to " + WATCH_STATE_FILENAME + " in the prediction directory.",
+                        default=None)
+    parser.add_argument("--sample", action="store_true",
+                        help="Evaluate the prediction files in random order and stop as soon as the confidence "
+                             "intervals of the average metrics are narrower than --interval_width "
+                             "or the --time_budget is used up.")
+    parser.add_argument("--interval_width", type=float, required=False,
+                        help="Target width of the confidence intervals for --sample.",
+                        default=0.01)
+    parser.add_argument("--confidence_level", type=float, required=False,
+                        help="Confidence level of the intervals for --sample and --bootstrap.",
+                        default=0.95)
+    parser.add_argument("--time_budget", type=float, required=False,
+                        help="Maximum seconds for the evaluation with --sample.",
+                        default=None)
+    parser.add_argument("--sample_metrics", type=str, nargs="+", required=False,
+                        help="Metrics whose confidence intervals have to be narrow enough for --sample, "
+                             "defaults to all metrics. One of: " + ", ".join(METRICS),
+                        default=None)
+    parser.add_argument("--seed", type=int, required=False,
+                        help="Seed for the random order of the prediction files with --sample "
+                             "and for the resamples of --bootstrap.",
+                        default=None)
+    parser.add_argument("--bootstrap", type=int, required=False,
+                        help="Number of bootstrap resamples for confidence intervals of the average metrics and "
+                             "the significance of the differences between the revisions, e.g. 10000. "
+                             "0 disables the confidence intervals.",
+                        default=0)
+    parser.add_argument("--thresholds", type=str, required=False,
+                        help="Additionally compute the precision, recall and f1 curves of the iou, fpa and ld metrics "
+                             "for the thresholds start:stop:step, e.g. 0.5:0.95:0.05, and the f1 score averaged "
+                             "over these thresholds.",
+                        default=None)
+    parser.add_argument("--memory_profile", action="store_true",
+                        help="Record the peak memory of each document and metric and report the documents with the "
+                             "highest peak. Use it without --prefetch, the memory of prefetched files is attributed "
+                             "to the document which is evaluated at the same time.")
+    parser.add_argument("--memory_budget", type=float, required=False,
+                        help="Memory budget of a document in MB, implies --memory_profile. "
+                             "Documents over the budget are listed in the report.",
+                        default=None)
+    parser.add_argument("--memory_budget_action", type=str, required=False, choices=memory.BUDGET_ACTIONS,
+                        help="flag: only list the documents over the budget. "
+                             "skip: leave the documents over the budget out of the averages, documents whose "
+                             "estimated memory is over the budget aren't evaluated. "
+                             "low_memory: compute the foreground pixel accuracy of large cells in parts which fit "
+                             "into the budget.",
+                        default="flag")
+    parser.add_argument("--memory_report", type=str, required=False,
+                        help="Write the peak memory of all documents and metrics to this json file, "
+                             "implies --memory_profile.",
+                        default=None)
+    parser.add_argument("--results_store", type=str, required=False,
+                        help="Write the metrics of each table with descriptors of the table, e.g. its number of "
+                             "cells, to this .npz file. It can be sliced and aggregated with query_results.py. "
+                             "Documents which are evaluated again with --watch have rows for each evaluation.",
+                        default=None)
+    parser.add_argument("--cell_workers", type=int, required=False,
+                        help="Number of worker processes which evaluate the cells of large documents in chunks, "
+                             "e.g. the foreground pixel accuracy of each cell. 0 evaluates all cells in this process.",
+                        default=0)
+    parser.add_argument("--cell_parallel_threshold", type=int, required=False,
+                        help="Minimum number of gt and prediction cells of a document for --cell_workers.",
+                        default=parallel.MIN_CELLS)
+    parser.add_argument("--fpa_sampling", type=str, required=False, choices=foreground_pixel_accuracy.SAMPLING_METHODS,
+                        help="Approximate the foreground pixel accuracy from a sample of the pixels of each cell "
+                             "instead of all pixels, e.g. for previews during model iteration. stride: every "
+                             "--fpa_sampling_stride-th pixel in both directions. random: --fpa_sampling_samples random "
+                             "pixels per cell, seeded by --seed. The averages are reported with error bounds for the "
+                             "--confidence_level. The bounds of stride are approximate, they treat the pixels as a "
+                             "random sample. Without this option, the exact foreground pixel accuracy is "
+                             "computed.",
+                        default=None)
+    parser.add_argument("--fpa_sampling_stride", type=int, required=False,
+                        help="Distance of the sampled pixels for --fpa_sampling stride.",
+                        default=4)
+    parser.add_argument("--fpa_sampling_samples", type=int, required=False,
+                        help="Number of sampled pixels per cell for --fpa_sampling random, "
+                             "smaller cells are evaluated exactly.",
+                        default=64)
+    parser.add_argument("--document_time_limit", type=float, required=False,
+                        help="Maximum seconds for the evaluation of a document. The documents are evaluated in a "
+                             "worker process which is stopped at the time limit, the stopped documents are left out "
+                             "of the averages and listed in the report. Requires a single prediction directory.",
+                        default=None)
+    parser.add_argument("--metric_time_limit", type=float, required=False,
+                        help="Maximum seconds for a metric of a document, summed over its revisions. "
+                             "Works like --document_time_limit.",
+                        default=None)
+    parser.add_argument("--time_limit_report", type=str, required=False,
+                        help="Write the documents which were stopped by the time limits to this json file.",
+                        default=None)
+    parser.add_argument("--live_metrics", type=str, required=False,
+                        help="Periodically write the throughput, the latencies of the documents and metrics, the "
+                             "number of prefetched documents, the cache hit rates and the error counts of the running "
+                             "evaluation to this file. Files ending with .prom are written in the Prometheus text "
+                             "format, e.g. for the textfile collector of the node exporter, other files as json.",
+                        default=None)
+    parser.add_argument("--live_metrics_interval", type=float, required=False,
+                        help="Seconds between the writes of --live_metrics.",
+                        default=10.0)
+    parser.add_argument("--document_workers", type=int, required=False,
+                        help="Evaluate the documents of a prediction directory with this many worker processes. The "
+                             "time of each document is estimated up front from the size of its file, the number of "
+                             "polygons in it, the size of its image and the measured times of --schedule_timings, "
+                             "and the documents are dispatched largest first. Prediction files in archives aren't "
+                             "supported. The estimated and measured times are compared at the end.",
+                        default=0)
+    parser.add_argument("--schedule_timings", type=str, required=False,
+                        help="Json file with the measured times of the documents of an earlier run for "
+                             "--document_workers. The estimates are fitted to these times and the file is updated "
+                             "with the times of this run.",
                         default=None)
     # todo remove default "" values and replace with none
     # todo add check_args method, check that either prediction_file or prediction_directory is supplied
@@ -289,7 +1816,6 @@ def parse_arguments() -> argparse.Namespace:
 
 
 if __name__ == "__main__":
-    args: argparse.Namespace = parse_arguments()
-    main(args.prediction_file, args.prediction_directory, args.ground_truth_directory, args.image_directory)
+    main(parse_arguments())
 
 # todo rename to docrecJSON-evaluations
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+This script combines the partial results of a sharded evaluation (exec_evaluations.py --shard i/N --partial_output)
+and outputs the same report as an evaluation on a single machine.
+"""
+import argparse
+import sys
+
+from typing import List
+
+from loguru import logger
+
+import exec_evaluations
+import script_utilities
+
+logger.remove()
+logger.add(sys.stderr, level="INFO")
+
+
+def main(partial_files: List[str]):
+    runs: List[dict] = script_utilities.merge_partial_metrics(partial_files)
+    logger.info("Merged [" + str(len(partial_files)) + "] partial results.")
+    if len(runs) == 1:
+        logger.success("Computed average metrics for [" + str(runs[0]["files_considered"]) + "] files.")
+        exec_evaluations._output_metrics(runs[0]["files_considered"], runs[0]["metrics"])
+    else:
+        exec_evaluations._output_comparison([run["run"] for run in runs],
+                                            [run["files_considered"] for run in runs],
+                                            [run["metrics"] for run in runs])
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("partial_files", type=str, nargs="+",
+                        help="The partial result files written by the shards.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args: argparse.Namespace = parse_arguments()
+    main(args.partial_files)
@@ -0,0 +1,210 @@
+"""
+Compressed files and archives as inputs of the evaluation.
+Single documents can be compressed with gzip (.gz) or zstandard (.zst). Many documents can be bundled into tar or zip
+archives, e.g. one archive per shard of a large evaluation. The tar archives can be compressed as a whole (.tar.gz,
+.tar.zst, ...) and their members can be compressed files themselves.
+
+The predictions are read from an archive as a stream, member after member, so only the member which is evaluated is in
+memory. The ground truth and the images are looked up by name and are read with random access instead. Zip archives
+and uncompressed tar archives are read in place, compressed tar archives can't be read with random access and are
+read into memory once when they are opened.
+
+zstandard is only imported when the first .zst file is read.
+"""
+import gzip
+import io
+import os
+import tarfile
+import threading
+import zipfile
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+COMPRESSED_EXTENSIONS: List[str] = [".gz", ".zst"]
+# compressed tar archives with a single extension
+_TAR_EXTENSIONS: Dict[str, str] = {".tgz": ".gz", ".tzst": ".zst"}
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Reading .zst files requires the zstandard package.")
+    return zstandard
+
+
+def strip_compression(filename: str) -> str:
+    """
+    :return: the filename without its compression extension, e.g. a.json for a.json.gz
+    """
+    for extension in COMPRESSED_EXTENSIONS:
+        if filename.endswith(extension):
+            return filename[:-len(extension)]
+    return filename
+
+
+def _tar_compression(path: str) -> Optional[str]:
+    """
+    :return: the compression extension of a tar archive, empty for an uncompressed tar archive and none if the file
+    isn't a tar archive
+    """
+    for extension, compression in _TAR_EXTENSIONS.items():
+        if path.endswith(extension):
+            return compression
+    if strip_compression(path).endswith(".tar"):
+        return path[len(strip_compression(path)):]
+    return None
+
+
+def is_archive(path: str) -> bool:
+    """
+    :return: whether the file is a tar or zip archive, decided by its extension
+    """
+    return (_tar_compression(path) is not None or path.endswith(".zip")) and os.path.isfile(path)
+
+
+def open_file(path: str) -> BinaryIO:
+    """
+    opens a file for reading, compressed files are decompressed while they are read
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        return _zstandard().ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def decompress(name: str, data: bytes) -> bytes:
+    """
+    :param name: name of the file or archive member, its extension decides the compression
+    :return: the decompressed data, the data itself if it isn't compressed
+    """
+    if name.endswith(".gz"):
+        return gzip.decompress(data)
+    if name.endswith(".zst"):
+        with _zstandard().ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+            return reader.read()
+    return data
+
+
+def _member_name(name: str) -> Optional[str]:
+    """
+    :return: the name of a member without leading ./, none for hidden members
+    """
+    while name.startswith("./"):
+        name = name[2:]
+    if os.path.basename(name).startswith("."):
+        return None
+    return name
+
+
+def _open_tar_stream(path: str) -> tarfile.TarFile:
+    """
+    opens a tar archive for reading its members in order, without seeking
+    """
+    if _tar_compression(path) == ".zst":
+        reader = _zstandard().ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return tarfile.open(fileobj=reader, mode="r|")
+    return tarfile.open(path, mode="r|*")
+
+
+def iter_members(path: str, accept: Optional[Callable[[str], bool]] = None) -> Iterator[Tuple[str, bytes]]:
+    """
+    reads the files of an archive in the order they are stored, only the current file is kept in memory. Hidden files
+    and directories are skipped.
+    :param accept: optional filter for the names of the members, the data of the other members isn't decompressed
+    :return: name and decompressed data of each member
+    """
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                name: Optional[str] = _member_name(info.filename)
+                if info.is_dir() or name is None or (accept is not None and not accept(name)):
+                    continue
+                yield name, decompress(name, archive.read(info))
+        return
+
+    with _open_tar_stream(path) as archive:
+        for member in archive:
+            name: Optional[str] = _member_name(member.name)
+            if not member.isfile() or name is None or (accept is not None and not accept(name)):
+                continue
+            yield name, decompress(name, archive.extractfile(member).read())
+
+
+def member_count(path: str) -> Optional[int]:
+    """
+    counts the files of an archive without reading them
+    :return: the number of files, none for compressed tar archives which would have to be decompressed completely
+    """
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            return sum(1 for info in archive.infolist() if not info.is_dir() and _member_name(info.filename))
+    if _tar_compression(path) != "":
+        return None
+    with tarfile.open(path, mode="r:") as archive:
+        return sum(1 for member in archive.getmembers() if member.isfile() and _member_name(member.name))
+
+
+class ArchiveReader:
+    """
+    random access to the files of an archive by their name, e.g. of the ground truth or of the images. The files can
+    be read by several threads at the same time.
+    """
+    __slots__ = ("path", "_lock", "_archive", "_members", "_data", "_basenames")
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self._lock: threading.Lock = threading.Lock()
+        self._archive: Optional[object] = None
+        # name of each file -> member of the archive, the decompressed files of compressed tar archives
+        self._members: Dict[str, object] = {}
+        self._data: Dict[str, bytes] = {}
+        if path.endswith(".zip"):
+            self._archive = zipfile.ZipFile(path)
+            for info in self._archive.infolist():
+                name: Optional[str] = _member_name(info.filename)
+                if not info.is_dir() and name is not None:
+                    self._members[name] = info
+        elif _tar_compression(path) == "":
+            self._archive = tarfile.open(path, mode="r:")
+            for member in self._archive.getmembers():
+                name: Optional[str] = _member_name(member.name)
+                if member.isfile() and name is not None:
+                    self._members[name] = member
+        else:
+            for name, data in iter_members(path):
+                self._data[name] = data
+                self._members[name] = name
+        # files are found by their name in the archive or by their filename if it's unique
+        self._basenames: Dict[str, List[str]] = {}
+        for name in self._members:
+            self._basenames.setdefault(os.path.basename(name), []).append(name)
+
+    def names(self) -> List[str]:
+        return list(self._members)
+
+    def find(self, filename: str) -> Optional[str]:
+        """
+        :return: the name of the file in the archive, none if there is no such file or the filename is ambiguous
+        """
+        if filename in self._members:
+            return filename
+        names: List[str] = self._basenames.get(os.path.basename(filename), [])
+        return names[0] if len(names) == 1 else None
+
+    def read(self, name: str) -> bytes:
+        """
+        :return: the decompressed data of the file
+        """
+        if name in self._data:
+            return self._data[name]
+        with self._lock:
+            if isinstance(self._archive, zipfile.ZipFile):
+                data: bytes = self._archive.read(self._members[name])
+            else:
+                data = self._archive.extractfile(self._members[name]).read()
+        return decompress(name, data)
+
+    def close(self):
+        if self._archive is not None:
+            self._archive.close()
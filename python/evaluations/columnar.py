@@ -0,0 +1,150 @@
+"""
+Columnar (struct of arrays) representation of the tables of a document.
+The metrics only need the cell geometry, the table structure and the cell texts. Instead of walking the docrecjson
+object graph for each metric, those values are converted once into contiguous numpy arrays per table:
+
+bounds          (n, 4) array with x_min, y_min, x_max, y_max of each cell
+vertices        (v, 2) array with the polygon vertices of all cells
+vertex_offsets  (n + 1) array, the polygon of cell i is vertices[vertex_offsets[i]:vertex_offsets[i + 1]]
+structure       row and column indices and row/column occupancy, see table_structure.TableStructure
+text            the texts of all cells joined into one string
+text_offsets    (n + 1) array, the text of cell i is text[text_offsets[i]:text_offsets[i + 1]]
+has_text        (n) array, False for cells without text content
+"""
+import hashlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+from docrecjson.elements import Document, Revision, Table, Cell
+from shapely.geometry import Polygon
+
+import python.evaluations.quadrilaterals as quadrilaterals
+import python.evaluations.table_structure as table_structure
+from python.evaluations.table_structure import TableStructure
+
+
+class ColumnarTable:
+    __slots__ = ("table_polygon", "bounds", "vertices", "vertex_offsets", "structure", "text", "text_offsets",
+                 "has_text", "_shapes", "_table_shape", "_quadrilaterals", "_fingerprint")
+
+    def __init__(self, table_polygon: np.ndarray, bounds: np.ndarray, vertices: np.ndarray,
+                 vertex_offsets: np.ndarray, structure: TableStructure, text: str, text_offsets: np.ndarray,
+                 has_text: np.ndarray):
+        self.table_polygon: np.ndarray = table_polygon
+        self.bounds: np.ndarray = bounds
+        self.vertices: np.ndarray = vertices
+        self.vertex_offsets: np.ndarray = vertex_offsets
+        self.structure: TableStructure = structure
+        self.text: str = text
+        self.text_offsets: np.ndarray = text_offsets
+        self.has_text: np.ndarray = has_text
+        self._shapes: Optional[List[Polygon]] = None
+        self._table_shape: Optional[Polygon] = None
+        self._quadrilaterals: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._fingerprint: Optional[bytes] = None
+
+    def __len__(self) -> int:
+        return len(self.vertex_offsets) - 1
+
+    def polygon(self, index: int) -> np.ndarray:
+        return self.vertices[self.vertex_offsets[index]:self.vertex_offsets[index + 1]]
+
+    def cell_text(self, index: int) -> Optional[str]:
+        if not self.has_text[index]:
+            return None
+        return self.text[self.text_offsets[index]:self.text_offsets[index + 1]]
+
+    def shapes(self) -> List[Polygon]:
+        """
+        :return: the shapely polygons of the cells. They are created on first use and kept for further metrics.
+        """
+        if self._shapes is None:
+            self._shapes = [Polygon(self.polygon(index)) for index in range(len(self))]
+        return self._shapes
+
+    def quadrilaterals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: the corners of the cells and whether each cell is a convex quadrilateral, see
+        quadrilaterals.convex_quadrilaterals. They are computed on first use.
+        """
+        if self._quadrilaterals is None:
+            self._quadrilaterals = quadrilaterals.convex_quadrilaterals(self.vertices, self.vertex_offsets)
+        return self._quadrilaterals
+
+    def table_shape(self) -> Polygon:
+        if self._table_shape is None:
+            self._table_shape = Polygon(self.table_polygon)
+        return self._table_shape
+
+    def fingerprint(self) -> bytes:
+        """
+        :return: hash of everything the metrics read from the table, tables with the same fingerprint have the same
+        results
+        """
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for array in [self.table_polygon, self.bounds, self.vertices, self.vertex_offsets, *self.structure,
+                          self.text_offsets, self.has_text]:
+                array = np.ascontiguousarray(array)
+                digest.update(str(array.dtype).encode() + str(array.shape).encode())
+                digest.update(array.tobytes())
+            digest.update(self.text.encode("utf-8", "surrogatepass"))
+            self._fingerprint = digest.digest()
+        return self._fingerprint
+
+
+class ColumnarDocument:
+    __slots__ = ("filename", "tables")
+
+    def __init__(self, filename: Optional[str], tables: List[ColumnarTable]):
+        self.filename: Optional[str] = filename
+        self.tables: List[ColumnarTable] = tables
+
+
+def _offsets(lengths: List[int]) -> np.ndarray:
+    offsets: np.ndarray = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def from_table(table: Table) -> ColumnarTable:
+    cells: List[Cell] = table.cells
+    polygons: List[np.ndarray] = [np.asarray(cell.bounding_box.polygon, dtype=np.float64).reshape(-1, 2)
+                                  for cell in cells]
+    vertex_offsets: np.ndarray = _offsets([len(polygon) for polygon in polygons])
+    vertices: np.ndarray = np.concatenate(polygons) if len(polygons) > 0 else np.empty((0, 2), dtype=np.float64)
+
+    bounds: np.ndarray = np.empty((len(cells), 4), dtype=np.float64)
+    if len(cells) > 0:
+        bounds[:, :2] = np.minimum.reduceat(vertices, vertex_offsets[:-1])
+        bounds[:, 2:] = np.maximum.reduceat(vertices, vertex_offsets[:-1])
+
+    texts: List[Optional[str]] = [cell.text_content.text if cell.text_content is not None else None
+                                  for cell in cells]
+    has_text: np.ndarray = np.array([text is not None for text in texts], dtype=bool)
+    texts = [text if text is not None else "" for text in texts]
+
+    return ColumnarTable(table_polygon=np.asarray(table.get_table_coordinates(), dtype=np.float64),
+                         bounds=bounds,
+                         vertices=vertices,
+                         vertex_offsets=vertex_offsets,
+                         structure=table_structure.get_table_structure(table),
+                         text="".join(texts),
+                         text_offsets=_offsets([len(text) for text in texts]),
+                         has_text=has_text)
+
+
+def from_tables(tables: List[Table], filename: Optional[str] = None) -> ColumnarDocument:
+    return ColumnarDocument(filename, [from_table(table) for table in tables])
+
+
+def from_document(document: Document) -> ColumnarDocument:
+    """
+    :param document: document with the currently selected revision
+    :return: the columnar representation of the tables of the document
+    """
+    return from_tables([x for x in document.objects() if isinstance(x, Table)], document.filename)
+
+
+def from_revision(revision: Revision, filename: Optional[str] = None) -> ColumnarDocument:
+    return from_tables([x for x in revision.objects if isinstance(x, Table)], filename)
@@ -0,0 +1,168 @@
+"""
+Binary store for columnar documents.
+A store is a directory with one .npy file per column, which concatenates the values of all tables of all documents,
+and a manifest.json, which maps the document keys to their tables.
+The columns are memory-mapped when the store is opened, loading a document only slices views of the mapped arrays
+and doesn't need any json parsing.
+"""
+import json
+import os
+import shutil
+from typing import List, Dict, Tuple, Optional
+
+import numpy as np
+
+from python.evaluations.columnar import ColumnarDocument, ColumnarTable
+from python.evaluations.table_structure import TableStructure
+
+STORE_VERSION: int = 1
+MANIFEST_FILENAME: str = "manifest.json"
+
+# the table_* offset columns locate the values of each table in the other columns
+_COLUMNS: List[str] = ["table_cell_offsets", "table_vertex_offsets", "table_polygon_offsets", "table_row_offsets",
+                       "table_column_offsets", "table_text_offsets", "table_polygons", "bounds", "vertices",
+                       "vertex_offsets", "structure", "text_offsets", "has_text", "row_occupancy", "column_occupancy",
+                       "text"]
+
+
+class ColumnarStore:
+    __slots__ = ("directory", "documents", "_columns")
+
+    def __init__(self, directory: str, documents: Dict[str, dict], columns: Dict[str, np.ndarray]):
+        self.directory: str = directory
+        # document key -> manifest entry
+        self.documents: Dict[str, dict] = documents
+        self._columns: Dict[str, np.ndarray] = columns
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.documents
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _table(self, table_index: int) -> ColumnarTable:
+        columns: Dict[str, np.ndarray] = self._columns
+        cell_start, cell_end = columns["table_cell_offsets"][table_index:table_index + 2]
+        vertex_start, vertex_end = columns["table_vertex_offsets"][table_index:table_index + 2]
+        polygon_start, polygon_end = columns["table_polygon_offsets"][table_index:table_index + 2]
+        row_start, row_end = columns["table_row_offsets"][table_index:table_index + 2]
+        column_start, column_end = columns["table_column_offsets"][table_index:table_index + 2]
+        text_start, text_end = columns["table_text_offsets"][table_index:table_index + 2]
+
+        # the local offsets of table i are stored after the local offsets of the previous tables,
+        # each table has one offset more than cells
+        structure: np.ndarray = columns["structure"][cell_start:cell_end]
+        return ColumnarTable(table_polygon=columns["table_polygons"][polygon_start:polygon_end],
+                             bounds=columns["bounds"][cell_start:cell_end],
+                             vertices=columns["vertices"][vertex_start:vertex_end],
+                             vertex_offsets=columns["vertex_offsets"][cell_start + table_index:
+                                                                      cell_end + table_index + 1],
+                             structure=TableStructure(start_row_index=structure[:, 0],
+                                                      end_row_index=structure[:, 1],
+                                                      start_column_index=structure[:, 2],
+                                                      end_column_index=structure[:, 3],
+                                                      row_occupancy=columns["row_occupancy"][row_start:row_end],
+                                                      column_occupancy=columns["column_occupancy"][
+                                                                       column_start:column_end]),
+                             text=columns["text"][text_start:text_end].tobytes().decode("utf-8"),
+                             text_offsets=columns["text_offsets"][cell_start + table_index:
+                                                                  cell_end + table_index + 1],
+                             has_text=columns["has_text"][cell_start:cell_end])
+
+    def load(self, key: str) -> ColumnarDocument:
+        """
+        :param key: key of the document
+        :return: the document, its arrays are views of the memory-mapped store
+        """
+        entry: dict = self.documents[key]
+        return ColumnarDocument(entry["filename"],
+                                [self._table(table_index) for table_index in range(entry["first_table"],
+                                                                                   entry["last_table"])])
+
+
+def _offsets(lengths: List[int]) -> np.ndarray:
+    offsets: np.ndarray = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def write_store(directory: str, documents: List[Tuple[str, ColumnarDocument, dict]],
+                manifest_information: Optional[dict] = None):
+    """
+    writes the documents to a new store. An existing store in the directory is replaced.
+    :param directory: directory of the store
+    :param documents: key, document and additional manifest information (e.g. the source file) of each document
+    :param manifest_information: additional information about the whole store
+    """
+    tables: List[ColumnarTable] = []
+    manifest_documents: Dict[str, dict] = {}
+    for key, document, information in documents:
+        entry: dict = dict(information)
+        entry.update({"filename": document.filename, "first_table": len(tables),
+                      "last_table": len(tables) + len(document.tables)})
+        manifest_documents[key] = entry
+        tables.extend(document.tables)
+
+    encoded_texts: List[bytes] = [table.text.encode("utf-8") for table in tables]
+    columns: Dict[str, np.ndarray] = {
+        "table_cell_offsets": _offsets([len(table) for table in tables]),
+        "table_vertex_offsets": _offsets([len(table.vertices) for table in tables]),
+        "table_polygon_offsets": _offsets([len(table.table_polygon) for table in tables]),
+        "table_row_offsets": _offsets([len(table.structure.row_occupancy) for table in tables]),
+        "table_column_offsets": _offsets([len(table.structure.column_occupancy) for table in tables]),
+        "table_text_offsets": _offsets([len(text) for text in encoded_texts]),
+        "table_polygons": np.concatenate([np.asarray(table.table_polygon, dtype=np.float64).reshape(-1, 2)
+                                          for table in tables] + [np.empty((0, 2))]),
+        "bounds": np.concatenate([table.bounds for table in tables] + [np.empty((0, 4))]),
+        "vertices": np.concatenate([table.vertices for table in tables] + [np.empty((0, 2))]),
+        "vertex_offsets": np.concatenate([table.vertex_offsets for table in tables] + [np.empty(0, dtype=np.int64)]),
+        "structure": np.concatenate([np.column_stack([table.structure.start_row_index,
+                                                      table.structure.end_row_index,
+                                                      table.structure.start_column_index,
+                                                      table.structure.end_column_index]).reshape(-1, 4)
+                                     for table in tables] + [np.empty((0, 4), dtype=np.int64)]),
+        "text_offsets": np.concatenate([table.text_offsets for table in tables] + [np.empty(0, dtype=np.int64)]),
+        "has_text": np.concatenate([table.has_text for table in tables] + [np.empty(0, dtype=bool)]),
+        "row_occupancy": np.concatenate([table.structure.row_occupancy for table in tables] +
+                                        [np.empty(0, dtype=np.int64)]),
+        "column_occupancy": np.concatenate([table.structure.column_occupancy for table in tables] +
+                                           [np.empty(0, dtype=np.int64)]),
+        "text": np.frombuffer(b"".join(encoded_texts), dtype=np.uint8),
+    }
+
+    # write into a temporary directory first, a failed compilation must not leave a partial store behind
+    temporary_directory: str = directory.rstrip(os.sep) + ".tmp"
+    if os.path.exists(temporary_directory):
+        shutil.rmtree(temporary_directory)
+    os.makedirs(temporary_directory)
+    for name in _COLUMNS:
+        np.save(os.path.join(temporary_directory, name + ".npy"), columns[name])
+    with open(os.path.join(temporary_directory, MANIFEST_FILENAME), "w") as manifest_file:
+        manifest: dict = dict(manifest_information) if manifest_information is not None else {}
+        manifest.update({"version": STORE_VERSION, "documents": manifest_documents})
+        json.dump(manifest, manifest_file)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(temporary_directory, directory)
+
+
+def read_manifest(directory: str) -> Optional[dict]:
+    """
+    :return: the manifest of the store or none if there is no store of the current version in the directory
+    """
+    manifest_path: str = os.path.join(directory, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as manifest_file:
+        manifest: dict = json.load(manifest_file)
+    return manifest if manifest.get("version") == STORE_VERSION else None
+
+
+def open_store(directory: str) -> ColumnarStore:
+    manifest: Optional[dict] = read_manifest(directory)
+    if manifest is None:
+        raise RuntimeError("Expected a columnar store of version " + str(STORE_VERSION) + " in " + directory + ".")
+    columns: Dict[str, np.ndarray] = {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")
+                                      for name in _COLUMNS}
+    return ColumnarStore(directory, manifest["documents"], columns)
@@ -9,44 +9,49 @@
 # 9-2 = 7 columns die übrig sind stimmen nicht mit den eigtl. 5 überein
 
 # completeness = (correct rows + correct collumns)/(total rows and columns)
-from copy import copy
-from typing import overload, Dict, List
+from typing import overload, List, Optional
 
-from docrecjson.elements import Table, Revision, Document, Cell
+import numpy as np
+from docrecjson.elements import Table, Revision, Document
 from evaluations import utility
 
+import python.evaluations.columnar as columnar
+import python.evaluations.table_structure as table_structure
+from python.evaluations.columnar import ColumnarDocument, ColumnarTable
+from python.evaluations.table_structure import TableStructure
 
-def _completeness_table(table_gt: Table, table_prediction: Table) -> float:
-    rows_gt, columns_gt = table_gt.get_table_structure()
-    rows_prediction, columns_prediction = table_prediction.get_table_structure()
 
-    complete_elements: int = 0
+def _complete_elements(occupancy_gt: np.ndarray, occupancy_prediction: np.ndarray) -> int:
+    """
+    :return: number of rows/columns which contain the same number of cells in the gt and the prediction
+    """
+    shared_elements: int = min(len(occupancy_gt), len(occupancy_prediction))
+    return int(np.count_nonzero(occupancy_gt[:shared_elements] == occupancy_prediction[:shared_elements]))
 
-    row: List[Cell]
-    for i, row in enumerate(rows_gt):
-        if len(row) == (len(rows_prediction[i]) if i < len(rows_prediction) else -1):
-            complete_elements += 1
 
-    column: List[Cell]
-    for i, column in enumerate(columns_gt):
-        if len(column) == (len(columns_prediction[i]) if i < len(columns_prediction) else -1):
-            complete_elements += 1
+def _completeness_structure(structure_gt: TableStructure, structure_prediction: TableStructure) -> float:
+    complete_elements: int = _complete_elements(structure_gt.row_occupancy, structure_prediction.row_occupancy)
+    complete_elements += _complete_elements(structure_gt.column_occupancy, structure_prediction.column_occupancy)
 
-    return complete_elements / (len(rows_gt) + len(columns_gt))
+    return complete_elements / (len(structure_gt.row_occupancy) + len(structure_gt.column_occupancy))
 
 
-def _completeness_document(doc_gt: Document, revision_prediction: Revision) -> float:
-    tables_gt: List[Table] = [x for x in doc_gt.objects() if isinstance(x, Table)]
-    tables_prediction: List[Table] = [x for x in copy(revision_prediction.objects) if isinstance(x, Table)]
+def _completeness_table(table_gt: Table, table_prediction: Table) -> float:
+    return _completeness_structure(table_structure.get_table_structure(table_gt),
+                                   table_structure.get_table_structure(table_prediction))
+
 
-    matched_tables: Dict[Table, Table] = utility.match_tables(tables_gt, tables_prediction)
+def _completeness_columnar(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument) -> float:
+    matched_tables: List[Optional[int]] = utility.match_columnar_tables(doc_gt.tables, doc_prediction.tables)
+    tables_prediction: List[int] = list(range(len(doc_prediction.tables)))
     total_completeness: float = 0
     tables_viewed: int = 0
 
-    for table_gt, table_prediction in matched_tables.items():
-        if table_prediction is not None:
-            total_completeness += _completeness_table(table_gt, table_prediction)
-            tables_prediction.remove(table_prediction)
+    for table_gt, prediction_index in zip(doc_gt.tables, matched_tables):
+        if prediction_index is not None:
+            total_completeness += _completeness_structure(table_gt.structure,
+                                                          doc_prediction.tables[prediction_index].structure)
+            tables_prediction.remove(prediction_index)
         tables_viewed += 1
 
     # todo does this count to the metric? this makes the metric worse... but td is not part of this work
@@ -55,18 +60,36 @@ def _completeness_document(doc_gt: Document, revision_prediction: Revision) -> f
     return total_completeness / tables_viewed
 
 
+def _completeness_document(doc_gt: Document, revision_prediction: Revision) -> float:
+    return _completeness_columnar(columnar.from_document(doc_gt), columnar.from_revision(revision_prediction))
+
+
 @overload
 def completeness(table_gt: Table, table_prediction: Table) -> float:
     ...
 
 
+@overload
+def completeness(table_gt: ColumnarTable, table_prediction: ColumnarTable) -> float:
+    ...
+
+
 @overload
 def completeness(doc_gt: Document, revision_prediction: Revision) -> float:
     ...
 
 
+@overload
+def completeness(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument) -> float:
+    ...
+
+
 def completeness(param_a, param_b) -> float:
     if isinstance(param_a, Document) and isinstance(param_b, Revision):
         return _completeness_document(param_a, param_b)
+    elif isinstance(param_a, ColumnarDocument) and isinstance(param_b, ColumnarDocument):
+        return _completeness_columnar(param_a, param_b)
     elif isinstance(param_a, Table) and isinstance(param_b, Table):
         return _completeness_table(param_a, param_b)
+    elif isinstance(param_a, ColumnarTable) and isinstance(param_b, ColumnarTable):
+        return _completeness_structure(param_a.structure, param_b.structure)
@@ -0,0 +1,159 @@
+"""
+Confidence intervals for the average metrics of a prediction directory.
+The average of a metric is the mean of its per-document values, the intervals describe how far the average of the
+evaluated documents can be from the average of all documents. RunningStatistics estimates the intervals while the
+documents are evaluated, the bootstrap functions compute them from the per-document values of all documents.
+"""
+import math
+from statistics import NormalDist
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class RunningStatistics:
+    """
+    streaming mean and variance of a metric (Welford's algorithm), one value is added per document
+    """
+    __slots__ = ("count", "mean", "_squared_deviations")
+
+    def __init__(self):
+        self.count: int = 0
+        self.mean: float = 0.0
+        self._squared_deviations: float = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta: float = value - self.mean
+        self.mean += delta / self.count
+        self._squared_deviations += delta * (value - self.mean)
+
+    def variance(self) -> float:
+        """
+        :return: the sample variance of the added values
+        """
+        return self._squared_deviations / (self.count - 1) if self.count > 1 else math.inf
+
+    def interval_width(self, z: float, population_size: Optional[int] = None) -> float:
+        """
+        :param z: quantile of the standard normal distribution for the confidence level, see z_value
+        :param population_size: number of documents the values are sampled from without replacement, the finite
+        population correction narrows the interval if a large share of the documents is evaluated
+        :return: the width of the confidence interval of the mean
+        """
+        if self.count < 2:
+            return math.inf
+        variance_of_mean: float = self.variance() / self.count
+        if population_size is not None and population_size > 1:
+            variance_of_mean *= max(population_size - self.count, 0) / (population_size - 1)
+        return 2 * z * math.sqrt(variance_of_mean)
+
+
+def z_value(confidence: float) -> float:
+    """
+    :param confidence: confidence level of the two-sided interval, e.g. 0.95
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("Expected a confidence level between 0 and 1, got: " + str(confidence))
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def add_document(statistics: Dict[str, Dict[str, RunningStatistics]], document_metrics: dict):
+    """
+    adds the metric values of one document
+    :param statistics: metric -> revision name -> statistics of the per-document values
+    :param document_metrics: metric -> revision name -> value of the document
+    """
+    for metric, revisions in document_metrics.items():
+        metric_statistics: Dict[str, RunningStatistics] = statistics.setdefault(metric, {})
+        for revision_name, value in revisions.items():
+            metric_statistics.setdefault(revision_name, RunningStatistics()).add(float(value))
+
+
+class DocumentScores:
+    """
+    per-document values of each metric and revision, the rows of the values are the documents and the columns are
+    the (metric, revision name) pairs. Documents without a value for a pair have nan in its column.
+    """
+    __slots__ = ("columns", "_values", "_count")
+
+    def __init__(self):
+        # (metric, revision name) -> column index
+        self.columns: Dict[Tuple[str, str], int] = {}
+        self._values: np.ndarray = np.full((1024, 0), np.nan)
+        self._count: int = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, document_metrics: dict):
+        """
+        :param document_metrics: metric -> revision name -> value of the document
+        """
+        if self._count == len(self._values):
+            self._values = np.concatenate([self._values, np.full(self._values.shape, np.nan)])
+        for metric, revisions in document_metrics.items():
+            for revision_name, value in revisions.items():
+                column: Optional[int] = self.columns.get((metric, revision_name))
+                if column is None:
+                    column = len(self.columns)
+                    self.columns[(metric, revision_name)] = column
+                    self._values = np.concatenate([self._values, np.full((len(self._values), 1), np.nan)], axis=1)
+                self._values[self._count, column] = value
+        self._count += 1
+
+    def values(self) -> np.ndarray:
+        return self._values[:self._count]
+
+
+def bootstrap_means(values: np.ndarray, resamples: int, seed: Optional[int] = None,
+                    chunk_size: int = 1 << 22) -> np.ndarray:
+    """
+    resamples the documents with replacement and computes the mean of each column for each resample.
+    All columns are resampled with the same documents, the resamples are drawn as counts per document, which turns
+    the means of all columns into one matrix product per chunk of resamples.
+    :param values: (documents, columns) per-document values, nan for documents without a value
+    :param resamples: number of bootstrap resamples
+    :param chunk_size: maximum number of counts held in memory at once
+    :return: (resamples, columns) means of the resamples, nan if a resample has no value for a column
+    """
+    document_count: int = len(values)
+    present: np.ndarray = ~np.isnan(values)
+    filled_values: np.ndarray = np.where(present, values, 0.0)
+    present_values: np.ndarray = present.astype(np.float64)
+
+    generator: np.random.Generator = np.random.default_rng(seed)
+    means: np.ndarray = np.empty((resamples, values.shape[1]))
+    resamples_per_chunk: int = max(1, chunk_size // max(document_count, 1))
+    for start in range(0, resamples, resamples_per_chunk):
+        chunk: int = min(resamples_per_chunk, resamples - start)
+        # the drawn documents of resample i are counted at i * document_count + document index
+        drawn: np.ndarray = generator.integers(0, document_count, size=(chunk, document_count))
+        drawn += np.arange(chunk)[:, None] * document_count
+        counts: np.ndarray = np.bincount(drawn.ravel(), minlength=chunk * document_count) \
+            .reshape(chunk, document_count).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[start:start + chunk] = (counts @ filled_values) / (counts @ present_values)
+    return means
+
+
+def percentile_intervals(resampled_means: np.ndarray, confidence: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param resampled_means: (resamples, columns) means of the bootstrap resamples
+    :param confidence: confidence level of the two-sided intervals, e.g. 0.95
+    :return: lower and upper bound of the interval of each column
+    """
+    lower, upper = np.nanquantile(resampled_means, [(1 - confidence) / 2, (1 + confidence) / 2], axis=0)
+    return lower, upper
+
+
+def paired_p_values(resampled_differences: np.ndarray) -> np.ndarray:
+    """
+    :param resampled_differences: (resamples, pairs) mean per-document differences of paired values in each resample
+    :return: two-sided bootstrap p-value of each pair for the hypothesis that the mean difference is zero
+    """
+    valid: np.ndarray = ~np.isnan(resampled_differences)
+    resample_counts: np.ndarray = np.maximum(np.count_nonzero(valid, axis=0), 1)
+    at_most_zero: np.ndarray = np.count_nonzero(valid & (resampled_differences <= 0), axis=0) / resample_counts
+    at_least_zero: np.ndarray = np.count_nonzero(valid & (resampled_differences >= 0), axis=0) / resample_counts
+    return np.minimum(1.0, 2 * np.minimum(at_most_zero, at_least_zero))
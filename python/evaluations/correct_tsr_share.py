@@ -4,12 +4,15 @@ It returns the share of the correct coordinates.
 Each cell has four coordinates.
 start_column, end_column, start_row, end_row
 """
-from copy import copy
-
+import numpy as np
 from docrecjson.elements import Revision, Document, Table, Cell
-from typing import List, Dict, overload
+from typing import List, Optional, overload
 
+import python.evaluations.columnar as columnar
 import python.evaluations.utility as utility
+import python.evaluations.table_structure as table_structure
+from python.evaluations.columnar import ColumnarDocument, ColumnarTable
+from python.evaluations.table_structure import TableStructure
 
 
 def _correct_tsr_share_cell(cell_gt: Cell, cell_prediction: Cell) -> float:
@@ -32,27 +35,68 @@ def _correct_tsr_share_cell_list(cell_a, cells: List[Cell]):
     return _correct_tsr_share_cell(cell_a, matching_cell)
 
 
+def _correct_tsr_share_structure(structure_gt: TableStructure, structure_prediction: TableStructure,
+                                 matching_indices: np.ndarray) -> np.ndarray:
+    """
+    :param structure_gt: structure of the gt table
+    :param structure_prediction: structure of the prediction table
+    :param matching_indices: index of the matching prediction cell for each gt cell, -1 if there is no matching cell
+    :return: the correct tsr share for each gt cell
+    """
+    matched: np.ndarray = matching_indices >= 0
+    indices: np.ndarray = matching_indices[matched]
+
+    correct_identified_table_coordinates: np.ndarray = \
+        (structure_prediction.start_column_index[indices] == structure_gt.start_column_index[matched]).astype(np.int64)
+    correct_identified_table_coordinates += \
+        structure_prediction.end_column_index[indices] == structure_gt.end_column_index[matched]
+    correct_identified_table_coordinates += \
+        structure_prediction.start_row_index[indices] == structure_gt.start_row_index[matched]
+    correct_identified_table_coordinates += \
+        structure_prediction.end_row_index[indices] == structure_gt.end_row_index[matched]
+
+    correct_tsr_share: np.ndarray = np.zeros(len(matching_indices))
+    correct_tsr_share[matched] = correct_identified_table_coordinates / 4
+    return correct_tsr_share
+
+
 def _correct_tsr_share_table(table_a: Table, table_b: Table):
-    total_correct_tsr_share: float = 0
-    search_cells: List[Cell] = copy(table_b.cells)
-    for cell in table_a.cells:
-        total_correct_tsr_share += _correct_tsr_share_cell_list(cell, search_cells)
+    matching_indices: List[Optional[int]] = [
+        utility.find_index_of_cell_with_highest_intersection_area(cell, table_b.cells) for cell in table_a.cells]
+    correct_tsr_share: np.ndarray = _correct_tsr_share_structure(
+        table_structure.get_table_structure(table_a), table_structure.get_table_structure(table_b),
+        np.array([-1 if index is None else index for index in matching_indices], dtype=np.int64))
 
-    return total_correct_tsr_share / len(table_a.cells)
+    return float(np.sum(correct_tsr_share)) / len(table_a.cells)
 
 
-def _correct_tsr_share_document(doc_gt: Document, revision_prediction: Revision) -> float:
-    tables_gt: List[Table] = [x for x in doc_gt.objects() if isinstance(x, Table)]
-    tables_prediction: List[Table] = [x for x in copy(revision_prediction.objects) if isinstance(x, Table)]
+def _correct_tsr_share_columnar_table(table_gt: ColumnarTable, table_prediction: ColumnarTable) -> float:
+    return correct_tsr_share_matched(table_gt, table_prediction,
+                                     utility.match_columnar_cells(table_gt, table_prediction))
+
+
+def correct_tsr_share_matched(table_gt: ColumnarTable, table_prediction: ColumnarTable,
+                              matching_indices: np.ndarray) -> float:
+    """
+    :param matching_indices: index of the matching prediction cell for each gt cell, see utility.match_columnar_cells
+    """
+    correct_tsr_share: np.ndarray = _correct_tsr_share_structure(table_gt.structure, table_prediction.structure,
+                                                                 matching_indices)
+
+    return float(np.sum(correct_tsr_share)) / len(table_gt)
+
 
-    matched_tables: Dict[Table, Table] = utility.match_tables(tables_gt, tables_prediction)
+def _correct_tsr_share_columnar(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument) -> float:
+    matched_tables: List[Optional[int]] = utility.match_columnar_tables(doc_gt.tables, doc_prediction.tables)
+    tables_prediction: List[int] = list(range(len(doc_prediction.tables)))
     total_correct_tsr_share: float = 0
     tables_viewed: int = 0
 
-    for table_gt, table_prediction in matched_tables.items():
-        if table_prediction is not None:
-            total_correct_tsr_share += _correct_tsr_share_table(table_gt, table_prediction)
-            tables_prediction.remove(table_prediction)
+    for table_gt, prediction_index in zip(doc_gt.tables, matched_tables):
+        if prediction_index is not None:
+            total_correct_tsr_share += _correct_tsr_share_columnar_table(table_gt,
+                                                                         doc_prediction.tables[prediction_index])
+            tables_prediction.remove(prediction_index)
         tables_viewed += 1
 
     tables_viewed += len(tables_prediction)
@@ -60,6 +104,10 @@ def _correct_tsr_share_document(doc_gt: Document, revision_prediction: Revision)
     return total_correct_tsr_share / tables_viewed
 
 
+def _correct_tsr_share_document(doc_gt: Document, revision_prediction: Revision) -> float:
+    return _correct_tsr_share_columnar(columnar.from_document(doc_gt), columnar.from_revision(revision_prediction))
+
+
 @overload
 def correct_tsr_share(cell_a: Cell, cell_b: Cell):
     ...
@@ -75,16 +123,30 @@ def correct_tsr_share(table_a: Table, table_b: Table):
     ...
 
 
+@overload
+def correct_tsr_share(table_gt: ColumnarTable, table_prediction: ColumnarTable):
+    ...
+
+
 @overload
 def correct_tsr_share(doc_gt: Document, revision_prediction: Revision):
     ...
 
 
+@overload
+def correct_tsr_share(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument):
+    ...
+
+
 def correct_tsr_share(param_a, param_b) -> float:
     if isinstance(param_a, Document) and isinstance(param_b, Revision):
         return _correct_tsr_share_document(param_a, param_b)
+    elif isinstance(param_a, ColumnarDocument) and isinstance(param_b, ColumnarDocument):
+        return _correct_tsr_share_columnar(param_a, param_b)
     elif isinstance(param_a, Table) and isinstance(param_b, Table):
         return _correct_tsr_share_table(param_a, param_b)
+    elif isinstance(param_a, ColumnarTable) and isinstance(param_b, ColumnarTable):
+        return _correct_tsr_share_columnar_table(param_a, param_b)
     elif isinstance(param_a, Cell) and isinstance(param_b, List):
         return _correct_tsr_share_cell_list(param_a, param_b)
     elif isinstance(param_a, Cell) and isinstance(param_b, Cell):
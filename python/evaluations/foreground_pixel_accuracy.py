@@ -1,19 +1,71 @@
 import shapely
-from docrecjson.elements import Cell, Document, Revision, Table
-from typing import List, Dict
+from docrecjson.elements import Cell, Document, Revision
+from typing import List, Optional, Tuple, Union, TYPE_CHECKING
 
 from shapely.geometry import Polygon, mapping, MultiPoint
 
+import python.evaluations.columnar as columnar
+import python.evaluations.confidence as confidence
+import python.evaluations.quadrilaterals as quadrilaterals
+import python.evaluations.thresholds as threshold_sweep
 import python.evaluations.utility as utility
+from python.evaluations.columnar import ColumnarDocument, ColumnarTable
 
 import numpy as np
 
-from PIL import Image
-
 from loguru import logger
 
+if TYPE_CHECKING:
+    # PIL is only imported when an image is opened
+    from PIL import Image
+
+# area of a cell: its shapely polygon or, if the gt cell and its matching cell are convex quadrilaterals, the (4, 2)
+# corners of the quadrilateral whose points are tested with numpy, see quadrilaterals
+CellArea = Union[Polygon, np.ndarray]
+
+# stride: every stride-th pixel of the cell in both directions, random: a fixed number of random pixels of the cell
+SAMPLING_METHODS: List[str] = ["stride", "random"]
+
+# a sample with fewer foreground pixels misses too much of the cell, e.g. a cell with little text, and is taken again
+# with twice the density
+MIN_SAMPLED_FOREGROUND: int = 10
 
-def _foreground_pixel_accuracy_for_single_cell(gt_cell: Cell, cells_to_search: List[Cell], image: Image) -> float:
+
+class PixelSampling:
+    """
+    approximates the foreground pixel accuracy of each cell from a sample of its pixels instead of all pixels. The
+    share of the sampled foreground pixels of the gt cell which are inside the prediction cell estimates the share of
+    all its foreground pixels. The variance of the estimate is the variance of a sampled share with the finite
+    population correction. It's computed with the smoothed share (p + 1) / (n + 2) of p of n sampled foreground pixels,
+    so a sample in which all or none of the pixels are inside the prediction cell still has a variance.
+    The stride method has a random offset per cell, but its pixels aren't a simple random sample. Its variance is only
+    an approximation, e.g. it's too small if the text of a cell repeats with about the period of the stride.
+    """
+    __slots__ = ("method", "stride", "samples", "seed")
+
+    def __init__(self, method: str = "stride", stride: int = 4, samples: int = 64, seed: int = 0):
+        """
+        :param method: see SAMPLING_METHODS
+        :param stride: distance of the sampled pixels in both directions for the stride method
+        :param samples: number of sampled pixels per cell for the random method, smaller cells are evaluated exactly
+        :param seed: seed of the random samples, the sample of a cell only depends on the seed and the cell index
+        """
+        if method not in SAMPLING_METHODS:
+            raise ValueError("Unknown sampling method: " + method + ". Expected one of: " + ", ".join(SAMPLING_METHODS))
+        if stride < 1 or samples < 1:
+            raise ValueError("Expected a stride and a number of samples of at least 1.")
+        self.method: str = method
+        self.stride: int = stride
+        self.samples: int = samples
+        self.seed: int = seed
+
+    def __str__(self) -> str:
+        return "stride " + str(self.stride) if self.method == "stride" else \
+            str(self.samples) + " random pixels per cell"
+
+
+def _foreground_pixel_accuracy_for_single_cell(gt_cell: Cell, cells_to_search: List[Cell],
+                                               image: "Image.Image") -> float:
     """
 
     :param: gt_cell: ground truth cell
@@ -27,112 +79,436 @@ def _foreground_pixel_accuracy_for_single_cell(gt_cell: Cell, cells_to_search: L
         return 0.0
     gt_cell_area: Polygon = Polygon(gt_cell.bounding_box.polygon)
     prediction_cell_area: Polygon = Polygon(prediction_cell.bounding_box.polygon)
+    return _foreground_pixel_accuracy_for_cell_areas(gt_cell_area, prediction_cell_area, foreground_mask(image))
+
+
+def foreground_mask(image: "Image.Image") -> np.ndarray:
+    """
+    :param image: image file for the annotation and ground truth
+    :return: (height, width) array, True for the pixels which are counted as foreground. Those are the pixels which
+    aren't (0, 0, 0), images without three bands have no such pixels.
+    """
+    if len(image.getbands()) != 3:
+        return np.ones((image.height, image.width), dtype=bool)
+    return np.asarray(image).any(axis=2)
+
+
+def _foreground_pixel_accuracy_for_cell_areas(gt_cell_area: CellArea, prediction_cell_area: CellArea,
+                                              mask: np.ndarray, max_points: Optional[int] = None) -> float:
+    """
+    :param: gt_cell_area: polygon of the ground truth cell
+    :param: prediction_cell_area: polygon of the matching prediction cell
+    :param: mask: foreground mask of the image, see foreground_mask
+    :param: max_points: maximum size of the point grid, larger cells are processed in bands of rows. None builds the
+    grid of the whole cell at once.
+    :return: the share of the black pixels which are identical in gt and prediction
+    """
+    gt_pixels, prediction_pixels = _count_grid_pixels(gt_cell_area, prediction_cell_area, mask,
+                                                      *_cell_grid(gt_cell_area), max_points)
+    return prediction_pixels / gt_pixels if gt_pixels > 0 else 0
+
 
+def _cell_grid(gt_cell_area: CellArea) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: x and y coordinates of the pixels of the bounding box of the cell
+    """
     # min = upper left coordinate
     # max = lower right coordinate
-    x_min, y_min, x_max, y_max = gt_cell_area.bounds
+    x_min, y_min, x_max, y_max = gt_cell_area.bounds if isinstance(gt_cell_area, Polygon) else \
+        (*gt_cell_area.min(axis=0), *gt_cell_area.max(axis=0))
     x = np.arange(np.floor(x_min), np.ceil(x_max), 1)  # returns all values between min and max spaced with 1
     y = np.arange(np.floor(y_min), np.ceil(y_max), 1)
+    return x, y
+
+
+def _count_grid_pixels(gt_cell_area: CellArea, prediction_cell_area: CellArea, mask: np.ndarray, x: np.ndarray,
+                       y: np.ndarray, max_points: Optional[int] = None) -> Tuple[int, int]:
+    """
+    counts the foreground pixels of the point grid in bands of rows with at most max_points points
+    :return: the number of foreground pixels of the grid inside the gt cell and how many of them are inside the
+    prediction cell
+    """
+    rows_per_band: int = max(len(y), 1) if max_points is None else max(1, max_points // max(len(x), 1))
 
+    gt_pixels: int = 0
+    prediction_pixels: int = 0
+    logger.enable("python.evaluations.foreground_pixel_accuracy")
+    for band_start in range(0, len(y), rows_per_band):
+        band_gt_pixels, band_prediction_pixels = _count_foreground_pixels(
+            gt_cell_area, prediction_cell_area, mask, x, y[band_start:band_start + rows_per_band])
+        gt_pixels += band_gt_pixels
+        prediction_pixels += band_prediction_pixels
+    return gt_pixels, prediction_pixels
+
+
+def _sampled_foreground_pixel_accuracy(gt_cell_area: CellArea, prediction_cell_area: CellArea, mask: np.ndarray,
+                                       sampling: PixelSampling, cell_index: int,
+                                       max_points: Optional[int] = None) -> Tuple[float, float]:
+    """
+    samples the pixels of the cell again with twice the density until the sample has at least
+    MIN_SAMPLED_FOREGROUND foreground pixels or all pixels of the cell are sampled
+    :param cell_index: index of the gt cell in its table, it selects the random sample
+    :return: the estimated foreground pixel accuracy of the cell and the variance of the estimate
+    """
+    logger.enable("python.evaluations.foreground_pixel_accuracy")
+    x, y = _cell_grid(gt_cell_area)
+    pixels: int = len(x) * len(y)
+    random: np.random.Generator = np.random.default_rng([sampling.seed, cell_index])
+    stride: int = sampling.stride
+    samples: int = sampling.samples
+    while True:
+        if sampling.method == "stride":
+            # the first sampled pixel is random, so the errors of the cells are independent like with random samples
+            offset_x, offset_y = random.integers(stride, size=2)
+            sampled_x: np.ndarray = x[min(offset_x, len(x) - 1)::stride]
+            sampled_y: np.ndarray = y[min(offset_y, len(y) - 1)::stride]
+            sampled: int = len(sampled_x) * len(sampled_y)
+            gt_pixels, prediction_pixels = _count_grid_pixels(gt_cell_area, prediction_cell_area, mask, sampled_x,
+                                                              sampled_y, max_points)
+        elif pixels <= samples:
+            sampled = pixels
+            gt_pixels, prediction_pixels = _count_grid_pixels(gt_cell_area, prediction_cell_area, mask, x, y,
+                                                              max_points)
+        else:
+            sampled = samples
+            flat_indices: np.ndarray = np.sort(random.choice(pixels, sampled, replace=False))
+            gt_pixels, prediction_pixels = _count_foreground_points(
+                gt_cell_area, prediction_cell_area, mask,
+                np.column_stack([x[flat_indices % len(x)], y[flat_indices // len(x)]]))
+        if gt_pixels >= MIN_SAMPLED_FOREGROUND or sampled >= pixels:
+            break
+        stride = max(1, stride // 2)
+        samples *= 2
+
+    estimate: float = prediction_pixels / gt_pixels if gt_pixels > 0 else 0
+    if sampled >= pixels:
+        return estimate, 0.0
+    smoothed: float = (prediction_pixels + 1) / (gt_pixels + 2)
+    return estimate, smoothed * (1 - smoothed) / (gt_pixels + 2) * (1 - sampled / pixels)
+
+
+def _count_foreground_pixels(gt_cell_area: CellArea, prediction_cell_area: CellArea, mask: np.ndarray, x: np.ndarray,
+                             y: np.ndarray) -> Tuple[int, int]:
+    """
+    :param: x: x coordinates of the point grid
+    :param: y: y coordinates of the point grid
+    :return: the number of foreground pixels of the grid inside the gt cell and how many of them are inside the
+    prediction cell
+    """
     # create matrix with bounds of the polygon element
     point_matrix = [np.tile(x, len(y)), np.repeat(y, len(x))]
+    return _count_foreground_points(gt_cell_area, prediction_cell_area, mask, np.transpose(point_matrix))
+
+
+def _count_foreground_points(gt_cell_area: CellArea, prediction_cell_area: CellArea, mask: np.ndarray,
+                             coordinates: np.ndarray) -> Tuple[int, int]:
+    """
+    :param: coordinates: (points, 2) x and y coordinates of the pixels
+    :return: the number of foreground pixels inside the gt cell and how many of them are inside the prediction cell
+    """
+    if isinstance(gt_cell_area, np.ndarray):
+        return _count_foreground_points_in_quadrilaterals(gt_cell_area, prediction_cell_area, mask, coordinates)
     # create a shapely multipoint object
-    points_matrix = MultiPoint(np.transpose(point_matrix))
-    points_inside_cell: MultiPoint = points_matrix.intersection(gt_cell_area)
+    points_matrix = MultiPoint(coordinates)
+    points_inside_cell = points_matrix.intersection(gt_cell_area)
+    # a single point isn't returned as multipoint
+    points: List[shapely.geometry.Point] = list(points_inside_cell.geoms) if hasattr(points_inside_cell, "geoms") \
+        else [points_inside_cell] if not points_inside_cell.is_empty else []
 
     gt_pixels: int = 0
     prediction_pixels: int = 0
-    pixels = image.load()
     coord: shapely.geometry.Point
-    logger.enable("python.evaluations.foreground_pixel_accuracy")
-    for coord in points_inside_cell.geoms:
+    for coord in points:
         try:
-            rgb = pixels[coord.x, coord.y]
+            # negative coordinates count from the end, like with the pixel access of the image
+            is_foreground: bool = mask[int(coord.y), int(coord.x)]
         except IndexError:
-            # This is because of the structure of the SciTSR dataset
-            # For some reason, some indexes are out of the original image file.
-            # You can view those files easily by viewing the dataset in fiftyone
-            logger.warning(
-                "Got coordinates (" + str(coord.x) + ", " + str(coord.y) + ") for Foreground Pixel Accuracy "
-                                                                           "which are out of the bounds of the image.")
-            logger.info("Further log messages for this cell are disabled.")
-            logger.disable("python.evaluations.foreground_pixel_accuracy")
+            _warn_out_of_bounds(coord.x, coord.y)
             continue
-        if rgb != (0, 0, 0):
+        if is_foreground:
             # print(str(coord) + ":" + str(pixels[coord.x, coord.y]))  # todo does pixels[x,y] work from the top or the bottom?
             point_area: shapely.geometry.point = shapely.geometry.Point(coord.x, coord.y)
             gt_pixels += 1
             if point_area.intersects(prediction_cell_area):
                 prediction_pixels += 1
 
-    return prediction_pixels / gt_pixels if gt_pixels > 0 else 0
+    return gt_pixels, prediction_pixels
 
 
-def foreground_pixel_accuracy(doc_gt: Document, revision_prediction: Revision, image_filepath: str) -> float:
-    tables_gt: List[Table] = [x for x in doc_gt.objects() if isinstance(x, Table)]
-    tables_prediction: List[Table] = [x for x in revision_prediction.objects if isinstance(x, Table)]
-    image: Image = Image.open(image_filepath)
+def _count_foreground_points_in_quadrilaterals(gt_corners: np.ndarray, prediction_corners: np.ndarray,
+                                              mask: np.ndarray, coordinates: np.ndarray) -> Tuple[int, int]:
+    """
+    _count_foreground_points for a gt cell and a prediction cell which are convex quadrilaterals
+    """
+    points: np.ndarray = coordinates[quadrilaterals.contains(gt_corners, coordinates)]
+    rows: np.ndarray = points[:, 1].astype(np.int64)
+    columns: np.ndarray = points[:, 0].astype(np.int64)
+    # negative coordinates count from the end, like with the pixel access of the image
+    height, width = mask.shape[:2]
+    in_image: np.ndarray = (rows >= -height) & (rows < height) & (columns >= -width) & (columns < width)
+    if not in_image.all():
+        _warn_out_of_bounds(*points[np.argmin(in_image)])
+    foreground: np.ndarray = points[in_image][mask[rows[in_image], columns[in_image]]]
+    return len(foreground), int(np.count_nonzero(quadrilaterals.contains(prediction_corners, foreground)))
+
+
+def _warn_out_of_bounds(x: float, y: float):
+    # This is because of the structure of the SciTSR dataset
+    # For some reason, some indexes are out of the original image file.
+    # You can view those files easily by viewing the dataset in fiftyone
+    logger.warning(
+        "Got coordinates (" + str(x) + ", " + str(y) + ") for Foreground Pixel Accuracy "
+                                                       "which are out of the bounds of the image.")
+    logger.info("Further log messages for this cell are disabled.")
+    logger.disable("python.evaluations.foreground_pixel_accuracy")
+
+
+def _matched_cell_areas(table_a: ColumnarTable, table_b: ColumnarTable, index: int,
+                        matching_index: int) -> Tuple[CellArea, CellArea]:
+    """
+    :return: the areas of a cell of table_a and its matching cell of table_b, the corners of both cells if both are
+    convex quadrilaterals and their shapely polygons otherwise
+    """
+    corners_a, convex_a = table_a.quadrilaterals()
+    corners_b, convex_b = table_b.quadrilaterals()
+    if convex_a[index] and convex_b[matching_index]:
+        return corners_a[index], corners_b[matching_index]
+    return table_a.shapes()[index], table_b.shapes()[matching_index]
 
-    matched_tables: Dict[Table, Table] = utility.match_tables(tables_gt, tables_prediction)
 
-    foreground_pixel_accuracy_total_value: float = 0
-    total_cells_viewed: int = 0
-    for table_gt, table_prediction in matched_tables.items():
-        cells_prediction: List[Cell] = table_prediction.cells if table_prediction is not None else []
-        cell_gt: Cell
-        for cell_gt in table_gt.cells:
-            foreground_pixel_accuracy_total_value += _foreground_pixel_accuracy_for_single_cell(cell_gt,
-                                                                                                cells_prediction, image)
-            total_cells_viewed += 1
+def _foreground_pixel_accuracy_matched_cells(table_a: ColumnarTable, table_b: Optional[ColumnarTable],
+                                              mask: np.ndarray, max_points: Optional[int] = None,
+                                              matching_indices: Optional[np.ndarray] = None,
+                                              cells: Optional[range] = None) -> np.ndarray:
+    """
+    :param matching_indices: index of the matching cell of table_b for each cell of table_a, see
+    utility.match_columnar_cells. It's computed if it's none.
+    :param cells: indices of the cells of table_a, all cells if none
+    :return: the foreground pixel accuracy of each cell of table_a with the cell of table_b with the highest
+    intersection
+    """
+    cells = cells if cells is not None else range(len(table_a))
+    if table_b is None:
+        return np.zeros(len(cells))
+    if matching_indices is None:
+        matching_indices = utility.match_columnar_cells(table_a, table_b)
+    return np.array([_foreground_pixel_accuracy_for_cell_areas(
+        *_matched_cell_areas(table_a, table_b, index, matching_indices[index]), mask, max_points)
+        if matching_indices[index] >= 0 else 0.0 for index in cells], dtype=np.float64)
+
+
+def _sampled_foreground_pixel_accuracy_matched_cells(table_a: ColumnarTable, table_b: Optional[ColumnarTable],
+                                                      mask: np.ndarray, sampling: PixelSampling,
+                                                      max_points: Optional[int] = None,
+                                                      matching_indices: Optional[np.ndarray] = None,
+                                                      cells: Optional[range] = None) -> np.ndarray:
+    """
+    like _foreground_pixel_accuracy_matched_cells with sampled pixels
+    :return: (cells, 2) estimated foreground pixel accuracy of each cell of table_a and the variance of the estimate
+    """
+    cells = cells if cells is not None else range(len(table_a))
+    estimates: np.ndarray = np.zeros((len(cells), 2))
+    if table_b is None:
+        return estimates
+    if matching_indices is None:
+        matching_indices = utility.match_columnar_cells(table_a, table_b)
+    for row, index in enumerate(cells):
+        if matching_indices[index] >= 0:
+            estimates[row] = _sampled_foreground_pixel_accuracy(
+                *_matched_cell_areas(table_a, table_b, index, matching_indices[index]), mask, sampling, index,
+                max_points)
+    return estimates
+
+
+def fpa_matched_cell_scores(table_a: ColumnarTable, table_b: ColumnarTable, mask: np.ndarray,
+                            matching_indices: np.ndarray, cells: range, max_points: Optional[int] = None) -> np.ndarray:
+    """
+    :param matching_indices: index of the matching cell of table_b for each cell of table_a
+    :return: the foreground pixel accuracy of the given cells of table_a with their matching cells of table_b
+    """
+    return _foreground_pixel_accuracy_matched_cells(table_a, table_b, mask, max_points, matching_indices, cells)
 
-    return foreground_pixel_accuracy_total_value / total_cells_viewed
+
+def fpa_sampled_matched_cell_scores(table_a: ColumnarTable, table_b: ColumnarTable, mask: np.ndarray,
+                                    sampling: PixelSampling, matching_indices: np.ndarray, cells: range,
+                                    max_points: Optional[int] = None) -> np.ndarray:
+    """
+    :return: (cells, 2) estimated foreground pixel accuracy of the given cells of table_a with their matching cells of
+    table_b and the variance of each estimate
+    """
+    return _sampled_foreground_pixel_accuracy_matched_cells(table_a, table_b, mask, sampling, max_points,
+                                                             matching_indices, cells)
 
 
-def fpa_precision(threshold: float, doc_gt: Document, revision_prediction: Revision, image_filepath: str) -> float:
+def fpa_cell_scores(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument,
+                    image_filepath: Union[str, "Image.Image", np.ndarray],
+                    include_prediction: bool = True, max_points: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
     """
-    precision = true positives / (true positives + false positives)
-    precision = (number of cells with fpa bigger than threshold) /
-    [("") + (cells from prediction which don't find cells from the gt with fpa > threshold)]
+    computes the foreground pixel accuracy of each cell to its matching cell, the basis for all fpa metrics
+    :param doc_gt: ground truth
+    :param doc_prediction: prediction
+    :param image_filepath: image file for the annotation and ground truth, the already opened image or its
+    foreground mask
+    :param include_prediction: whether the scores of the prediction cells are required
+    :param max_points: maximum size of the point grid of a cell, larger cells are processed in parts
+    :return: the scores of all gt cells and the scores of all prediction cells of the matched tables
+    """
+    mask: np.ndarray = _mask(image_filepath)
+    scores_gt: List[np.ndarray] = [np.empty(0)]
+    scores_prediction: List[np.ndarray] = [np.empty(0)]
+    for table_gt, table_prediction in _matched_tables(doc_gt, doc_prediction):
+        table_scores_gt, table_scores_prediction = fpa_table_scores(table_gt, table_prediction, mask,
+                                                                    include_prediction, max_points)
+        scores_gt.append(table_scores_gt)
+        scores_prediction.append(table_scores_prediction)
+
+    return np.concatenate(scores_gt), np.concatenate(scores_prediction)
+
+
+def fpa_sampled_cell_scores(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument,
+                            image_filepath: Union[str, "Image.Image", np.ndarray], sampling: PixelSampling,
+                            include_prediction: bool = True,
+                            max_points: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    like fpa_cell_scores with sampled pixels
+    :return: (cells, 2) estimated scores and their variances of all gt cells and of all prediction cells of the
+    matched tables
+    """
+    mask: np.ndarray = _mask(image_filepath)
+    estimates_gt: List[np.ndarray] = [np.empty((0, 2))]
+    estimates_prediction: List[np.ndarray] = [np.empty((0, 2))]
+    for table_gt, table_prediction in _matched_tables(doc_gt, doc_prediction):
+        table_estimates_gt, table_estimates_prediction = fpa_sampled_table_scores(
+            table_gt, table_prediction, mask, sampling, include_prediction, max_points)
+        estimates_gt.append(table_estimates_gt)
+        estimates_prediction.append(table_estimates_prediction)
 
-    :param threshold:
-    :param doc_gt:
-    :param revision_prediction:
-    :param image_filepath:
-    :return:
+    return np.concatenate(estimates_gt), np.concatenate(estimates_prediction)
+
+
+def _mask(image_filepath: Union[str, "Image.Image", np.ndarray]) -> np.ndarray:
+    """
+    :return: the foreground mask of the image file, the opened image or the mask itself
+    """
+    if isinstance(image_filepath, np.ndarray):
+        return image_filepath
+    elif isinstance(image_filepath, str):
+        from PIL import Image
+        return foreground_mask(Image.open(image_filepath))
+    return foreground_mask(image_filepath)
+
+
+def _matched_tables(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument) \
+        -> List[Tuple[ColumnarTable, Optional[ColumnarTable]]]:
+    """
+    :return: each gt table with its matching prediction table, none if it has no matching table
     """
+    matched_tables: List[Optional[int]] = utility.match_columnar_tables(doc_gt.tables, doc_prediction.tables)
+    return [(table_gt, doc_prediction.tables[prediction_index] if prediction_index is not None else None)
+            for table_gt, prediction_index in zip(doc_gt.tables, matched_tables)]
 
-    tables_gt: List[Table] = [x for x in doc_gt.objects() if isinstance(x, Table)]
-    tables_prediction: List[Table] = [x for x in revision_prediction.objects if isinstance(x, Table)]
-    image: Image = Image.open(image_filepath)
 
-    matched_tables: Dict[Table, Table] = utility.match_tables(tables_gt, tables_prediction)
+def fpa_table_scores(table_gt: ColumnarTable, table_prediction: Optional[ColumnarTable], mask: np.ndarray,
+                     include_prediction: bool = True,
+                     max_points: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param table_prediction: matching prediction table, none if the gt table has no matching table
+    :param mask: foreground mask of the image, see foreground_mask
+    :return: the scores of the gt cells and the scores of the prediction cells of a matched table pair
+    """
+    scores_gt: np.ndarray = _foreground_pixel_accuracy_matched_cells(table_gt, table_prediction, mask, max_points)
+    if not include_prediction or table_prediction is None:
+        return scores_gt, np.empty(0)
+    return scores_gt, _foreground_pixel_accuracy_matched_cells(table_prediction, table_gt, mask, max_points)
 
-    true_positives: int = 0
-    false_positives: int = 0
 
-    for table_gt, table_prediction in matched_tables.items():
-        cells_prediction: List[Cell] = table_prediction.cells if table_prediction is not None else []
-        cells_gt: List[Cell] = table_gt.cells
+def fpa_sampled_table_scores(table_gt: ColumnarTable, table_prediction: Optional[ColumnarTable], mask: np.ndarray,
+                             sampling: PixelSampling, include_prediction: bool = True,
+                             max_points: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    like fpa_table_scores with sampled pixels
+    :return: (cells, 2) estimated scores and their variances of the gt cells and of the prediction cells
+    """
+    estimates_gt: np.ndarray = _sampled_foreground_pixel_accuracy_matched_cells(table_gt, table_prediction, mask,
+                                                                                sampling, max_points)
+    if not include_prediction or table_prediction is None:
+        return estimates_gt, np.empty((0, 2))
+    return estimates_gt, _sampled_foreground_pixel_accuracy_matched_cells(table_prediction, table_gt, mask, sampling,
+                                                                          max_points)
+
 
-        cell_gt: Cell
-        for cell_gt in cells_gt:
-            fpa: float = _foreground_pixel_accuracy_for_single_cell(cell_gt, cells_prediction, image)
-            if fpa >= threshold:
-                true_positives += 1
+def fpa_error_bound(estimates_gt: np.ndarray, z: float) -> float:
+    """
+    :param estimates_gt: (cells, 2) estimated scores of the gt cells and their variances
+    :param z: quantile of the standard normal distribution for the confidence level, see confidence.z_value
+    :return: half width of the confidence interval of the foreground pixel accuracy, the average of the estimates
+    """
+    return z * float(np.sqrt(np.sum(estimates_gt[:, 1]))) / len(estimates_gt)
 
-        for cell_prediction in cells_prediction:
-            fpa: float = _foreground_pixel_accuracy_for_single_cell(cell_prediction, cells_gt, image)
-            if fpa < threshold:
-                false_positives += 1
 
+def fpa_f1_bounds(thresholds: np.ndarray, estimates_gt: np.ndarray, estimates_prediction: np.ndarray,
+                  z: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    the f1 score only grows with the scores of the cells. The bounds are the f1 scores of the lower and of the upper
+    bounds of the confidence intervals of the cell scores.
+    :return: lower and upper bound of the f1 score for each threshold
+    """
+    def shifted(estimates: np.ndarray, sign: int) -> np.ndarray:
+        return estimates[:, 0] + sign * z * np.sqrt(estimates[:, 1])
+
+    _, _, lower = threshold_sweep.precision_recall_f1(shifted(estimates_gt, -1), shifted(estimates_prediction, -1),
+                                                      thresholds)
+    _, _, upper = threshold_sweep.precision_recall_f1(shifted(estimates_gt, 1), shifted(estimates_prediction, 1),
+                                                      thresholds)
+    return lower, upper
+
+
+def _to_columnar(doc_gt, revision_prediction) -> Tuple[ColumnarDocument, ColumnarDocument]:
+    if isinstance(doc_gt, ColumnarDocument) and isinstance(revision_prediction, ColumnarDocument):
+        return doc_gt, revision_prediction
+    return columnar.from_document(doc_gt), columnar.from_revision(revision_prediction)
+
+
+def _fpa_precision_from_scores(threshold: float, scores_gt: np.ndarray, scores_prediction: np.ndarray) -> float:
+    true_positives: int = int(np.count_nonzero(scores_gt >= threshold))
+    false_positives: int = int(np.count_nonzero(scores_prediction < threshold))
     return true_positives / (true_positives + false_positives) if true_positives + false_positives > 0 else 0
 
 
-def fpa_recall(threshold: float, doc_gt: Document, revision_prediction: Revision, image_filepath: str):
+def _fpa_recall_from_scores(threshold: float, scores_gt: np.ndarray) -> float:
+    true_positives: int = int(np.count_nonzero(scores_gt >= threshold))
+    false_negatives: int = len(scores_gt) - true_positives
+    return true_positives / (true_positives + false_negatives) if true_positives + false_negatives > 0 else 0
+
+
+def foreground_pixel_accuracy(doc_gt: Document, revision_prediction: Revision,
+                              image_filepath: Union[str, "Image.Image", np.ndarray]) -> float:
+    scores_gt, _ = fpa_cell_scores(*_to_columnar(doc_gt, revision_prediction), image_filepath,
+                                   include_prediction=False)
+    return float(np.sum(scores_gt)) / len(scores_gt)
+
+
+def approximate_foreground_pixel_accuracy(doc_gt: Document, revision_prediction: Revision,
+                                          image_filepath: Union[str, "Image.Image", np.ndarray],
+                                          sampling: Optional[PixelSampling] = None,
+                                          confidence_level: float = 0.95) -> Tuple[float, float]:
     """
-    recall = true positives / (true positives + false negatives)
-    recall = (number of cells with fpa bigger than threshold) /
-    [("") + (cells from gt which don't find cell from prediction with fpa > threshold)]
+    estimates the foreground pixel accuracy from a sample of the pixels of each cell, see PixelSampling
+    :param sampling: defaults to every 4th pixel in both directions
+    :return: the estimated foreground pixel accuracy and its error bound, the half width of its confidence interval
+    """
+    estimates_gt, _ = fpa_sampled_cell_scores(*_to_columnar(doc_gt, revision_prediction), image_filepath,
+                                              sampling or PixelSampling(), include_prediction=False)
+    return float(np.sum(estimates_gt[:, 0])) / len(estimates_gt), \
+        fpa_error_bound(estimates_gt, confidence.z_value(confidence_level))
+
+
+def fpa_precision(threshold: float, doc_gt: Document, revision_prediction: Revision,
+                  image_filepath: Union[str, "Image.Image", np.ndarray]) -> float:
+    """
+    precision = true positives / (true positives + false positives)
+    precision = (number of cells with fpa bigger than threshold) /
+    [("") + (cells from prediction which don't find cells from the gt with fpa > threshold)]
 
     :param threshold:
     :param doc_gt:
@@ -140,32 +516,30 @@ def fpa_recall(threshold: float, doc_gt: Document, revision_prediction: Revision
     :param image_filepath:
     :return:
     """
+    scores_gt, scores_prediction = fpa_cell_scores(*_to_columnar(doc_gt, revision_prediction), image_filepath)
+    return _fpa_precision_from_scores(threshold, scores_gt, scores_prediction)
 
-    tables_gt: List[Table] = [x for x in doc_gt.objects() if isinstance(x, Table)]
-    tables_prediction: List[Table] = [x for x in revision_prediction.objects if isinstance(x, Table)]
-    image: Image = Image.open(image_filepath)
-
-    matched_tables: Dict[Table, Table] = utility.match_tables(tables_gt, tables_prediction)
-
-    true_positives: int = 0
-    false_negatives: int = 0
 
-    for table_gt, table_prediction in matched_tables.items():
-        cells_prediction: List[Cell] = table_prediction.cells if table_prediction is not None else []
-        cells_gt: List[Cell] = table_gt.cells
-
-        cell_gt: Cell
-        for cell_gt in cells_gt:
-            fpa: float = _foreground_pixel_accuracy_for_single_cell(cell_gt, cells_prediction, image)
-            if fpa >= threshold:
-                true_positives += 1
-            else:
-                false_negatives += 1
+def fpa_recall(threshold: float, doc_gt: Document, revision_prediction: Revision,
+               image_filepath: Union[str, "Image.Image", np.ndarray]):
+    """
+    recall = true positives / (true positives + false negatives)
+    recall = (number of cells with fpa bigger than threshold) /
+    [("") + (cells from gt which don't find cell from prediction with fpa > threshold)]
 
-    return true_positives / (true_positives + false_negatives) if true_positives + false_negatives > 0 else 0
+    :param threshold:
+    :param doc_gt:
+    :param revision_prediction:
+    :param image_filepath:
+    :return:
+    """
+    scores_gt, _ = fpa_cell_scores(*_to_columnar(doc_gt, revision_prediction), image_filepath,
+                                   include_prediction=False)
+    return _fpa_recall_from_scores(threshold, scores_gt)
 
 
-def fpa_f1_score(threshold: float, doc_gt: Document, revision_prediction: Revision, image_filepath: str) -> float:
+def fpa_f1_score(threshold: float, doc_gt: Document, revision_prediction: Revision,
+                 image_filepath: Union[str, "Image.Image", np.ndarray]) -> float:
     """
     f1_score = 2*[(precision*recall)/(precision + recall)]
 
@@ -175,8 +549,45 @@ def fpa_f1_score(threshold: float, doc_gt: Document, revision_prediction: Revisi
     :param image_filepath:
     :return:
     """
-
-    precision: float = fpa_precision(threshold, doc_gt, revision_prediction, image_filepath)
-    recall: float = fpa_recall(threshold, doc_gt, revision_prediction, image_filepath)
+    scores_gt, scores_prediction = fpa_cell_scores(*_to_columnar(doc_gt, revision_prediction), image_filepath)
+    precision: float = _fpa_precision_from_scores(threshold, scores_gt, scores_prediction)
+    recall: float = _fpa_recall_from_scores(threshold, scores_gt)
 
     return float(2 * ((precision * recall) / (precision + recall))) if precision + recall > 0 else 0
+
+
+def approximate_fpa_f1_score(threshold: float, doc_gt: Document, revision_prediction: Revision,
+                             image_filepath: Union[str, "Image.Image", np.ndarray],
+                             sampling: Optional[PixelSampling] = None,
+                             confidence_level: float = 0.95) -> Tuple[float, float, float]:
+    """
+    estimates fpa_f1_score from a sample of the pixels of each cell, see PixelSampling
+    :param sampling: defaults to every 4th pixel in both directions
+    :return: the estimated f1 score and the lower and upper bound of the f1 score, see fpa_f1_bounds
+    """
+    estimates_gt, estimates_prediction = fpa_sampled_cell_scores(*_to_columnar(doc_gt, revision_prediction),
+                                                                 image_filepath, sampling or PixelSampling())
+    thresholds: np.ndarray = np.array([threshold])
+    _, _, f1_score = threshold_sweep.precision_recall_f1(estimates_gt[:, 0], estimates_prediction[:, 0], thresholds)
+    lower, upper = fpa_f1_bounds(thresholds, estimates_gt, estimates_prediction,
+                                 confidence.z_value(confidence_level))
+    return float(f1_score[0]), float(lower[0]), float(upper[0])
+
+
+def fpa_threshold_scores(thresholds: np.ndarray, doc_gt: Document, revision_prediction: Revision,
+                         image_filepath: Union[str, "Image.Image", np.ndarray], max_points: Optional[int] = None) \
+        -> Tuple[float, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    computes the cell scores once and evaluates foreground_pixel_accuracy and fpa_f1_score for all thresholds with them
+
+    :param thresholds: thresholds to evaluate
+    :param doc_gt:
+    :param revision_prediction:
+    :param image_filepath:
+    :param max_points: maximum size of the point grid of a cell, see fpa_cell_scores
+    :return: the foreground pixel accuracy and the precision, recall and f1 score for each threshold
+    """
+    scores_gt, scores_prediction = fpa_cell_scores(*_to_columnar(doc_gt, revision_prediction), image_filepath,
+                                                   max_points=max_points)
+    precision, recall, f1_score = threshold_sweep.precision_recall_f1(scores_gt, scores_prediction, thresholds)
+    return float(np.sum(scores_gt)) / len(scores_gt), precision, recall, f1_score
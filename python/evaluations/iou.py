@@ -1,3 +1,4 @@
+import numpy as np
 from docrecjson.elements import Document, PolygonRegion, Cell, Table
 from evaluations import utility
 
@@ -9,7 +10,11 @@ from loguru import logger
 
 # todo check issues with shapely-speed ->
 #  https://stackoverflow.com/questions/14697442/faster-way-of-polygon-intersection-with-shapely
-from typing import List, Dict
+from typing import List, Optional, Tuple
+
+import python.evaluations.columnar as columnar
+import python.evaluations.thresholds as threshold_sweep
+from python.evaluations.columnar import ColumnarDocument, ColumnarTable
 
 
 def iou_f1_score_with_threshold(threshold: float, tables_gt: List[Table],
@@ -24,45 +29,66 @@ def iou_f1_score_with_threshold(threshold: float, tables_gt: List[Table],
 
     # todo add table matching
 
+    return float(iou_precision_recall_f1(np.array([threshold]), tables_gt, tables_prediction)[2][0])
+
+
+def iou_precision_recall_f1(thresholds: np.ndarray, tables_gt: List[Table],
+                            tables_prediction: List[Table]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    evaluates iou_f1_score_with_threshold for all thresholds with a single matching of the cells
+    :param thresholds: thresholds to evaluate
+    :return: precision, recall and f1 score for each threshold
+    """
     if len(tables_prediction) == 0:
         # no table was detected
-        return 0
+        return np.zeros(len(thresholds)), np.zeros(len(thresholds)), np.zeros(len(thresholds))
 
     table_gt: Table = tables_gt[0]
     table_prediction: Table = tables_prediction[0]
+    if not isinstance(table_gt, ColumnarTable):
+        table_gt = columnar.from_table(table_gt)
+        table_prediction = columnar.from_table(table_prediction)
 
-    true_positives: int = 0  # = cells from prediction with matching gt cell with iou > threshold
-    false_negatives: int = 0  # = each cell from gt which did not found a prediction cell with iou > threshold
-    false_positives: int = 0  # = cells from prediction with matching gt cell with iou < threshold
-    for cell in table_gt.cells:
-        iou: float = _iou_for_single_cell(cell, table_prediction.cells)
-        if iou < threshold:
-            false_negatives += 1
-
-    for cell in table_prediction.cells:
-        iou: float = _iou_for_single_cell(cell, table_gt.cells)
-        if iou >= threshold:
-            true_positives += 1
-        else:
-            false_positives += 1
-
-    if true_positives > 0 and len(table_gt.cells) > 0:
-        precision: float = true_positives / (true_positives + false_positives)
-        logger.debug("precision: " + str(precision))
-        recall: float = true_positives / (true_positives + false_positives)
-        logger.debug("recall: " + str(recall))
-        f1_score = 2 * ((precision * recall) / (precision + recall))
-    else:
-        precision: float = 0
-        recall: float = 0
-        f1_score: float = 0
+    return iou_precision_recall_f1_from_scores(thresholds, iou_cell_scores(table_gt, table_prediction), len(table_gt))
 
-    return f1_score
+
+def iou_cell_scores(table_gt: ColumnarTable, table_prediction: ColumnarTable) -> np.ndarray:
+    """
+    :return: the iou of each prediction cell with its matching gt cell, the basis for the iou f1 scores
+    """
+    return _iou_for_columnar_cells(table_prediction, table_gt)
+
+
+def iou_precision_recall_f1_from_scores(thresholds: np.ndarray, scores_prediction: np.ndarray,
+                                        gt_cells: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :param scores_prediction: scores of the prediction cells, see iou_cell_scores
+    :param gt_cells: number of cells of the gt table
+    :return: precision, recall and f1 score for each threshold
+    """
+    # = cells from prediction with matching gt cell with iou > threshold
+    true_positives: np.ndarray = threshold_sweep.count_at_least(scores_prediction, thresholds)
+    # = cells from prediction with matching gt cell with iou < threshold
+    false_positives: np.ndarray = len(scores_prediction) - true_positives
+
+    if gt_cells == 0:
+        return np.zeros(len(thresholds)), np.zeros(len(thresholds)), np.zeros(len(thresholds))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision: np.ndarray = np.where(true_positives > 0, true_positives / (true_positives + false_positives), 0.0)
+        # the recall is computed like the precision, the scores of the existing evaluations depend on it
+        recall: np.ndarray = precision
+        f1_score: np.ndarray = np.where(true_positives > 0, 2 * ((precision * recall) / (precision + recall)), 0.0)
+    logger.debug("precision: " + str(precision))
+    logger.debug("recall: " + str(recall))
+    return precision, recall, f1_score
 
 
 def intersection_over_union(doc_gt: Document = None, doc_prediction: Document = None,
                             cells_gt: List[Cell] = None, cells_prediction: List[Cell] = None,
-                            tables_gt: List[Table] = None, tables_prediction: List[Table] = None) -> float:
+                            tables_gt: List[Table] = None, tables_prediction: List[Table] = None,
+                            columnar_gt: ColumnarDocument = None, columnar_prediction: ColumnarDocument = None,
+                            columnar_table_gt: ColumnarTable = None, columnar_table_prediction: ColumnarTable = None) \
+        -> float:
     if doc_gt is not None and doc_prediction is not None:
         polygon_content_gt = [x for x in doc_gt.content if isinstance(x, PolygonRegion)]
         polygon_content_prediction = [x for x in doc_prediction.content if isinstance(x, PolygonRegion)]
@@ -72,27 +98,85 @@ def intersection_over_union(doc_gt: Document = None, doc_prediction: Document =
         polygon_content_prediction = [x.bounding_box for x in cells_prediction]
         return _intersection_over_union_polygon_region(polygon_content_gt, polygon_content_prediction)
     elif tables_gt is not None and tables_prediction is not None:
-        if len(tables_gt) == 1 and len(tables_prediction) == 0:
-            # special case where the table from the ground truth was not detected by the prediction
-            return 0
-
-        matched_tables: Dict[Table, Table] = utility.match_tables(tables_gt, tables_prediction)
-        iou_total_value: int = 0
-        total_tables_viewed: int = 0
-        for table_gt, table_prediction in matched_tables.items():
-            cells_gt: List[Cell] = table_gt.cells
-            cells_prediction: List[Cell] = table_prediction.cells
-            polygon_content_gt = [x.bounding_box for x in cells_gt]
-            polygon_content_prediction = [x.bounding_box for x in cells_prediction]
-
-            iou_total_value += _intersection_over_union_polygon_region(polygon_content_gt, polygon_content_prediction)
-            total_tables_viewed += 1
-
-        return iou_total_value / total_tables_viewed
+        return _intersection_over_union_columnar(columnar.from_tables(tables_gt),
+                                                 columnar.from_tables(tables_prediction))
+    elif columnar_gt is not None and columnar_prediction is not None:
+        return _intersection_over_union_columnar(columnar_gt, columnar_prediction)
+    elif columnar_table_gt is not None and columnar_table_prediction is not None:
+        return _intersection_over_union_columnar_table(columnar_table_gt, columnar_table_prediction)
     else:
         raise RuntimeError("Wrong Arguments for intersection over union calculation. Please review the required args.")
 
 
+def _intersection_over_union_columnar(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument) -> float:
+    """
+    average iou of the gt tables with their matching prediction tables. A gt table without matching table counts as
+    iou 0, the evaluation of the Table objects before the columnar tables failed on such a table.
+    """
+    if len(doc_gt.tables) == 1 and len(doc_prediction.tables) == 0:
+        # special case where the table from the ground truth was not detected by the prediction
+        return 0
+
+    matched_tables: List[Optional[int]] = utility.match_columnar_tables(doc_gt.tables, doc_prediction.tables)
+    iou_total_value: int = 0
+    total_tables_viewed: int = 0
+    for table_gt, prediction_index in zip(doc_gt.tables, matched_tables):
+        if prediction_index is not None:
+            iou_total_value += _intersection_over_union_columnar_table(table_gt,
+                                                                       doc_prediction.tables[prediction_index])
+        total_tables_viewed += 1
+
+    return iou_total_value / total_tables_viewed
+
+
+def _intersection_over_union_columnar_table(table_gt: ColumnarTable, table_prediction: ColumnarTable) -> float:
+    """
+    columnar version of _intersection_over_union_polygon_region
+    """
+    # all intersecting pairs of a gt cell and a prediction cell, ordered by gt cell
+    gt_indices, prediction_indices = utility.candidate_pairs(table_gt, table_prediction)
+    intersecting: np.ndarray = utility.intersecting_pairs(table_gt, table_prediction, gt_indices, prediction_indices)
+    gt_indices, prediction_indices = gt_indices[intersecting], prediction_indices[intersecting]
+    # the gt cell is clipped, so a gt cell inside the prediction cell keeps its vertices and its area
+    intersection: np.ndarray = utility.intersection_areas(table_prediction, table_gt, prediction_indices, gt_indices)
+    area_gt: np.ndarray = utility.cell_areas(table_gt, gt_indices)
+    area_prediction: np.ndarray = utility.cell_areas(table_prediction, prediction_indices)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # a gt cell inside the prediction cell counts as 1. The areas are compared with a tolerance, as the
+        # intersection and the area of the gt cell are computed in different ways.
+        pair_iou: np.ndarray = np.where(np.isclose(intersection, area_gt, rtol=1e-9, atol=0.0), 1,
+                                        intersection / (area_gt + area_prediction - intersection))
+    total_iou: float = sum(pair_iou.tolist())
+
+    # each intersecting pair, each gt cell without intersecting cell and each prediction cell without intersecting cell
+    gt_elements_viewed: np.ndarray = np.zeros(len(table_gt), dtype=bool)
+    gt_elements_viewed[gt_indices] = True
+    prediction_elements_viewed: np.ndarray = np.zeros(len(table_prediction), dtype=bool)
+    prediction_elements_viewed[prediction_indices] = True
+    elements_iou_considered: int = len(gt_indices) + int(np.count_nonzero(~gt_elements_viewed)) + \
+        int(np.count_nonzero(~prediction_elements_viewed))
+    return total_iou / elements_iou_considered
+
+
+def _iou_for_columnar_cells(table: ColumnarTable, table_to_search: ColumnarTable) -> np.ndarray:
+    """
+    columnar version of _iou_for_single_cell for all cells of table
+    :return: the iou of each cell of table with the first intersecting cell of table_to_search
+    """
+    rows, columns = utility.candidate_pairs(table, table_to_search)
+    intersecting: np.ndarray = utility.intersecting_pairs(table, table_to_search, rows, columns)
+    # the first intersecting cell of each cell
+    rows, first = np.unique(rows[intersecting], return_index=True)
+    columns = columns[intersecting][first]
+
+    intersection: np.ndarray = utility.intersection_areas(table, table_to_search, rows, columns)
+    iou_values: np.ndarray = np.zeros(len(table))
+    iou_values[rows] = intersection / (utility.cell_areas(table_to_search, columns) +
+                                       utility.cell_areas(table, rows) - intersection)
+    return iou_values
+
+
 def _iou_for_single_cell(cell: Cell, cells_to_search: List[Cell]) -> float:
     for search_cell in cells_to_search:
         search_cell_area: Polygon = Polygon(search_cell.bounding_box.polygon)
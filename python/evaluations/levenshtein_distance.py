@@ -1,14 +1,23 @@
 from copy import copy
 
-import nltk
+import numpy as np
 from docrecjson.elements import Cell, Table, Revision, Document
-from typing import overload, List, Dict
+from typing import overload, List, Optional, Tuple
 
+import python.evaluations.columnar as columnar
+import python.evaluations.thresholds as threshold_sweep
 import python.evaluations.utility as utility
+from python.evaluations.columnar import ColumnarDocument, ColumnarTable
+
+
+def _edit_distance(text_a: str, text_b: str) -> int:
+    # nltk takes a long time to import, it's only imported once the first distance is computed
+    import nltk
+    return nltk.edit_distance(text_a, text_b)
 
 
 def _levenshtein_distance_total(cell_a: Cell, cell_b: Cell) -> int:
-    distance = nltk.edit_distance(cell_a.text_content.text, cell_b.text_content.text)
+    distance = _edit_distance(cell_a.text_content.text, cell_b.text_content.text)
     return distance
 
 
@@ -20,6 +29,12 @@ def _levenshtein_distance_cell(cell_a: Cell, cell_b: Cell) -> float:
     return normalized_distance
 
 
+def _levenshtein_distance_text(text_a: Optional[str], text_b: Optional[str]) -> float:
+    if text_a is None or text_b is None:
+        return 0
+    return 1 - (_edit_distance(text_a, text_b) / max(len(text_a), len(text_b)))
+
+
 def _levenshtein_distance_cell_list(cell_a: Cell, cells: List[Cell]) -> float:
     matching_cell = utility.find_cell_with_highest_intersection_area(cell_a, cells)
     if matching_cell is None:
@@ -45,18 +60,38 @@ def _levenshtein_distance_table(table_a: Table, table_b: Table) -> float:
     return total_levenshtein_distance_relative / cells_viewed if cells_viewed > 0 else 0
 
 
-def _levenshtein_distance_document(doc_gt: Document, revision_prediction: Revision) -> float:
-    tables_gt: List[Table] = [x for x in doc_gt.objects() if isinstance(x, Table)]
-    tables_prediction: List[Table] = [x for x in copy(revision_prediction.objects) if isinstance(x, Table)]
+def _levenshtein_distance_columnar_table(table_a: ColumnarTable, table_b: ColumnarTable) -> float:
+    cells_viewed: int = 0
+    total_levenshtein_distance_relative: float = 0
+    search_cells: np.ndarray = np.ones(len(table_b), dtype=bool)
+    for index in range(len(table_a)):
+        matching_index: Optional[int] = utility.find_index_of_columnar_cell_with_highest_intersection_area(
+            table_a, index, table_b, search_cells)
+        if matching_index is not None:
+            total_levenshtein_distance_relative += _levenshtein_distance_text(table_a.cell_text(index),
+                                                                              table_b.cell_text(matching_index))
+            search_cells[matching_index] = False
+        cells_viewed += 1
+
+    # add relative value for each cell which was not matched
+    cells_not_matched: int = int(np.count_nonzero(search_cells))
+    total_levenshtein_distance_relative += cells_not_matched
+    cells_viewed += cells_not_matched
+
+    return total_levenshtein_distance_relative / cells_viewed if cells_viewed > 0 else 0
+
 
-    matched_tables: Dict[Table, Table] = utility.match_tables(tables_gt, tables_prediction)
+def _levenshtein_distance_columnar(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument) -> float:
+    matched_tables: List[Optional[int]] = utility.match_columnar_tables(doc_gt.tables, doc_prediction.tables)
+    tables_prediction: List[int] = list(range(len(doc_prediction.tables)))
     tables_viewed: int = 0
     total_levenshtein_distance: float = 0
 
-    for table_gt, table_prediction in matched_tables.items():
-        if table_prediction is not None:
-            total_levenshtein_distance += levenshtein_distance(table_gt, table_prediction)
-            tables_prediction.remove(table_prediction)
+    for table_gt, prediction_index in zip(doc_gt.tables, matched_tables):
+        if prediction_index is not None:
+            total_levenshtein_distance += _levenshtein_distance_columnar_table(table_gt,
+                                                                               doc_prediction.tables[prediction_index])
+            tables_prediction.remove(prediction_index)
         tables_viewed += 1
 
     tables_viewed += len(tables_prediction)
@@ -65,6 +100,86 @@ def _levenshtein_distance_document(doc_gt: Document, revision_prediction: Revisi
     return total_levenshtein_distance / tables_viewed if tables_viewed != 0 else 0
 
 
+def _levenshtein_distance_document(doc_gt: Document, revision_prediction: Revision) -> float:
+    return _levenshtein_distance_columnar(columnar.from_document(doc_gt), columnar.from_revision(revision_prediction))
+
+
+def _levenshtein_distance_matched_cells(table_a: ColumnarTable, table_b: ColumnarTable,
+                                        matching_indices: Optional[np.ndarray] = None,
+                                        cells: Optional[range] = None) -> np.ndarray:
+    """
+    :param matching_indices: index of the matching cell of table_b for each cell of table_a, see
+    utility.match_columnar_cells. It's computed if it's none.
+    :param cells: indices of the cells of table_a, all cells if none
+    :return: the levenshtein distance of each cell of table_a to the cell of table_b with the highest intersection
+    """
+    if matching_indices is None:
+        matching_indices = utility.match_columnar_cells(table_a, table_b)
+    return np.array([_levenshtein_distance_text(table_a.cell_text(index),
+                                                table_b.cell_text(matching_indices[index]))
+                     if matching_indices[index] >= 0 else 0
+                     for index in (cells if cells is not None else range(len(table_a)))], dtype=np.float64)
+
+
+def ld_matched_cell_scores(table_a: ColumnarTable, table_b: ColumnarTable, matching_indices: np.ndarray,
+                           cells: range) -> np.ndarray:
+    """
+    :param matching_indices: index of the matching cell of table_b for each cell of table_a
+    :return: the levenshtein distance of the given cells of table_a to their matching cells of table_b
+    """
+    return _levenshtein_distance_matched_cells(table_a, table_b, matching_indices, cells)
+
+
+def ld_cell_scores(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    computes the levenshtein distance of each cell to its matching cell, the basis for ld precision and recall
+    :param doc_gt: ground truth
+    :param doc_prediction: prediction
+    :return: the scores of all gt cells and the scores of all prediction cells of the matched tables
+    """
+    matched_tables: List[Optional[int]] = utility.match_columnar_tables(doc_gt.tables, doc_prediction.tables)
+
+    scores_gt: List[np.ndarray] = [np.empty(0)]
+    scores_prediction: List[np.ndarray] = [np.empty(0)]
+    for table_gt, prediction_index in zip(doc_gt.tables, matched_tables):
+        table_scores_gt, table_scores_prediction = ld_table_scores(
+            table_gt, doc_prediction.tables[prediction_index] if prediction_index is not None else None)
+        scores_gt.append(table_scores_gt)
+        scores_prediction.append(table_scores_prediction)
+
+    return np.concatenate(scores_gt), np.concatenate(scores_prediction)
+
+
+def ld_table_scores(table_gt: ColumnarTable,
+                    table_prediction: Optional[ColumnarTable]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param table_prediction: matching prediction table, none if the gt table has no matching table
+    :return: the scores of the gt cells and the scores of the prediction cells of a matched table pair
+    """
+    if table_prediction is None:
+        return np.zeros(len(table_gt)), np.empty(0)
+    return _levenshtein_distance_matched_cells(table_gt, table_prediction), \
+        _levenshtein_distance_matched_cells(table_prediction, table_gt)
+
+
+def _to_columnar(doc_gt, revision_prediction) -> Tuple[ColumnarDocument, ColumnarDocument]:
+    if isinstance(doc_gt, ColumnarDocument) and isinstance(revision_prediction, ColumnarDocument):
+        return doc_gt, revision_prediction
+    return columnar.from_document(doc_gt), columnar.from_revision(revision_prediction)
+
+
+def _ld_precision_from_scores(threshold: float, scores_gt: np.ndarray, scores_prediction: np.ndarray) -> float:
+    true_positives: int = int(np.count_nonzero(scores_gt >= threshold))
+    false_positives: int = int(np.count_nonzero(scores_prediction < threshold))
+    return true_positives / (true_positives + false_positives) if true_positives + false_positives > 0 else 0
+
+
+def _ld_recall_from_scores(threshold: float, scores_gt: np.ndarray) -> float:
+    true_positives: int = int(np.count_nonzero(scores_gt >= threshold))
+    false_negatives: int = len(scores_gt) - true_positives
+    return true_positives / (true_positives + false_negatives) if true_positives + false_negatives > 0 else 0
+
+
 def ld_precision(threshold: float, doc_gt: Document, revision_prediction: Revision) -> float:
     """
     precision = true positives / (true positives + false positives)
@@ -76,28 +191,8 @@ def ld_precision(threshold: float, doc_gt: Document, revision_prediction: Revisi
     :param revision_prediction:
     :return:
     """
-    tables_gt: List[Table] = [x for x in doc_gt.objects() if isinstance(x, Table)]
-    tables_prediction: List[Table] = [x for x in revision_prediction.objects if isinstance(x, Table)]
-    matched_tables: Dict[Table, Table] = utility.match_tables(tables_gt, tables_prediction)
-
-    true_positives: int = 0
-    false_positives: int = 0
-
-    for table_gt, table_prediction in matched_tables.items():
-        cells_prediction: List[Cell] = table_prediction.cells if table_prediction is not None else []
-        cells_gt: List[Cell] = table_gt.cells
-
-        cell_gt: Cell
-        for cell_gt in cells_gt:
-            ld: float = _levenshtein_distance_cell_list(cell_gt, cells_prediction)
-            if ld >= threshold:
-                true_positives += 1
-
-        for cell_prediction in cells_prediction:
-            ld: float = _levenshtein_distance_cell_list(cell_prediction, cells_gt)
-            if ld < threshold:
-                false_positives += 1
-    return true_positives / (true_positives + false_positives) if true_positives + false_positives > 0 else 0
+    scores_gt, scores_prediction = ld_cell_scores(*_to_columnar(doc_gt, revision_prediction))
+    return _ld_precision_from_scores(threshold, scores_gt, scores_prediction)
 
 
 def ld_recall(threshold: float, doc_gt: Document, revision_prediction: Revision):
@@ -111,35 +206,27 @@ def ld_recall(threshold: float, doc_gt: Document, revision_prediction: Revision)
     :param revision_prediction:
     :return:
     """
-    tables_gt: List[Table] = [x for x in doc_gt.objects() if isinstance(x, Table)]
-    tables_prediction: List[Table] = [x for x in revision_prediction.objects if isinstance(x, Table)]
-
-    matched_tables: Dict[Table, Table] = utility.match_tables(tables_gt, tables_prediction)
-
-    true_positives: int = 0
-    false_negatives: int = 0
-
-    for table_gt, table_prediction in matched_tables.items():
-        cells_prediction: List[Cell] = table_prediction.cells if table_prediction is not None else []
-        cells_gt: List[Cell] = table_gt.cells
-
-        cell_gt: Cell
-        for cell_gt in cells_gt:
-            fpa: float = _levenshtein_distance_cell_list(cell_gt, cells_prediction)
-            if fpa >= threshold:
-                true_positives += 1
-            else:
-                false_negatives += 1
-
-    return true_positives / (true_positives + false_negatives) if true_positives + false_negatives > 0 else 0
+    scores_gt, _ = ld_cell_scores(*_to_columnar(doc_gt, revision_prediction))
+    return _ld_recall_from_scores(threshold, scores_gt)
 
 
 def ld_f1(threshold: float, doc_gt: Document, revision_prediction: Revision):
-    precision: float = ld_precision(threshold, doc_gt, revision_prediction)
-    recall: float = ld_recall(threshold, doc_gt, revision_prediction)
+    scores_gt, scores_prediction = ld_cell_scores(*_to_columnar(doc_gt, revision_prediction))
+    precision: float = _ld_precision_from_scores(threshold, scores_gt, scores_prediction)
+    recall: float = _ld_recall_from_scores(threshold, scores_gt)
     return float(2 * ((precision * recall) / (precision + recall))) if precision + recall > 0 else 0
 
 
+def ld_precision_recall_f1(thresholds: np.ndarray, doc_gt: Document,
+                           revision_prediction: Revision) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    computes the cell scores once and evaluates ld_precision, ld_recall and ld_f1 for all thresholds with them
+    :return: precision, recall and f1 score for each threshold
+    """
+    scores_gt, scores_prediction = ld_cell_scores(*_to_columnar(doc_gt, revision_prediction))
+    return threshold_sweep.precision_recall_f1(scores_gt, scores_prediction, thresholds)
+
+
 @overload
 def levenshtein_distance(cell_a: Cell, cell_b: Cell):
     ...
@@ -155,16 +242,30 @@ def levenshtein_distance(table_a: Table, table_b: Table):
     ...
 
 
+@overload
+def levenshtein_distance(table_a: ColumnarTable, table_b: ColumnarTable):
+    ...
+
+
 @overload
 def levenshtein_distance(doc_gt: Document, revision_prediction: Revision):
     ...
 
 
+@overload
+def levenshtein_distance(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument):
+    ...
+
+
 def levenshtein_distance(param_a, param_b) -> float:
     if isinstance(param_a, Document):
         return _levenshtein_distance_document(param_a, param_b)
+    elif isinstance(param_a, ColumnarDocument):
+        return _levenshtein_distance_columnar(param_a, param_b)
     elif isinstance(param_b, Table):
         return _levenshtein_distance_table(param_a, param_b)
+    elif isinstance(param_b, ColumnarTable):
+        return _levenshtein_distance_columnar_table(param_a, param_b)
     elif isinstance(param_a, Cell) and isinstance(param_b, Cell):
         return _levenshtein_distance_cell(param_a, param_b)
     elif isinstance(param_a, Cell) and isinstance(param_b, List):
@@ -0,0 +1,253 @@
+"""
+Live throughput and latency metrics of a running evaluation.
+The evaluation records each evaluated document, the time of each of its metrics, the errors of the skipped documents,
+the hits of the caches and the number of prefetched documents. A background thread periodically writes a snapshot of
+these metrics to a file, so long runs can be watched and alerted on without parsing the log:
+
+.prom   Prometheus text format, e.g. for the textfile collector of the node exporter
+other   JSON
+
+The snapshot is written to a temporary file which replaces the previous snapshot, readers never see a partial file.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional
+
+# upper bounds in seconds of the buckets of the latency histograms, the last bucket is unbounded
+LATENCY_BUCKETS: List[float] = [0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300]
+
+# documents per second are computed over the documents of this many recent seconds
+RATE_WINDOW: float = 60.0
+
+PROMETHEUS_PREFIX: str = "docrec_evaluation_"
+
+
+class Histogram:
+    """
+    latency histogram with the buckets of LATENCY_BUCKETS
+    """
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        # one count per bucket of LATENCY_BUCKETS and the unbounded bucket
+        self.counts: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum: float = 0.0
+
+    def add(self, seconds: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+    def merge(self, other: "Histogram"):
+        self.counts = [x + y for x, y in zip(self.counts, other.counts)]
+        self.sum += other.sum
+
+    def to_dict(self) -> dict:
+        """
+        :return: the cumulative count of each bucket by its upper bound, like the buckets of Prometheus
+        """
+        cumulative: List[int] = [sum(self.counts[:index + 1]) for index in range(len(self.counts))]
+        return {"buckets": {**{"%g" % bound: count for bound, count in zip(LATENCY_BUCKETS, cumulative)},
+                            "+Inf": cumulative[-1]},
+                "count": cumulative[-1], "sum": self.sum}
+
+
+class LiveMetrics:
+    """
+    records of a running evaluation, they can be recorded and exported by different threads
+    """
+    __slots__ = ("start", "documents", "document_seconds", "metric_seconds", "errors", "cache_hits", "cache_lookups",
+                 "queue_depth", "last_document", "_recent", "_lock", "_thread", "_stopped")
+    # the records which are passed from the worker process of the time limits, see merge
+    _RECORDS = ("documents", "document_seconds", "metric_seconds", "errors", "cache_hits", "cache_lookups")
+
+    def __init__(self):
+        self.start: float = time.time()
+        self.documents: int = 0
+        self.document_seconds: Histogram = Histogram()
+        self.metric_seconds: Dict[str, Histogram] = {}
+        # number of skipped documents by the name of their error, e.g. MemoryBudgetExceeded
+        self.errors: Dict[str, int] = {}
+        # hits and lookups by cache, e.g. the results of the unchanged tables of a document
+        self.cache_hits: Dict[str, int] = {}
+        self.cache_lookups: Dict[str, int] = {}
+        # number of documents which are loaded ahead of the evaluation, see --prefetch
+        self.queue_depth: int = 0
+        self.last_document: Optional[float] = None
+        # end of each document within the rate window
+        self._recent: Deque[float] = deque()
+        self._lock: threading.Lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped: threading.Event = threading.Event()
+
+    def __getstate__(self) -> dict:
+        return {name: getattr(self, name) for name in self._RECORDS}
+
+    def __setstate__(self, state: dict):
+        self.__init__()
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def _add_documents(self, count: int):
+        now: float = time.time()
+        self.documents += count
+        self.last_document = now
+        self._recent.extend([now] * count)
+
+    @contextmanager
+    def document(self) -> Iterator[None]:
+        """
+        records the time of a document which is evaluated within the block, or the error which skipped it
+        """
+        start: float = time.perf_counter()
+        try:
+            yield
+        except Exception as error:
+            self.add_error(type(error).__name__)
+            raise
+        with self._lock:
+            self.document_seconds.add(time.perf_counter() - start)
+            self._add_documents(1)
+
+    @contextmanager
+    def metric(self, name: str) -> Iterator[None]:
+        """
+        records the time of a metric which is evaluated within the block, it's recorded once per revision
+        """
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.metric_seconds.setdefault(name, Histogram()).add(time.perf_counter() - start)
+
+    def add_error(self, kind: str):
+        with self._lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def add_cache(self, name: str, hits: int, lookups: int):
+        with self._lock:
+            self.cache_hits[name] = self.cache_hits.get(name, 0) + hits
+            self.cache_lookups[name] = self.cache_lookups.get(name, 0) + lookups
+
+    def merge(self, other: "LiveMetrics"):
+        """
+        adds the records of other, e.g. of a document which was evaluated in another process
+        """
+        with self._lock:
+            self._add_documents(other.documents)
+            self.document_seconds.merge(other.document_seconds)
+            for name, histogram in other.metric_seconds.items():
+                self.metric_seconds.setdefault(name, Histogram()).merge(histogram)
+            for kind, count in other.errors.items():
+                self.errors[kind] = self.errors.get(kind, 0) + count
+            for name in other.cache_lookups:
+                self.cache_hits[name] = self.cache_hits.get(name, 0) + other.cache_hits[name]
+                self.cache_lookups[name] = self.cache_lookups.get(name, 0) + other.cache_lookups[name]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now: float = time.time()
+            while len(self._recent) > 0 and self._recent[0] < now - RATE_WINDOW:
+                self._recent.popleft()
+            uptime: float = now - self.start
+            return {"timestamp": now, "uptime_seconds": uptime, "documents": self.documents,
+                    "documents_per_second": len(self._recent) / min(RATE_WINDOW, max(uptime, 1e-9)),
+                    "average_documents_per_second": self.documents / max(uptime, 1e-9),
+                    "last_document_timestamp": self.last_document, "queue_depth": self.queue_depth,
+                    "errors": dict(self.errors),
+                    "caches": {name: {"hits": self.cache_hits[name], "lookups": lookups,
+                                      "hit_rate": self.cache_hits[name] / lookups if lookups > 0 else None}
+                               for name, lookups in self.cache_lookups.items()},
+                    "document_seconds": self.document_seconds.to_dict(),
+                    "metric_seconds": {name: histogram.to_dict() for name, histogram in self.metric_seconds.items()}}
+
+    def write(self, filepath: str):
+        """
+        writes a snapshot, in Prometheus text format for .prom files and as JSON otherwise
+        """
+        snapshot: dict = self.snapshot()
+        temporary_filepath: str = filepath + ".tmp"
+        with open(temporary_filepath, "w") as snapshot_file:
+            if filepath.endswith(".prom"):
+                snapshot_file.write(prometheus_text(snapshot))
+            else:
+                json.dump(snapshot, snapshot_file)
+        os.replace(temporary_filepath, filepath)
+
+    def start_export(self, filepath: str, interval: float):
+        """
+        writes a snapshot every interval seconds in a background thread until stop_export
+        """
+        def export():
+            while not self._stopped.wait(interval):
+                self.write(filepath)
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=export, daemon=True)
+        self._thread.start()
+
+    def stop_export(self, filepath: str):
+        """
+        stops the background thread and writes the final snapshot
+        """
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        self.write(filepath)
+
+
+def _prometheus_histogram(lines: List[str], name: str, histogram: dict, labels: str = ""):
+    for bound, count in histogram["buckets"].items():
+        lines.append(PROMETHEUS_PREFIX + name + "_bucket{" + labels + 'le="' + bound + '"} ' + str(count))
+    lines.append(PROMETHEUS_PREFIX + name + "_sum" + ("{" + labels[:-1] + "}" if labels else "") + " " +
+                 repr(histogram["sum"]))
+    lines.append(PROMETHEUS_PREFIX + name + "_count" + ("{" + labels[:-1] + "}" if labels else "") + " " +
+                 str(histogram["count"]))
+
+
+def prometheus_text(snapshot: dict) -> str:
+    """
+    :param snapshot: see LiveMetrics.snapshot
+    :return: the snapshot in the Prometheus text format
+    """
+    lines: List[str] = []
+
+    def metric(name: str, kind: str, description: str):
+        lines.append("# HELP " + PROMETHEUS_PREFIX + name + " " + description)
+        lines.append("# TYPE " + PROMETHEUS_PREFIX + name + " " + kind)
+
+    def value(name: str, number, labels: str = ""):
+        lines.append(PROMETHEUS_PREFIX + name + ("{" + labels + "}" if labels else "") + " " + repr(float(number)))
+
+    metric("documents_total", "counter", "Evaluated documents.")
+    value("documents_total", snapshot["documents"])
+    metric("documents_per_second", "gauge", "Evaluated documents per second in the last minute.")
+    value("documents_per_second", snapshot["documents_per_second"])
+    metric("uptime_seconds", "gauge", "Seconds since the start of the evaluation.")
+    value("uptime_seconds", snapshot["uptime_seconds"])
+    if snapshot["last_document_timestamp"] is not None:
+        metric("last_document_timestamp_seconds", "gauge", "Unix time of the last evaluated document.")
+        value("last_document_timestamp_seconds", snapshot["last_document_timestamp"])
+    metric("queue_depth", "gauge", "Documents which are loaded ahead of the evaluation.")
+    value("queue_depth", snapshot["queue_depth"])
+    metric("errors_total", "counter", "Skipped documents by error.")
+    for kind, count in sorted(snapshot["errors"].items()):
+        value("errors_total", count, 'kind="' + kind + '"')
+    metric("cache_hits_total", "counter", "Cache hits by cache.")
+    for name, cache in sorted(snapshot["caches"].items()):
+        value("cache_hits_total", cache["hits"], 'cache="' + name + '"')
+    metric("cache_lookups_total", "counter", "Cache lookups by cache.")
+    for name, cache in sorted(snapshot["caches"].items()):
+        value("cache_lookups_total", cache["lookups"], 'cache="' + name + '"')
+    metric("document_seconds", "histogram", "Time of the evaluation of a document.")
+    _prometheus_histogram(lines, "document_seconds", snapshot["document_seconds"])
+    metric("metric_seconds", "histogram", "Time of a metric of a revision.")
+    for name, histogram in sorted(snapshot["metric_seconds"].items()):
+        _prometheus_histogram(lines, "metric_seconds", histogram, 'metric="' + name + '",')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,75 @@
+"""
+Store for the foreground masks of the page images.
+A store is a directory with one .npy file per image, which holds the mask packed to one bit per pixel, and a
+manifest.json, which maps the image filenames to the size of their mask and the image file it was computed from.
+Loading a mask reads an eighth of the bytes of the decoded image and doesn't need to decode the image. The whole mask
+is unpacked to one byte per pixel on each load, not only the bounding boxes of the cells: the mask of a page is shared
+by the cells of all tables and revisions, which usually cover most of the page.
+"""
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+MASK_STORE_VERSION: int = 1
+MANIFEST_FILENAME: str = "manifest.json"
+
+
+class MaskStore:
+    __slots__ = ("directory", "masks")
+
+    def __init__(self, directory: str, masks: Dict[str, dict]):
+        self.directory: str = directory
+        # image filename -> manifest entry
+        self.masks: Dict[str, dict] = masks
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self.masks
+
+    def load(self, filename: str) -> np.ndarray:
+        """
+        :param filename: filename of the image
+        :return: (height, width) foreground mask of the image, unpacked in full
+        """
+        packed: np.ndarray = np.load(os.path.join(self.directory, filename + ".npy"), mmap_mode="r")
+        return np.unpackbits(packed, axis=1, count=self.masks[filename]["width"]).view(bool)
+
+
+def write_mask(directory: str, filename: str, mask: np.ndarray) -> dict:
+    """
+    writes the mask of an image into the store directory. The manifest has to be written afterwards.
+    :return: the manifest entry of the mask, without the information about the image file
+    """
+    np.save(os.path.join(directory, filename + ".npy"), np.packbits(mask, axis=1))
+    return {"height": mask.shape[0], "width": mask.shape[1]}
+
+
+def remove_mask(directory: str, filename: str):
+    filepath: str = os.path.join(directory, filename + ".npy")
+    if os.path.exists(filepath):
+        os.remove(filepath)
+
+
+def write_manifest(directory: str, masks: Dict[str, dict]):
+    """
+    :param masks: manifest entry of each mask by the filename of its image
+    """
+    temporary_filepath: str = os.path.join(directory, MANIFEST_FILENAME + ".tmp")
+    with open(temporary_filepath, "w") as manifest_file:
+        json.dump({"version": MASK_STORE_VERSION, "masks": masks}, manifest_file)
+    os.replace(temporary_filepath, os.path.join(directory, MANIFEST_FILENAME))
+
+
+def open_store(directory: str) -> Optional[MaskStore]:
+    """
+    :return: the store or none if there is no store of the current version in the directory
+    """
+    manifest_path: str = os.path.join(directory, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as manifest_file:
+        manifest: dict = json.load(manifest_file)
+    if manifest.get("version") != MASK_STORE_VERSION:
+        return None
+    return MaskStore(directory, manifest["masks"])
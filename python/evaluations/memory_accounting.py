@@ -0,0 +1,198 @@
+"""
+Memory accounting of the evaluation.
+The peak memory of each document and of each metric is measured with tracemalloc, which traces the allocations of
+Python objects and numpy arrays. The geometries of shapely are allocated by GEOS and aren't traced, on Linux the peak
+resident set size is measured too. Its high-water mark is reset before each measurement, so both peaks are the memory
+which was allocated in addition to the memory in use when the measurement started.
+"""
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from python.evaluations.columnar import ColumnarDocument
+
+# flag: documents over the budget are listed in the report
+# skip: documents over the budget are not part of the averages. Documents whose estimated memory is over the budget
+# aren't evaluated at all.
+# low_memory: the foreground pixel accuracy builds the pixel grid of large cells in parts which fit into the budget
+BUDGET_ACTIONS: List[str] = ["flag", "skip", "low_memory"]
+
+# approximate peak resident memory per pixel of the point grid of a cell in the foreground pixel accuracy
+BYTES_PER_GRID_POINT: int = 400
+
+_PROC_STATUS: str = "/proc/self/status"
+_PROC_CLEAR_REFS: str = "/proc/self/clear_refs"
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    pass
+
+
+def _read_rss() -> Optional[Tuple[int, int]]:
+    """
+    :return: current and peak resident set size in bytes, none if it can't be read
+    """
+    current: Optional[int] = None
+    peak: Optional[int] = None
+    try:
+        with open(_PROC_STATUS) as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return (current, peak) if current is not None and peak is not None else None
+
+
+def _reset_peak_rss() -> bool:
+    """
+    :return: whether the high-water mark of the resident set size was reset to the current resident set size
+    """
+    try:
+        with open(_PROC_CLEAR_REFS, "w") as clear_refs_file:
+            clear_refs_file.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def estimate_grid_points(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument) -> int:
+    """
+    :return: the number of pixels of the largest cell, the foreground pixel accuracy builds a point grid of this size
+    """
+    largest: int = 0
+    for table in doc_gt.tables + doc_prediction.tables:
+        if len(table) == 0:
+            continue
+        bounds: np.ndarray = table.bounds
+        points: np.ndarray = (np.ceil(bounds[:, 2]) - np.floor(bounds[:, 0])) * \
+                             (np.ceil(bounds[:, 3]) - np.floor(bounds[:, 1]))
+        largest = max(largest, int(points.max()))
+    return largest
+
+
+class MemoryAccounting:
+    """
+    peak memory of the evaluated documents and their metrics, in bytes
+    """
+    __slots__ = ("budget", "action", "documents", "_measure_rss", "_peak_traced", "_peak_rss")
+
+    def __init__(self, budget: Optional[int] = None, action: str = "flag"):
+        """
+        :param budget: memory budget of a document in bytes, none to only measure
+        :param action: what happens with documents over the budget, see BUDGET_ACTIONS
+        """
+        if action not in BUDGET_ACTIONS:
+            raise ValueError("Unknown budget action: " + action + ". Expected one of: " + ", ".join(BUDGET_ACTIONS))
+        self.budget: Optional[int] = budget
+        self.action: str = action
+        # one record per evaluated document with its filename, the traced and the rss peak, the peak of each metric
+        # and the reason if the document is over the budget. The same filename has a record for each run.
+        self.documents: List[dict] = []
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._measure_rss: bool = _reset_peak_rss() and _read_rss() is not None
+        # peaks of the current document, absolute values
+        self._peak_traced: int = 0
+        self._peak_rss: int = 0
+
+    def _checkpoint(self):
+        """
+        adds the peaks since the last reset to the peaks of the current document
+        """
+        self._peak_traced = max(self._peak_traced, tracemalloc.get_traced_memory()[1])
+        if self._measure_rss:
+            self._peak_rss = max(self._peak_rss, _read_rss()[1])
+
+    def _reset(self) -> Tuple[int, int]:
+        """
+        :return: the current traced memory and resident set size, the peaks start from there
+        """
+        base_rss: int = 0
+        if self._measure_rss:
+            _reset_peak_rss()
+            base_rss = _read_rss()[0]
+        # after reading the resident set size, its buffers aren't part of the traced peak
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0], base_rss
+
+    @contextmanager
+    def document(self, filename: str) -> Iterator[dict]:
+        """
+        measures the evaluation of a document, the metrics of the document are measured with metric
+        :return: the record of the document, it's complete after the block
+        """
+        record: dict = {"filename": filename, "traced": 0, "rss": None, "metrics": {}, "reason": None}
+        self.documents.append(record)
+        base_traced, base_rss = self._reset()
+        self._peak_traced = base_traced
+        self._peak_rss = base_rss
+        try:
+            yield record
+        finally:
+            self._checkpoint()
+            record["traced"] = self._peak_traced - base_traced
+            if self._measure_rss:
+                record["rss"] = self._peak_rss - base_rss
+            if self.budget is not None and peak(record) > self.budget:
+                record["reason"] = "peak memory of " + megabytes(peak(record)) + " is over the budget of " + \
+                                   megabytes(self.budget)
+
+    @contextmanager
+    def metric(self, record: dict, metric: str):
+        """
+        measures a metric of the document of the record, the peak of a metric is its maximum over all revisions
+        """
+        self._checkpoint()
+        base_traced, base_rss = self._reset()
+        try:
+            yield
+        finally:
+            traced: int = tracemalloc.get_traced_memory()[1] - base_traced
+            rss: int = _read_rss()[1] - base_rss if self._measure_rss else 0
+            record["metrics"][metric] = max(record["metrics"].get(metric, 0), traced, rss)
+            self._checkpoint()
+
+    def check_estimate(self, filename: str, estimated: int):
+        """
+        raises MemoryBudgetExceeded if documents over the budget are skipped and the estimated memory of the document
+        is over the budget
+        :param estimated: estimated memory of the document in bytes
+        """
+        if self.action != "skip" or self.budget is None or estimated <= self.budget:
+            return
+        reason: str = "estimated memory of " + megabytes(estimated) + " is over the budget of " + \
+                      megabytes(self.budget)
+        self.documents.append({"filename": filename, "traced": None, "rss": None, "metrics": {}, "reason": reason})
+        raise MemoryBudgetExceeded("Skipped [" + filename + "]: " + reason)
+
+    def check_peak(self, record: dict):
+        """
+        raises MemoryBudgetExceeded if documents over the budget are skipped and the document of the record was over
+        the budget
+        """
+        if self.action == "skip" and record["reason"] is not None:
+            raise MemoryBudgetExceeded("Skipped [" + record["filename"] + "]: " + record["reason"])
+
+    def max_grid_points(self) -> Optional[int]:
+        """
+        :return: maximum size of the point grids of the foreground pixel accuracy, none for no limit
+        """
+        if self.action != "low_memory" or self.budget is None:
+            return None
+        return max(1, self.budget // BYTES_PER_GRID_POINT)
+
+
+def peak(record: dict) -> int:
+    """
+    :return: the peak memory of a document record, the larger of the traced peak and the resident set size peak
+    """
+    return max(record["traced"] or 0, record["rss"] or 0)
+
+
+def megabytes(size: int) -> str:
+    return "%.1f MB" % (size / (1 << 20))
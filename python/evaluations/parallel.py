@@ -0,0 +1,208 @@
+"""
+Parallel evaluation of the cells of large documents.
+Most of the time of a large document is spent per cell: matching each cell with the cells of the other table and
+computing the foreground pixel accuracy and the levenshtein distance of each cell with its matching cell. The cells of
+a table are split into chunks which are evaluated by worker processes. The results of the chunks are merged in the
+order of the cells, so they are the same as the results of the evaluation in a single process.
+The levenshtein distance of a table pair matches the cells greedily one after another and isn't split into chunks,
+only the levenshtein distance of each cell with its matching cell is.
+
+The workers are started once per evaluation and evaluate the large documents one after another. The current document
+is written to a temporary file which each worker reads once, the chunks only refer to the file and to the tables of
+the document by index.
+"""
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import util
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import python.evaluations.foreground_pixel_accuracy as foreground_pixel_accuracy
+import python.evaluations.levenshtein_distance as ld
+import python.evaluations.utility as utility
+from python.evaluations.columnar import ColumnarDocument, ColumnarTable
+from python.evaluations.foreground_pixel_accuracy import PixelSampling
+
+# documents with at least this many gt and prediction cells are evaluated in parallel
+MIN_CELLS: int = 1000
+
+# each worker gets about this many chunks of a table, smaller chunks balance the load between the workers
+CHUNKS_PER_WORKER: int = 4
+
+# the side of the base cells of a chunk, the cells are matched with the cells of the table on the other side
+GT: str = "gt"
+PREDICTION: str = "prediction"
+
+MATCH: str = "match"
+FPA: str = "fpa"
+FPA_SAMPLED: str = "fpa_sampled"
+LD: str = "ld"
+
+# file, gt, prediction, foreground mask, maximum grid size and pixel sampling of the document of a worker process
+_worker_document: Optional[Tuple[str, ColumnarDocument, ColumnarDocument, Optional[np.ndarray], Optional[int],
+                                 Optional[PixelSampling]]] = None
+
+
+def _load_document(document_file: str) -> Tuple[ColumnarDocument, ColumnarDocument, Optional[np.ndarray],
+                                                Optional[int], Optional[PixelSampling]]:
+    """
+    runs in a worker process, the document is only read from its file for the first chunk of the document
+    """
+    global _worker_document
+    if _worker_document is None or _worker_document[0] != document_file:
+        with open(document_file, "rb") as document:
+            _worker_document = (document_file,) + pickle.load(document)
+    return _worker_document[1:]
+
+
+def _evaluate_chunk(document_file: str, kind: str, side: str, table_index: int, other_index: int, cells: range,
+                    matching_indices: Optional[np.ndarray]) -> np.ndarray:
+    """
+    runs in a worker process
+    :param document_file: file of the document, see CellPool.set_document
+    :param table_index: index of the table of the base cells on the given side
+    :param other_index: index of the table on the other side
+    :param matching_indices: matching cells of all cells of the table, required for FPA and LD
+    """
+    doc_gt, doc_prediction, mask, max_points, sampling = _load_document(document_file)
+    table_a, table_b = (doc_gt.tables[table_index], doc_prediction.tables[other_index]) if side == GT else \
+        (doc_prediction.tables[table_index], doc_gt.tables[other_index])
+    if kind == MATCH:
+        return utility.match_columnar_cells(table_a, table_b, cells)
+    elif kind == FPA:
+        return foreground_pixel_accuracy.fpa_matched_cell_scores(table_a, table_b, mask, matching_indices, cells,
+                                                                 max_points)
+    elif kind == FPA_SAMPLED:
+        return foreground_pixel_accuracy.fpa_sampled_matched_cell_scores(table_a, table_b, mask, sampling,
+                                                                         matching_indices, cells, max_points)
+    return ld.ld_matched_cell_scores(table_a, table_b, matching_indices, cells)
+
+
+def cell_count(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument) -> int:
+    return sum(len(table) for table in doc_gt.tables) + sum(len(table) for table in doc_prediction.tables)
+
+
+def _shutdown(executor: ProcessPoolExecutor, directory: str):
+    executor.shutdown(cancel_futures=True)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+class CellPool:
+    """
+    worker processes for the cells of the large documents of an evaluation, see set_document. The matching cells of
+    each table pair of the current document are computed once and shared by the metrics.
+    The workers are started on the first document. A pool which is inherited by a forked process, e.g. by a document
+    worker, starts its own workers in that process.
+    """
+    __slots__ = ("workers", "_executor", "_pid", "_directory", "_documents", "_document_file", "_doc_gt",
+                 "_doc_prediction", "_matches", "__weakref__")
+
+    def __init__(self, workers: int):
+        self.workers: int = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # the process which started the workers
+        self._pid: Optional[int] = None
+        # directory of the document files
+        self._directory: Optional[str] = None
+        self._documents: int = 0
+        self._document_file: Optional[str] = None
+        self._doc_gt: Optional[ColumnarDocument] = None
+        self._doc_prediction: Optional[ColumnarDocument] = None
+        self._matches: Dict[Tuple[str, int, int], np.ndarray] = {}
+
+    def __enter__(self) -> "CellPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _start(self):
+        self._executor = ProcessPoolExecutor(self.workers)
+        self._pid = os.getpid()
+        self._directory = tempfile.mkdtemp(prefix="cell_pool_")
+        self._documents = 0
+        self._document_file = None
+        # the workers are stopped when the process exits, even if the pool isn't closed. A worker process of
+        # multiprocessing joins its children before the exit handlers of the executors run, so the workers are
+        # stopped by a finalizer, before the finalizers of the queues of the executor (priority 10) close them.
+        util.Finalize(self, _shutdown, args=(self._executor, self._directory), exitpriority=20)
+
+    def set_document(self, doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument,
+                     mask: Optional[np.ndarray] = None, max_points: Optional[int] = None,
+                     sampling: Optional[PixelSampling] = None):
+        """
+        the following chunks evaluate the cells of this document, e.g. of a revision of a prediction
+        :param mask: foreground mask of the image, see foreground_pixel_accuracy.fpa_cell_scores
+        """
+        if self._pid != os.getpid():
+            self._start()
+        self._documents += 1
+        document_file: str = os.path.join(self._directory, str(self._documents) + ".pickle")
+        with open(document_file, "wb") as document:
+            pickle.dump((doc_gt, doc_prediction, mask, max_points, sampling), document,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        # the chunks of the previous document are finished
+        if self._document_file is not None:
+            os.remove(self._document_file)
+        self._document_file = document_file
+        self._doc_gt = doc_gt
+        self._doc_prediction = doc_prediction
+        self._matches = {}
+
+    def close(self):
+        if self._pid != os.getpid():
+            return
+        _shutdown(self._executor, self._directory)
+        self._pid = None
+
+    def _table(self, side: str, table_index: int) -> ColumnarTable:
+        return (self._doc_gt if side == GT else self._doc_prediction).tables[table_index]
+
+    def _map(self, kind: str, side: str, table_index: int, other_index: int,
+             matching_indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        evaluates the cells of the table in chunks
+        :return: the results of the chunks in the order of the cells
+        """
+        cells: int = len(self._table(side, table_index))
+        if cells == 0:
+            return np.empty((0, 2) if kind == FPA_SAMPLED else 0, dtype=np.int64 if kind == MATCH else np.float64)
+        chunk_size: int = max(1, -(-cells // (self.workers * CHUNKS_PER_WORKER)))
+        futures: List[Future] = [self._executor.submit(_evaluate_chunk, self._document_file, kind, side, table_index,
+                                                       other_index, range(start, min(start + chunk_size, cells)),
+                                                       matching_indices)
+                                 for start in range(0, cells, chunk_size)]
+        return np.concatenate([future.result() for future in futures])
+
+    def matches(self, side: str, table_index: int, other_index: int) -> np.ndarray:
+        """
+        :return: the index of the matching cell of the other table for each cell of the table, see
+        utility.match_columnar_cells
+        """
+        key: Tuple[str, int, int] = (side, table_index, other_index)
+        if key not in self._matches:
+            self._matches[key] = self._map(MATCH, side, table_index, other_index)
+        return self._matches[key]
+
+    def fpa_scores(self, side: str, table_index: int, other_index: int) -> np.ndarray:
+        """
+        :return: the foreground pixel accuracy of each cell of the table with its matching cell
+        """
+        return self._map(FPA, side, table_index, other_index, self.matches(side, table_index, other_index))
+
+    def fpa_sampled_scores(self, side: str, table_index: int, other_index: int) -> np.ndarray:
+        """
+        :return: (cells, 2) estimated foreground pixel accuracy of each cell of the table with its matching cell and
+        the variance of the estimate, see foreground_pixel_accuracy.PixelSampling
+        """
+        return self._map(FPA_SAMPLED, side, table_index, other_index, self.matches(side, table_index, other_index))
+
+    def ld_scores(self, side: str, table_index: int, other_index: int) -> np.ndarray:
+        """
+        :return: the levenshtein distance of each cell of the table to its matching cell
+        """
+        return self._map(LD, side, table_index, other_index, self.matches(side, table_index, other_index))
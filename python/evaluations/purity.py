@@ -1,42 +1,51 @@
-from copy import copy
-from typing import overload, List, Dict
+from typing import overload, List, Optional
 
 from docrecjson.elements import Table, Document, Revision
 from evaluations import utility
 
+import python.evaluations.columnar as columnar
+import python.evaluations.table_structure as table_structure
+from python.evaluations.columnar import ColumnarDocument, ColumnarTable
+from python.evaluations.table_structure import TableStructure
 
-def _purity_table(table_gt: Table, table_prediction: Table) -> float:
-    rows_gt, columns_gt = table_gt.get_table_structure()
-    rows_prediction, columns_prediction = table_prediction.get_table_structure()
+
+def _purity_structure(structure_gt: TableStructure, structure_prediction: TableStructure) -> float:
+    rows_gt: int = len(structure_gt.row_occupancy)
+    columns_gt: int = len(structure_gt.column_occupancy)
+    rows_prediction: int = len(structure_prediction.row_occupancy)
+    columns_prediction: int = len(structure_prediction.column_occupancy)
 
     columns_identified: int = 0
     rows_identified: int = 0
 
-    if len(columns_prediction) >= len(columns_gt):
-        columns_identified += len(columns_gt)
+    if columns_prediction >= columns_gt:
+        columns_identified += columns_gt
     else:
-        columns_identified += len(columns_prediction) if len(columns_prediction) > 1 else 0
+        columns_identified += columns_prediction if columns_prediction > 1 else 0
 
-    if len(rows_prediction) >= len(rows_gt):
-        rows_identified += len(rows_gt)
+    if rows_prediction >= rows_gt:
+        rows_identified += rows_gt
     else:
-        rows_identified += len(rows_prediction) if len(rows_prediction) > 1 else 0
+        rows_identified += rows_prediction if rows_prediction > 1 else 0
 
-    return (columns_identified + rows_identified) / (len(columns_gt) + len(rows_gt))
+    return (columns_identified + rows_identified) / (columns_gt + rows_gt)
 
 
-def _purity_document(doc_gt: Document, revision_prediction: Revision) -> float:
-    tables_gt: List[Table] = [x for x in doc_gt.objects() if isinstance(x, Table)]
-    tables_prediction: List[Table] = [x for x in copy(revision_prediction.objects) if isinstance(x, Table)]
+def _purity_table(table_gt: Table, table_prediction: Table) -> float:
+    return _purity_structure(table_structure.get_table_structure(table_gt),
+                             table_structure.get_table_structure(table_prediction))
 
-    matched_tables: Dict[Table, Table] = utility.match_tables(tables_gt, tables_prediction)
+
+def _purity_columnar(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument) -> float:
+    matched_tables: List[Optional[int]] = utility.match_columnar_tables(doc_gt.tables, doc_prediction.tables)
+    tables_prediction: List[int] = list(range(len(doc_prediction.tables)))
     total_purity: float = 0
     tables_viewed: int = 0
 
-    for table_gt, table_prediction in matched_tables.items():
-        if table_prediction is not None:
-            total_purity += purity(table_gt, table_prediction)
-            tables_prediction.remove(table_prediction)
+    for table_gt, prediction_index in zip(doc_gt.tables, matched_tables):
+        if prediction_index is not None:
+            total_purity += _purity_structure(table_gt.structure, doc_prediction.tables[prediction_index].structure)
+            tables_prediction.remove(prediction_index)
         tables_viewed += 1
 
     # todo does this count to the metric? this makes the metric worse... but td is not part of this work
@@ -45,18 +54,36 @@ def _purity_document(doc_gt: Document, revision_prediction: Revision) -> float:
     return total_purity / tables_viewed
 
 
+def _purity_document(doc_gt: Document, revision_prediction: Revision) -> float:
+    return _purity_columnar(columnar.from_document(doc_gt), columnar.from_revision(revision_prediction))
+
+
 @overload
 def purity(table_gt: Table, table_prediction: Table) -> float:
     ...
 
 
+@overload
+def purity(table_gt: ColumnarTable, table_prediction: ColumnarTable) -> float:
+    ...
+
+
 @overload
 def purity(doc_gt: Document, revision_prediction: Revision) -> float:
     ...
 
 
+@overload
+def purity(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument) -> float:
+    ...
+
+
 def purity(param_a, param_b):
     if isinstance(param_a, Document) and isinstance(param_b, Revision):
         return _purity_document(param_a, param_b)
+    elif isinstance(param_a, ColumnarDocument) and isinstance(param_b, ColumnarDocument):
+        return _purity_columnar(param_a, param_b)
     elif isinstance(param_a, Table) and isinstance(param_b, Table):
         return _purity_table(param_a, param_b)
+    elif isinstance(param_a, ColumnarTable) and isinstance(param_b, ColumnarTable):
+        return _purity_structure(param_a.structure, param_b.structure)
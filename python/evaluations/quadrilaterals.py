@@ -0,0 +1,142 @@
+"""
+Exact geometry of convex quadrilaterals in batches.
+Most cells are four-point polygons, in rotated or skewed scans they aren't axis-aligned. For convex quadrilaterals the
+intersection tests, the intersection areas and the point tests of the metrics are computed with numpy for many pairs
+at once instead of creating a shapely geometry for each of them.
+
+The intersection of two convex quadrilaterals is computed by Sutherland-Hodgman clipping: the first quadrilateral is
+clipped by the half-plane of each edge of the second one. The polygons of a batch are kept in one (pairs, vertices, 2)
+array, the unused vertices of a polygon repeat its last vertex, so they don't change its area.
+
+The corners are expected in the order with a positive signed area, see convex_quadrilaterals. Polygons which aren't
+convex quadrilaterals, e.g. with more points or self-intersecting ones, are left to shapely.
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+def convex_quadrilaterals(vertices: np.ndarray, vertex_offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param vertices: (v, 2) vertices of all polygons, see columnar.ColumnarTable
+    :param vertex_offsets: (n + 1) offsets of the polygons in vertices
+    :return: (n, 4, 2) corners of each polygon in the order with a positive signed area and whether the polygon is a
+    convex quadrilateral. The corners of the other polygons are undefined.
+    """
+    starts: np.ndarray = vertex_offsets[:-1]
+    counts: np.ndarray = np.diff(vertex_offsets)
+    if len(vertices) == 0:
+        return np.zeros((len(starts), 4, 2)), np.zeros(len(starts), dtype=bool)
+    indices: np.ndarray = np.minimum(starts[:, None] + np.arange(5), len(vertices) - 1)
+    corners: np.ndarray = vertices[indices[:, :4]].astype(np.float64)
+    # a closed polygon repeats its first point
+    closed: np.ndarray = (counts == 5) & np.all(vertices[indices[:, 4]] == corners[:, 0], axis=1)
+
+    edges: np.ndarray = np.roll(corners, -1, axis=1) - corners
+    turns: np.ndarray = _cross(edges, np.roll(edges, -1, axis=1))
+    # all turns in the same direction, without collinear or repeated corners
+    positive: np.ndarray = np.all(turns > 0, axis=1)
+    negative: np.ndarray = np.all(turns < 0, axis=1)
+    corners[negative] = corners[negative, ::-1]
+    return corners, ((counts == 4) | closed) & (positive | negative)
+
+
+def _cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def areas(polygons: np.ndarray) -> np.ndarray:
+    """
+    :param polygons: (n, vertices, 2) polygons
+    :return: the area of each polygon
+    """
+    return np.abs(np.sum(_cross(polygons, np.roll(polygons, -1, axis=1)), axis=1)) / 2
+
+
+def intersects(quadrilaterals_a: np.ndarray, quadrilaterals_b: np.ndarray) -> np.ndarray:
+    """
+    like shapely's intersects, quadrilaterals which only touch intersect
+    :param quadrilaterals_a: (n, 4, 2) convex quadrilaterals
+    :param quadrilaterals_b: (n, 4, 2) convex quadrilaterals
+    :return: whether each pair intersects
+    """
+    # convex polygons are disjoint if and only if the projections onto the normal of one of their edges are disjoint
+    separated: np.ndarray = np.zeros(len(quadrilaterals_a), dtype=bool)
+    for quadrilaterals in (quadrilaterals_a, quadrilaterals_b):
+        for corner in range(4):
+            edge: np.ndarray = quadrilaterals[:, (corner + 1) % 4] - quadrilaterals[:, corner]
+            projections_a: np.ndarray = _cross(edge[:, None], quadrilaterals_a - quadrilaterals[:, corner, None])
+            projections_b: np.ndarray = _cross(edge[:, None], quadrilaterals_b - quadrilaterals[:, corner, None])
+            separated |= (projections_a.max(axis=1) < projections_b.min(axis=1)) | \
+                         (projections_b.max(axis=1) < projections_a.min(axis=1))
+    return ~separated
+
+
+def _clip(polygons: np.ndarray, counts: np.ndarray, start: np.ndarray, end: np.ndarray) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """
+    clips each polygon by the half-plane left of the edge from start to end
+    :param polygons: (n, vertices, 2) polygons, the vertices after the count of a polygon repeat its last vertex
+    :param counts: (n) number of vertices of each polygon
+    :param start: (n, 2) start of the edge of each polygon
+    :param end: (n, 2) end of the edge of each polygon
+    :return: the clipped polygons and their number of vertices
+    """
+    positions: np.ndarray = np.arange(polygons.shape[1])
+    following: np.ndarray = np.where(positions + 1 < counts[:, None], positions + 1, 0)
+    sides: np.ndarray = _cross((end - start)[:, None], polygons - start[:, None])
+    following_sides: np.ndarray = np.take_along_axis(sides, following, axis=1)
+    following_vertices: np.ndarray = np.take_along_axis(polygons, following[..., None], axis=1)
+    valid: np.ndarray = positions < counts[:, None]
+    inside: np.ndarray = sides >= 0
+
+    # each vertex is followed by the crossing of its edge with the clip edge
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t: np.ndarray = sides / (sides - following_sides)
+        crossings: np.ndarray = polygons + t[..., None] * (following_vertices - polygons)
+    # the crossings with vertical or horizontal edges are exact, so the intersections of axis-aligned cells are exact
+    for axis in range(2):
+        parallel: np.ndarray = start[:, axis] == end[:, axis]
+        crossings[parallel, :, axis] = start[parallel, axis, None]
+    candidates: np.ndarray = np.stack([polygons, crossings], axis=2).reshape(len(polygons), -1, 2)
+    kept: np.ndarray = np.stack([valid & inside, valid & (inside != (following_sides >= 0))],
+                                axis=2).reshape(len(polygons), -1)
+
+    clipped_counts: np.ndarray = np.count_nonzero(kept, axis=1)
+    width: int = max(int(clipped_counts.max(initial=0)), 1)
+    order: np.ndarray = np.argsort(~kept, axis=1, kind="stable")[:, :width]
+    # the unused vertices repeat the last vertex, empty polygons are a single point
+    last: np.ndarray = np.take_along_axis(order, np.maximum(clipped_counts - 1, 0)[:, None], axis=1)
+    order = np.where(np.arange(width) < clipped_counts[:, None], order, last)
+    clipped: np.ndarray = np.take_along_axis(candidates, order[..., None], axis=1)
+    clipped[clipped_counts == 0] = 0
+    return clipped, clipped_counts
+
+
+def intersection_areas(quadrilaterals_a: np.ndarray, quadrilaterals_b: np.ndarray) -> np.ndarray:
+    """
+    :param quadrilaterals_a: (n, 4, 2) convex quadrilaterals
+    :param quadrilaterals_b: (n, 4, 2) convex quadrilaterals
+    :return: the area of the intersection of each pair, 0 for pairs which don't overlap
+    """
+    if len(quadrilaterals_a) == 0:
+        return np.empty(0)
+    polygons: np.ndarray = quadrilaterals_a
+    counts: np.ndarray = np.full(len(polygons), 4)
+    for corner in range(4):
+        polygons, counts = _clip(polygons, counts, quadrilaterals_b[:, corner], quadrilaterals_b[:, (corner + 1) % 4])
+    return areas(polygons)
+
+
+def contains(quadrilateral: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """
+    like shapely's intersects, points on the boundary are contained
+    :param quadrilateral: (4, 2) convex quadrilateral
+    :param points: (p, 2) points
+    :return: whether each point is inside the quadrilateral
+    """
+    inside: np.ndarray = np.ones(len(points), dtype=bool)
+    for corner in range(4):
+        start: np.ndarray = quadrilateral[corner]
+        inside &= _cross(quadrilateral[(corner + 1) % 4] - start, points - start) >= 0
+    return inside
@@ -0,0 +1,269 @@
+"""
+Columnar store for the results of each table.
+The store has one row per run, document, revision and gt table with the metrics of the table and descriptors of the gt
+table, e.g. its number of cells. Each field is a contiguous numpy array with the type of the field in ROW_DTYPE, so a
+query only reads the columns it needs. The names of the runs, documents and revisions are kept once and the rows refer
+to them by index. Queries filter the rows and aggregate the metrics by groups with vectorized numpy operations, which
+takes well under a second for millions of rows.
+
+Metrics which don't apply to a table, e.g. the metrics of a gt table without matching prediction table, are NaN and
+aren't part of the averages.
+"""
+import operator
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+RESULTS_STORE_VERSION: int = 1
+
+NAME_FIELDS: List[str] = ["run", "document", "revision"]
+DESCRIPTOR_FIELDS: List[str] = ["table", "matched", "cell_count", "span_count", "table_area", "text_length"]
+F1_THRESHOLDS: List[int] = [60, 70, 80, 90]
+METRIC_FIELDS: List[str] = ["iou"] + ["iou_f1_" + str(x) for x in F1_THRESHOLDS] + \
+                           ["foreground_pixel_accuracy"] + ["fpa_f1_" + str(x) for x in F1_THRESHOLDS] + \
+                           ["levenshtein_distance"] + ["ld_f1_" + str(x) for x in F1_THRESHOLDS] + \
+                           ["correct_tsr_share", "completeness", "purity"]
+
+# fields and their types, ResultsStore.rows returns the rows as structured array of this type
+ROW_DTYPE: np.dtype = np.dtype([("run", np.int32), ("document", np.int32), ("revision", np.int32),
+                                ("table", np.int32), ("matched", np.bool_), ("cell_count", np.int32),
+                                ("span_count", np.int32), ("table_area", np.float64), ("text_length", np.int32)] +
+                               [(field, np.float64) for field in METRIC_FIELDS])
+
+# operators of the query filters, longest first
+FILTER_OPERATORS: Dict[str, Callable[[np.ndarray, object], np.ndarray]] = {
+    "<=": operator.le, ">=": operator.ge, "!=": operator.ne, "==": operator.eq, "<": operator.lt, ">": operator.gt,
+    "=": operator.eq}
+
+class _Names:
+    """
+    names of the runs, documents or revisions and their index in the rows
+    """
+    __slots__ = ("names", "indices")
+
+    def __init__(self, names: Optional[List[str]] = None):
+        self.names: List[str] = []
+        self.indices: Dict[str, int] = {}
+        for name in names or []:
+            self.index(name)
+
+    def index(self, name: str) -> int:
+        index: Optional[int] = self.indices.get(name)
+        if index is None:
+            index = len(self.names)
+            self.indices[name] = index
+            self.names.append(name)
+        return index
+
+
+class ResultsStore:
+    __slots__ = ("_columns", "_size", "_names", "run")
+
+    def __init__(self, columns: Optional[Dict[str, np.ndarray]] = None, names: Optional[Dict[str, List[str]]] = None):
+        """
+        :param columns: the array of each field in ROW_DTYPE, all of the same length
+        :param names: the names of each name field, the values of the name fields are their indices
+        """
+        self._size: int = len(columns[ROW_DTYPE.names[0]]) if columns is not None else 0
+        self._columns: Dict[str, np.ndarray] = {
+            field: np.ascontiguousarray(columns[field], dtype=ROW_DTYPE[field]) if columns is not None else
+            np.empty(1024, dtype=ROW_DTYPE[field]) for field in ROW_DTYPE.names}
+        self._names: Dict[str, _Names] = {field: _Names((names or {}).get(field)) for field in NAME_FIELDS}
+        # run of the added rows, e.g. the prediction directory if several runs are evaluated
+        self.run: str = ""
+
+    def __len__(self) -> int:
+        return self._size
+
+    def column(self, field: str) -> np.ndarray:
+        return self._columns[field][:self._size]
+
+    @property
+    def rows(self) -> np.ndarray:
+        """
+        :return: a copy of the rows as structured array
+        """
+        rows: np.ndarray = np.empty(self._size, dtype=ROW_DTYPE)
+        for field in ROW_DTYPE.names:
+            rows[field] = self.column(field)
+        return rows
+
+    def names(self, field: str) -> List[str]:
+        """
+        :param field: run, document or revision
+        """
+        return self._names[field].names
+
+    def truncate(self, size: int):
+        """
+        removes the rows which were added after the store had the given size
+        """
+        self._size = min(self._size, size)
+
+    def _append(self, columns: Dict[str, np.ndarray], count: int):
+        """
+        :param columns: the values of count rows for each field in ROW_DTYPE
+        """
+        for field in ROW_DTYPE.names:
+            column: np.ndarray = self._columns[field]
+            if self._size + count > len(column):
+                grown: np.ndarray = np.empty(max(2 * len(column), self._size + count), dtype=column.dtype)
+                grown[:self._size] = column[:self._size]
+                self._columns[field] = column = grown
+            column[self._size:self._size + count] = columns[field]
+        self._size += count
+
+    def add_tables(self, document_name: str, revision_name: str, columns: Dict[str, list]):
+        """
+        adds a row for each gt table of an evaluated document
+        :param columns: the values of the tables for each field in ROW_DTYPE except the name fields, see
+        table_metrics.table_columns
+        """
+        count: int = len(columns["table"])
+        self._append(dict(columns, run=self._names["run"].index(self.run),
+                          document=self._names["document"].index(document_name),
+                          revision=self._names["revision"].index(revision_name)), count)
+
+    def extend(self, other: "ResultsStore"):
+        """
+        adds the rows of the other store, its names are mapped to the names of this store
+        """
+        columns: Dict[str, np.ndarray] = {field: other.column(field) for field in ROW_DTYPE.names}
+        for field in NAME_FIELDS:
+            mapping: np.ndarray = np.array([self._names[field].index(name) for name in other.names(field)] + [0],
+                                           dtype=np.int32)
+            columns[field] = mapping[columns[field]]
+        self._append(columns, len(other))
+
+
+def save(filepath: str, store: ResultsStore):
+    """
+    writes the store into a .npz file with one array per field
+    """
+    with open(filepath, "wb") as store_file:
+        np.savez(store_file, version=np.array(RESULTS_STORE_VERSION),
+                 **{"column_" + field: store.column(field) for field in ROW_DTYPE.names},
+                 **{"names_" + field: np.array(store.names(field), dtype=str) for field in NAME_FIELDS})
+
+
+def load(filepath: str) -> ResultsStore:
+    with np.load(filepath, allow_pickle=False) as data:
+        if int(data["version"]) != RESULTS_STORE_VERSION:
+            raise RuntimeError("Unsupported results store version in " + filepath + ": " + str(int(data["version"])))
+        return ResultsStore({field: data["column_" + field] for field in ROW_DTYPE.names},
+                            {field: [str(x) for x in data["names_" + field]] for field in NAME_FIELDS})
+
+
+def concatenate(stores: List[ResultsStore]) -> ResultsStore:
+    """
+    :return: a store with the rows of all stores, e.g. of the shards of an evaluation
+    """
+    if len(stores) == 1:
+        return stores[0]
+    combined: ResultsStore = ResultsStore()
+    for store in stores:
+        combined.extend(store)
+    return combined
+
+
+def parse_filter(expression: str) -> Tuple[str, Callable[[np.ndarray, object], np.ndarray], str]:
+    """
+    :param expression: field, operator and value, e.g. cell_count>=20 or revision==revision:1:ocr
+    :return: field, operator and value
+    """
+    for symbol, function in FILTER_OPERATORS.items():
+        field, found, value = expression.partition(symbol)
+        if found:
+            field = field.strip()
+            if field not in ROW_DTYPE.names:
+                raise RuntimeError("Unknown field in filter: " + expression + ". Expected one of: " +
+                                   ", ".join(ROW_DTYPE.names))
+            return field, function, value.strip()
+    raise RuntimeError("Expected a filter like field>=value, got: " + expression)
+
+
+def _filter_mask(store: ResultsStore, filters: List[str]) -> np.ndarray:
+    mask: np.ndarray = np.ones(len(store), dtype=bool)
+    for expression in filters:
+        field, function, value = parse_filter(expression)
+        if field in NAME_FIELDS:
+            # names are compared by their index, only equality is supported
+            if function not in (operator.eq, operator.ne):
+                raise RuntimeError("Names can only be compared with == or !=, got: " + expression)
+            index: Optional[int] = store._names[field].indices.get(value)
+            matches: np.ndarray = store.column(field) == index if index is not None else \
+                np.zeros(len(store), dtype=bool)
+            mask &= matches if function is operator.eq else ~matches
+        elif field == "matched":
+            mask &= function(store.column(field), value.lower() in ("1", "true"))
+        else:
+            mask &= function(store.column(field), float(value))
+    return mask
+
+
+def _group_codes(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: the distinct values and the code of each value, the index of its distinct value
+    """
+    if values.dtype.kind in "iub" and len(values) > 0:
+        # integers with a small range, e.g. the indices of the names, are coded by their offset without sorting
+        minimum: int = int(values.min())
+        value_range: int = int(values.max()) - minimum + 1
+        if value_range <= 2 * len(values):
+            codes: np.ndarray = values.astype(np.int64) - minimum
+            present: np.ndarray = np.flatnonzero(np.bincount(codes, minlength=value_range))
+            remap: np.ndarray = np.zeros(value_range, dtype=np.int64)
+            remap[present] = np.arange(len(present))
+            return (present + minimum).astype(values.dtype), remap[codes]
+    unique, codes = np.unique(values, return_inverse=True)
+    return unique, codes.reshape(-1)
+
+
+def query(store: ResultsStore, metrics: List[str], group_by: Optional[List[str]] = None,
+          filters: Optional[List[str]] = None) -> Tuple[List[tuple], np.ndarray, np.ndarray]:
+    """
+    averages the metrics over the filtered rows of each group
+    :param metrics: fields of the averaged metrics
+    :param group_by: fields of the groups, none or empty for a single group with all rows
+    :param filters: filter expressions, see parse_filter
+    :return: the values of the group fields of each group, the number of rows of each group and the (groups, metrics)
+    averages. A metric is averaged over the rows where it isn't NaN.
+    """
+    group_by = group_by or []
+    for field in metrics + group_by:
+        if field not in ROW_DTYPE.names:
+            raise RuntimeError("Unknown field: " + field + ". Expected one of: " + ", ".join(ROW_DTYPE.names))
+    mask: np.ndarray = _filter_mask(store, filters or [])
+
+    # the group of each row, the codes of the group fields are combined into one integer key
+    keys: np.ndarray = np.zeros(int(np.count_nonzero(mask)), dtype=np.int64)
+    uniques: List[np.ndarray] = []
+    for field in group_by:
+        unique, codes = _group_codes(np.compress(mask, store.column(field)))
+        keys = keys * len(unique) + codes
+        uniques.append(unique)
+    group_keys, groups = _group_codes(keys)
+
+    counts: np.ndarray = np.bincount(groups, minlength=len(group_keys))
+    averages: np.ndarray = np.empty((len(group_keys), len(metrics)))
+    for column, metric in enumerate(metrics):
+        values: np.ndarray = np.compress(mask, store.column(metric))
+        missing: np.ndarray = np.isnan(values)
+        value_counts: np.ndarray = counts
+        if missing.any():
+            values = np.where(missing, 0, values)
+            value_counts = counts - np.bincount(groups, weights=missing, minlength=len(group_keys))
+        sums: np.ndarray = np.bincount(groups, weights=values, minlength=len(group_keys))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averages[:, column] = sums / value_counts
+
+    # decode the combined keys into the values of the group fields
+    group_values: List[List] = [[] for _ in group_keys]
+    remaining: np.ndarray = group_keys.copy()
+    for field, unique in reversed(list(zip(group_by, uniques))):
+        codes = remaining % len(unique)
+        remaining //= len(unique)
+        for group, code in enumerate(codes):
+            value = unique[code].item()
+            group_values[group].insert(0, store.names(field)[value] if field in NAME_FIELDS else value)
+    return [tuple(x) for x in group_values], counts, averages
@@ -0,0 +1,142 @@
+"""
+Cost-aware scheduling of the documents of a parallel evaluation.
+A few large documents which are started late determine the wall time of a parallel run. The cost of each document is
+estimated before the evaluation from cheap signals and the documents are dispatched in the order of decreasing cost
+(longest processing time first). An idle worker takes the next document from the shared queue, so the small documents
+at the end of the queue fill the gaps next to the large ones.
+
+The signals of a document, see FEATURES:
+
+polygons    number of polygons in the prediction file, counted in the raw file without decoding it. Each cell has a
+            polygon, so it grows with the cells of all revisions.
+pixels      pixels of the image of the document, zero without image directory
+size        size of the prediction file in bytes
+
+The estimate is a linear model of the signals. Its coefficients are fitted to the measured times of an earlier run,
+see CostModel.fit, until then rough defaults are used. A document with a measured time from an earlier run and an
+unchanged file size is estimated by that time.
+"""
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+FEATURES: List[str] = ["polygons", "pixels", "size"]
+
+# seconds of a document without cells and seconds per polygon, pixel and byte, until they are fitted to measured times
+DEFAULT_COEFFICIENTS: np.ndarray = np.array([0.05, 2e-3, 2e-8, 0.0])
+
+# the coefficients are only fitted to at least this many measured documents
+MIN_FIT_DOCUMENTS: int = 10
+
+_POLYGON: bytes = b'"polygon"'
+_FILENAME: re.Pattern = re.compile(rb'"filename"\s*:\s*("(?:[^"\\]|\\.)*")')
+_IMAGE_SIZE: re.Pattern = re.compile(rb'"original_image_size"\s*:\s*\[\s*(\d+)\s*,\s*(\d+)\s*]')
+
+
+def scan(data: bytes) -> Tuple[int, Optional[str], Optional[Tuple[int, int]]]:
+    """
+    scans a prediction file without decoding it
+    :param data: content of the prediction file
+    :return: number of polygons, filename of the image and size of the image if the prediction states them
+    """
+    filename: Optional[re.Match] = _FILENAME.search(data)
+    image_size: Optional[re.Match] = _IMAGE_SIZE.search(data)
+    return data.count(_POLYGON), json.loads(filename.group(1)) if filename is not None else None, \
+        (int(image_size.group(1)), int(image_size.group(2))) if image_size is not None else None
+
+
+class CostModel:
+    """
+    estimates the seconds of a document from its signals
+    """
+    __slots__ = ("coefficients", "documents")
+
+    def __init__(self, coefficients: np.ndarray = DEFAULT_COEFFICIENTS, documents: int = 0):
+        """
+        :param coefficients: intercept and seconds per unit of each feature
+        :param documents: number of measured documents the coefficients were fitted to, 0 for the defaults
+        """
+        self.coefficients: np.ndarray = coefficients
+        self.documents: int = documents
+
+    @classmethod
+    def fit(cls, timings: Dict[str, dict]) -> "CostModel":
+        """
+        fits the coefficients by least squares, the features with a negative coefficient are left out
+        :param timings: measured seconds and features by file name, see load_timings
+        :return: the model with the default coefficients for fewer than MIN_FIT_DOCUMENTS documents
+        """
+        if len(timings) < MIN_FIT_DOCUMENTS:
+            return cls()
+        features: np.ndarray = np.array([[1.0] + [record[name] for name in FEATURES] for record in timings.values()])
+        seconds: np.ndarray = np.array([record["seconds"] for record in timings.values()])
+        # the features are scaled to a comparable magnitude for the least squares
+        scales: np.ndarray = np.maximum(features.max(axis=0), 1e-12)
+        used: np.ndarray = np.ones(features.shape[1], dtype=bool)
+        coefficients: np.ndarray = np.zeros(features.shape[1])
+        while np.any(used):
+            coefficients[:] = 0
+            coefficients[used] = np.linalg.lstsq(features[:, used] / scales[used], seconds, rcond=None)[0] / \
+                scales[used]
+            if np.all(coefficients >= 0):
+                break
+            used &= coefficients > 0
+        return cls(np.maximum(coefficients, 0), len(timings))
+
+    def estimate(self, features: dict) -> float:
+        """
+        :param features: value of each of FEATURES
+        """
+        return float(self.coefficients[0] + sum(coefficient * features[name]
+                                                for coefficient, name in zip(self.coefficients[1:], FEATURES)))
+
+
+def longest_first(costs: List[float]) -> List[int]:
+    """
+    :return: the indices of the documents in the order of decreasing cost, documents with the same cost keep their
+    order
+    """
+    return np.argsort(-np.asarray(costs, dtype=np.float64), kind="stable").tolist()
+
+
+def load_timings(filepath: str) -> Dict[str, dict]:
+    """
+    :return: measured seconds and features by file name of the documents of an earlier run, empty if the file doesn't
+    exist yet
+    """
+    if not os.path.exists(filepath):
+        return {}
+    with open(filepath) as timings_file:
+        return json.load(timings_file)["documents"]
+
+
+def save_timings(filepath: str, timings: Dict[str, dict]):
+    with open(filepath, "w") as timings_file:
+        json.dump({"features": FEATURES, "documents": timings}, timings_file)
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    ranks: np.ndarray = np.empty(len(values))
+    ranks[np.argsort(values, kind="stable")] = np.arange(len(values))
+    return ranks
+
+
+def compare(estimated: np.ndarray, measured: np.ndarray) -> dict:
+    """
+    :param estimated: estimated seconds of each document
+    :param measured: measured seconds of each document
+    :return: sums, mean absolute error and the rank correlation of the estimated and measured seconds. The rank
+    correlation is what matters for the order of the documents, it's none for fewer than two documents.
+    """
+    correlation: Optional[float] = None
+    if len(estimated) > 1:
+        ranks_estimated: np.ndarray = _ranks(estimated) - (len(estimated) - 1) / 2
+        ranks_measured: np.ndarray = _ranks(measured) - (len(measured) - 1) / 2
+        norm: float = float(np.sqrt(np.sum(ranks_estimated ** 2) * np.sum(ranks_measured ** 2)))
+        correlation = float(np.sum(ranks_estimated * ranks_measured)) / norm if norm > 0 else None
+    return {"estimated": float(np.sum(estimated)), "measured": float(np.sum(measured)),
+            "mean_absolute_error": float(np.mean(np.abs(estimated - measured))) if len(estimated) > 0 else 0.0,
+            "rank_correlation": correlation}
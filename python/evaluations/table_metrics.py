@@ -0,0 +1,394 @@
+"""
+Per-table results of the metrics.
+Each metric of a document is an aggregate over the matched table pairs. The tables are matched once per document and
+revision, each metric is evaluated per table pair and the document metrics are aggregated from the per-table results.
+The aggregation adds the values in the same order as the document metrics, so both give the same results.
+Consecutive revisions of a document usually change only a few tables. The results of a table pair only depend on the
+two tables, with a TableCache the results of table pairs which are unchanged since an earlier revision are reused.
+"""
+import contextlib
+from typing import Callable, ContextManager, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import python.evaluations.iou as iou
+import python.evaluations.foreground_pixel_accuracy as foreground_pixel_accuracy
+import python.evaluations.levenshtein_distance as ld
+import python.evaluations.correct_tsr_share as tsr_share
+import python.evaluations.completeness as completeness
+import python.evaluations.purity as purity
+import python.evaluations.parallel as parallel
+import python.evaluations.results_store as results
+import python.evaluations.thresholds as threshold_sweep
+import python.evaluations.utility as utility
+from python.evaluations.columnar import ColumnarDocument, ColumnarTable
+from python.evaluations.foreground_pixel_accuracy import PixelSampling
+from python.evaluations.parallel import CellPool
+
+# names of the metrics for the measure callback of evaluate_document
+IOU: str = "iou"
+FOREGROUND_PIXEL_ACCURACY: str = "foreground_pixel_accuracy"
+LEVENSHTEIN_DISTANCE: str = "levenshtein_distance"
+CORRECT_TSR_SHARE: str = "correct_tsr_share"
+COMPLETENESS: str = "completeness"
+PURITY: str = "purity"
+
+# thresholds of the f1 scores of the tables in the results store
+_F1_THRESHOLD_VALUES: np.ndarray = np.array(results.F1_THRESHOLDS) / 100
+
+
+class TableMetrics:
+    """
+    results of a gt table and its matching prediction table. The values of the prediction cells and the metrics of
+    the table pair are none if the gt table has no matching table.
+    """
+    __slots__ = ("prediction_index", "iou", "iou_scores", "levenshtein_distance", "ld_scores_gt",
+                 "ld_scores_prediction", "fpa_scores_gt", "fpa_scores_prediction", "fpa_variances_gt",
+                 "fpa_variances_prediction", "correct_tsr_share", "completeness", "purity")
+
+    def __init__(self, prediction_index: Optional[int]):
+        self.prediction_index: Optional[int] = prediction_index
+        self.iou: Optional[float] = None
+        # iou of each prediction cell with its matching gt cell, see iou.iou_cell_scores
+        self.iou_scores: Optional[np.ndarray] = None
+        self.levenshtein_distance: Optional[float] = None
+        self.ld_scores_gt: Optional[np.ndarray] = None
+        self.ld_scores_prediction: Optional[np.ndarray] = None
+        # none without a foreground mask
+        self.fpa_scores_gt: Optional[np.ndarray] = None
+        self.fpa_scores_prediction: Optional[np.ndarray] = None
+        # variances of the estimated fpa scores, none unless the pixels are sampled
+        self.fpa_variances_gt: Optional[np.ndarray] = None
+        self.fpa_variances_prediction: Optional[np.ndarray] = None
+        self.correct_tsr_share: Optional[float] = None
+        self.completeness: Optional[float] = None
+        self.purity: Optional[float] = None
+
+    @property
+    def matched(self) -> bool:
+        return self.prediction_index is not None
+
+    def copy_results(self, other: "TableMetrics"):
+        """
+        takes over the results of another table pair with the same tables, the prediction index is kept
+        """
+        for attribute in TableMetrics.__slots__[1:]:
+            setattr(self, attribute, getattr(other, attribute))
+
+
+class DocumentMetrics:
+    __slots__ = ("tables", "prediction_tables", "unmatched_predictions")
+
+    def __init__(self, tables: List[TableMetrics], prediction_tables: int, unmatched_predictions: int):
+        # one entry per gt table
+        self.tables: List[TableMetrics] = tables
+        self.prediction_tables: int = prediction_tables
+        # number of prediction tables which aren't matched to a gt table
+        self.unmatched_predictions: int = unmatched_predictions
+
+
+class TableCache:
+    """
+    results of the table pairs of the evaluated revisions of one document, by the index of the gt table and the
+    fingerprint of the prediction table. It's only valid for the same ground truth and foreground mask.
+    Only whole table pairs are reused. A prediction table with a single changed cell is evaluated again with all its
+    cells, because the matching cells and the greedy levenshtein distance depend on all cells of the table.
+    """
+    __slots__ = ("_tables", "reused", "evaluated")
+
+    def __init__(self):
+        self._tables: Dict[Tuple[int, Optional[bytes]], TableMetrics] = {}
+        self.reused: int = 0
+        self.evaluated: int = 0
+
+    def lookup(self, gt_index: int, table: TableMetrics, table_prediction: Optional[ColumnarTable]) -> bool:
+        """
+        :return: whether the results of the table pair were taken over from an earlier revision
+        """
+        cached: Optional[TableMetrics] = self._tables.get(_cache_key(gt_index, table_prediction))
+        if cached is None:
+            self.evaluated += 1
+            return False
+        table.copy_results(cached)
+        self.reused += 1
+        return True
+
+    def add(self, gt_index: int, table: TableMetrics, table_prediction: Optional[ColumnarTable]):
+        self._tables[_cache_key(gt_index, table_prediction)] = table
+
+
+def _cache_key(gt_index: int, table_prediction: Optional[ColumnarTable]) -> Tuple[int, Optional[bytes]]:
+    return gt_index, table_prediction.fingerprint() if table_prediction is not None else None
+
+
+def _unmatched_predictions(matched_tables: List[Optional[int]], prediction_tables: int) -> int:
+    """
+    :return: the number of prediction tables without matching gt table. Like the document metrics, it raises a
+    ValueError if a prediction table is matched to more than one gt table.
+    """
+    tables_prediction: List[int] = list(range(prediction_tables))
+    for prediction_index in matched_tables:
+        if prediction_index is not None:
+            tables_prediction.remove(prediction_index)
+    return len(tables_prediction)
+
+
+def evaluate_document(doc_gt: ColumnarDocument, doc_prediction: ColumnarDocument,
+                      mask: Optional[np.ndarray] = None, max_points: Optional[int] = None,
+                      measure: Optional[Callable[[str], ContextManager]] = None,
+                      cache: Optional[TableCache] = None, pool: Optional[CellPool] = None,
+                      parallel_min_cells: int = parallel.MIN_CELLS,
+                      sampling: Optional[PixelSampling] = None) -> DocumentMetrics:
+    """
+    :param mask: foreground mask of the image, none to skip the foreground pixel accuracy
+    :param max_points: maximum size of the point grid of a cell, see foreground_pixel_accuracy.fpa_cell_scores
+    :param measure: returns a context for each metric which is evaluated within it, e.g. to measure its memory
+    :param cache: results of the earlier revisions of the document, only the table pairs which aren't in the cache
+    are evaluated and added to it
+    :param pool: worker processes for the cells of documents with at least parallel_min_cells gt and prediction
+    cells, none to evaluate all documents in this process
+    :param sampling: estimate the foreground pixel accuracy from a sample of the pixels of each cell, none for the
+    exact foreground pixel accuracy
+    :return: the results of each gt table
+    """
+    if measure is None:
+        measure = lambda metric: contextlib.nullcontext()
+    matched_tables: List[Optional[int]] = utility.match_columnar_tables(doc_gt.tables, doc_prediction.tables)
+    tables: List[TableMetrics] = [TableMetrics(prediction_index) for prediction_index in matched_tables]
+    unmatched_predictions: int = _unmatched_predictions(matched_tables, len(doc_prediction.tables))
+    # the table pairs which are evaluated and the indices of their gt tables
+    pairs: List[Tuple[TableMetrics, ColumnarTable, Optional[ColumnarTable]]] = []
+    gt_indices: List[int] = []
+    for gt_index, (table, table_gt) in enumerate(zip(tables, doc_gt.tables)):
+        table_prediction: Optional[ColumnarTable] = doc_prediction.tables[table.prediction_index] \
+            if table.matched else None
+        if cache is None or not cache.lookup(gt_index, table, table_prediction):
+            pairs.append((table, table_gt, table_prediction))
+            gt_indices.append(gt_index)
+
+    if pool is not None and len(pairs) > 0 and parallel.cell_count(doc_gt, doc_prediction) >= parallel_min_cells:
+        pool.set_document(doc_gt, doc_prediction, mask, max_points, sampling)
+        _evaluate_pairs(pairs, gt_indices, mask, max_points, measure, pool, sampling)
+    else:
+        _evaluate_pairs(pairs, gt_indices, mask, max_points, measure, sampling=sampling)
+
+    if cache is not None:
+        for gt_index, (table, table_gt, table_prediction) in zip(gt_indices, pairs):
+            cache.add(gt_index, table, table_prediction)
+    return DocumentMetrics(tables, len(doc_prediction.tables), unmatched_predictions)
+
+
+def _evaluate_pairs(pairs: List[Tuple[TableMetrics, ColumnarTable, Optional[ColumnarTable]]], gt_indices: List[int],
+                    mask: Optional[np.ndarray], max_points: Optional[int],
+                    measure: Callable[[str], ContextManager], pool: Optional[CellPool] = None,
+                    sampling: Optional[PixelSampling] = None):
+    """
+    evaluates the metrics of the table pairs, the per-cell work of the matched pairs runs on the pool if it's given
+    """
+    # the pool evaluates the cells of the matched pairs, by the gt index and the prediction index of the pair
+    pooled: List[Optional[Tuple[int, int]]] = [
+        (gt_index, table.prediction_index) if pool is not None and table.matched else None
+        for gt_index, (table, table_gt, table_prediction) in zip(gt_indices, pairs)]
+
+    if mask is not None and sampling is not None:
+        with measure(FOREGROUND_PIXEL_ACCURACY):
+            for indices, (table, table_gt, table_prediction) in zip(pooled, pairs):
+                if indices is not None:
+                    estimates_gt: np.ndarray = pool.fpa_sampled_scores(parallel.GT, *indices)
+                    estimates_prediction: np.ndarray = pool.fpa_sampled_scores(parallel.PREDICTION,
+                                                                               *reversed(indices))
+                else:
+                    estimates_gt, estimates_prediction = foreground_pixel_accuracy.fpa_sampled_table_scores(
+                        table_gt, table_prediction, mask, sampling, max_points=max_points)
+                table.fpa_scores_gt, table.fpa_variances_gt = estimates_gt[:, 0], estimates_gt[:, 1]
+                table.fpa_scores_prediction, table.fpa_variances_prediction = \
+                    estimates_prediction[:, 0], estimates_prediction[:, 1]
+    elif mask is not None:
+        with measure(FOREGROUND_PIXEL_ACCURACY):
+            for indices, (table, table_gt, table_prediction) in zip(pooled, pairs):
+                if indices is not None:
+                    table.fpa_scores_gt = pool.fpa_scores(parallel.GT, *indices)
+                    table.fpa_scores_prediction = pool.fpa_scores(parallel.PREDICTION, *reversed(indices))
+                    continue
+                table.fpa_scores_gt, table.fpa_scores_prediction = foreground_pixel_accuracy.fpa_table_scores(
+                    table_gt, table_prediction, mask, max_points=max_points)
+
+    with measure(IOU):
+        for table, table_gt, table_prediction in pairs:
+            if table_prediction is not None:
+                table.iou = iou.intersection_over_union(columnar_table_gt=table_gt,
+                                                        columnar_table_prediction=table_prediction)
+                table.iou_scores = iou.iou_cell_scores(table_gt, table_prediction)
+
+    with measure(LEVENSHTEIN_DISTANCE):
+        for indices, (table, table_gt, table_prediction) in zip(pooled, pairs):
+            if table_prediction is not None:
+                # the cells are matched greedily one after another, this distance isn't split into chunks
+                table.levenshtein_distance = ld.levenshtein_distance(table_gt, table_prediction)
+            if indices is not None:
+                table.ld_scores_gt = pool.ld_scores(parallel.GT, *indices)
+                table.ld_scores_prediction = pool.ld_scores(parallel.PREDICTION, *reversed(indices))
+                continue
+            table.ld_scores_gt, table.ld_scores_prediction = ld.ld_table_scores(table_gt, table_prediction)
+
+    with measure(CORRECT_TSR_SHARE):
+        for indices, (table, table_gt, table_prediction) in zip(pooled, pairs):
+            if indices is not None:
+                table.correct_tsr_share = tsr_share.correct_tsr_share_matched(
+                    table_gt, table_prediction, pool.matches(parallel.GT, *indices))
+            elif table_prediction is not None:
+                table.correct_tsr_share = tsr_share.correct_tsr_share(table_gt, table_prediction)
+
+    with measure(COMPLETENESS):
+        for table, table_gt, table_prediction in pairs:
+            if table_prediction is not None:
+                table.completeness = completeness.completeness(table_gt, table_prediction)
+
+    with measure(PURITY):
+        for table, table_gt, table_prediction in pairs:
+            if table_prediction is not None:
+                table.purity = purity.purity(table_gt, table_prediction)
+
+
+def _sum_matched(document: DocumentMetrics, attribute: str) -> float:
+    total: float = 0
+    for table in document.tables:
+        if table.matched:
+            total += getattr(table, attribute)
+    return total
+
+
+def _average_over_tables_viewed(document: DocumentMetrics, attribute: str) -> float:
+    """
+    :return: the sum of the metric over the matched tables divided by the number of gt and unmatched prediction tables
+    """
+    return _sum_matched(document, attribute) / (len(document.tables) + document.unmatched_predictions)
+
+
+def intersection_over_union(document: DocumentMetrics) -> float:
+    if len(document.tables) == 1 and document.prediction_tables == 0:
+        # special case where the table from the ground truth was not detected by the prediction
+        return 0
+    return _sum_matched(document, "iou") / len(document.tables)
+
+
+def iou_precision_recall_f1(thresholds: np.ndarray, document: DocumentMetrics, doc_gt: ColumnarDocument,
+                            doc_prediction: ColumnarDocument) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    the iou f1 scores compare the first gt table with the first prediction table, see iou.iou_precision_recall_f1.
+    The cell scores of the first table are reused if it's matched to the first prediction table.
+    """
+    if len(document.tables) > 0 and document.tables[0].prediction_index == 0:
+        return iou.iou_precision_recall_f1_from_scores(thresholds, document.tables[0].iou_scores,
+                                                       len(doc_gt.tables[0]))
+    return iou.iou_precision_recall_f1(thresholds, doc_gt.tables, doc_prediction.tables)
+
+
+def _concatenated(document: DocumentMetrics, attribute: str) -> np.ndarray:
+    return np.concatenate([np.empty(0)] + [getattr(table, attribute) for table in document.tables])
+
+
+def fpa_threshold_scores(thresholds: np.ndarray, document: DocumentMetrics) \
+        -> Tuple[float, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :return: the foreground pixel accuracy and the precision, recall and f1 score for each threshold, see
+    foreground_pixel_accuracy.fpa_threshold_scores
+    """
+    scores_gt: np.ndarray = _concatenated(document, "fpa_scores_gt")
+    precision, recall, f1_score = threshold_sweep.precision_recall_f1(
+        scores_gt, _concatenated(document, "fpa_scores_prediction"), thresholds)
+    return float(np.sum(scores_gt)) / len(scores_gt), precision, recall, f1_score
+
+
+def fpa_approximation(thresholds: np.ndarray, document: DocumentMetrics, z: float) \
+        -> Tuple[float, np.ndarray, np.ndarray]:
+    """
+    :param z: quantile of the standard normal distribution for the bounds of the f1 scores
+    :return: the variance of the estimated foreground pixel accuracy and the lower and upper bounds of the f1 scores
+    for each threshold, see foreground_pixel_accuracy.fpa_f1_bounds
+    """
+    estimates_gt: np.ndarray = np.column_stack([_concatenated(document, "fpa_scores_gt"),
+                                                _concatenated(document, "fpa_variances_gt")])
+    estimates_prediction: np.ndarray = np.column_stack([_concatenated(document, "fpa_scores_prediction"),
+                                                        _concatenated(document, "fpa_variances_prediction")])
+    lower, upper = foreground_pixel_accuracy.fpa_f1_bounds(thresholds, estimates_gt, estimates_prediction, z)
+    return float(np.sum(estimates_gt[:, 1])) / len(estimates_gt) ** 2, lower, upper
+
+
+def levenshtein_distance(document: DocumentMetrics) -> float:
+    tables_viewed: int = len(document.tables) + document.unmatched_predictions
+    total_levenshtein_distance: float = _sum_matched(document, "levenshtein_distance") + document.unmatched_predictions
+    return total_levenshtein_distance / tables_viewed if tables_viewed != 0 else 0
+
+
+def ld_precision_recall_f1(thresholds: np.ndarray,
+                           document: DocumentMetrics) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return threshold_sweep.precision_recall_f1(_concatenated(document, "ld_scores_gt"),
+                                               _concatenated(document, "ld_scores_prediction"), thresholds)
+
+
+def correct_tsr_share(document: DocumentMetrics) -> float:
+    return _average_over_tables_viewed(document, "correct_tsr_share")
+
+
+def completeness_value(document: DocumentMetrics) -> float:
+    return _average_over_tables_viewed(document, "completeness")
+
+
+def purity_value(document: DocumentMetrics) -> float:
+    return _average_over_tables_viewed(document, "purity")
+
+
+def table_descriptors(table: ColumnarTable) -> Tuple[int, int, float, int]:
+    """
+    :return: number of cells, number of cells which span more than one row or column, area of the bounding box of the
+    table and number of characters of the cell texts
+    """
+    structure = table.structure
+    spanning: np.ndarray = (structure.end_row_index != structure.start_row_index) | \
+                           (structure.end_column_index != structure.start_column_index)
+    table_area: float = 0.0
+    if len(table.table_polygon) > 0:
+        points: np.ndarray = table.table_polygon.reshape(-1, 2)
+        table_area = float(np.prod(points.max(axis=0) - points.min(axis=0)))
+    return len(table), int(np.count_nonzero(spanning)), table_area, len(table.text)
+
+
+def _table_values(table: TableMetrics, gt_cells: int) -> List[float]:
+    """
+    :return: the value of each field in results_store.METRIC_FIELDS for the table, NaN if it doesn't apply
+    """
+    nan: List[float] = [np.nan] * len(_F1_THRESHOLD_VALUES)
+    iou_f1: List[float] = nan
+    if table.matched:
+        iou_f1 = list(iou.iou_precision_recall_f1_from_scores(_F1_THRESHOLD_VALUES, table.iou_scores, gt_cells)[2])
+    fpa: float = np.nan
+    fpa_f1: List[float] = nan
+    if table.fpa_scores_gt is not None and len(table.fpa_scores_gt) > 0:
+        fpa = float(np.mean(table.fpa_scores_gt))
+        fpa_f1 = list(threshold_sweep.precision_recall_f1(table.fpa_scores_gt, table.fpa_scores_prediction,
+                                                          _F1_THRESHOLD_VALUES)[2])
+    ld_f1: List[float] = list(threshold_sweep.precision_recall_f1(table.ld_scores_gt, table.ld_scores_prediction,
+                                                                  _F1_THRESHOLD_VALUES)[2])
+
+    def value(x: Optional[float]) -> float:
+        return float(x) if x is not None else np.nan
+
+    return [value(table.iou)] + iou_f1 + [fpa] + fpa_f1 + [value(table.levenshtein_distance)] + ld_f1 + \
+        [value(table.correct_tsr_share), value(table.completeness), value(table.purity)]
+
+
+def table_columns(doc_gt: ColumnarDocument, document: DocumentMetrics) -> Dict[str, list]:
+    """
+    :return: the descriptors and metrics of each gt table for the results store, see results_store.ResultsStore
+    """
+    descriptors: List[Tuple[int, int, float, int]] = [table_descriptors(table_gt) for table_gt in doc_gt.tables]
+    values: List[List[float]] = [_table_values(table, len(table_gt))
+                                 for table, table_gt in zip(document.tables, doc_gt.tables)]
+    columns: Dict[str, list] = {"table": list(range(len(document.tables))),
+                                "matched": [table.matched for table in document.tables]}
+    for index, field in enumerate(["cell_count", "span_count", "table_area", "text_length"]):
+        columns[field] = [x[index] for x in descriptors]
+    for index, field in enumerate(results.METRIC_FIELDS):
+        columns[field] = [x[index] for x in values]
+    return columns
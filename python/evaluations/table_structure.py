@@ -0,0 +1,84 @@
+"""
+Compact array view of the logical structure of a table.
+The structure metrics (completeness, purity, correct tsr share) only need the row and column indices of the cells
+and the number of cells in each row and column. Those values are extracted once per table into numpy arrays,
+which allows the metrics to compare whole tables with vectorized operations instead of walking the cell objects.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, NamedTuple, List, Optional, Tuple
+
+import numpy as np
+from docrecjson.elements import Table, Cell
+
+# index value used for cells without a row or column index
+MISSING_INDEX: int = -1
+
+# the structures of the tables of the current document of each thread, see document_cache
+_scope: threading.local = threading.local()
+
+
+class TableStructure(NamedTuple):
+    start_row_index: np.ndarray
+    end_row_index: np.ndarray
+    start_column_index: np.ndarray
+    end_column_index: np.ndarray
+    # number of cells in each row/column, as returned by Table.get_table_structure()
+    row_occupancy: np.ndarray
+    column_occupancy: np.ndarray
+
+
+def _index_array(values: List[Optional[int]]) -> np.ndarray:
+    return np.array([MISSING_INDEX if value is None else value for value in values], dtype=np.int64)
+
+
+def from_table(table: Table) -> TableStructure:
+    """
+    :param table: table to extract the structure from
+    :return: the structure view of the table
+    """
+    cells: List[Cell] = table.cells
+    rows, columns = table.get_table_structure()
+    return TableStructure(start_row_index=_index_array([cell.start_row_index for cell in cells]),
+                          end_row_index=_index_array([cell.end_row_index for cell in cells]),
+                          start_column_index=_index_array([cell.start_column_index for cell in cells]),
+                          end_column_index=_index_array([cell.end_column_index for cell in cells]),
+                          row_occupancy=np.array([len(row) for row in rows], dtype=np.int64),
+                          column_occupancy=np.array([len(column) for column in columns], dtype=np.int64))
+
+
+@contextmanager
+def document_cache() -> Iterator[None]:
+    """
+    reuses the structure view of each table within the block, e.g. while the revisions of a document are converted
+    and evaluated. The cache belongs to the thread and is dropped at the end of the block, a nested block uses the
+    cache of the outer block.
+    """
+    if getattr(_scope, "cache", None) is not None:
+        yield
+        return
+    _scope.cache = {}
+    try:
+        yield
+    finally:
+        _scope.cache = None
+
+
+def get_table_structure(table: Table) -> TableStructure:
+    """
+    returns the structure view of the table. Within a document_cache block, the view is built once and reused as
+    long as the table keeps its cells.
+    :param table: table to get the structure for
+    :return: the structure view of the table
+    """
+    cache: Optional[Dict[int, Tuple[Table, List[Cell], int, TableStructure]]] = getattr(_scope, "cache", None)
+    if cache is None:
+        return from_table(table)
+    entry = cache.get(id(table))
+    # the table is kept in the cache entry, therefore its id can't be reused by another object while it's cached
+    if entry is not None and entry[0] is table and entry[1] is table.cells and entry[2] == len(table.cells):
+        return entry[3]
+
+    structure: TableStructure = from_table(table)
+    cache[id(table)] = (table, table.cells, len(table.cells), structure)
+    return structure
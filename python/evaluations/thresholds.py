@@ -0,0 +1,61 @@
+"""
+Threshold sweeps over per-cell scores.
+A cell counts as true positive for a threshold if its score is at least the threshold. The scores are sorted once,
+the number of cells above each threshold is then a binary search, so evaluating many thresholds costs about as much as
+evaluating a single one.
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+def parse_thresholds(thresholds: str) -> np.ndarray:
+    """
+    :param thresholds: start:stop:step with an inclusive stop, e.g. 0.5:0.95:0.05, or a single threshold
+    :return: the thresholds in ascending order
+    """
+    try:
+        values = [float(x) for x in thresholds.split(":")]
+    except ValueError:
+        raise RuntimeError("Expected thresholds in the format start:stop:step, got: " + thresholds)
+    if len(values) == 1:
+        return np.array(values)
+    if len(values) != 3 or values[2] <= 0 or values[1] < values[0]:
+        raise RuntimeError("Expected thresholds in the format start:stop:step with start <= stop and step > 0, got: "
+                           + thresholds)
+    start, stop, step = values
+    # the tolerance keeps the stop value if (stop - start) / step is not exactly an integer because of rounding
+    count: int = int(np.floor((stop - start) / step + 1e-9)) + 1
+    return np.round(start + step * np.arange(count), 10)
+
+
+def count_at_least(scores: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    """
+    :return: the number of scores which are at least the threshold, for each threshold
+    """
+    return len(scores) - np.searchsorted(np.sort(scores), thresholds, side="left")
+
+
+def precision_recall_f1(scores_gt: np.ndarray, scores_prediction: np.ndarray,
+                        thresholds: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    true positives = gt cells with a score of at least the threshold
+    false positives = prediction cells with a score below the threshold
+    false negatives = gt cells with a score below the threshold
+
+    :param scores_gt: score of each gt cell with its matching prediction cell
+    :param scores_prediction: score of each prediction cell with its matching gt cell
+    :param thresholds: thresholds to evaluate
+    :return: precision, recall and f1 score for each threshold
+    """
+    true_positives: np.ndarray = count_at_least(scores_gt, thresholds)
+    false_positives: np.ndarray = len(scores_prediction) - count_at_least(scores_prediction, thresholds)
+    false_negatives: np.ndarray = len(scores_gt) - true_positives
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        precision: np.ndarray = np.where(true_positives + false_positives > 0,
+                                         true_positives / (true_positives + false_positives), 0.0)
+        recall: np.ndarray = np.where(true_positives + false_negatives > 0,
+                                      true_positives / (true_positives + false_negatives), 0.0)
+        f1_score: np.ndarray = np.where(precision + recall > 0, 2 * ((precision * recall) / (precision + recall)), 0.0)
+    return precision, recall, f1_score
@@ -0,0 +1,186 @@
+"""
+Time limits of the documents and metrics of an evaluation.
+A malformed prediction, e.g. a gigantic cell whose point grid has billions of points, can keep a computation of shapely
+or numpy busy for hours. Such a computation can't be interrupted in its own process, so the documents are evaluated by
+a worker process and a watchdog in the evaluating process terminates the worker if a document or one of its metrics
+exceeds its time limit. The next document is evaluated by a new worker.
+
+The worker is forked from the evaluating process, so it has the same configuration, e.g. the thresholds of the
+metrics. The metrics of the worker report their start and end, see metric, so the watchdog knows how long each metric
+took and which metric exceeded its limit.
+"""
+import multiprocessing
+import time
+from contextlib import contextmanager
+from multiprocessing.connection import Connection
+from typing import Callable, Iterator, List, Optional
+
+STARTED: str = "started"
+FINISHED: str = "finished"
+RESULT: str = "result"
+ERROR: str = "error"
+
+# connection of a worker process to the watchdog, none outside of a worker
+_worker_connection: Optional[Connection] = None
+
+
+class DocumentStopped(RuntimeError):
+    """
+    the watchdog stopped the evaluation of a document, because it exceeded a time limit or its worker process ended
+    """
+    pass
+
+
+def _run_worker(connection: Connection, watchdog_connection: Connection, evaluate: Callable):
+    """
+    evaluates the documents which are sent through the connection until it's closed
+    :param watchdog_connection: the end of the watchdog which is inherited by the fork, it's closed so the worker
+    notices when the watchdog closes it
+    """
+    global _worker_connection
+    watchdog_connection.close()
+    _worker_connection = connection
+    while True:
+        try:
+            arguments: tuple = connection.recv()
+        except EOFError:
+            return
+        try:
+            result = evaluate(*arguments)
+        except Exception as error:
+            connection.send((ERROR, error))
+            continue
+        connection.send((RESULT, result))
+
+
+@contextmanager
+def metric(name: str) -> Iterator[None]:
+    """
+    reports the start and the end of a metric to the watchdog, nothing happens outside of a worker process
+    """
+    if _worker_connection is None:
+        yield
+        return
+    _worker_connection.send((STARTED, name))
+    try:
+        yield
+    finally:
+        _worker_connection.send((FINISHED, name))
+
+
+class TimeLimits:
+    """
+    evaluates documents in a worker process with a time limit for each document and for each of its metrics
+    """
+    __slots__ = ("document_limit", "metric_limit", "documents", "_evaluate", "_process", "_connection")
+
+    def __init__(self, evaluate: Callable, document_limit: Optional[float] = None,
+                 metric_limit: Optional[float] = None):
+        """
+        :param evaluate: evaluates a document in the worker, its result and its exceptions are passed on
+        :param document_limit: maximum seconds for a document, none for no limit
+        :param metric_limit: maximum seconds for a metric of a document, the time of a metric is summed over all
+        revisions of the document. None for no limit.
+        """
+        self.document_limit: Optional[float] = document_limit
+        self.metric_limit: Optional[float] = metric_limit
+        # one record per stopped document with its filename, its time until it was stopped, the time of each metric
+        # and the reason
+        self.documents: List[dict] = []
+        self._evaluate: Callable = evaluate
+        self._process: Optional[multiprocessing.Process] = None
+        self._connection: Optional[Connection] = None
+
+    def _start(self):
+        self._connection, worker_connection = multiprocessing.Pipe()
+        # not a daemon, so the worker can start the processes of parallel.CellPool
+        self._process = multiprocessing.get_context("fork").Process(
+            target=_run_worker, args=(worker_connection, self._connection, self._evaluate), daemon=False)
+        self._process.start()
+        worker_connection.close()
+
+    def _stop(self):
+        """
+        terminates the worker, a stuck worker doesn't react to anything else
+        """
+        self._process.kill()
+        self._process.join()
+        self._connection.close()
+        self._process = None
+        self._connection = None
+
+    def close(self):
+        if self._process is not None:
+            self._connection.close()
+            self._process.join()
+            self._process = None
+            self._connection = None
+
+    def evaluate(self, filename: str, *arguments):
+        """
+        evaluates a document in the worker process
+        :return: the result of the evaluation of the document
+        :raises DocumentStopped: if the document or one of its metrics exceeded its time limit or if the worker ended
+        unexpectedly, e.g. after a crash. The document is recorded in documents.
+        """
+        if self._process is None:
+            self._start()
+        self._connection.send(arguments)
+
+        start: float = time.monotonic()
+        metrics: dict = {}
+        # the metric which is running and when it started
+        running: Optional[str] = None
+        metric_start: float = start
+        while True:
+            now: float = time.monotonic()
+            deadlines: List[float] = []
+            if self.document_limit is not None:
+                deadlines.append(start + self.document_limit)
+            if running is not None and self.metric_limit is not None:
+                deadlines.append(metric_start - metrics.get(running, 0) + self.metric_limit)
+            timeout: Optional[float] = max(0.0, min(deadlines) - now) if len(deadlines) > 0 else None
+            if not self._connection.poll(timeout):
+                break
+            try:
+                kind, value = self._connection.recv()
+            except EOFError:
+                self._process.join()
+                reason: str = "worker process ended with exit code " + str(self._process.exitcode)
+                self._stop()
+                self._record(filename, start, metrics, running, metric_start, reason)
+            now = time.monotonic()
+            if kind == STARTED:
+                running, metric_start = value, now
+            elif kind == FINISHED:
+                metrics[value] = metrics.get(value, 0) + now - metric_start
+                running = None
+            elif kind == RESULT:
+                return value
+            else:
+                raise value
+
+        self._stop()
+        if running is not None and self.metric_limit is not None and \
+                metrics.get(running, 0) + time.monotonic() - metric_start >= self.metric_limit:
+            reason = "metric " + running + " exceeded the time limit of " + seconds(self.metric_limit)
+        else:
+            reason = "document exceeded the time limit of " + seconds(self.document_limit) + \
+                     (" in metric " + running if running is not None else "")
+        self._record(filename, start, metrics, running, metric_start, reason)
+
+    def _record(self, filename: str, start: float, metrics: dict, running: Optional[str], metric_start: float,
+                reason: str):
+        """
+        records the stopped document
+        :raises DocumentStopped: always
+        """
+        now: float = time.monotonic()
+        if running is not None:
+            metrics[running] = metrics.get(running, 0) + now - metric_start
+        self.documents.append({"filename": filename, "seconds": now - start, "metrics": metrics, "reason": reason})
+        raise DocumentStopped("Stopped [" + filename + "] after " + seconds(now - start) + ": " + reason)
+
+
+def seconds(duration: float) -> str:
+    return "%.1f s" % duration
@@ -1,11 +1,18 @@
 from docrecjson.elements import Cell, Table
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 
+import numpy as np
 from shapely.geometry import Polygon
 
 from loguru import logger
 from shapely.validation import make_valid
 
+import python.evaluations.quadrilaterals as quadrilaterals
+from python.evaluations.columnar import ColumnarTable
+
+# base cells per block of candidate_pairs, the bounds of a block are compared with the bounds of all cells at once
+PAIR_BLOCK_CELLS: int = 256
+
 
 def find_cell_with_highest_intersection_area(cell: Cell, cells_to_search: List[Cell]) -> Optional[Cell]:
     """
@@ -14,21 +21,32 @@ def find_cell_with_highest_intersection_area(cell: Cell, cells_to_search: List[C
     :param cells_to_search: list of cells to search a matching candidate
     :return: the matching cell or none if there is no intersecting cell in cells_to_search
     """
+    index: Optional[int] = find_index_of_cell_with_highest_intersection_area(cell, cells_to_search)
+    return cells_to_search[index] if index is not None else None
+
+
+def find_index_of_cell_with_highest_intersection_area(cell: Cell, cells_to_search: List[Cell]) -> Optional[int]:
+    """
+    returns the index of the cell from cells_to_search with the highest intersection to cell
+    :param cell: base cell
+    :param cells_to_search: list of cells to search a matching candidate
+    :return: the index of the matching cell or none if there is no intersecting cell in cells_to_search
+    """
     cell_area: Polygon = Polygon(cell.bounding_box.polygon)
 
-    cell_with_highest_intersection: Optional[Cell] = None
+    index_with_highest_intersection: Optional[int] = None
     highest_intersection: float = 0
 
     search_cell: Cell
-    for search_cell in cells_to_search:
+    for index, search_cell in enumerate(cells_to_search):
         search_cell_area: Polygon = Polygon(search_cell.bounding_box.polygon)
         if search_cell_area.intersects(cell_area):
             intersection = search_cell_area.intersection(cell_area)
             if intersection.area > highest_intersection:
                 highest_intersection = intersection.area
-                cell_with_highest_intersection = search_cell
+                index_with_highest_intersection = index
 
-    return cell_with_highest_intersection
+    return index_with_highest_intersection
 
 
 def match_tables(tables_gt: List[Table], tables_prediction: List[Table]) -> Dict[Table, Table]:
@@ -59,3 +77,191 @@ def match_tables(tables_gt: List[Table], tables_prediction: List[Table]) -> Dict
         matched_tables[table_gt] = prediction_table_with_highest_intersection
 
     return matched_tables
+
+
+def candidate_cells(table: ColumnarTable, index: int, table_to_search: ColumnarTable,
+                    available: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    returns the cells of table_to_search whose bounding box overlaps or touches the bounding box of the cell.
+    Cells outside of this selection can't intersect the cell.
+    :param table: table of the base cell
+    :param index: index of the base cell
+    :param table_to_search: table to search candidates in
+    :param available: optional mask of the cells of table_to_search which may be considered
+    :return: the indices of the candidate cells in ascending order
+    """
+    x_min, y_min, x_max, y_max = table.bounds[index]
+    bounds: np.ndarray = table_to_search.bounds
+    overlapping: np.ndarray = (bounds[:, 0] <= x_max) & (bounds[:, 2] >= x_min) & \
+                              (bounds[:, 1] <= y_max) & (bounds[:, 3] >= y_min)
+    if available is not None:
+        overlapping &= available
+    return np.flatnonzero(overlapping)
+
+
+def candidate_pairs(table: ColumnarTable, table_to_search: ColumnarTable,
+                    cells: Optional[range] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    candidate_cells of all base cells at once
+    :param cells: indices of the base cells, all cells of table if none
+    :return: the index of the base cell and the index of the candidate cell of each pair, ordered by base cell and
+    candidate cell
+    """
+    cells = cells if cells is not None else range(len(table))
+    bounds: np.ndarray = table_to_search.bounds
+    rows: List[np.ndarray] = []
+    columns: List[np.ndarray] = []
+    for block_start in range(cells.start, cells.stop, PAIR_BLOCK_CELLS):
+        block: np.ndarray = table.bounds[block_start:min(block_start + PAIR_BLOCK_CELLS, cells.stop), None]
+        overlapping: np.ndarray = (bounds[:, 0] <= block[..., 2]) & (bounds[:, 2] >= block[..., 0]) & \
+                                  (bounds[:, 1] <= block[..., 3]) & (bounds[:, 3] >= block[..., 1])
+        block_rows, block_columns = np.nonzero(overlapping)
+        rows.append(block_rows + block_start)
+        columns.append(block_columns)
+    if len(rows) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(rows), np.concatenate(columns)
+
+
+def _quadrilateral_pairs(table: ColumnarTable, table_to_search: ColumnarTable, rows: np.ndarray,
+                         columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :return: the pairs of two convex quadrilaterals and the corners of their cells
+    """
+    corners, convex = table.quadrilaterals()
+    search_corners, search_convex = table_to_search.quadrilaterals()
+    quadrilateral: np.ndarray = convex[rows] & search_convex[columns]
+    return quadrilateral, corners[rows[quadrilateral]], search_corners[columns[quadrilateral]]
+
+
+def intersecting_pairs(table: ColumnarTable, table_to_search: ColumnarTable, rows: np.ndarray,
+                       columns: np.ndarray) -> np.ndarray:
+    """
+    :param rows: indices of the cells of table
+    :param columns: indices of the cells of table_to_search
+    :return: whether the cells of each pair intersect, cells which only touch intersect
+    """
+    quadrilateral, corners, search_corners = _quadrilateral_pairs(table, table_to_search, rows, columns)
+    intersecting: np.ndarray = np.empty(len(rows), dtype=bool)
+    intersecting[quadrilateral] = quadrilaterals.intersects(search_corners, corners)
+    if not quadrilateral.all():
+        cell_areas: List[Polygon] = table.shapes()
+        search_cell_areas: List[Polygon] = table_to_search.shapes()
+        for position in np.flatnonzero(~quadrilateral):
+            intersecting[position] = search_cell_areas[columns[position]].intersects(cell_areas[rows[position]])
+    return intersecting
+
+
+def intersection_areas(table: ColumnarTable, table_to_search: ColumnarTable, rows: np.ndarray,
+                       columns: np.ndarray) -> np.ndarray:
+    """
+    :param rows: indices of the cells of table
+    :param columns: indices of the cells of table_to_search
+    :return: the area of the intersection of the cells of each pair, 0 if they don't intersect
+    """
+    quadrilateral, corners, search_corners = _quadrilateral_pairs(table, table_to_search, rows, columns)
+    areas: np.ndarray = np.empty(len(rows))
+    areas[quadrilateral] = quadrilaterals.intersection_areas(search_corners, corners)
+    if not quadrilateral.all():
+        cell_areas: List[Polygon] = table.shapes()
+        search_cell_areas: List[Polygon] = table_to_search.shapes()
+        for position in np.flatnonzero(~quadrilateral):
+            cell_area: Polygon = cell_areas[rows[position]]
+            search_cell_area: Polygon = search_cell_areas[columns[position]]
+            areas[position] = search_cell_area.intersection(cell_area).area \
+                if search_cell_area.intersects(cell_area) else 0
+    return areas
+
+
+def cell_areas(table: ColumnarTable, cells: np.ndarray) -> np.ndarray:
+    """
+    :return: the area of each of the cells
+    """
+    corners, convex = table.quadrilaterals()
+    areas: np.ndarray = quadrilaterals.areas(corners[cells])
+    if not convex[cells].all():
+        shapes: List[Polygon] = table.shapes()
+        for position in np.flatnonzero(~convex[cells]):
+            areas[position] = shapes[cells[position]].area
+    return areas
+
+
+def _highest_intersections(rows: np.ndarray, columns: np.ndarray, areas: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: the base cells with an intersecting cell and the index of the cell with the highest intersection area,
+    the first of several cells with the same area
+    """
+    order: np.ndarray = np.lexsort((columns, -areas, rows))
+    first: np.ndarray = order[np.flatnonzero(np.diff(rows[order], prepend=-1) != 0)]
+    first = first[areas[first] > 0]
+    return rows[first], columns[first]
+
+
+def find_index_of_columnar_cell_with_highest_intersection_area(table: ColumnarTable, index: int,
+                                                               table_to_search: ColumnarTable,
+                                                               available: Optional[np.ndarray] = None) \
+        -> Optional[int]:
+    """
+    columnar version of find_index_of_cell_with_highest_intersection_area
+    :param table: table of the base cell
+    :param index: index of the base cell
+    :param table_to_search: table to search a matching candidate in
+    :param available: optional mask of the cells of table_to_search which may be matched
+    :return: the index of the matching cell or none if there is no intersecting cell in table_to_search
+    """
+    columns: np.ndarray = candidate_cells(table, index, table_to_search, available)
+    rows: np.ndarray = np.full(len(columns), index)
+    _, matching_indices = _highest_intersections(rows, columns,
+                                                 intersection_areas(table, table_to_search, rows, columns))
+    return int(matching_indices[0]) if len(matching_indices) > 0 else None
+
+
+def match_columnar_cells(table: ColumnarTable, table_to_search: ColumnarTable,
+                         cells: Optional[range] = None) -> np.ndarray:
+    """
+    :param table: table with the base cells
+    :param table_to_search: table to search the matching cells in
+    :param cells: indices of the base cells, all cells of table if none
+    :return: the index of the cell with the highest intersection for each base cell, -1 if there is none
+    """
+    cells = cells if cells is not None else range(len(table))
+    rows, columns = candidate_pairs(table, table_to_search, cells)
+    matched_rows, matched_columns = _highest_intersections(rows, columns,
+                                                           intersection_areas(table, table_to_search, rows, columns))
+    matching_indices: np.ndarray = np.full(len(cells), -1, dtype=np.int64)
+    matching_indices[matched_rows - cells.start] = matched_columns
+    return matching_indices
+
+
+def match_columnar_tables(tables_gt: List[ColumnarTable],
+                          tables_prediction: List[ColumnarTable]) -> List[Optional[int]]:
+    """
+    columnar version of match_tables
+    :param: tables_gt: ground truth tables
+    :param: tables_prediction: prediction tables
+    :return: the index of the matching prediction table for each gt table, none if there is no matching table
+    """
+    table_prediction_areas: List[Polygon] = []
+    for table_prediction in tables_prediction:
+        table_prediction_area: Polygon = table_prediction.table_shape()
+        if not table_prediction_area.is_valid:
+            logger.warning("Getting invalid prediction table! Please review the order of the Polygon coordinates.")
+            logger.warning("Trying to resolve the invalid polygon: ")
+            table_prediction_area = make_valid(table_prediction_area)
+        table_prediction_areas.append(table_prediction_area)
+
+    matched_tables: List[Optional[int]] = []
+    for table_gt in tables_gt:
+        table_gt_area: Polygon = table_gt.table_shape()
+        prediction_table_with_highest_intersection: Optional[int] = None
+        highest_intersection: float = 0
+        for prediction_index, table_prediction_area in enumerate(table_prediction_areas):
+            if table_gt_area.intersects(table_prediction_area):
+                intersection = table_gt_area.intersection(table_prediction_area)
+                if intersection.area > highest_intersection:
+                    highest_intersection = intersection.area
+                    prediction_table_with_highest_intersection = prediction_index
+
+        matched_tables.append(prediction_table_with_highest_intersection)
+
+    return matched_tables
@@ -0,0 +1,53 @@
+"""
+columnar tables for the tests, built without a docrecjson document
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+from python.evaluations.columnar import ColumnarTable
+from python.evaluations.table_structure import TableStructure
+
+WORDS = ["alpha", "beta", "gamma", "delta", "42", "foo bar"]
+
+
+def _offsets(lengths: List[int]) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+
+def polygon_table(polygons: List[np.ndarray], cells: List[Tuple[int, int]], texts: List[str]) -> ColumnarTable:
+    """
+    :param cells: row and column index of each cell
+    :return: a table of the cell polygons, the table polygon is the bounding box of the cells
+    """
+    vertices: np.ndarray = np.concatenate(polygons)
+    vertex_offsets: np.ndarray = _offsets([len(polygon) for polygon in polygons])
+    row_indices: np.ndarray = np.array([row for row, column in cells], dtype=np.int64)
+    column_indices: np.ndarray = np.array([column for row, column in cells], dtype=np.int64)
+    (x_min, y_min), (x_max, y_max) = vertices.min(axis=0), vertices.max(axis=0)
+    return ColumnarTable(
+        table_polygon=np.array([[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]),
+        bounds=np.concatenate([np.minimum.reduceat(vertices, vertex_offsets[:-1]),
+                               np.maximum.reduceat(vertices, vertex_offsets[:-1])], axis=1),
+        vertices=vertices, vertex_offsets=vertex_offsets,
+        structure=TableStructure(row_indices, row_indices, column_indices, column_indices,
+                                 np.bincount(row_indices), np.bincount(column_indices)),
+        text="".join(texts), text_offsets=_offsets([len(text) for text in texts]),
+        has_text=np.ones(len(cells), dtype=bool))
+
+
+def grid_table(random: np.random.Generator, x: float, y: float, rows: int, columns: int, jitter: float = 0.0,
+               drop: float = 0.0) -> ColumnarTable:
+    """
+    :return: a grid of rows x columns cells of 40 x 12 pixels, each cell is dropped with the probability drop
+    """
+    cells: List[Tuple[int, int]] = [(row, column) for row in range(rows) for column in range(columns)
+                                    if random.random() >= drop]
+    polygons: List[np.ndarray] = []
+    texts: List[str] = []
+    for row, column in cells:
+        x_min, y_min = x + column * 40, y + row * 12
+        corners = np.array([[x_min, y_min], [x_min + 40, y_min], [x_min + 40, y_min + 12], [x_min, y_min + 12]])
+        polygons.append(corners + random.uniform(-jitter, jitter, (4, 2)))
+        texts.append(str(random.choice(WORDS)))
+    return polygon_table(polygons, cells, texts)
@@ -0,0 +1,115 @@
+import gzip
+import io
+import os
+import tarfile
+import zipfile
+from typing import Dict
+
+import pytest
+
+import python.evaluations.archives as archives
+import script_utilities
+from python.evaluations.archives import ArchiveReader
+
+# stored name -> stored data, the gz member is decompressed when it's read
+MEMBERS: Dict[str, bytes] = {"a.json": b'{"a": 1}', "./b.json": b'{"b": 2}',
+                             "nested/c.json.gz": gzip.compress(b'{"c": 3}'), "first/d.json": b"first",
+                             "second/d.json": b"second", "nested/.hidden.json": b"hidden"}
+# name and decompressed data of each visible member
+FILES: Dict[str, bytes] = {"a.json": b'{"a": 1}', "b.json": b'{"b": 2}', "nested/c.json.gz": b'{"c": 3}',
+                           "first/d.json": b"first", "second/d.json": b"second"}
+
+
+def _write_tar(path: str, mode: str, members: Dict[str, bytes]):
+    with tarfile.open(path, mode) as archive:
+        directory: tarfile.TarInfo = tarfile.TarInfo("nested")
+        directory.type = tarfile.DIRTYPE
+        archive.addfile(directory)
+        for name, data in members.items():
+            info: tarfile.TarInfo = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def _write_zip(path: str, members: Dict[str, bytes]):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("nested/", b"")
+        for name, data in members.items():
+            archive.writestr(name, data)
+
+
+def _archives(directory) -> Dict[str, str]:
+    """
+    :return: the path of an archive of the members for each archive type
+    """
+    paths: Dict[str, str] = {extension: str(directory / ("archive" + extension))
+                             for extension in [".tar", ".tar.gz", ".tgz", ".zip"]}
+    _write_tar(paths[".tar"], "w", MEMBERS)
+    _write_tar(paths[".tar.gz"], "w:gz", MEMBERS)
+    _write_tar(paths[".tgz"], "w:gz", MEMBERS)
+    _write_zip(paths[".zip"], MEMBERS)
+    return paths
+
+
+def test_compression_extensions(tmp_path):
+    assert archives.strip_compression("a.json.gz") == "a.json"
+    assert archives.strip_compression("a.json.zst") == "a.json"
+    assert archives.strip_compression("a.json") == "a.json"
+    for path in _archives(tmp_path).values():
+        assert archives.is_archive(path)
+    assert not archives.is_archive(str(tmp_path / "missing.tar"))
+    (tmp_path / "a.json.gz").write_bytes(gzip.compress(b"data"))
+    assert not archives.is_archive(str(tmp_path / "a.json.gz"))
+    with archives.open_file(str(tmp_path / "a.json.gz")) as compressed_file:
+        assert compressed_file.read() == b"data"
+
+
+def test_members_are_read_in_order(tmp_path):
+    for extension, path in _archives(tmp_path).items():
+        assert dict(archives.iter_members(path)) == FILES, extension
+        assert list(archives.iter_members(path, lambda name: name.endswith(".gz"))) == \
+            [("nested/c.json.gz", b'{"c": 3}')]
+        # compressed tar archives would have to be decompressed completely
+        assert archives.member_count(path) == (None if extension in [".tar.gz", ".tgz"] else len(FILES))
+
+
+def test_reader_finds_the_files_by_name(tmp_path):
+    for extension, path in _archives(tmp_path).items():
+        reader: ArchiveReader = ArchiveReader(path)
+        assert sorted(reader.names()) == sorted(FILES)
+        for name, data in FILES.items():
+            assert reader.read(reader.find(name)) == data, extension
+        # a unique filename is found without its directory, an ambiguous one isn't
+        assert reader.find("c.json.gz") == "nested/c.json.gz"
+        assert reader.find("d.json") is None
+        assert reader.find(".hidden.json") is None
+        reader.close()
+
+
+def test_zstandard_members(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    compressor = zstandard.ZstdCompressor()
+    path: str = str(tmp_path / "archive.tar.zst")
+    tar_path: str = str(tmp_path / "archive.tar")
+    _write_tar(tar_path, "w", {"a.json.zst": compressor.compress(b"a"), "b.json": b"b"})
+    with open(tar_path, "rb") as tar_file:
+        (tmp_path / "archive.tar.zst").write_bytes(compressor.compress(tar_file.read()))
+    assert dict(archives.iter_members(path)) == {"a.json.zst": b"a", "b.json": b"b"}
+    assert ArchiveReader(path).read("a.json.zst") == b"a"
+
+
+def test_changed_archive_is_opened_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(script_utilities, "_archive_readers", {})
+    path: str = str(tmp_path / "archive.zip")
+    _write_zip(path, {"a.json": b"first"})
+    reader: ArchiveReader = script_utilities.open_archive(path)
+    assert script_utilities.open_archive(path) is reader
+
+    _write_zip(path, {"a.json": b"second", "b.json": b"new"})
+    # the modification time decides, it's set explicitly for file systems with a coarse resolution
+    modification_time: int = os.stat(path).st_mtime_ns
+    os.utime(path, ns=(modification_time, modification_time + 10 ** 9))
+    changed: ArchiveReader = script_utilities.open_archive(path)
+    assert changed is not reader
+    assert changed.read("a.json") == b"second"
+    assert sorted(changed.names()) == ["a.json", "b.json"]
@@ -0,0 +1,121 @@
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+import python.evaluations.columnar as columnar
+import python.evaluations.columnar_store as columnar_store
+import script_utilities
+from columnar_tables import grid_table, polygon_table
+from python.evaluations.columnar import ColumnarDocument, ColumnarTable
+
+
+def _documents(random: np.random.Generator) -> List[ColumnarDocument]:
+    squares = [np.array([[x, 0], [x + 10, 0], [x + 10, 10], [x, 10]], dtype=np.float64) for x in [0, 10, 20]]
+    return [ColumnarDocument("first.png", [grid_table(random, 10, 10, 4, 3),
+                                           grid_table(random, 10, 200, 5, 2, jitter=2, drop=0.2)]),
+            ColumnarDocument("empty.png", []),
+            # a triangle and texts with more bytes than characters
+            ColumnarDocument("second.png", [polygon_table(squares[:2] + [np.array([[20, 0], [30, 0], [25, 10]])],
+                                                          [(0, 0), (0, 1), (1, 0)], ["äöü", "", "€ 42"])])]
+
+
+def _assert_equal_tables(table: ColumnarTable, expected: ColumnarTable):
+    for attribute in ["table_polygon", "bounds", "vertices", "vertex_offsets", "text_offsets", "has_text"]:
+        assert np.array_equal(getattr(table, attribute), getattr(expected, attribute)), attribute
+    for attribute in expected.structure._fields:
+        assert np.array_equal(getattr(table.structure, attribute), getattr(expected.structure, attribute)), attribute
+    assert table.text == expected.text
+    assert [table.cell_text(index) for index in range(len(table))] == \
+        [expected.cell_text(index) for index in range(len(expected))]
+
+
+def test_round_trip(tmp_path):
+    documents: List[ColumnarDocument] = _documents(np.random.default_rng(0))
+    directory: str = str(tmp_path / "store")
+    columnar_store.write_store(directory, [("key_" + str(index), document, {"source": str(index) + ".json"})
+                                           for index, document in enumerate(documents)], {"sources": {"a": 1}})
+
+    manifest: dict = columnar_store.read_manifest(directory)
+    assert manifest["sources"] == {"a": 1}
+    assert manifest["documents"]["key_2"]["source"] == "2.json"
+
+    store = columnar_store.open_store(directory)
+    assert len(store) == len(documents)
+    assert "key_1" in store and "key_3" not in store
+    for index, expected in enumerate(documents):
+        document: ColumnarDocument = store.load("key_" + str(index))
+        assert document.filename == expected.filename
+        assert len(document.tables) == len(expected.tables)
+        for table, expected_table in zip(document.tables, expected.tables):
+            _assert_equal_tables(table, expected_table)
+
+
+def test_write_replaces_the_store(tmp_path):
+    documents: List[ColumnarDocument] = _documents(np.random.default_rng(1))
+    directory: str = str(tmp_path / "store")
+    columnar_store.write_store(directory, [("first", documents[0], {}), ("second", documents[2], {})])
+    columnar_store.write_store(directory, [("second", documents[2], {})])
+    store = columnar_store.open_store(directory)
+    assert list(store.documents) == ["second"]
+    _assert_equal_tables(store.load("second").tables[0], documents[2].tables[0])
+    assert not os.path.exists(directory + ".tmp")
+
+
+def test_missing_or_outdated_store_is_rejected(tmp_path):
+    directory: str = str(tmp_path / "store")
+    assert columnar_store.read_manifest(directory) is None
+    with pytest.raises(RuntimeError):
+        columnar_store.open_store(directory)
+
+    columnar_store.write_store(directory, [])
+    manifest_path: str = os.path.join(directory, columnar_store.MANIFEST_FILENAME)
+    with open(manifest_path) as manifest_file:
+        manifest: dict = json.load(manifest_file)
+    manifest["version"] = columnar_store.STORE_VERSION + 1
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file)
+    assert columnar_store.read_manifest(directory) is None
+
+
+def test_changed_ground_truth_is_compiled_again(tmp_path, monkeypatch):
+    ground_truth_directory = tmp_path / "ground_truth"
+    ground_truth_directory.mkdir()
+    store_directory: str = str(tmp_path / "store")
+    parsed: List[str] = []
+
+    def load_document(filepath: str) -> int:
+        # each ground truth file holds the seed of its table
+        parsed.append(os.path.basename(filepath))
+        with open(filepath) as ground_truth_file:
+            return int(ground_truth_file.read())
+
+    def from_document(seed: int) -> ColumnarDocument:
+        return ColumnarDocument(str(seed), [grid_table(np.random.default_rng(seed), 10, 10, 3, 3, jitter=2)])
+
+    monkeypatch.setattr(script_utilities, "load_document", load_document)
+    monkeypatch.setattr(columnar, "from_document", from_document)
+
+    def load(expected_seeds: Dict[str, int]):
+        parsed.clear()
+        store = script_utilities.load_ground_truth_store(str(ground_truth_directory), store_directory)
+        assert len(store) == len(expected_seeds)
+        for source, seed in expected_seeds.items():
+            expected: ColumnarTable = grid_table(np.random.default_rng(seed), 10, 10, 3, 3, jitter=2)
+            _assert_equal_tables(store.load(os.path.splitext(source)[0]).tables[0], expected)
+        return sorted(parsed)
+
+    (ground_truth_directory / "a.json").write_text("1")
+    (ground_truth_directory / "b.json").write_text("2")
+    assert load({"a.json": 1, "b.json": 2}) == ["a.json", "b.json"]
+    # an unchanged directory uses the compiled store
+    assert load({"a.json": 1, "b.json": 2}) == []
+
+    (ground_truth_directory / "b.json").write_text("33")
+    assert load({"a.json": 1, "b.json": 33}) == ["a.json", "b.json"]
+    (ground_truth_directory / "c.json").write_text("4")
+    assert load({"a.json": 1, "b.json": 33, "c.json": 4}) == ["a.json", "b.json", "c.json"]
+    os.remove(ground_truth_directory / "a.json")
+    assert load({"b.json": 33, "c.json": 4}) == ["b.json", "c.json"]
@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+import pytest
+
+import python.evaluations.confidence as confidence
+from python.evaluations.confidence import DocumentScores, RunningStatistics
+
+
+def test_running_statistics():
+    values: np.ndarray = np.random.default_rng(0).normal(3, 2, 100)
+    statistics: RunningStatistics = RunningStatistics()
+    for value in values:
+        statistics.add(float(value))
+    assert statistics.mean == pytest.approx(np.mean(values))
+    assert statistics.variance() == pytest.approx(np.var(values, ddof=1))
+    assert statistics.interval_width(1.96) == pytest.approx(2 * 1.96 * np.std(values, ddof=1) / 10)
+    # all documents are evaluated
+    assert statistics.interval_width(1.96, population_size=100) == 0
+    assert RunningStatistics().interval_width(1.96) == math.inf
+
+
+def test_z_value():
+    assert confidence.z_value(0.95) == pytest.approx(1.959964, abs=1e-6)
+    with pytest.raises(ValueError):
+        confidence.z_value(1)
+
+
+def test_document_scores_fill_missing_values_with_nan():
+    scores: DocumentScores = DocumentScores()
+    for index in range(1500):
+        scores.add({"iou": {"original": index}} if index % 2 == 0 else {"purity": {"corrected": -index}})
+    values: np.ndarray = scores.values()
+    assert values.shape == (1500, 2)
+    assert np.array_equal(values[::2, scores.columns[("iou", "original")]], np.arange(0, 1500, 2))
+    assert np.isnan(values[1::2, scores.columns[("iou", "original")]]).all()
+    assert np.isnan(values[::2, scores.columns[("purity", "corrected")]]).all()
+
+
+def test_bootstrap_means_equal_resampled_means():
+    random: np.random.Generator = np.random.default_rng(1)
+    values: np.ndarray = random.random((30, 3))
+    values[random.random(values.shape) < 0.2] = np.nan
+    means: np.ndarray = confidence.bootstrap_means(values, 200, seed=2)
+
+    # the documents of each resample are drawn with replacement, the means skip the missing values
+    drawn: np.ndarray = np.random.default_rng(2).integers(0, len(values), size=(200, len(values)))
+    assert np.allclose(means, np.nanmean(values[drawn], axis=1), equal_nan=True)
+    # the chunks draw the same documents
+    assert np.allclose(confidence.bootstrap_means(values, 200, seed=2, chunk_size=100), means, equal_nan=True)
+
+
+def test_percentile_intervals():
+    resampled_means: np.ndarray = np.column_stack([np.arange(101), np.arange(101) * 2.0])
+    lower, upper = confidence.percentile_intervals(resampled_means, 0.9)
+    assert np.allclose(lower, [5, 10])
+    assert np.allclose(upper, [95, 190])
+
+
+def test_paired_p_values():
+    differences: np.ndarray = np.array([[-1, 1, 1, np.nan],
+                                        [1, 2, 0, np.nan],
+                                        [2, 3, 0, np.nan],
+                                        [3, 4, -1, 2]])
+    # the share of the resamples on the smaller side of zero, twice for both sides. Zero counts on both sides.
+    assert np.allclose(confidence.paired_p_values(differences), [0.5, 0, 1, 0])
+
+
+def test_p_values_of_equal_means_are_about_uniform():
+    random: np.random.Generator = np.random.default_rng(3)
+    p_values = []
+    for seed in range(200):
+        differences: np.ndarray = random.normal(0, 1, (50, 1))
+        p_values.append(confidence.paired_p_values(confidence.bootstrap_means(differences, 400, seed))[0])
+    assert 0.01 <= np.mean(np.array(p_values) < 0.05) <= 0.12
+    assert 0.4 <= np.mean(p_values) <= 0.6
+
+    # a real difference of half a standard deviation is found in most samples
+    p_values = [confidence.paired_p_values(confidence.bootstrap_means(random.normal(0.5, 1, (50, 1)), 400, seed))[0]
+                for seed in range(50)]
+    assert np.mean(np.array(p_values) < 0.05) >= 0.9
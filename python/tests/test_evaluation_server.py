@@ -0,0 +1,95 @@
+import json
+import threading
+from http.client import HTTPConnection
+from types import SimpleNamespace
+from typing import Callable, Iterator, Optional, Tuple
+
+import pytest
+
+import evaluation_server
+import exec_evaluations
+from evaluation_server import EvaluationServer
+from python.evaluations.columnar import ColumnarDocument
+from python.evaluations.memory_accounting import MemoryBudgetExceeded
+
+
+def _loads(body: str) -> SimpleNamespace:
+    """
+    decodes a prediction without docrecjson, a prediction without revisions is missing a field
+    """
+    data: dict = json.loads(body)
+    return SimpleNamespace(filename=data.get("filename"), revisions=data["revisions"])
+
+
+def _evaluate_document(evaluation, ground_truth: ColumnarDocument, prediction: SimpleNamespace, *args) -> dict:
+    """
+    the revisions of the prediction decide how its evaluation ends
+    """
+    if prediction.revisions == "large":
+        raise MemoryBudgetExceeded("Skipped [" + prediction.filename + "]: peak memory is over the budget")
+    if prediction.revisions == "malformed":
+        raise RuntimeError("Mismatching revision sum and total revision dictionary.")
+    if prediction.revisions == "missing image":
+        raise OSError("No image for [" + prediction.filename + "]")
+    return {exec_evaluations.IOU: {"revision:0:original": 0.5}, "ground_truth": ground_truth.filename}
+
+
+@pytest.fixture
+def post(monkeypatch) -> Iterator[Callable[[str, bytes], Tuple[int, dict]]]:
+    """
+    serves evaluations with the ground truth of a.png
+    :return: a function which posts a body to a path and returns the status and the json of the response
+    """
+    monkeypatch.setattr(evaluation_server, "decoder", SimpleNamespace(loads=_loads))
+    monkeypatch.setattr(exec_evaluations, "evaluate_document", _evaluate_document)
+    server: EvaluationServer = EvaluationServer(("127.0.0.1", 0), exec_evaluations.Evaluation(),
+                                                {"a": ColumnarDocument("a.png", [])}, None, 4)
+    thread: threading.Thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def send(path: str, body: bytes) -> Tuple[int, dict]:
+        connection: HTTPConnection = HTTPConnection(*server.server_address, timeout=30)
+        try:
+            connection.request("POST", path, body)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+    try:
+        yield send
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _prediction(revisions: object, filename: Optional[str] = "a.json") -> bytes:
+    return json.dumps({"filename": filename, "revisions": revisions}).encode("utf-8")
+
+
+def test_evaluation_returns_the_metrics(post):
+    status, content = post("/evaluate", _prediction([]))
+    assert status == 200
+    assert content["filename"] == "a.json"
+    assert content["metrics"] == {exec_evaluations.IOU: {"revision:0:original": 0.5}, "ground_truth": "a.png"}
+    # the filename of the request replaces a missing filename of the prediction
+    assert post("/evaluate?filename=a.png", _prediction([], None))[0] == 200
+
+
+def test_errors_are_returned_with_their_status(post):
+    for path, body, status in [
+            ("/evaluate", b"{not json", 400),
+            # the decoder raises a KeyError for the missing field
+            ("/evaluate", json.dumps({"filename": "a.json"}).encode("utf-8"), 400),
+            ("/evaluate", _prediction([], None), 400),
+            ("/evaluate?filename=../a.json", _prediction([]), 400),
+            ("/unknown", _prediction([]), 404),
+            ("/evaluate", _prediction([], "b.json"), 404),
+            ("/evaluate", _prediction("large"), 413),
+            ("/evaluate", _prediction("malformed"), 422),
+            ("/evaluate", _prediction("missing image"), 500)]:
+        response_status, content = post(path, body)
+        assert (response_status, path, body) == (status, path, body)
+        assert content["error"]
+    # the server continues after the errors
+    assert post("/evaluate", _prediction([]))[0] == 200
@@ -0,0 +1,365 @@
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+import numpy as np
+import pytest
+
+import exec_evaluations
+import python.evaluations.confidence as confidence
+import script_utilities
+from exec_evaluations import Evaluation
+from python.evaluations.columnar import ColumnarDocument
+from python.evaluations.confidence import RunningStatistics
+from python.evaluations.live_metrics import LiveMetrics
+from python.evaluations.memory_accounting import MemoryAccounting
+from python.evaluations.parallel import CellPool
+from python.evaluations.time_limits import TimeLimits
+
+REVISION: str = "revision:0:original"
+
+
+def _load_document(filepath: str) -> SimpleNamespace:
+    """
+    each prediction file holds the value of its metrics, a file which isn't a number can't be parsed
+    """
+    with open(filepath) as prediction_file:
+        return SimpleNamespace(filename=os.path.basename(filepath), value=float(prediction_file.read()))
+
+
+def _process_prediction_file(evaluation: Evaluation, ground_truth, metrics: dict, prediction: SimpleNamespace,
+                             image_directory, foreground_mask=None) -> dict:
+    """
+    adds the value of the prediction to two metrics, a negative value fails between them
+    """
+    for metric in [exec_evaluations.IOU, exec_evaluations.PURITY]:
+        revisions: dict = metrics[metric]
+        revisions[REVISION] = revisions[REVISION] + prediction.value if REVISION in revisions else prediction.value
+        if prediction.value < 0:
+            raise RuntimeError("Mismatching revision sum and total revision dictionary.")
+    return metrics
+
+
+@pytest.fixture
+def documents(monkeypatch) -> List[str]:
+    """
+    evaluates the prediction files without decoding them, see _load_document and _process_prediction_file
+    :return: the filenames of the prediction files in the order in which this process loads them
+    """
+    loaded: List[str] = []
+
+    def load_document(filepath: str) -> SimpleNamespace:
+        loaded.append(os.path.basename(filepath))
+        return _load_document(filepath)
+
+    monkeypatch.setattr(script_utilities, "load_document", load_document)
+    monkeypatch.setattr(script_utilities, "get_columnar_ground_truth", lambda filename, *_: filename)
+    monkeypatch.setattr(exec_evaluations, "_process_prediction_file", _process_prediction_file)
+    return loaded
+
+
+def _write_predictions(directory, values: Dict[str, str]) -> str:
+    directory.mkdir(exist_ok=True)
+    for filename, value in values.items():
+        (directory / filename).write_text(value)
+    return str(directory)
+
+
+def _read_partial_runs(filepath: str) -> List[dict]:
+    with open(filepath) as partial_file:
+        return json.load(partial_file)["runs"]
+
+
+def test_failing_documents_are_skipped_with_and_without_document_workers(tmp_path, documents):
+    prediction_directory: str = _write_predictions(tmp_path / "predictions", {
+        "a.json": "0.25", "b.json": "malformed", "c.json": "-1", "d.json": "0.5", "e.json": "0.125"})
+    runs: List[dict] = []
+    for document_workers in [0, 2]:
+        partial_output: str = str(tmp_path / ("partial_" + str(document_workers) + ".json"))
+        exec_evaluations._handle_prediction_directory(Evaluation(), prediction_directory, str(tmp_path),
+                                                      None, partial_output=partial_output,
+                                                      document_workers=document_workers)
+        runs.extend(_read_partial_runs(partial_output))
+
+    # the failing documents are left out of the averages, the partially summed metrics of c.json too
+    for run in runs:
+        assert run["files_considered"] == 3
+        assert run["metrics"][exec_evaluations.IOU] == {REVISION: 0.875}
+        assert run["metrics"][exec_evaluations.PURITY] == {REVISION: 0.875}
+    assert runs[0] == runs[1]
+
+
+def test_prediction_files_are_evaluated_while_the_directory_is_enumerated(tmp_path, documents, monkeypatch):
+    prediction_directory: str = _write_predictions(tmp_path / "predictions",
+                                                   {"%02d.json" % index: "0.5" for index in range(20)})
+    scanned: List[str] = []
+    # number of scanned files when each document was evaluated
+    evaluated: List[int] = []
+    scandir = os.scandir
+
+    @contextlib.contextmanager
+    def counting_scandir(path: str):
+        with scandir(path) as entries:
+            def scan():
+                for entry in entries:
+                    scanned.append(entry.name)
+                    yield entry
+            yield scan()
+
+    def process(evaluation: Evaluation, ground_truth, metrics: dict, prediction: SimpleNamespace, *args) -> dict:
+        evaluated.append(len(scanned))
+        return _process_prediction_file(evaluation, ground_truth, metrics, prediction, *args)
+
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    monkeypatch.setattr(exec_evaluations, "_process_prediction_file", process)
+    exec_evaluations._handle_prediction_directory(Evaluation(), prediction_directory, str(tmp_path), None)
+    # each file is scanned once, right before it's evaluated
+    assert sorted(scanned) == sorted(os.listdir(prediction_directory))
+    assert evaluated == list(range(1, 21))
+
+
+def _watch(prediction_directory: str, partial_output: str) -> dict:
+    """
+    watches the prediction directory until a scan finds no changes
+    :return: the partial results of the watch
+    """
+    exec_evaluations._watch_prediction_directory(Evaluation(), prediction_directory, os.path.dirname(partial_output),
+                                                 None, partial_output=partial_output, interval=0, idle_timeout=0)
+    return _read_partial_runs(partial_output)[0]
+
+
+def test_watch_resumes_and_follows_changed_and_removed_files(tmp_path, documents):
+    predictions = tmp_path / "predictions"
+    prediction_directory: str = _write_predictions(predictions, {"a.json": "0.25", "b.json": "0.5"})
+    partial_output: str = str(tmp_path / "partial.json")
+    run: dict = _watch(prediction_directory, partial_output)
+    assert sorted(documents) == ["a.json", "b.json"]
+    assert (run["files_considered"], run["metrics"][exec_evaluations.IOU]) == (2, {REVISION: 0.75})
+
+    # the restarted watch only evaluates the new file
+    documents.clear()
+    _write_predictions(predictions, {"c.json": "0.125"})
+    run = _watch(prediction_directory, partial_output)
+    assert documents == ["c.json"]
+    assert (run["files_considered"], run["metrics"][exec_evaluations.IOU]) == (3, {REVISION: 0.875})
+
+    # a changed file replaces its earlier metrics, a removed file's metrics are removed
+    documents.clear()
+    _write_predictions(predictions, {"b.json": "0.0625"})
+    os.remove(predictions / "a.json")
+    run = _watch(prediction_directory, partial_output)
+    assert documents == ["b.json"]
+    assert (run["files_considered"], run["metrics"][exec_evaluations.IOU]) == (2, {REVISION: 0.1875})
+    assert run["metrics"][exec_evaluations.PURITY] == {REVISION: 0.1875}
+
+
+def test_watch_skips_malformed_files_once(tmp_path, documents):
+    prediction_directory: str = _write_predictions(tmp_path / "predictions",
+                                                   {"a.json": "0.25", "malformed.json": "{\"revisions\": ["})
+    partial_output: str = str(tmp_path / "partial.json")
+    run: dict = _watch(prediction_directory, partial_output)
+    # the first attempt could have read a file which is still being written, the second one skips it
+    assert sorted(documents) == ["a.json", "malformed.json", "malformed.json"]
+    assert (run["files_considered"], run["metrics"][exec_evaluations.IOU]) == (1, {REVISION: 0.25})
+
+    # the skipped file isn't retried by a restarted watch until it changes
+    documents.clear()
+    run = _watch(prediction_directory, partial_output)
+    assert documents == []
+    assert run["files_considered"] == 1
+
+
+def _sample(prediction_directory: str, partial_output: str, **options) -> dict:
+    """
+    :return: the partial results of the sampled evaluation
+    """
+    exec_evaluations._sample_prediction_directory(Evaluation(), prediction_directory, os.path.dirname(partial_output),
+                                                  None, partial_output=partial_output, seed=7, **options)
+    return _read_partial_runs(partial_output)[0]
+
+
+def test_sampling_stops_once_the_intervals_are_narrow_enough(tmp_path, documents):
+    values: Dict[str, float] = {"%03d.json" % index: (index * 7 % 10) / 10 for index in range(300)}
+    prediction_directory: str = _write_predictions(tmp_path / "predictions",
+                                                   {filename: str(value) for filename, value in values.items()})
+    run: dict = _sample(prediction_directory, str(tmp_path / "partial.json"), interval_width=0.15)
+
+    # the documents are evaluated in the order of the seed until the interval of the mean is narrow enough
+    filepaths: List[str] = exec_evaluations._list_prediction_files(prediction_directory)
+    random.Random(7).shuffle(filepaths)
+    statistics: RunningStatistics = RunningStatistics()
+    for count, filepath in enumerate(filepaths, 1):
+        statistics.add(values[os.path.basename(filepath)])
+        if count >= exec_evaluations.MIN_SAMPLES and \
+                statistics.interval_width(confidence.z_value(0.95), len(filepaths)) <= 0.15:
+            break
+    assert exec_evaluations.MIN_SAMPLES < count < len(filepaths)
+    assert documents == [os.path.basename(filepath) for filepath in filepaths[:count]]
+    assert run["files_considered"] == count
+    assert run["metrics"][exec_evaluations.IOU][REVISION] == pytest.approx(statistics.mean * count)
+
+
+def test_sampling_evaluates_at_least_min_samples(tmp_path, documents, monkeypatch):
+    prediction_directory: str = _write_predictions(tmp_path / "predictions",
+                                                   {"%03d.json" % index: "0.5" for index in range(100)})
+    # the intervals of equal values are narrow after two documents
+    assert _sample(prediction_directory, str(tmp_path / "partial.json"))["files_considered"] == \
+        exec_evaluations.MIN_SAMPLES
+    monkeypatch.setattr(exec_evaluations, "MIN_SAMPLES", 5)
+    assert _sample(prediction_directory, str(tmp_path / "partial.json"))["files_considered"] == 5
+
+
+def test_sampling_stops_when_the_time_budget_is_used_up(tmp_path, documents):
+    prediction_directory: str = _write_predictions(tmp_path / "predictions",
+                                                   {"%03d.json" % index: str(index % 2) for index in range(100)})
+    run: dict = _sample(prediction_directory, str(tmp_path / "partial.json"), time_budget=0)
+    assert run["files_considered"] == len(documents) == 1
+
+
+def test_prefetched_items_keep_their_order_and_bound():
+    for prefetch in [0, 1, 3]:
+        lock: threading.Lock = threading.Lock()
+        # loaded items which the consumer didn't finish yet and their maximum
+        held: Dict[str, int] = {"items": 0, "most": 0}
+
+        def load(item: int) -> int:
+            with lock:
+                held["items"] += 1
+                held["most"] = max(held["most"], held["items"])
+            # the later items are loaded faster
+            time.sleep((20 - item) * 0.001)
+            return item * item
+
+        received: List[tuple] = []
+        for item, loaded in exec_evaluations._prefetched(range(20), load, prefetch):
+            received.append((item, loaded))
+            with lock:
+                held["items"] -= 1
+        assert received == [(item, item * item) for item in range(20)]
+        assert held["most"] == max(prefetch, 1)
+
+
+def test_prefetched_passes_on_the_error_of_an_item():
+    def load(item: int) -> int:
+        if item == 5:
+            raise ValueError("malformed item " + str(item))
+        return item
+
+    for prefetch in [0, 1, 3]:
+        received: List[int] = []
+        with pytest.raises(ValueError, match="malformed item 5"):
+            for item, loaded in exec_evaluations._prefetched(range(20), load, prefetch):
+                received.append(loaded)
+        assert received == [0, 1, 2, 3, 4]
+
+
+def test_prediction_directories_in_one_pass_equal_separate_runs(tmp_path, documents, monkeypatch):
+    prediction_directories: List[str] = [
+        _write_predictions(tmp_path / "first", {"a.json": "0.25", "b.json": "0.5", "c.json": "0.125"}),
+        _write_predictions(tmp_path / "second", {"a.json": "0.75", "c.json": "1"}),
+        _write_predictions(tmp_path / "third", {"b.json": "0.0625", "d.json": "0.5"})]
+    labels: List[str] = ["first run", "second run", "third run"]
+    separate_runs: List[dict] = []
+    for prediction_directory, label in zip(prediction_directories, labels):
+        partial_output: str = str(tmp_path / (label + ".json"))
+        exec_evaluations._handle_prediction_directory(Evaluation(), prediction_directory, str(tmp_path), None,
+                                                      partial_output=partial_output, run_label=label)
+        separate_runs.extend(_read_partial_runs(partial_output))
+
+    ground_truths: List[str] = []
+    monkeypatch.setattr(script_utilities, "get_columnar_ground_truth",
+                        lambda filename, *_: ground_truths.append(filename) or filename)
+    partial_output = str(tmp_path / "partial.json")
+    exec_evaluations._handle_prediction_directories(Evaluation(), prediction_directories, str(tmp_path), None,
+                                                    partial_output=partial_output, run_labels=labels)
+    runs: List[dict] = _read_partial_runs(partial_output)
+    assert [run["run"] for run in runs] == labels
+    assert [run["files_considered"] for run in runs] == [3, 2, 2]
+    assert runs == separate_runs
+    # the ground truth of each document is loaded once for all runs
+    assert ground_truths == ["a.json", "b.json", "c.json", "d.json"]
+
+
+def _allocate_revision(evaluation: Evaluation, ground_truth: ColumnarDocument, metrics: dict,
+                       prediction: SimpleNamespace, revision_index: int, foreground_mask, memory_record=None,
+                       table_cache=None) -> dict:
+    """
+    evaluates a revision whose iou allocates as many megabytes as the value of the prediction
+    """
+    with exec_evaluations._measure(evaluation, memory_record, exec_evaluations.IOU):
+        allocated: np.ndarray = np.ones(int(prediction.value * (1 << 20)), dtype=np.uint8)
+    metrics[exec_evaluations.IOU][REVISION] = metrics[exec_evaluations.IOU].get(REVISION, 0) + \
+        allocated.size / (1 << 20)
+    return metrics
+
+
+def test_memory_budget_skips_or_flags_documents(tmp_path, monkeypatch):
+    monkeypatch.setattr(script_utilities, "load_document",
+                        lambda filepath: SimpleNamespace(revisions=[None], **vars(_load_document(filepath))))
+    monkeypatch.setattr(script_utilities, "get_columnar_ground_truth",
+                        lambda filename, *_: ColumnarDocument(filename, []))
+    monkeypatch.setattr(exec_evaluations, "_process_revision", _allocate_revision)
+    prediction_directory: str = _write_predictions(tmp_path / "predictions", {"small.json": "1", "large.json": "64"})
+    tracing: bool = tracemalloc.is_tracing()
+    try:
+        for document_workers in [0, 2]:
+            for action, files_considered, iou in [("flag", 2, 65.0), ("skip", 1, 1.0)]:
+                evaluation: Evaluation = Evaluation()
+                evaluation.memory_accounting = MemoryAccounting(16 << 20, action)
+                partial_output: str = str(tmp_path / "partial.json")
+                exec_evaluations._handle_prediction_directory(evaluation, prediction_directory, str(tmp_path), None,
+                                                              partial_output=partial_output,
+                                                              document_workers=document_workers)
+                run: dict = _read_partial_runs(partial_output)[0]
+                assert (run["files_considered"], run["metrics"][exec_evaluations.IOU]) == \
+                    (files_considered, {REVISION: iou})
+
+                # the report has a record of each document, the records of the document workers too
+                report_filepath: str = str(tmp_path / "memory.json")
+                exec_evaluations._output_memory(evaluation.memory_accounting, report_filepath)
+                with open(report_filepath) as report_file:
+                    report: dict = json.load(report_file)
+                assert (report["budget"], report["action"]) == (16 << 20, action)
+                records: Dict[str, dict] = {record["filename"]: record for record in report["documents"]}
+                assert sorted(records) == ["large.json", "small.json"]
+                assert records["small.json"]["reason"] is None
+                assert records["large.json"]["reason"].startswith("peak memory of ")
+                assert records["large.json"]["metrics"][exec_evaluations.IOU] >= 64 << 20
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+
+def test_workers_and_export_are_stopped_when_the_evaluation_fails(tmp_path, monkeypatch):
+    stopped: List[str] = []
+
+    def recorded(name: str, stop: Callable):
+        def record_stop(self, *args):
+            stopped.append(name)
+            return stop(self, *args)
+        return record_stop
+
+    for cls, method in [(CellPool, "close"), (TimeLimits, "close"), (LiveMetrics, "stop_export")]:
+        monkeypatch.setattr(cls, method, recorded(cls.__name__, getattr(cls, method)))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("evaluation failed")
+
+    monkeypatch.setattr(exec_evaluations, "_handle_prediction_directory", fail)
+    live_metrics_filepath: str = str(tmp_path / "metrics.json")
+    monkeypatch.setattr(sys, "argv", ["exec_evaluations.py", "-g", str(tmp_path), "-p", str(tmp_path),
+                                      "--cell_workers", "2", "--document_time_limit", "30",
+                                      "--live_metrics", live_metrics_filepath])
+    with pytest.raises(RuntimeError, match="evaluation failed"):
+        exec_evaluations.main(exec_evaluations.parse_arguments())
+    assert stopped == ["CellPool", "TimeLimits", "LiveMetrics"]
+    # the final snapshot of the live metrics is written
+    with open(live_metrics_filepath) as live_metrics_file:
+        assert json.load(live_metrics_file)["documents"] == 0
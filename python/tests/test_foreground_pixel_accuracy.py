@@ -0,0 +1,103 @@
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+
+import python.evaluations.confidence as confidence
+import python.evaluations.foreground_pixel_accuracy as foreground_pixel_accuracy
+from python.evaluations.foreground_pixel_accuracy import PixelSampling
+
+
+def _text_mask(random: np.random.Generator) -> np.ndarray:
+    """
+    :return: foreground mask of lines of text like blobs
+    """
+    mask: np.ndarray = np.zeros((400, 400), dtype=bool)
+    for y in range(5, 395, 9):
+        for x in range(0, 400, 6):
+            if random.random() < 0.7:
+                mask[y:y + 5, x:x + int(random.integers(2, 5))] = True
+    return mask
+
+
+def _rectangle(x_min: float, y_min: float, x_max: float, y_max: float) -> np.ndarray:
+    return np.array([[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]])
+
+
+def _cells(random: np.random.Generator, mask: np.ndarray, count: int) -> List[Tuple[np.ndarray, np.ndarray, float]]:
+    """
+    :return: gt cell, matching prediction cell and exact foreground pixel accuracy of random cells
+    """
+    cells: List[Tuple[np.ndarray, np.ndarray, float]] = []
+    for _ in range(count):
+        x, y = random.uniform(0, 300, 2)
+        width, height = random.uniform(20, 90, 2)
+        cell_gt: np.ndarray = _rectangle(x, y, x + width, y + height)
+        cell_prediction: np.ndarray = _rectangle(*(np.array([x, y, x + width, y + height]) +
+                                                   random.uniform(-10, 10, 4)))
+        cells.append((cell_gt, cell_prediction,
+                      foreground_pixel_accuracy._foreground_pixel_accuracy_for_cell_areas(cell_gt, cell_prediction,
+                                                                                          mask)))
+    return cells
+
+
+def test_small_cells_are_evaluated_exactly():
+    random: np.random.Generator = np.random.default_rng(0)
+    mask: np.ndarray = _text_mask(random)
+    for cell_gt, cell_prediction, exact in _cells(random, mask, 20):
+        for sampling in [PixelSampling("stride", 1), PixelSampling("random", samples=10 ** 5)]:
+            assert foreground_pixel_accuracy._sampled_foreground_pixel_accuracy(
+                cell_gt, cell_prediction, mask, sampling, 0) == (exact, 0.0)
+
+
+def test_sampled_estimates_are_shares_with_a_bounded_variance():
+    random: np.random.Generator = np.random.default_rng(1)
+    mask: np.ndarray = _text_mask(random)
+    for index, (cell_gt, cell_prediction, exact) in enumerate(_cells(random, mask, 50)):
+        for sampling in [PixelSampling("stride", 4), PixelSampling("random", samples=64)]:
+            estimate, variance = foreground_pixel_accuracy._sampled_foreground_pixel_accuracy(
+                cell_gt, cell_prediction, mask, sampling, index)
+            assert 0 <= estimate <= 1
+            # a sample has at least MIN_SAMPLED_FOREGROUND foreground pixels, a share of them varies by at most 1/4
+            assert 0 <= variance <= 0.25 / (foreground_pixel_accuracy.MIN_SAMPLED_FOREGROUND + 2)
+            if variance == 0:
+                assert estimate == exact
+
+
+@pytest.mark.parametrize("method, coverage", [("random", 0.9), ("stride", 0.8)])
+def test_cell_bounds_cover_the_exact_scores(method: str, coverage: float):
+    random: np.random.Generator = np.random.default_rng(2)
+    mask: np.ndarray = _text_mask(random)
+    z: float = confidence.z_value(0.95)
+    covered: int = 0
+    cells = _cells(random, mask, 200)
+    for index, (cell_gt, cell_prediction, exact) in enumerate(cells):
+        estimate, variance = foreground_pixel_accuracy._sampled_foreground_pixel_accuracy(
+            cell_gt, cell_prediction, mask, PixelSampling(method, 4, 64), index)
+        covered += abs(estimate - exact) <= z * np.sqrt(variance)
+    # the bounds of the stride method are approximate, the text lines repeat with about the period of the stride
+    assert covered / len(cells) >= coverage
+
+
+@pytest.mark.parametrize("method", ["random", "stride"])
+def test_error_bound_covers_the_exact_average(method: str):
+    random: np.random.Generator = np.random.default_rng(3)
+    mask: np.ndarray = _text_mask(random)
+    cells = _cells(random, mask, 20)
+    exact: float = float(np.mean([score for _, _, score in cells]))
+    z: float = confidence.z_value(0.95)
+    covered: int = 0
+    for seed in range(40):
+        sampling: PixelSampling = PixelSampling(method, 4, 64, seed)
+        estimates: np.ndarray = np.array([foreground_pixel_accuracy._sampled_foreground_pixel_accuracy(
+            cell_gt, cell_prediction, mask, sampling, index) for index, (cell_gt, cell_prediction, _) in
+            enumerate(cells)])
+        covered += abs(np.mean(estimates[:, 0]) - exact) <= foreground_pixel_accuracy.fpa_error_bound(estimates, z)
+    assert covered >= 0.9 * 40
+
+
+def test_invalid_sampling_is_rejected():
+    with pytest.raises(ValueError):
+        PixelSampling("grid")
+    with pytest.raises(ValueError):
+        PixelSampling("stride", stride=0)
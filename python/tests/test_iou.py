@@ -1,9 +1,14 @@
 import json
+from types import SimpleNamespace
+from typing import List, Tuple
 
+import numpy as np
 from docrecjson import decoder
 from docrecjson.elements import Document
 
 import python.evaluations.iou as iou
+from columnar_tables import grid_table, polygon_table
+from python.evaluations.columnar import ColumnarDocument, ColumnarTable
 
 example_shared_file_format_simple_1_path: str = "../../resources/example-shared-file-format-simple-1.json"
 example_shared_file_format_simple_2_path: str = "../../resources/example-shared-file-format-simple-2.json"
@@ -36,3 +41,55 @@ def test_small_iou():
     document_1: Document = _load_document(example_shared_file_format_simple_1_path)
     document_2: Document = _load_document(example_shared_file_format_simple_2_path)
     assert iou.intersection_over_union(document_1, document_2) == 0.9
+
+
+def _regions(table: ColumnarTable) -> List[SimpleNamespace]:
+    """
+    :return: the cells of the table as the polygon regions which the evaluation of the Table objects reads
+    """
+    return [SimpleNamespace(polygon=table.polygon(index).tolist(), oid=index) for index in range(len(table))]
+
+
+def _cells(table: ColumnarTable) -> List[SimpleNamespace]:
+    return [SimpleNamespace(bounding_box=region) for region in _regions(table)]
+
+
+def test_columnar_iou_equals_polygon_regions():
+    for seed in range(5):
+        random: np.random.Generator = np.random.default_rng(seed)
+        table_gt: ColumnarTable = grid_table(random, 10.3, 10.7, 8, 5, jitter=2)
+        table_prediction: ColumnarTable = grid_table(random, 11.1, 9.9, 9, 5, jitter=4, drop=0.1)
+        assert np.isclose(iou.intersection_over_union(columnar_table_gt=table_gt,
+                                                      columnar_table_prediction=table_prediction),
+                          iou._intersection_over_union_polygon_region(_regions(table_gt), _regions(table_prediction)),
+                          rtol=1e-9)
+        assert np.allclose(iou.iou_cell_scores(table_gt, table_prediction),
+                           [iou._iou_for_single_cell(cell, _cells(table_gt)) for cell in _cells(table_prediction)],
+                           rtol=1e-9)
+
+
+def test_gt_cells_inside_prediction_cells_count_as_one():
+    random: np.random.Generator = np.random.default_rng(0)
+    # hexagonal cells with fractional coordinates, each gt cell is inside its prediction cell. The area of the
+    # intersection of a cell and the area of the cell differ by rounding errors for about half of them.
+    angles: np.ndarray = np.linspace(0, 2 * np.pi, 6, endpoint=False)
+    hexagon: np.ndarray = np.stack([np.cos(angles), np.sin(angles)], axis=1) * 15.3
+    centers: List[np.ndarray] = [np.array([40.0 * column + 20.7, 40.0 * row + 20.1]) + random.uniform(-1, 1, 2)
+                                 for row in range(5) for column in range(5)]
+    cells: List[Tuple[int, int]] = [(row, column) for row in range(5) for column in range(5)]
+    texts: List[str] = ["x"] * len(cells)
+    table_prediction: ColumnarTable = polygon_table([center + hexagon for center in centers], cells, texts)
+    table_gt: ColumnarTable = polygon_table([center + np.roll(hexagon, 2, axis=0) * 0.9 for center in centers],
+                                            cells, texts)
+    assert np.isclose(iou.intersection_over_union(columnar_table_gt=table_gt,
+                                                  columnar_table_prediction=table_prediction), 1.0)
+
+
+def test_unmatched_gt_table_counts_as_zero():
+    random: np.random.Generator = np.random.default_rng(0)
+    table_gt: ColumnarTable = grid_table(random, 10, 10, 4, 3)
+    table_prediction: ColumnarTable = grid_table(random, 12, 11, 4, 3, jitter=2)
+    doc_gt = ColumnarDocument("page.png", [table_gt, grid_table(random, 10, 500, 4, 3)])
+    doc_prediction = ColumnarDocument("page.png", [table_prediction])
+    assert iou.intersection_over_union(columnar_gt=doc_gt, columnar_prediction=doc_prediction) == \
+        iou.intersection_over_union(columnar_table_gt=table_gt, columnar_table_prediction=table_prediction) / 2
@@ -0,0 +1,124 @@
+import json
+import os
+import pickle
+import re
+import time
+
+import pytest
+
+from python.evaluations.live_metrics import Histogram, LiveMetrics, LATENCY_BUCKETS, PROMETHEUS_PREFIX
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram: Histogram = Histogram()
+    # a value at an upper bound belongs to its bucket
+    for seconds in [0.001, 0.01, 0.3, 0.5, 7, 1000]:
+        histogram.add(seconds)
+    histogram.merge(histogram)
+    exported: dict = histogram.to_dict()
+    assert exported["count"] == 12
+    assert exported["sum"] == pytest.approx(2 * 1007.811)
+    assert exported["buckets"]["0.01"] == 4
+    assert exported["buckets"]["0.1"] == 4
+    assert exported["buckets"]["0.5"] == 8
+    assert exported["buckets"]["10"] == 10
+    assert exported["buckets"]["300"] == 10
+    assert exported["buckets"]["+Inf"] == 12
+    assert list(exported["buckets"])[:-1] == ["%g" % bound for bound in LATENCY_BUCKETS]
+
+
+def test_documents_metrics_and_errors_are_recorded():
+    live_metrics: LiveMetrics = LiveMetrics()
+    for _ in range(3):
+        with live_metrics.document():
+            with live_metrics.metric("iou"):
+                pass
+            with live_metrics.metric("ld"):
+                pass
+    with pytest.raises(MemoryError):
+        with live_metrics.document():
+            raise MemoryError()
+    live_metrics.add_cache("tables", 3, 4)
+    live_metrics.add_cache("tables", 0, 4)
+
+    snapshot: dict = live_metrics.snapshot()
+    assert snapshot["documents"] == 3
+    assert snapshot["document_seconds"]["count"] == 3
+    assert {name: histogram["count"] for name, histogram in snapshot["metric_seconds"].items()} == \
+        {"iou": 3, "ld": 3}
+    assert snapshot["errors"] == {"MemoryError": 1}
+    assert snapshot["caches"] == {"tables": {"hits": 3, "lookups": 8, "hit_rate": 3 / 8}}
+    assert snapshot["documents_per_second"] > 0
+    assert snapshot["last_document_timestamp"] <= snapshot["timestamp"]
+
+
+def test_records_of_other_processes_are_merged():
+    worker: LiveMetrics = LiveMetrics()
+    with worker.document():
+        with worker.metric("fpa"):
+            pass
+    worker.add_error("DocumentStopped")
+    worker.add_cache("tables", 1, 2)
+    # the records are pickled to the evaluating process, the lock and the export thread aren't
+    received: LiveMetrics = pickle.loads(pickle.dumps(worker))
+
+    live_metrics: LiveMetrics = LiveMetrics()
+    live_metrics.add_cache("tables", 1, 1)
+    live_metrics.merge(received)
+    live_metrics.merge(received)
+    snapshot: dict = live_metrics.snapshot()
+    assert snapshot["documents"] == 2
+    assert snapshot["metric_seconds"]["fpa"]["count"] == 2
+    assert snapshot["errors"] == {"DocumentStopped": 2}
+    assert snapshot["caches"]["tables"] == {"hits": 3, "lookups": 5, "hit_rate": 3 / 5}
+
+
+def test_snapshots_are_written_as_json_and_prometheus_text(tmp_path):
+    live_metrics: LiveMetrics = LiveMetrics()
+    with live_metrics.document():
+        with live_metrics.metric("iou"):
+            pass
+    live_metrics.add_error("ValueError")
+    live_metrics.add_cache("ground_truth_store", 1, 1)
+
+    json_filepath: str = str(tmp_path / "metrics.json")
+    live_metrics.write(json_filepath)
+    with open(json_filepath) as json_file:
+        assert json.load(json_file)["documents"] == 1
+
+    prometheus_filepath: str = str(tmp_path / "metrics.prom")
+    live_metrics.write(prometheus_filepath)
+    with open(prometheus_filepath) as prometheus_file:
+        lines = prometheus_file.read().splitlines()
+    assert not os.path.exists(prometheus_filepath + ".tmp")
+    samples: dict = {}
+    for line in lines:
+        if line.startswith("#"):
+            assert re.fullmatch("# (HELP|TYPE) " + PROMETHEUS_PREFIX + r"\w+ .+", line), line
+            continue
+        match = re.fullmatch("(" + PROMETHEUS_PREFIX + r'\w+(?:\{\w+="[^"]*"(?:,\w+="[^"]*")*\})?) (\S+)', line)
+        assert match, line
+        samples[match.group(1)] = float(match.group(2))
+    assert samples[PROMETHEUS_PREFIX + "documents_total"] == 1
+    assert samples[PROMETHEUS_PREFIX + 'errors_total{kind="ValueError"}'] == 1
+    assert samples[PROMETHEUS_PREFIX + 'cache_hits_total{cache="ground_truth_store"}'] == 1
+    assert samples[PROMETHEUS_PREFIX + 'metric_seconds_bucket{metric="iou",le="+Inf"}'] == 1
+    assert samples[PROMETHEUS_PREFIX + 'metric_seconds_count{metric="iou"}'] == 1
+    assert samples[PROMETHEUS_PREFIX + "document_seconds_count"] == 1
+
+
+def test_export_writes_periodic_snapshots(tmp_path):
+    filepath: str = str(tmp_path / "metrics.json")
+    live_metrics: LiveMetrics = LiveMetrics()
+    live_metrics.start_export(filepath, 0.05)
+    deadline: float = time.monotonic() + 10
+    while not os.path.exists(filepath) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert os.path.exists(filepath)
+
+    with live_metrics.document():
+        pass
+    # the final snapshot contains all documents
+    live_metrics.stop_export(filepath)
+    with open(filepath) as json_file:
+        assert json.load(json_file)["documents"] == 1
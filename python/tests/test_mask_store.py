@@ -0,0 +1,103 @@
+import os
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+import python.evaluations.mask_store as mask_store
+import script_utilities
+from python.evaluations.foreground_pixel_accuracy import foreground_mask
+
+
+def _write_image(filepath: str, random: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """
+    :return: the foreground mask of the written image
+    """
+    pixels: np.ndarray = (random.random((height, width, 3)) < 0.3).astype(np.uint8) * 255
+    Image.fromarray(pixels).save(filepath)
+    return pixels.any(axis=2)
+
+
+def test_round_trip(tmp_path):
+    directory: str = str(tmp_path)
+    random: np.random.Generator = np.random.default_rng(0)
+    # the widths aren't multiples of the eight pixels of a packed byte
+    masks = {"a.png": random.random((13, 21)) < 0.5, "b.png": random.random((1, 8)) < 0.5,
+             "c.png": np.zeros((5, 3), dtype=bool)}
+    mask_store.write_manifest(directory, {filename: mask_store.write_mask(directory, filename, mask)
+                                          for filename, mask in masks.items()})
+    store = mask_store.open_store(directory)
+    assert "a.png" in store and "d.png" not in store
+    for filename, mask in masks.items():
+        loaded: np.ndarray = store.load(filename)
+        assert loaded.dtype == bool
+        assert np.array_equal(loaded, mask)
+
+    mask_store.remove_mask(directory, "a.png")
+    assert not os.path.exists(os.path.join(directory, "a.png.npy"))
+    mask_store.remove_mask(directory, "a.png")
+
+
+def test_missing_or_outdated_store_is_ignored(tmp_path):
+    directory: str = str(tmp_path)
+    assert mask_store.open_store(directory) is None
+    mask_store.write_manifest(directory, {})
+    assert mask_store.open_store(directory).masks == {}
+    with open(os.path.join(directory, mask_store.MANIFEST_FILENAME), "w") as manifest_file:
+        manifest_file.write('{"version": ' + str(mask_store.MASK_STORE_VERSION + 1) + ', "masks": {}}')
+    assert mask_store.open_store(directory) is None
+
+
+def test_only_added_and_changed_images_are_compiled(tmp_path, monkeypatch):
+    image_directory: str = str(tmp_path)
+    random: np.random.Generator = np.random.default_rng(1)
+    masks = {"a.png": _write_image(os.path.join(image_directory, "a.png"), random, 30, 20),
+             "b.png": _write_image(os.path.join(image_directory, "b.png"), random, 17, 9)}
+    with open(os.path.join(image_directory, "notes.txt"), "w") as text_file:
+        text_file.write("not an image")
+
+    decoded: List[str] = []
+    load_image = script_utilities.load_image
+
+    def counted_load_image(filename: str, directory: str) -> Image.Image:
+        decoded.append(filename)
+        return load_image(filename, directory)
+
+    monkeypatch.setattr(script_utilities, "load_image", counted_load_image)
+    monkeypatch.setattr(script_utilities, "_mask_stores", {})
+
+    def load_masks():
+        decoded.clear()
+        for filename, mask in masks.items():
+            assert np.array_equal(script_utilities.load_foreground_mask(filename, image_directory), mask)
+        return sorted(decoded)
+
+    # without a store each image is decoded
+    assert load_masks() == ["a.png", "b.png"]
+    decoded.clear()
+    script_utilities.compile_foreground_masks(image_directory)
+    assert sorted(decoded) == ["a.png", "b.png", "notes.txt"]
+    assert load_masks() == []
+
+    # a changed image is decoded until it's compiled again
+    masks["b.png"] = _write_image(os.path.join(image_directory, "b.png"), random, 40, 11)
+    assert load_masks() == ["b.png"]
+    decoded.clear()
+    script_utilities.compile_foreground_masks(image_directory)
+    assert sorted(decoded) == ["b.png", "notes.txt"]
+    assert load_masks() == []
+
+    os.remove(os.path.join(image_directory, "a.png"))
+    del masks["a.png"]
+    script_utilities.compile_foreground_masks(image_directory)
+    store_directory: str = os.path.join(image_directory, script_utilities.FOREGROUND_MASK_DIRECTORY)
+    assert list(mask_store.open_store(store_directory).masks) == ["b.png"]
+    assert not os.path.exists(os.path.join(store_directory, "a.png.npy"))
+    assert load_masks() == []
+
+
+def test_images_without_three_bands_are_all_foreground(tmp_path):
+    filepath: str = str(tmp_path / "gray.png")
+    Image.fromarray(np.zeros((4, 6), dtype=np.uint8)).save(filepath)
+    with Image.open(filepath) as image:
+        assert np.array_equal(foreground_mask(image), np.ones((4, 6), dtype=bool))
@@ -0,0 +1,73 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import python.evaluations.memory_accounting as memory
+from python.evaluations.memory_accounting import MemoryAccounting, MemoryBudgetExceeded
+
+MEGABYTE: int = 1 << 20
+
+
+@pytest.fixture(autouse=True)
+def stop_tracing():
+    """
+    the memory accounting starts tracing the allocations, it's stopped again for the other tests
+    """
+    tracing: bool = tracemalloc.is_tracing()
+    yield
+    if not tracing:
+        tracemalloc.stop()
+
+
+def _evaluate(memory_accounting: MemoryAccounting, filename: str, size: int) -> dict:
+    """
+    evaluates a document whose iou allocates size bytes
+    :return: the record of the document
+    """
+    with memory_accounting.document(filename) as record:
+        with memory_accounting.metric(record, "iou"):
+            allocated: np.ndarray = np.ones(size, dtype=np.uint8)
+            del allocated
+        with memory_accounting.metric(record, "ld"):
+            pass
+    return record
+
+
+def test_peaks_of_documents_and_metrics():
+    memory_accounting: MemoryAccounting = MemoryAccounting()
+    record: dict = _evaluate(memory_accounting, "a.json", 8 * MEGABYTE)
+    assert memory_accounting.documents == [record]
+    assert record["filename"] == "a.json" and record["reason"] is None
+    assert 8 * MEGABYTE <= memory.peak(record)
+    assert 8 * MEGABYTE <= record["traced"] < 9 * MEGABYTE
+    assert record["metrics"]["ld"] < MEGABYTE <= 8 * MEGABYTE <= record["metrics"]["iou"]
+    # the next document starts from the memory in use
+    assert _evaluate(memory_accounting, "b.json", MEGABYTE)["traced"] < 2 * MEGABYTE
+
+
+def test_budget_actions():
+    for action in memory.BUDGET_ACTIONS:
+        memory_accounting: MemoryAccounting = MemoryAccounting(4 * MEGABYTE, action)
+        assert _evaluate(memory_accounting, "small.json", MEGABYTE)["reason"] is None
+        record: dict = _evaluate(memory_accounting, "large.json", 8 * MEGABYTE)
+        assert record["reason"].startswith("peak memory of ")
+        memory_accounting.check_estimate("small.json", 2 * MEGABYTE)
+        if action == "skip":
+            with pytest.raises(MemoryBudgetExceeded, match=r"Skipped \[large.json\]: peak memory"):
+                memory_accounting.check_peak(record)
+            with pytest.raises(MemoryBudgetExceeded, match=r"Skipped \[estimated.json\]: estimated memory"):
+                memory_accounting.check_estimate("estimated.json", 8 * MEGABYTE)
+            # documents which aren't evaluated have a record without peaks
+            assert memory_accounting.documents[-1]["traced"] is None
+        else:
+            # documents over the budget are only flagged
+            memory_accounting.check_peak(record)
+            memory_accounting.check_estimate("estimated.json", 8 * MEGABYTE)
+        assert [x["filename"] for x in memory_accounting.documents] == \
+            ["small.json", "large.json"] + (["estimated.json"] if action == "skip" else [])
+        assert memory_accounting.max_grid_points() == \
+            (4 * MEGABYTE // memory.BYTES_PER_GRID_POINT if action == "low_memory" else None)
+
+    with pytest.raises(ValueError):
+        MemoryAccounting(MEGABYTE, "abort")
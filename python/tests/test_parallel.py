@@ -0,0 +1,59 @@
+from typing import List
+
+import numpy as np
+
+import python.evaluations.table_metrics as table_metrics
+from columnar_tables import grid_table
+from python.evaluations.columnar import ColumnarDocument
+from python.evaluations.foreground_pixel_accuracy import PixelSampling
+from python.evaluations.parallel import CellPool
+from python.evaluations.table_metrics import DocumentMetrics
+
+
+def _documents(seed: int):
+    random: np.random.Generator = np.random.default_rng(seed)
+    doc_gt = ColumnarDocument("page.png", [grid_table(random, 10, 10, 20, 8), grid_table(random, 10, 300, 5, 4)])
+    doc_prediction = ColumnarDocument("page.png", [grid_table(random, 12, 11, 20, 8, jitter=4, drop=0.1),
+                                                   grid_table(random, 11, 301, 6, 4, jitter=3, drop=0.1)])
+    return doc_gt, doc_prediction
+
+
+def _assert_equal(document: DocumentMetrics, expected: DocumentMetrics):
+    assert len(document.tables) == len(expected.tables)
+    for table, expected_table in zip(document.tables, expected.tables):
+        for attribute in table_metrics.TableMetrics.__slots__:
+            value = getattr(table, attribute)
+            if isinstance(value, np.ndarray):
+                assert np.array_equal(value, getattr(expected_table, attribute)), attribute
+            else:
+                assert value == getattr(expected_table, attribute), attribute
+
+
+def test_pooled_and_serial_results_are_equal():
+    mask: np.ndarray = np.random.default_rng(0).random((400, 400)) < 0.3
+    documents = [_documents(seed) for seed in range(3)]
+    for sampling in [None, PixelSampling("stride", 3), PixelSampling("random", samples=16, seed=1)]:
+        serial: List[DocumentMetrics] = [table_metrics.evaluate_document(doc_gt, doc_prediction, mask,
+                                                                         sampling=sampling)
+                                         for doc_gt, doc_prediction in documents]
+        # one pool evaluates all documents, the merged chunks must not depend on the number of workers
+        with CellPool(3) as pool:
+            pooled: List[DocumentMetrics] = [table_metrics.evaluate_document(doc_gt, doc_prediction, mask,
+                                                                             pool=pool, parallel_min_cells=0,
+                                                                             sampling=sampling)
+                                             for doc_gt, doc_prediction in documents]
+        for document, expected in zip(pooled, serial):
+            _assert_equal(document, expected)
+            assert table_metrics.levenshtein_distance(document) == table_metrics.levenshtein_distance(expected)
+            assert table_metrics.intersection_over_union(document) == \
+                table_metrics.intersection_over_union(expected)
+
+
+def test_small_documents_are_evaluated_serially():
+    doc_gt, doc_prediction = _documents(0)
+    with CellPool(2) as pool:
+        document: DocumentMetrics = table_metrics.evaluate_document(doc_gt, doc_prediction, pool=pool,
+                                                                    parallel_min_cells=10 ** 6)
+        # the workers are only started for the first large document
+        assert pool._executor is None
+    _assert_equal(document, table_metrics.evaluate_document(doc_gt, doc_prediction))
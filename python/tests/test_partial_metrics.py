@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+import script_utilities
+
+FILENAMES = ["document_" + str(index) + ".json" for index in range(200)]
+REVISIONS = ["revision:0:original", "revision:1:corrected"]
+
+
+def _file_metrics(random: np.random.Generator) -> dict:
+    return {metric: {revision_name: float(random.random()) for revision_name in REVISIONS}
+            for metric in ["iou", "iou_f1_60", "purity"]}
+
+
+def _sum_metrics(metrics: dict, file_metrics: dict):
+    for metric, revisions in file_metrics.items():
+        summed_revisions: dict = metrics.setdefault(metric, {})
+        for revision_name, value in revisions.items():
+            summed_revisions[revision_name] = summed_revisions.get(revision_name, 0) + value
+
+
+def test_shards_are_disjoint_and_complete():
+    for shard_count in [1, 2, 3, 7]:
+        shards = [{filename for filename in FILENAMES if script_utilities.in_shard(filename, shard_index, shard_count)}
+                  for shard_index in range(shard_count)]
+        assert sum(len(shard) for shard in shards) == len(FILENAMES)
+        assert set().union(*shards) == set(FILENAMES)
+        # the shard of a file only depends on its filename
+        assert all(script_utilities.in_shard(os.path.join("machine", filename), shard_index, shard_count)
+                   for shard_index, shard in enumerate(shards) for filename in shard)
+
+
+def test_merged_shards_equal_unsharded_totals(tmp_path):
+    random: np.random.Generator = np.random.default_rng(0)
+    runs = {"baseline": {filename: _file_metrics(random) for filename in FILENAMES},
+            "candidate": {filename: _file_metrics(random) for filename in FILENAMES[:150]}}
+    totals = {label: {} for label in runs}
+    for label, files in runs.items():
+        for file_metrics in files.values():
+            _sum_metrics(totals[label], file_metrics)
+
+    shard_count: int = 3
+    partial_files = []
+    for shard_index in range(shard_count):
+        partial_runs = []
+        for label, files in runs.items():
+            metrics: dict = {}
+            files_considered: int = 0
+            for filename, file_metrics in files.items():
+                if script_utilities.in_shard(filename, shard_index, shard_count):
+                    _sum_metrics(metrics, file_metrics)
+                    files_considered += 1
+            # each machine has the prediction directory at another path
+            partial_runs.append(script_utilities.partial_run(os.path.join("/mnt/machine_" + str(shard_index), label),
+                                                             files_considered, metrics))
+        partial_files.append(str(tmp_path / ("shard_" + str(shard_index) + ".json")))
+        script_utilities.write_partial_metrics(partial_files[-1], partial_runs)
+
+    merged = {run["run"]: run for run in script_utilities.merge_partial_metrics(partial_files)}
+    assert sorted(merged) == sorted(runs)
+    for label, files in runs.items():
+        assert merged[label]["files_considered"] == len(files)
+        assert merged[label]["metrics"].keys() == totals[label].keys()
+        for metric, revisions in totals[label].items():
+            for revision_name, value in revisions.items():
+                assert np.isclose(merged[label]["metrics"][metric][revision_name], value)
+
+
+def test_partial_results_without_label_are_merged_by_directory(tmp_path):
+    partial_files = [str(tmp_path / "shard_0.json"), str(tmp_path / "shard_1.json")]
+    for partial_file, files_considered in zip(partial_files, [2, 3]):
+        script_utilities.write_partial_metrics(partial_file, [
+            {"prediction_directory": "predictions", "files_considered": files_considered,
+             "metrics": {"iou": {"revision:0:original": 0.5 * files_considered}}}])
+    merged = script_utilities.merge_partial_metrics(partial_files)
+    assert len(merged) == 1
+    assert merged[0]["run"] == "predictions"
+    assert merged[0]["files_considered"] == 5
+    assert merged[0]["metrics"]["iou"]["revision:0:original"] == 2.5
@@ -0,0 +1,75 @@
+import numpy as np
+from shapely.geometry import Point, Polygon
+
+import python.evaluations.quadrilaterals as quadrilaterals
+
+
+def _random_quadrilaterals(random: np.random.Generator, count: int) -> np.ndarray:
+    """
+    quadrilaterals around random centers in both orientations, about half of them are convex
+    """
+    centers: np.ndarray = random.uniform(0, 100, (count, 1, 2))
+    radii: np.ndarray = random.uniform(5, 40, (count, 4, 1))
+    angles: np.ndarray = np.sort(random.uniform(0, 2 * np.pi, (count, 4)), axis=1)
+    corners: np.ndarray = centers + radii * np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+    reversed_order: np.ndarray = random.random(count) < 0.5
+    corners[reversed_order] = corners[reversed_order, ::-1]
+    return corners
+
+
+def _convex_pairs(count: int):
+    random: np.random.Generator = np.random.default_rng(0)
+    polygons: np.ndarray = _random_quadrilaterals(random, 2 * count)
+    # some identical pairs
+    polygons[count:count + 10] = polygons[:10]
+    corners, convex = quadrilaterals.convex_quadrilaterals(polygons.reshape(-1, 2), np.arange(0, 8 * count + 1, 4))
+    pairs: np.ndarray = convex[:count] & convex[count:]
+    return polygons[:count][pairs], polygons[count:][pairs], corners[:count][pairs], corners[count:][pairs]
+
+
+def test_convex_quadrilaterals():
+    random: np.random.Generator = np.random.default_rng(1)
+    polygons: np.ndarray = _random_quadrilaterals(random, 500)
+    _, convex = quadrilaterals.convex_quadrilaterals(polygons.reshape(-1, 2), np.arange(0, 2001, 4))
+    for polygon, is_convex in zip(polygons, convex):
+        shape: Polygon = Polygon(polygon)
+        assert is_convex == (shape.is_valid and np.isclose(shape.convex_hull.area, shape.area))
+
+
+def test_closed_and_other_polygons():
+    square: np.ndarray = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float64)
+    polygons: np.ndarray = np.concatenate([square, square[:1], square[:3], square[[0, 2, 1, 3]]])
+    corners, convex = quadrilaterals.convex_quadrilaterals(polygons, np.array([0, 5, 8, 12]))
+    # closed square, triangle, self-intersecting quadrilateral
+    assert convex.tolist() == [True, False, False]
+    assert quadrilaterals.areas(corners[:1])[0] == 100
+
+
+def test_intersection_areas():
+    polygons_a, polygons_b, corners_a, corners_b = _convex_pairs(2000)
+    areas: np.ndarray = quadrilaterals.intersection_areas(corners_a, corners_b)
+    expected: np.ndarray = np.array([Polygon(a).intersection(Polygon(b)).area for a, b in zip(polygons_a, polygons_b)])
+    assert np.allclose(areas, expected, rtol=1e-9, atol=1e-9)
+    assert np.allclose(quadrilaterals.areas(corners_a), [Polygon(a).area for a in polygons_a])
+
+
+def test_intersects():
+    polygons_a, polygons_b, corners_a, corners_b = _convex_pairs(2000)
+    expected: np.ndarray = np.array([Polygon(a).intersects(Polygon(b)) for a, b in zip(polygons_a, polygons_b)])
+    assert np.array_equal(quadrilaterals.intersects(corners_a, corners_b), expected)
+
+    square: np.ndarray = np.array([[[0, 0], [10, 0], [10, 10], [0, 10]]], dtype=np.float64)
+    # touching squares intersect without a common area
+    assert quadrilaterals.intersects(square, square + [10, 0])[0]
+    assert quadrilaterals.intersection_areas(square, square + [10, 0])[0] == 0
+    assert not quadrilaterals.intersects(square, square + [10.5, 0])[0]
+    assert quadrilaterals.intersection_areas(square, square + [5, 5])[0] == 25
+
+
+def test_contains():
+    polygons, _, corners, _ = _convex_pairs(50)
+    points: np.ndarray = np.mgrid[-10:110:3, -10:110:3].reshape(2, -1).T.astype(np.float64)
+    for polygon, quadrilateral in zip(polygons, corners):
+        shape: Polygon = Polygon(polygon)
+        expected: np.ndarray = np.array([Point(point).intersects(shape) for point in points])
+        assert np.array_equal(quadrilaterals.contains(quadrilateral, points), expected)
@@ -0,0 +1,119 @@
+from typing import Dict, List
+
+import numpy as np
+import pytest
+from loguru import logger
+
+import python.evaluations.results_store as results
+import query_results
+from python.evaluations.results_store import ResultsStore
+
+
+def _store(random: np.random.Generator, run: str, documents: int) -> ResultsStore:
+    store: ResultsStore = ResultsStore()
+    store.run = run
+    for document in range(documents):
+        for revision in ["revision:0:original", "revision:1:ocr"]:
+            tables: int = int(random.integers(1, 4))
+            matched: np.ndarray = random.random(tables) < 0.8
+            columns: Dict[str, list] = {"table": list(range(tables)), "matched": matched.tolist(),
+                                        "cell_count": random.integers(1, 40, tables).tolist(),
+                                        "span_count": random.integers(0, 3, tables).tolist(),
+                                        "table_area": random.uniform(100, 1000, tables).tolist(),
+                                        "text_length": random.integers(0, 500, tables).tolist()}
+            for metric in results.METRIC_FIELDS:
+                # the metrics of the unmatched tables don't apply
+                columns[metric] = np.where(matched, random.random(tables), np.nan).tolist()
+            store.add_tables("document_" + str(document), revision, columns)
+    return store
+
+
+def _rows(store: ResultsStore) -> List[dict]:
+    rows: List[dict] = []
+    for row in store.rows:
+        values: dict = {field: row[field].item() for field in results.ROW_DTYPE.names}
+        for field in results.NAME_FIELDS:
+            values[field] = store.names(field)[values[field]]
+        rows.append(values)
+    return rows
+
+
+def test_save_and_load(tmp_path):
+    store: ResultsStore = _store(np.random.default_rng(0), "run", 400)
+    filepath: str = str(tmp_path / "results.npz")
+    results.save(filepath, store)
+    loaded: ResultsStore = results.load(filepath)
+    assert len(loaded) == len(store) > 1024
+    for field in results.NAME_FIELDS:
+        assert loaded.names(field) == store.names(field)
+    for field in results.ROW_DTYPE.names:
+        assert np.array_equal(loaded.column(field), store.column(field), equal_nan=field in results.METRIC_FIELDS)
+
+
+def test_concatenated_stores_map_the_names():
+    random: np.random.Generator = np.random.default_rng(1)
+    first, second = _store(random, "first", 5), _store(random, "second", 8)
+    combined: ResultsStore = results.concatenate([first, second])
+    assert combined.names("run") == ["first", "second"]
+    assert combined.names("document") == ["document_" + str(index) for index in range(8)]
+    assert str(_rows(combined)) == str(_rows(first) + _rows(second))
+
+    size: int = len(combined)
+    combined.extend(second)
+    combined.truncate(size)
+    assert str(_rows(combined)) == str(_rows(first) + _rows(second))
+
+
+def test_query_equals_grouped_rows():
+    random: np.random.Generator = np.random.default_rng(2)
+    store: ResultsStore = results.concatenate([_store(random, "first", 30), _store(random, "second", 20)])
+    rows: List[dict] = _rows(store)
+    metrics: List[str] = ["iou", "purity"]
+    for group_by, filters, matches in [
+            ([], [], lambda row: True),
+            (["revision"], ["cell_count>=20"], lambda row: row["cell_count"] >= 20),
+            (["run", "span_count"], ["revision==revision:1:ocr", "matched!=true"],
+             lambda row: row["revision"] == "revision:1:ocr" and not row["matched"]),
+            (["matched", "cell_count"], ["run!=first", "table_area<500"],
+             lambda row: row["run"] != "first" and row["table_area"] < 500)]:
+        groups, counts, averages = results.query(store, metrics, group_by, filters)
+
+        expected: Dict[tuple, List[dict]] = {}
+        for row in rows:
+            if matches(row):
+                expected.setdefault(tuple(row[field] for field in group_by), []).append(row)
+        assert groups == sorted(expected)
+        for group, count, values in zip(groups, counts, averages):
+            group_rows: List[dict] = expected[group]
+            assert count == len(group_rows)
+            for metric, value in zip(metrics, values):
+                metric_values = [row[metric] for row in group_rows if not np.isnan(row[metric])]
+                if metric_values:
+                    assert value == pytest.approx(np.mean(metric_values))
+                else:
+                    assert np.isnan(value)
+
+
+def test_invalid_queries_are_rejected():
+    store: ResultsStore = _store(np.random.default_rng(3), "run", 2)
+    for metrics, group_by, filters in [(["unknown"], [], []), (["iou"], ["unknown"], []),
+                                       (["iou"], [], ["unknown>=1"]), (["iou"], [], ["cell_count"]),
+                                       (["iou"], [], ["revision>=revision:0:original"])]:
+        with pytest.raises(RuntimeError):
+            results.query(store, metrics, group_by, filters)
+
+
+def test_query_results_outputs_the_groups(tmp_path):
+    random: np.random.Generator = np.random.default_rng(4)
+    filepaths: List[str] = [str(tmp_path / "first.npz"), str(tmp_path / "second.npz")]
+    results.save(filepaths[0], _store(random, "first", 3))
+    results.save(filepaths[1], _store(random, "second", 3))
+
+    messages: List[str] = []
+    sink: int = logger.add(messages.append, format="{message}")
+    try:
+        query_results.main(filepaths, ["iou"], ["run"], ["matched==true"])
+    finally:
+        logger.remove(sink)
+    assert messages[0].startswith("Loaded the results of [" + str(len(results.load(filepaths[0])) * 2) + "] tables")
+    assert [message.split()[0] for message in messages[-2:]] == ["first", "second"]
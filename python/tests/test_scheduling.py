@@ -0,0 +1,77 @@
+import json
+
+import numpy as np
+
+import python.evaluations.scheduling as scheduling
+
+
+def _timings(coefficients: np.ndarray, count: int) -> dict:
+    random: np.random.Generator = np.random.default_rng(0)
+    timings: dict = {}
+    for index in range(count):
+        features: dict = {"polygons": int(random.integers(0, 5000)), "pixels": int(random.integers(0, 10 ** 7)),
+                          "size": int(random.integers(1000, 10 ** 6))}
+        seconds: float = coefficients[0] + sum(coefficient * features[name]
+                                               for coefficient, name in zip(coefficients[1:], scheduling.FEATURES))
+        timings["document_" + str(index) + ".json"] = {**features, "seconds": seconds}
+    return timings
+
+
+def test_longest_first():
+    assert scheduling.longest_first([1.0, 5.0, 3.0, 5.0, 0.0]) == [1, 3, 2, 0, 4]
+    assert scheduling.longest_first([]) == []
+
+
+def test_fit_recovers_the_coefficients():
+    coefficients: np.ndarray = np.array([0.1, 1e-3, 3e-8, 2e-7])
+    model: scheduling.CostModel = scheduling.CostModel.fit(_timings(coefficients, 50))
+    assert model.documents == 50
+    assert np.allclose(model.coefficients, coefficients, rtol=1e-6, atol=1e-12)
+
+
+def test_fit_leaves_out_negative_coefficients():
+    timings: dict = _timings(np.array([0.1, 1e-3, 0.0, 0.0]), 50)
+    # the size of the files makes the documents faster, which the model must not learn
+    for record in timings.values():
+        record["seconds"] -= 1e-7 * record["size"]
+    model: scheduling.CostModel = scheduling.CostModel.fit(timings)
+    assert np.all(model.coefficients >= 0)
+    assert model.coefficients[scheduling.FEATURES.index("size") + 1] == 0
+
+
+def test_fit_needs_enough_documents():
+    model: scheduling.CostModel = scheduling.CostModel.fit(_timings(np.array([1.0, 1.0, 1.0, 1.0]),
+                                                                    scheduling.MIN_FIT_DOCUMENTS - 1))
+    assert model.documents == 0
+    assert np.array_equal(model.coefficients, scheduling.DEFAULT_COEFFICIENTS)
+
+
+def test_estimate():
+    model: scheduling.CostModel = scheduling.CostModel(np.array([1.0, 2.0, 3.0, 4.0]), 10)
+    assert model.estimate({"polygons": 1, "pixels": 10, "size": 100}) == 1 + 2 + 30 + 400
+
+
+def test_scan():
+    data: bytes = json.dumps({"filename": "page \"1\".png", "original_image_size": [2480, 3508],
+                              "revisions": [{"polygon": [[0, 0]]}, {"polygon": [[1, 1]]}]}).encode("utf-8")
+    assert scheduling.scan(data) == (2, "page \"1\".png", (2480, 3508))
+    assert scheduling.scan(b"{}") == (0, None, None)
+
+
+def test_timings_round_trip(tmp_path):
+    filepath: str = str(tmp_path / "timings.json")
+    assert scheduling.load_timings(filepath) == {}
+    timings: dict = _timings(scheduling.DEFAULT_COEFFICIENTS, 3)
+    scheduling.save_timings(filepath, timings)
+    assert scheduling.load_timings(filepath) == timings
+
+
+def test_compare():
+    measured: np.ndarray = np.array([1.0, 2.0, 4.0, 8.0])
+    comparison: dict = scheduling.compare(measured / 2, measured)
+    assert comparison["estimated"] == 7.5
+    assert comparison["measured"] == 15.0
+    assert comparison["mean_absolute_error"] == 1.875
+    assert np.isclose(comparison["rank_correlation"], 1.0)
+    assert np.isclose(scheduling.compare(measured[::-1], measured)["rank_correlation"], -1.0)
+    assert scheduling.compare(np.array([1.0]), np.array([2.0]))["rank_correlation"] is None
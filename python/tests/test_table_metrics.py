@@ -0,0 +1,53 @@
+from typing import List
+
+import numpy as np
+
+import python.evaluations.table_metrics as table_metrics
+from columnar_tables import grid_table
+from python.evaluations.columnar import ColumnarDocument, ColumnarTable
+from python.evaluations.table_metrics import DocumentMetrics, TableCache
+
+
+def _prediction_table(seed: int, y: float) -> ColumnarTable:
+    """
+    :return: a new table object with the same cells for the same seed and position
+    """
+    return grid_table(np.random.default_rng(seed), 12, y + 1, 10, 6, jitter=3, drop=0.1)
+
+
+def _assert_equal(document: DocumentMetrics, expected: DocumentMetrics):
+    assert len(document.tables) == len(expected.tables)
+    assert document.prediction_tables == expected.prediction_tables
+    assert document.unmatched_predictions == expected.unmatched_predictions
+    for table, expected_table in zip(document.tables, expected.tables):
+        for attribute in table_metrics.TableMetrics.__slots__:
+            value = getattr(table, attribute)
+            if isinstance(value, np.ndarray):
+                assert np.array_equal(value, getattr(expected_table, attribute)), attribute
+            else:
+                assert value == getattr(expected_table, attribute), attribute
+
+
+def test_cached_and_uncached_revisions_are_equal():
+    random: np.random.Generator = np.random.default_rng(0)
+    doc_gt = ColumnarDocument("page.png", [grid_table(random, 10, 10, 10, 6), grid_table(random, 10, 200, 10, 6)])
+    mask: np.ndarray = np.random.default_rng(1).random((400, 300)) < 0.3
+    revisions: List[List[ColumnarTable]] = [
+        [_prediction_table(1, 10), _prediction_table(2, 200)],
+        # the first table is unchanged, the second one changed
+        [_prediction_table(1, 10), _prediction_table(3, 200)],
+        # the second table is changed back, the first one changed
+        [_prediction_table(4, 10), _prediction_table(2, 200)],
+        # the unchanged tables in another order, their prediction indices change
+        [_prediction_table(2, 200), _prediction_table(1, 10)],
+        # the second gt table has no matching table
+        [_prediction_table(1, 10)],
+        [_prediction_table(1, 10), _prediction_table(2, 200), _prediction_table(5, 600)]]
+    cache: TableCache = TableCache()
+    for tables in revisions:
+        doc_prediction = ColumnarDocument("page.png", tables)
+        cached: DocumentMetrics = table_metrics.evaluate_document(doc_gt, doc_prediction, mask, cache=cache)
+        _assert_equal(cached, table_metrics.evaluate_document(doc_gt, doc_prediction, mask))
+    # each table pair is evaluated once, the unmatched second gt table as well
+    assert cache.evaluated == 5
+    assert cache.reused == 2 * len(revisions) - cache.evaluated
@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+from typing import List, Optional
+
+import numpy as np
+
+import python.evaluations.table_structure as table_structure
+from python.evaluations.completeness import _completeness_structure
+from python.evaluations.correct_tsr_share import _correct_tsr_share_cell, _correct_tsr_share_structure
+from python.evaluations.purity import _purity_structure
+
+
+def _index(random: np.random.Generator, size: int) -> Optional[int]:
+    return None if random.random() < 0.1 else int(random.integers(size))
+
+
+def _table(random: np.random.Generator) -> SimpleNamespace:
+    """
+    :return: a stand-in for a docrecjson table with the attributes the structure is built from
+    """
+    rows: int = int(random.integers(1, 8))
+    columns: int = int(random.integers(1, 6))
+    cells: List[SimpleNamespace] = []
+    for _ in range(int(random.integers(1, 30))):
+        start_row, start_column = _index(random, rows), _index(random, columns)
+        cells.append(SimpleNamespace(start_row_index=start_row, start_column_index=start_column,
+                                     end_row_index=start_row if random.random() < 0.8 else _index(random, rows),
+                                     end_column_index=start_column if random.random() < 0.8 else
+                                     _index(random, columns)))
+    row_cells = [[cell for cell in cells if cell.start_row_index == row] for row in range(rows)]
+    column_cells = [[cell for cell in cells if cell.start_column_index == column] for column in range(columns)]
+    return SimpleNamespace(cells=cells, get_table_structure=lambda: (row_cells, column_cells))
+
+
+def _completeness_lists(table_gt, table_prediction) -> float:
+    """
+    the completeness as computed from the row and column lists before the structure view
+    """
+    rows_gt, columns_gt = table_gt.get_table_structure()
+    rows_prediction, columns_prediction = table_prediction.get_table_structure()
+    complete_elements: int = 0
+    for i, row in enumerate(rows_gt):
+        if len(row) == (len(rows_prediction[i]) if i < len(rows_prediction) else -1):
+            complete_elements += 1
+    for i, column in enumerate(columns_gt):
+        if len(column) == (len(columns_prediction[i]) if i < len(columns_prediction) else -1):
+            complete_elements += 1
+    return complete_elements / (len(rows_gt) + len(columns_gt))
+
+
+def _purity_lists(table_gt, table_prediction) -> float:
+    """
+    the purity as computed from the row and column lists before the structure view
+    """
+    rows_gt, columns_gt = table_gt.get_table_structure()
+    rows_prediction, columns_prediction = table_prediction.get_table_structure()
+    identified: int = 0
+    for elements_gt, elements_prediction in [(columns_gt, columns_prediction), (rows_gt, rows_prediction)]:
+        if len(elements_prediction) >= len(elements_gt):
+            identified += len(elements_gt)
+        else:
+            identified += len(elements_prediction) if len(elements_prediction) > 1 else 0
+    return identified / (len(columns_gt) + len(rows_gt))
+
+
+def test_structure_metrics_equal_list_metrics():
+    random: np.random.Generator = np.random.default_rng(0)
+    for _ in range(200):
+        table_gt, table_prediction = _table(random), _table(random)
+        structure_gt = table_structure.from_table(table_gt)
+        structure_prediction = table_structure.from_table(table_prediction)
+        assert _completeness_structure(structure_gt, structure_prediction) == \
+            _completeness_lists(table_gt, table_prediction)
+        assert _purity_structure(structure_gt, structure_prediction) == _purity_lists(table_gt, table_prediction)
+
+        matching_indices: np.ndarray = random.integers(-1, len(table_prediction.cells), len(table_gt.cells))
+        expected: List[float] = [0 if index < 0 else _correct_tsr_share_cell(cell, table_prediction.cells[index])
+                                 for cell, index in zip(table_gt.cells, matching_indices)]
+        assert _correct_tsr_share_structure(structure_gt, structure_prediction, matching_indices).tolist() == \
+            expected
+
+
+def test_structures_are_cached_per_document():
+    table: SimpleNamespace = _table(np.random.default_rng(1))
+    # without a document the structure is built for each call
+    assert table_structure.get_table_structure(table) is not table_structure.get_table_structure(table)
+
+    with table_structure.document_cache():
+        structure = table_structure.get_table_structure(table)
+        with table_structure.document_cache():
+            assert table_structure.get_table_structure(table) is structure
+        assert table_structure.get_table_structure(table) is structure
+
+        # new cells invalidate the structure
+        table.cells = table.cells[:-1]
+        changed = table_structure.get_table_structure(table)
+        assert changed is not structure
+        assert len(changed.start_row_index) == len(table.cells)
+
+    # the structures of the document aren't kept after the document
+    with table_structure.document_cache():
+        assert table_structure.get_table_structure(table) is not changed
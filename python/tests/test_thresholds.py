@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import python.evaluations.thresholds as thresholds
+
+
+def _precision_recall_f1(scores_gt: np.ndarray, scores_prediction: np.ndarray, threshold: float):
+    """
+    precision, recall and f1 score of a single threshold, counted cell by cell
+    """
+    true_positives: int = sum(1 for score in scores_gt if score >= threshold)
+    false_positives: int = sum(1 for score in scores_prediction if score < threshold)
+    false_negatives: int = len(scores_gt) - true_positives
+    precision: float = true_positives / (true_positives + false_positives) if true_positives + false_positives else 0
+    recall: float = true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 0
+    f1_score: float = 2 * precision * recall / (precision + recall) if precision + recall else 0
+    return precision, recall, f1_score
+
+
+def test_parse_thresholds():
+    assert np.array_equal(thresholds.parse_thresholds("0.5:0.95:0.05"), np.round(np.arange(10) * 0.05 + 0.5, 10))
+    assert np.array_equal(thresholds.parse_thresholds("0.1:0.3:0.1"), [0.1, 0.2, 0.3])
+    assert np.array_equal(thresholds.parse_thresholds("0.7"), [0.7])
+    for invalid in ["a:b:c", "0.5:0.4:0.1", "0.1:0.5:0", "0.1:0.5"]:
+        with pytest.raises(RuntimeError):
+            thresholds.parse_thresholds(invalid)
+
+
+def test_count_at_least():
+    # scores equal to a threshold count
+    scores: np.ndarray = np.array([0.5, 0.1, 0.9, 0.5, 0.7])
+    assert thresholds.count_at_least(scores, np.array([0.0, 0.1, 0.5, 0.6, 0.9, 1.0])).tolist() == [5, 5, 4, 2, 1, 0]
+    assert thresholds.count_at_least(np.empty(0), np.array([0.0, 0.5])).tolist() == [0, 0]
+
+    random: np.random.Generator = np.random.default_rng(0)
+    scores = np.round(random.random(500), 2)
+    sweep: np.ndarray = thresholds.parse_thresholds("0:1:0.01")
+    assert thresholds.count_at_least(scores, sweep).tolist() == \
+        [int(np.count_nonzero(scores >= threshold)) for threshold in sweep]
+
+
+def test_precision_recall_f1_equal_single_thresholds():
+    random: np.random.Generator = np.random.default_rng(1)
+    sweep: np.ndarray = thresholds.parse_thresholds("0:1:0.05")
+    for scores_gt, scores_prediction in [(np.round(random.random(200), 1), np.round(random.random(150), 1)),
+                                         (random.random(10), np.empty(0)), (np.empty(0), random.random(10)),
+                                         (np.empty(0), np.empty(0))]:
+        precision, recall, f1_score = thresholds.precision_recall_f1(scores_gt, scores_prediction, sweep)
+        for index, threshold in enumerate(sweep):
+            assert (precision[index], recall[index], f1_score[index]) == \
+                pytest.approx(_precision_recall_f1(scores_gt, scores_prediction, threshold))
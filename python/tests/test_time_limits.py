@@ -0,0 +1,83 @@
+import os
+import time
+
+import pytest
+
+import python.evaluations.time_limits as time_limits
+from python.evaluations.time_limits import DocumentStopped, TimeLimits
+
+
+def _evaluate(kind: str, duration: float = 0.0):
+    """
+    evaluates a document in the worker, the kind decides how
+    """
+    if kind == "crash":
+        os._exit(3)
+    if kind == "error":
+        raise ValueError("malformed document")
+    with time_limits.metric("iou"):
+        pass
+    with time_limits.metric("ld" if kind == "slow metric" else "fpa"):
+        time.sleep(duration)
+    return kind, os.getpid()
+
+
+def test_results_and_errors_are_passed_on():
+    limits: TimeLimits = TimeLimits(_evaluate, document_limit=30, metric_limit=30)
+    try:
+        kind, pid = limits.evaluate("a.json", "fast")
+        assert kind == "fast" and pid != os.getpid()
+        with pytest.raises(ValueError, match="malformed document"):
+            limits.evaluate("b.json", "error")
+        # the worker is kept for the next document
+        assert limits.evaluate("c.json", "fast")[1] == pid
+    finally:
+        limits.close()
+    assert limits.documents == []
+
+
+def test_document_limit_stops_the_worker():
+    limits: TimeLimits = TimeLimits(_evaluate, document_limit=0.5)
+    try:
+        start: float = time.monotonic()
+        with pytest.raises(DocumentStopped):
+            limits.evaluate("slow.json", "slow", 60)
+        assert time.monotonic() - start < 10
+        # the next document is evaluated by a new worker
+        assert limits.evaluate("fast.json", "fast")[0] == "fast"
+    finally:
+        limits.close()
+    assert len(limits.documents) == 1
+    record: dict = limits.documents[0]
+    assert record["filename"] == "slow.json"
+    assert record["reason"] == "document exceeded the time limit of 0.5 s in metric fpa"
+    assert 0.5 <= record["seconds"] < 10
+    assert set(record["metrics"]) == {"iou", "fpa"}
+
+
+def test_metric_limit_names_the_metric():
+    limits: TimeLimits = TimeLimits(_evaluate, document_limit=30, metric_limit=0.5)
+    try:
+        # a metric within its limit
+        assert limits.evaluate("fast.json", "fast", 0.1)[0] == "fast"
+        with pytest.raises(DocumentStopped):
+            limits.evaluate("slow.json", "slow metric", 60)
+    finally:
+        limits.close()
+    assert [record["reason"] for record in limits.documents] == ["metric ld exceeded the time limit of 0.5 s"]
+    assert 0.5 <= limits.documents[0]["metrics"]["ld"] < 10
+
+
+def test_crashed_worker_is_recorded():
+    limits: TimeLimits = TimeLimits(_evaluate)
+    try:
+        with pytest.raises(DocumentStopped):
+            limits.evaluate("crash.json", "crash")
+        assert limits.evaluate("fast.json", "fast")[0] == "fast"
+    finally:
+        limits.close()
+    assert [record["reason"] for record in limits.documents] == ["worker process ended with exit code 3"]
+
+
+def test_metrics_outside_of_a_worker_are_not_reported():
+    assert _evaluate("fast") == ("fast", os.getpid())
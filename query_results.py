@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+This script slices the results stores written by exec_evaluations.py --results_store and outputs the average metrics
+of the tables by groups, e.g. the average iou of the tables with at least 20 cells for each revision:
+
+    query_results.py results.npz --filter "cell_count>=20" --group_by revision --metrics iou
+"""
+import argparse
+import sys
+import time
+
+from typing import List, Optional
+
+import numpy as np
+from loguru import logger
+
+import python.evaluations.results_store as results
+from python.evaluations.results_store import ResultsStore
+
+logger.remove()
+logger.add(sys.stderr, level="INFO")
+
+
+def _format(value) -> str:
+    return "%g" % value if isinstance(value, float) else str(value)
+
+
+def main(store_files: List[str], metrics: Optional[List[str]], group_by: List[str], filters: List[str]):
+    store: ResultsStore = results.concatenate([results.load(filepath) for filepath in store_files])
+    logger.info("Loaded the results of [" + str(len(store)) + "] tables from [" + str(len(store_files)) + "] stores.")
+    metrics = metrics or results.METRIC_FIELDS
+
+    start: float = time.perf_counter()
+    groups, counts, averages = results.query(store, metrics, group_by, filters)
+    logger.info("Aggregated [" + str(int(np.sum(counts))) + "] tables into [" + str(len(groups)) + "] groups in " +
+                "%.3f s" % (time.perf_counter() - start))
+
+    logger.info("-----------------------------------------------------------------------------------------------------")
+    logger.info("".join(field.ljust(32) for field in group_by) + "tables".rjust(10) +
+                "".join(metric.rjust(28) for metric in metrics))
+    for group, count, values in zip(groups, counts, averages):
+        logger.info("".join(_format(value).ljust(32) for value in group) + str(count).rjust(10) +
+                    "".join(("%.4f" % value if not np.isnan(value) else "-").rjust(28) for value in values))
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("store_files", type=str, nargs="+",
+                        help="The results stores, e.g. of the shards of an evaluation.")
+    parser.add_argument("--metrics", type=str, nargs="+", required=False,
+                        help="Averaged metrics, defaults to all metrics. One of: " + ", ".join(results.METRIC_FIELDS),
+                        default=None)
+    parser.add_argument("--group_by", type=str, nargs="+", required=False,
+                        help="Fields of the groups, e.g. revision or cell_count. One of: " +
+                             ", ".join(results.NAME_FIELDS + results.DESCRIPTOR_FIELDS),
+                        default=[])
+    parser.add_argument("--filter", type=str, nargs="+", required=False,
+                        help="Only aggregate the tables which match all filters, e.g. cell_count>=20, matched==true "
+                             "or revision==revision:1:ocr. Names can only be compared with == and !=.",
+                        default=[])
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args: argparse.Namespace = parse_arguments()
+    main(args.store_files, args.metrics, args.group_by, args.filter)
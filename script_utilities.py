@@ -1,29 +1,117 @@
-import glob
+import hashlib
+import io
 import json
 import os
 
+from typing import Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
 from docrecjson import decoder
 from docrecjson.elements import Document
 
 from loguru import logger
 
+import numpy as np
+
+import python.evaluations.archives as archives
+import python.evaluations.columnar as columnar
+import python.evaluations.columnar_store as columnar_store
+import python.evaluations.foreground_pixel_accuracy as foreground_pixel_accuracy
+import python.evaluations.mask_store as mask_store
+import python.evaluations.scheduling as scheduling
+from python.evaluations.archives import ArchiveReader
+from python.evaluations.columnar import ColumnarDocument
+from python.evaluations.columnar_store import ColumnarStore
+from python.evaluations.mask_store import MaskStore
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# ground truth directory -> modification time and index of the directory, see _ground_truth_index
+_ground_truth_indices: Dict[str, Tuple[int, Dict[str, List[str]]]] = {}
+
+# hidden directory in the image directory, therefore it isn't listed as image
+FOREGROUND_MASK_DIRECTORY: str = ".foreground_masks"
+# mask store directory -> modification time of the manifest and the opened store
+_mask_stores: Dict[str, Tuple[int, MaskStore]] = {}
+# archive file -> modification time of the archive and the opened archive, see open_archive
+_archive_readers: Dict[str, Tuple[int, ArchiveReader]] = {}
+
+
+def parse_document(data: bytes) -> Document:
+    return decoder.loads(json.dumps(json.loads(data)))
+
 
 def load_document(filepath: str) -> Document:
-    with open(filepath) as json_data:
+    """
+    :param filepath: json file, optionally compressed with gzip (.gz) or zstandard (.zst)
+    """
+    with archives.open_file(filepath) as json_data:
         json_annotation = json.load(json_data)
 
     return decoder.loads(json.dumps(json_annotation))
 
 
+def open_archive(archive_filepath: str) -> ArchiveReader:
+    """
+    :return: the opened archive, it's only opened again if its modification time changed
+    """
+    modification_time: int = os.stat(archive_filepath).st_mtime_ns
+    cached: Optional[Tuple[int, ArchiveReader]] = _archive_readers.get(archive_filepath)
+    if cached is not None and cached[0] == modification_time:
+        return cached[1]
+    reader: ArchiveReader = ArchiveReader(archive_filepath)
+    _archive_readers[archive_filepath] = (modification_time, reader)
+    return reader
+
+
+def ground_truth_key(filename: str) -> str:
+    # remove the compression and the .png extension from conversion if present
+    filename = archives.strip_compression(filename).replace(".png", "")
+    return os.path.basename(os.path.splitext(filename)[0])
+
+
+def _ground_truth_index(ground_truth_directory: str) -> Dict[str, List[str]]:
+    """
+    maps each prefix of the filenames up to a dot to the matching files, the files of a key are the files a
+    glob for key.* would find. The directory is only listed again if its modification time changed.
+    The ground truth directory can be an archive, the files are the names of its members then.
+    """
+    modification_time: int = os.stat(ground_truth_directory).st_mtime_ns
+    cached: Optional[Tuple[int, Dict[str, List[str]]]] = _ground_truth_indices.get(ground_truth_directory)
+    if cached is not None and cached[0] == modification_time:
+        return cached[1]
+
+    files: List[Tuple[str, str]] = []
+    if archives.is_archive(ground_truth_directory):
+        files = [(os.path.basename(name), name) for name in open_archive(ground_truth_directory).names()]
+    else:
+        with os.scandir(ground_truth_directory) as entries:
+            files = [(entry.name, entry.path) for entry in entries if not entry.name.startswith('.')]
+
+    index: Dict[str, List[str]] = {}
+    for name, path in files:
+        dot_index: int = name.find(".")
+        while dot_index > 0:
+            index.setdefault(name[:dot_index], []).append(path)
+            dot_index = name.find(".", dot_index + 1)
+    _ground_truth_indices[ground_truth_directory] = (modification_time, index)
+    return index
+
+
+def _load_ground_truth_file(ground_truth_directory: str, path: str) -> Document:
+    """
+    :param path: path of the file or name of the member if the ground truth directory is an archive
+    """
+    if archives.is_archive(ground_truth_directory):
+        return parse_document(open_archive(ground_truth_directory).read(path))
+    return load_document(path)
+
+
 def get_ground_truth(filename: str, ground_truth_directory: str) -> Document:
     # todo add handling with getting ground truth from earlier versions
-    # remove .png extension from conversion if present
-    filename = filename.replace(".png", "")
-    filename_without_extension = os.path.basename(os.path.splitext(filename)[0])
-    glob_searchstring: str = os.path.join(ground_truth_directory, filename_without_extension) + ".*"
-    matching_gt = []
-    for filepath in glob.glob(glob_searchstring):
-        matching_gt.append(filepath)
+    filename_without_extension = ground_truth_key(filename)
+    # the directory is listed once instead of a glob for each file
+    matching_gt: List[str] = _ground_truth_index(ground_truth_directory).get(filename_without_extension, [])
 
     if len(matching_gt) != 1:
         raise RuntimeError(
@@ -33,7 +121,7 @@ def get_ground_truth(filename: str, ground_truth_directory: str) -> Document:
         logger.debug("Found matching annotation file for [" + filename + "]: [" + matching_gt[0] + "]")
 
     gt_annotation_path: str = matching_gt[0]
-    return load_document(gt_annotation_path)
+    return _load_ground_truth_file(ground_truth_directory, gt_annotation_path)
 
 
 def get_image_file(filename: str, image_file_directory: str) -> str:
@@ -42,3 +130,352 @@ def get_image_file(filename: str, image_file_directory: str) -> str:
         return filepath
     else:
         raise RuntimeError("Expected " + filepath + " to be present.")
+
+
+def _open_image(filename: str, image_file_directory: str) -> "Image.Image":
+    """
+    opens the image for the annotation without decoding it. PIL is only imported when the first image is opened.
+    :param image_file_directory: directory or archive of the images
+    """
+    from PIL import Image
+    if archives.is_archive(image_file_directory):
+        reader: ArchiveReader = open_archive(image_file_directory)
+        name: Optional[str] = reader.find(filename)
+        if name is None:
+            raise RuntimeError("Expected " + filename + " to be present in " + image_file_directory + ".")
+        image: Image.Image = Image.open(io.BytesIO(reader.read(name)))
+    else:
+        image = Image.open(get_image_file(filename, image_file_directory))
+    return image
+
+
+def load_image(filename: str, image_file_directory: str) -> "Image.Image":
+    """
+    opens and decodes the image for the annotation
+    :param image_file_directory: directory or archive of the images
+    """
+    image: "Image.Image" = _open_image(filename, image_file_directory)
+    image.load()
+    return image
+
+
+def image_size(filename: str, image_file_directory: str) -> Tuple[int, int]:
+    """
+    :return: width and height of the image for the annotation, only its header is read
+    """
+    return _open_image(filename, image_file_directory).size
+
+
+def prescan_prediction_file(filepath: str, image_file_directory: Optional[str]) -> dict:
+    """
+    :return: the signals of the cost of the prediction file for the scheduling, see scheduling.FEATURES. The size of
+    the image is read from its header if the prediction doesn't state it.
+    """
+    with archives.open_file(filepath) as prediction_file:
+        polygons, filename, size = scheduling.scan(prediction_file.read())
+    pixels: int = 0
+    if image_file_directory is not None:
+        if size is None and filename is not None:
+            size = image_size(filename, image_file_directory)
+        pixels = size[0] * size[1] if size is not None else 0
+    return {"polygons": polygons, "pixels": pixels, "size": os.stat(filepath).st_size}
+
+
+def _open_mask_store(image_file_directory: str) -> Optional[MaskStore]:
+    """
+    :return: the mask store of the image directory, none if the masks were not compiled
+    """
+    store_directory: str = os.path.join(image_file_directory, FOREGROUND_MASK_DIRECTORY)
+    try:
+        modification_time: int = os.stat(os.path.join(store_directory, mask_store.MANIFEST_FILENAME)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached: Optional[Tuple[int, MaskStore]] = _mask_stores.get(store_directory)
+    if cached is not None and cached[0] == modification_time:
+        return cached[1]
+    store: Optional[MaskStore] = mask_store.open_store(store_directory)
+    if store is not None:
+        _mask_stores[store_directory] = (modification_time, store)
+    return store
+
+
+def load_foreground_mask(filename: str, image_file_directory: str) -> np.ndarray:
+    """
+    returns the foreground mask of the image. The mask is read from the mask store of the image directory if it was
+    compiled from the current image file, otherwise the image is decoded. Images in archives are always decoded.
+    """
+    if archives.is_archive(image_file_directory):
+        return foreground_pixel_accuracy.foreground_mask(load_image(filename, image_file_directory))
+    filepath: str = get_image_file(filename, image_file_directory)
+    store: Optional[MaskStore] = _open_mask_store(image_file_directory)
+    if store is not None and filename in store:
+        stat: os.stat_result = os.stat(filepath)
+        entry: dict = store.masks[filename]
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return store.load(filename)
+    return foreground_pixel_accuracy.foreground_mask(load_image(filename, image_file_directory))
+
+
+def compile_foreground_masks(image_file_directory: str):
+    """
+    computes the foreground masks of all images in the image directory into its mask store. Only the images which
+    were added or changed since the last compilation are decoded.
+    """
+    if archives.is_archive(image_file_directory):
+        raise RuntimeError("Foreground masks can only be compiled for image directories, not for archives.")
+    store_directory: str = os.path.join(image_file_directory, FOREGROUND_MASK_DIRECTORY)
+    os.makedirs(store_directory, exist_ok=True)
+    store: Optional[MaskStore] = mask_store.open_store(store_directory)
+    masks: Dict[str, dict] = dict(store.masks) if store is not None else {}
+
+    sources: Dict[str, dict] = {}
+    with os.scandir(image_file_directory) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            stat: os.stat_result = entry.stat()
+            sources[entry.name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    for filename in [x for x in masks if x not in sources]:
+        mask_store.remove_mask(store_directory, filename)
+        del masks[filename]
+
+    compiled: int = 0
+    for filename, source in sources.items():
+        entry: Optional[dict] = masks.get(filename)
+        if entry is not None and entry["size"] == source["size"] and entry["mtime_ns"] == source["mtime_ns"]:
+            continue
+        try:
+            image: "Image.Image" = load_image(filename, image_file_directory)
+        except OSError:
+            logger.warning("Not compiling a foreground mask for [" + filename + "] because it can't be read as image.")
+            continue
+        entry = mask_store.write_mask(store_directory, filename, foreground_pixel_accuracy.foreground_mask(image))
+        entry.update(source)
+        masks[filename] = entry
+        compiled += 1
+
+    mask_store.write_manifest(store_directory, masks)
+    logger.info("Compiled [" + str(compiled) + "] foreground masks into [" + store_directory + "], [" +
+                str(len(masks) - compiled) + "] masks were up to date.")
+
+
+def get_columnar_ground_truth(filename: str, ground_truth_directory: str,
+                              store: Optional[ColumnarStore] = None) -> ColumnarDocument:
+    """
+    returns the ground truth from the compiled store if it's present there, otherwise from the ground truth directory
+    """
+    key: str = ground_truth_key(filename)
+    if store is not None and key in store:
+        return store.load(key)
+    return columnar.from_document(get_ground_truth(filename, ground_truth_directory))
+
+
+def _ground_truth_sources(ground_truth_directory: str) -> Dict[str, dict]:
+    """
+    :return: the size and modification time of each annotation file in the ground truth directory. The files of an
+    archive have the size and modification time of the archive.
+    """
+    if archives.is_archive(ground_truth_directory):
+        stat: os.stat_result = os.stat(ground_truth_directory)
+        return {name: {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                for name in open_archive(ground_truth_directory).names()}
+    sources: Dict[str, dict] = {}
+    with os.scandir(ground_truth_directory) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            stat: os.stat_result = entry.stat()
+            sources[entry.name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return sources
+
+
+def _parse_ground_truth_directory(ground_truth_directory: str, sources: Dict[str, dict]) \
+        -> Iterator[Tuple[str, str, ColumnarDocument]]:
+    """
+    parses all unambiguous ground truth files of the directory
+    :return: key, source file and columnar document of each ground truth file
+    """
+    in_archive: bool = archives.is_archive(ground_truth_directory)
+    sources_by_key: Dict[str, List[str]] = {}
+    for source in sources:
+        sources_by_key.setdefault(ground_truth_key(source), []).append(source)
+
+    for key, key_sources in sources_by_key.items():
+        if len(key_sources) != 1:
+            # get_ground_truth raises the error for ambiguous ground truth files on lookup
+            logger.warning("Not loading ground truth [" + key + "], found " + str(len(key_sources)) + " files.")
+            continue
+        source: str = key_sources[0]
+        try:
+            document: Document = _load_ground_truth_file(ground_truth_directory, source if in_archive else
+                                                         os.path.join(ground_truth_directory, source))
+        except ValueError:
+            logger.warning("Not loading [" + source + "] because it can't be parsed as document.")
+            continue
+        yield key, source, columnar.from_document(document)
+
+
+def compile_ground_truth_store(ground_truth_directory: str, store_directory: str):
+    """
+    parses all ground truth files once and writes them into a columnar store
+    """
+    sources: Dict[str, dict] = _ground_truth_sources(ground_truth_directory)
+
+    documents: List[Tuple[str, ColumnarDocument, dict]] = []
+    for key, source, document in _parse_ground_truth_directory(ground_truth_directory, sources):
+        information: dict = {"source": source}
+        information.update(sources[source])
+        documents.append((key, document, information))
+
+    # the manifest has to know all sources, also those which were not compiled, to detect changes correctly
+    columnar_store.write_store(store_directory, documents, {"sources": sources})
+    logger.info("Compiled [" + str(len(documents)) + "] ground truth files into [" + store_directory + "]")
+
+
+def load_ground_truth_corpus(ground_truth_directory: str, store: Optional[ColumnarStore] = None) \
+        -> Dict[str, ColumnarDocument]:
+    """
+    loads all ground truth documents into memory
+    :return: the ground truth documents by their key, see ground_truth_key
+    """
+    if store is not None:
+        return {key: store.load(key) for key in store.documents}
+    return {key: document for key, _, document in
+            _parse_ground_truth_directory(ground_truth_directory, _ground_truth_sources(ground_truth_directory))}
+
+
+def load_ground_truth_store(ground_truth_directory: str, store_directory: str) -> ColumnarStore:
+    """
+    opens the compiled ground truth store. The store is compiled again if it's missing or if any file in the
+    ground truth directory was added, removed or changed since the compilation.
+    """
+    manifest: Optional[dict] = columnar_store.read_manifest(store_directory)
+    if manifest is None:
+        logger.info("No compiled ground truth found in [" + store_directory + "], compiling it.")
+        compile_ground_truth_store(ground_truth_directory, store_directory)
+    elif manifest.get("sources") != _ground_truth_sources(ground_truth_directory):
+        logger.info("Ground truth in [" + ground_truth_directory + "] changed, compiling it again.")
+        compile_ground_truth_store(ground_truth_directory, store_directory)
+    return columnar_store.open_store(store_directory)
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """
+    :param shard: shard specification i/N with 0 <= i < N
+    :return: shard index and shard count
+    """
+    try:
+        shard_index, shard_count = (int(x) for x in shard.split("/"))
+    except ValueError:
+        raise RuntimeError("Expected shard in the format i/N, got: " + shard)
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise RuntimeError("Expected shard index between 0 and " + str(shard_count - 1) + ", got: " + shard)
+    return shard_index, shard_count
+
+
+def in_shard(filename: str, shard_index: int, shard_count: int) -> bool:
+    """
+    assigns files to shards by a stable hash of the filename, independent of the machine and the directory order
+    """
+    digest: bytes = hashlib.md5(os.path.basename(filename).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count == shard_index
+
+
+def run_label(prediction_directory: str) -> str:
+    """
+    :return: the default label of the run of a prediction directory, the name of the directory. It's the same on all
+    machines of a sharded evaluation, while the path of the directory may differ between them.
+    """
+    return os.path.basename(os.path.normpath(prediction_directory))
+
+
+def partial_run(prediction_directory: str, files_considered: int, metrics: dict, label: Optional[str] = None) -> dict:
+    """
+    :param label: label of the run, defaults to run_label of the prediction directory
+    :return: the partial results of a run, see write_partial_metrics
+    """
+    return {"run": label if label is not None else run_label(prediction_directory),
+            "prediction_directory": prediction_directory, "files_considered": files_considered, "metrics": metrics}
+
+
+def write_partial_metrics(filepath: str, runs: List[dict]):
+    """
+    writes the summed metrics of a (sharded) evaluation, so they can be merged with the results of other shards
+    :param filepath: file for the partial results
+    :param runs: prediction_directory, files_considered and the summed metrics of each evaluated run
+    """
+    with open(filepath, "w") as partial_file:
+        json.dump({"runs": runs}, partial_file)
+    logger.info("Wrote partial metrics to [" + filepath + "]")
+
+
+def write_memory_report(filepath: str, budget: Optional[int], action: str, documents: List[dict]):
+    """
+    writes the peak memory of the evaluated documents, see memory_accounting.MemoryAccounting
+    :param budget: memory budget of a document in bytes, none without budget
+    :param documents: one record per evaluated document
+    """
+    with open(filepath, "w") as report_file:
+        json.dump({"budget": budget, "action": action, "documents": documents}, report_file)
+    logger.info("Wrote memory report to [" + filepath + "]")
+
+
+def write_time_limit_report(filepath: str, document_limit: Optional[float], metric_limit: Optional[float],
+                            documents: List[dict]):
+    """
+    writes the documents which were stopped by the time limits, see time_limits.TimeLimits
+    :param document_limit: time limit of a document in seconds, none without limit
+    :param metric_limit: time limit of a metric in seconds, none without limit
+    :param documents: one record per stopped document
+    """
+    with open(filepath, "w") as report_file:
+        json.dump({"document_limit": document_limit, "metric_limit": metric_limit, "documents": documents},
+                  report_file)
+    logger.info("Wrote time limit report to [" + filepath + "]")
+
+
+def merge_partial_metrics(filepaths: List[str]) -> List[dict]:
+    """
+    sums the metrics and the considered files of the partial results, runs are identified by their label. Partial
+    results without label are identified by their prediction directory.
+    :return: run label, prediction_directory of the first partial result, files_considered and the summed metrics of
+    each run
+    """
+    merged_runs: Dict[str, dict] = {}
+    for filepath in filepaths:
+        with open(filepath) as partial_file:
+            runs: List[dict] = json.load(partial_file)["runs"]
+        for run in runs:
+            label: str = run.get("run", run["prediction_directory"])
+            merged_run: dict = merged_runs.setdefault(label, {
+                "run": label, "prediction_directory": run["prediction_directory"], "files_considered": 0,
+                "metrics": {}})
+            merged_run["files_considered"] += run["files_considered"]
+            for metric, revisions in run["metrics"].items():
+                merged_revisions: dict = merged_run["metrics"].setdefault(metric, {})
+                for revision_name, value in revisions.items():
+                    merged_revisions[revision_name] = merged_revisions.get(revision_name, 0) + value
+    return list(merged_runs.values())
+
+
+def read_watch_state(filepath: str) -> dict:
+    """
+    :return: the persisted progress of a watched prediction directory, an empty state if there is none yet
+    """
+    if not os.path.exists(filepath):
+        return {"files": {}}
+    with open(filepath) as state_file:
+        return json.load(state_file)
+
+
+def write_watch_state(filepath: str, state: dict):
+    """
+    writes the progress of a watched prediction directory. The file is replaced atomically, an interrupted write
+    keeps the previous state.
+    :param state: size, modification time and metrics of each evaluated file
+    """
+    temporary_filepath: str = filepath + ".tmp"
+    with open(temporary_filepath, "w") as state_file:
+        json.dump(state, state_file)
+    os.replace(temporary_filepath, filepath)